@@ -0,0 +1,770 @@
+#!/usr/bin/env python3
+"""
+QuickBooks-style accounting API (/api/v1/* and /api/accounting/*), registered on the app by web_viewer.
+
+The accounting controllers (and the services/models behind them) are imported on the first request
+that uses one, so importing web_viewer doesn't load the accounting backend. If a controller can't be
+imported, its endpoints answer 503 instead of disappearing.
+"""
+
+import os
+import shutil
+import importlib
+import traceback
+from datetime import datetime, date
+
+from flask import Blueprint, jsonify, request, make_response, send_from_directory
+from werkzeug.utils import secure_filename
+from psycopg2.extras import RealDictCursor
+
+from database import list_vendors
+from database_postgres import get_connection, replica_reads
+from journal_queue import journalized_reads
+from backend.middleware.error_handler import AppError
+
+accounting_bp = Blueprint('accounting', __name__)
+
+
+class _LazyController:
+    """Stand-in for a backend.controllers singleton; imports the controller module on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._controller = None
+
+    def __getattr__(self, attr):
+        controller = self._controller
+        if controller is None:
+            try:
+                module = importlib.import_module(f'backend.controllers.{self._name}')
+            except Exception as e:
+                print(f"Note: Accounting backend not loaded: {e}")
+                raise AppError(f'Accounting backend not available: {e}', 503)
+            controller = self._controller = getattr(module, self._name)
+        return getattr(controller, attr)
+
+
+account_controller = _LazyController('account_controller')
+transaction_controller = _LazyController('transaction_controller')
+report_controller = _LazyController('report_controller')
+bill_controller = _LazyController('bill_controller')
+bill_payment_controller = _LazyController('bill_payment_controller')
+invoice_controller = _LazyController('invoice_controller')
+payment_controller = _LazyController('payment_controller')
+vendor_controller = _LazyController('vendor_controller')
+customer_controller = _LazyController('customer_controller')
+
+
+def _pg_conn():
+    """PostgreSQL connection with dict-like rows."""
+    conn = get_connection()
+    return conn, conn.cursor(cursor_factory=RealDictCursor)
+
+
+# One-time ensure accounting schema and accounting.accounts exist (e.g. in Supabase)
+_accounting_schema_ensured = False
+
+def _ensure_accounting_schema_once():
+    global _accounting_schema_ensured
+    if _accounting_schema_ensured:
+        return
+    try:
+        from accounting_bootstrap import ensure_accounting_schema
+        ensure_accounting_schema()
+        _accounting_schema_ensured = True
+    except Exception as e:
+        print(f"Accounting schema bootstrap (ensure_accounting_schema): {e}")
+        traceback.print_exc()
+
+# ---------- /api/v1/accounts ----------
+@accounting_bp.route('/api/v1/accounts', methods=['GET'])
+def api_v1_accounts_list():
+    _ensure_accounting_schema_once()
+    return account_controller.get_all_accounts()
+
+@accounting_bp.route('/api/v1/accounts', methods=['POST'])
+def api_v1_accounts_create():
+    _ensure_accounting_schema_once()
+    return account_controller.create_account()
+
+@accounting_bp.route('/api/v1/accounts/tree', methods=['GET'])
+def api_v1_accounts_tree():
+    return account_controller.get_account_tree()
+
+@accounting_bp.route('/api/v1/accounts/<int:account_id>', methods=['GET'])
+def api_v1_accounts_get(account_id):
+    return account_controller.get_account_by_id(account_id)
+
+@accounting_bp.route('/api/v1/accounts/<int:account_id>', methods=['PUT'])
+def api_v1_accounts_update(account_id):
+    return account_controller.update_account(account_id)
+
+@accounting_bp.route('/api/v1/accounts/<int:account_id>', methods=['DELETE'])
+def api_v1_accounts_delete(account_id):
+    return account_controller.delete_account(account_id)
+
+@accounting_bp.route('/api/v1/accounts/<int:account_id>/children', methods=['GET'])
+def api_v1_accounts_children(account_id):
+    return account_controller.get_account_children(account_id)
+
+@accounting_bp.route('/api/v1/accounts/<int:account_id>/balance', methods=['GET'])
+def api_v1_accounts_balance(account_id):
+    return account_controller.get_account_balance(account_id)
+
+@accounting_bp.route('/api/v1/accounts/<int:account_id>/toggle-status', methods=['PATCH'])
+def api_v1_accounts_toggle(account_id):
+    return account_controller.toggle_account_status(account_id)
+
+# ---------- /api/v1/transactions ----------
+@accounting_bp.route('/api/v1/transactions', methods=['GET'])
+def api_v1_transactions_list():
+    return transaction_controller.get_all_transactions()
+
+@accounting_bp.route('/api/v1/transactions', methods=['POST'])
+def api_v1_transactions_create():
+    return transaction_controller.create_transaction()
+
+@accounting_bp.route('/api/v1/transactions/general-ledger', methods=['GET'])
+def api_v1_transactions_gl():
+    return transaction_controller.get_general_ledger()
+
+@accounting_bp.route('/api/v1/transactions/account-ledger/<int:account_id>', methods=['GET'])
+def api_v1_transactions_account_ledger(account_id):
+    return transaction_controller.get_account_ledger(account_id)
+
+@accounting_bp.route('/api/v1/transactions/<int:transaction_id>', methods=['GET'])
+def api_v1_transactions_get(transaction_id):
+    return transaction_controller.get_transaction_by_id(transaction_id)
+
+@accounting_bp.route('/api/v1/transactions/<int:transaction_id>', methods=['PUT'])
+def api_v1_transactions_update(transaction_id):
+    return transaction_controller.update_transaction(transaction_id)
+
+@accounting_bp.route('/api/v1/transactions/<int:transaction_id>', methods=['DELETE'])
+def api_v1_transactions_delete(transaction_id):
+    return transaction_controller.delete_transaction(transaction_id)
+
+@accounting_bp.route('/api/v1/transactions/<int:transaction_id>/post', methods=['POST'])
+def api_v1_transactions_post(transaction_id):
+    return transaction_controller.post_transaction(transaction_id)
+
+@accounting_bp.route('/api/v1/transactions/<int:transaction_id>/unpost', methods=['POST'])
+def api_v1_transactions_unpost(transaction_id):
+    return transaction_controller.unpost_transaction(transaction_id)
+
+@accounting_bp.route('/api/v1/transactions/<int:transaction_id>/void', methods=['POST'])
+def api_v1_transactions_void(transaction_id):
+    return transaction_controller.void_transaction(transaction_id)
+
+# ---------- /api/v1/customers (accounting customers for invoices/payments) ----------
+@accounting_bp.route('/api/v1/customers', methods=['GET'])
+def api_v1_customers_list():
+    return customer_controller.get_all()
+
+@accounting_bp.route('/api/v1/customers', methods=['POST'])
+def api_v1_customers_create():
+    return customer_controller.create()
+
+@accounting_bp.route('/api/v1/customers/<int:customer_id>', methods=['GET'])
+def api_v1_customers_get(customer_id):
+    return customer_controller.get_by_id(customer_id)
+
+@accounting_bp.route('/api/v1/customers/<int:customer_id>', methods=['PUT'])
+def api_v1_customers_update(customer_id):
+    return customer_controller.update(customer_id)
+
+@accounting_bp.route('/api/v1/customers/<int:customer_id>', methods=['DELETE'])
+def api_v1_customers_delete(customer_id):
+    return customer_controller.delete(customer_id)
+
+# ---------- /api/v1/vendors ----------
+@accounting_bp.route('/api/v1/vendors', methods=['GET'])
+def api_v1_vendors_list():
+    return vendor_controller.get_all()
+
+@accounting_bp.route('/api/v1/vendors', methods=['POST'])
+def api_v1_vendors_create():
+    return vendor_controller.create()
+
+@accounting_bp.route('/api/v1/vendors/search', methods=['GET'])
+def api_v1_vendors_search():
+    return vendor_controller.search()
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>', methods=['GET'])
+def api_v1_vendors_get(vendor_id):
+    return vendor_controller.get_by_id(vendor_id)
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>', methods=['PUT'])
+def api_v1_vendors_update(vendor_id):
+    return vendor_controller.update(vendor_id)
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>', methods=['DELETE'])
+def api_v1_vendors_delete(vendor_id):
+    return vendor_controller.delete(vendor_id)
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>/toggle-status', methods=['PATCH'])
+def api_v1_vendors_toggle(vendor_id):
+    return vendor_controller.toggle_status(vendor_id)
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>/balance', methods=['GET'])
+def api_v1_vendors_balance(vendor_id):
+    return vendor_controller.get_balance(vendor_id)
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>/bills', methods=['GET'])
+def api_v1_vendors_bills(vendor_id):
+    return vendor_controller.get_bills(vendor_id)
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>/statement', methods=['GET'])
+def api_v1_vendors_statement(vendor_id):
+    return vendor_controller.get_statement(vendor_id)
+
+@accounting_bp.route('/api/v1/vendors/1099', methods=['GET'])
+def api_v1_vendors_1099():
+    return vendor_controller.get_1099_vendors()
+
+# ---------- /api/v1/bills ----------
+@accounting_bp.route('/api/v1/bills', methods=['GET'])
+def api_v1_bills_list():
+    return bill_controller.get_all()
+
+@accounting_bp.route('/api/v1/bills', methods=['POST'])
+def api_v1_bills_create():
+    return bill_controller.create()
+
+@accounting_bp.route('/api/v1/bills/overdue', methods=['GET'])
+def api_v1_bills_overdue():
+    return bill_controller.get_overdue()
+
+@accounting_bp.route('/api/v1/bills/<int:bill_id>', methods=['GET'])
+def api_v1_bills_get(bill_id):
+    return bill_controller.get_by_id(bill_id)
+
+@accounting_bp.route('/api/v1/bills/<int:bill_id>', methods=['PUT'])
+def api_v1_bills_update(bill_id):
+    return bill_controller.update(bill_id)
+
+@accounting_bp.route('/api/v1/bills/<int:bill_id>', methods=['DELETE'])
+def api_v1_bills_delete(bill_id):
+    return bill_controller.delete(bill_id)
+
+@accounting_bp.route('/api/v1/bills/<int:bill_id>/void', methods=['POST'])
+def api_v1_bills_void(bill_id):
+    return bill_controller.void_bill(bill_id)
+
+# ---------- /api/v1/invoices ----------
+@accounting_bp.route('/api/v1/invoices', methods=['GET'])
+def api_v1_invoices_list():
+    return invoice_controller.get_all()
+
+@accounting_bp.route('/api/v1/invoices', methods=['POST'])
+def api_v1_invoices_create():
+    return invoice_controller.create()
+
+@accounting_bp.route('/api/v1/invoices/overdue', methods=['GET'])
+def api_v1_invoices_overdue():
+    return invoice_controller.get_overdue()
+
+@accounting_bp.route('/api/v1/invoices/<int:invoice_id>', methods=['GET'])
+def api_v1_invoices_get(invoice_id):
+    return invoice_controller.get_by_id(invoice_id)
+
+@accounting_bp.route('/api/v1/invoices/<int:invoice_id>', methods=['PUT'])
+def api_v1_invoices_update(invoice_id):
+    return invoice_controller.update(invoice_id)
+
+@accounting_bp.route('/api/v1/invoices/<int:invoice_id>', methods=['DELETE'])
+def api_v1_invoices_delete(invoice_id):
+    return invoice_controller.delete(invoice_id)
+
+@accounting_bp.route('/api/v1/invoices/<int:invoice_id>/mark-sent', methods=['POST'])
+def api_v1_invoices_mark_sent(invoice_id):
+    return invoice_controller.mark_as_sent(invoice_id)
+
+@accounting_bp.route('/api/v1/invoices/<int:invoice_id>/void', methods=['POST'])
+def api_v1_invoices_void(invoice_id):
+    return invoice_controller.void_invoice(invoice_id)
+
+# ---------- /api/v1/payments (customer payments / receive payment) ----------
+@accounting_bp.route('/api/v1/payments', methods=['GET'])
+def api_v1_payments_list():
+    return payment_controller.get_all()
+
+@accounting_bp.route('/api/v1/payments', methods=['POST'])
+def api_v1_payments_create():
+    return payment_controller.create()
+
+@accounting_bp.route('/api/v1/payments/<int:payment_id>', methods=['GET'])
+def api_v1_payments_get(payment_id):
+    return payment_controller.get_by_id(payment_id)
+
+@accounting_bp.route('/api/v1/payments/<int:payment_id>', methods=['PUT'])
+def api_v1_payments_update(payment_id):
+    return payment_controller.update(payment_id)
+
+@accounting_bp.route('/api/v1/payments/<int:payment_id>', methods=['DELETE'])
+def api_v1_payments_delete(payment_id):
+    return payment_controller.delete(payment_id)
+
+@accounting_bp.route('/api/v1/payments/<int:payment_id>/void', methods=['POST'])
+def api_v1_payments_void(payment_id):
+    return payment_controller.void_payment(payment_id)
+
+@accounting_bp.route('/api/v1/customers/<int:customer_id>/outstanding-invoices', methods=['GET'])
+def api_v1_customers_outstanding_invoices(customer_id):
+    return payment_controller.get_customer_outstanding_invoices(customer_id)
+
+@accounting_bp.route('/api/v1/payments/<int:payment_id>/receipt', methods=['GET'])
+def api_v1_payments_receipt(payment_id):
+    return payment_controller.get_payment_receipt(payment_id)
+
+# ---------- /api/v1/bill-payments ----------
+@accounting_bp.route('/api/v1/bill-payments', methods=['GET'])
+def api_v1_bill_payments_list():
+    return bill_payment_controller.get_all()
+
+@accounting_bp.route('/api/v1/bill-payments', methods=['POST'])
+def api_v1_bill_payments_create():
+    return bill_payment_controller.create()
+
+@accounting_bp.route('/api/v1/bill-payments/<int:payment_id>', methods=['GET'])
+def api_v1_bill_payments_get(payment_id):
+    return bill_payment_controller.get_by_id(payment_id)
+
+@accounting_bp.route('/api/v1/bill-payments/<int:payment_id>', methods=['PUT'])
+def api_v1_bill_payments_update(payment_id):
+    return bill_payment_controller.update(payment_id)
+
+@accounting_bp.route('/api/v1/bill-payments/<int:payment_id>', methods=['DELETE'])
+def api_v1_bill_payments_delete(payment_id):
+    return bill_payment_controller.delete(payment_id)
+
+@accounting_bp.route('/api/v1/bill-payments/<int:payment_id>/void', methods=['POST'])
+def api_v1_bill_payments_void(payment_id):
+    return bill_payment_controller.void_payment(payment_id)
+
+@accounting_bp.route('/api/v1/vendors/<int:vendor_id>/outstanding-bills', methods=['GET'])
+def api_v1_vendors_outstanding_bills(vendor_id):
+    return bill_payment_controller.get_vendor_outstanding_bills(vendor_id)
+
+@accounting_bp.route('/api/v1/bill-payments/<int:payment_id>/check-data', methods=['GET'])
+def api_v1_bill_payments_check_data(payment_id):
+    return bill_payment_controller.get_payment_check_data(payment_id)
+
+# ---------- /api/v1/reports (P&L, Balance Sheet, Cash Flow - same data as /api/accounting, used by reportService) ----------
+@accounting_bp.route('/api/v1/reports/profit-loss', methods=['GET'])
+def api_v1_reports_profit_loss():
+    return report_controller.get_profit_loss()
+
+@accounting_bp.route('/api/v1/reports/profit-loss/comparative', methods=['GET'])
+def api_v1_reports_profit_loss_comparative():
+    return report_controller.get_comparative_profit_loss()
+
+@accounting_bp.route('/api/v1/reports/balance-sheet', methods=['GET'])
+def api_v1_reports_balance_sheet():
+    return report_controller.get_balance_sheet()
+
+@accounting_bp.route('/api/v1/reports/balance-sheet/comparative', methods=['GET'])
+def api_v1_reports_balance_sheet_comparative():
+    return report_controller.get_comparative_balance_sheet()
+
+@accounting_bp.route('/api/v1/reports/cash-flow', methods=['GET'])
+def api_v1_reports_cash_flow():
+    return report_controller.get_cash_flow()
+
+@accounting_bp.route('/api/v1/reports/cash-flow/comparative', methods=['GET'])
+def api_v1_reports_cash_flow_comparative():
+    return report_controller.get_comparative_cash_flow()
+
+# ---------- /api/accounting reports (trial-balance, P&L, balance-sheet) ----------
+@accounting_bp.route('/api/accounting/trial-balance', methods=['GET'])
+@journalized_reads
+@replica_reads
+def api_accounting_trial_balance():
+    as_of = request.args.get('as_of_date')
+    if not as_of:
+        as_of = date.today().isoformat()
+    try:
+        d = datetime.fromisoformat(as_of.split('T')[0]).date()
+    except Exception:
+        return jsonify({'success': False, 'message': 'Invalid as_of_date. Use YYYY-MM-DD'}), 400
+    conn, cur = _pg_conn()
+    cur.execute("SELECT * FROM accounting.get_trial_balance(%s)", (d,))
+    rows = cur.fetchall()
+    data = [dict(row) for row in rows]
+    conn.close()
+    total_d = sum(float(row.get('total_debits') or 0) for row in data)
+    total_c = sum(float(row.get('total_credits') or 0) for row in data)
+    return jsonify({'success': True, 'data': {'accounts': data, 'total_debits': total_d, 'total_credits': total_c, 'date': as_of}}), 200
+
+@accounting_bp.route('/api/accounting/profit-loss', methods=['GET'])
+def api_accounting_profit_loss():
+    return report_controller.get_profit_loss()
+
+@accounting_bp.route('/api/accounting/profit-loss/comparative', methods=['GET'])
+def api_accounting_profit_loss_comparative():
+    return report_controller.get_comparative_profit_loss()
+
+@accounting_bp.route('/api/accounting/balance-sheet', methods=['GET'])
+def api_accounting_balance_sheet():
+    return report_controller.get_balance_sheet()
+
+@accounting_bp.route('/api/accounting/balance-sheet/comparative', methods=['GET'])
+def api_accounting_balance_sheet_comparative():
+    return report_controller.get_comparative_balance_sheet()
+
+ACCOUNTING_REPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads', 'accounting_reports')
+
+@accounting_bp.route('/api/accounting/directory', methods=['GET'])
+def api_accounting_directory():
+    """List saved reports and shipment documents for the accounting directory view."""
+    try:
+        saved_reports = []
+        if os.path.isdir(ACCOUNTING_REPORTS_DIR):
+            for fn in sorted(os.listdir(ACCOUNTING_REPORTS_DIR), reverse=True)[:500]:
+                fp = os.path.join(ACCOUNTING_REPORTS_DIR, fn)
+                if os.path.isfile(fp):
+                    try:
+                        mtime = os.path.getmtime(fp)
+                        saved_reports.append({
+                            'name': fn,
+                            'saved_at': datetime.fromtimestamp(mtime).isoformat(),
+                            'type': 'report'
+                        })
+                    except OSError:
+                        pass
+        shipment_documents = []
+        conn, cur = _pg_conn()
+        try:
+            cur.execute("""
+                SELECT pending_shipment_id, file_path, upload_timestamp
+                FROM pending_shipments
+                WHERE file_path IS NOT NULL AND file_path != ''
+                ORDER BY upload_timestamp DESC NULLS LAST
+                LIMIT 500
+            """)
+            rows = cur.fetchall()
+            for r in rows:
+                row = dict(r)
+                fp = row.get('file_path') or ''
+                name = os.path.basename(fp) if fp else "Shipment #%s" % row.get('pending_shipment_id')
+                ts = row.get('upload_timestamp')
+                shipment_documents.append({
+                    'id': row.get('pending_shipment_id'),
+                    'name': name,
+                    'saved_at': ts.isoformat() if hasattr(ts, 'isoformat') else str(ts) if ts else None,
+                    'type': 'shipment',
+                    'file_path': fp
+                })
+        except Exception:
+            pass
+        finally:
+            conn.close()
+        return jsonify({
+            'success': True,
+            'data': {
+                'saved_reports': saved_reports,
+                'shipment_documents': shipment_documents
+            }
+        })
+    except Exception as e:
+        return make_response(jsonify({'success': False, 'message': str(e)}), 500)
+
+@accounting_bp.route('/api/accounting/reports/save', methods=['POST'])
+def api_accounting_reports_save():
+    """Save a report file to the accounting directory. Format 'pdf' generates a PDF from CSV content."""
+    try:
+        data = request.get_json() or {}
+        name = (data.get('name') or data.get('filename') or 'report').strip()
+        content = data.get('content') or ''
+        report_type = (data.get('report_type') or 'report').replace('/', '-').replace('\\', '')
+        fmt = (data.get('format') or 'csv').lower()
+        save_as_pdf = (fmt == 'pdf')
+
+        if save_as_pdf:
+            try:
+                from report_pdf_generator import generate_report_pdf
+                pdf_bytes = generate_report_pdf(content, report_type)
+                if not pdf_bytes:
+                    return make_response(jsonify({'success': False, 'message': 'PDF generation failed. Install reportlab: pip install reportlab'}), 500)
+            except Exception as pdf_err:
+                return make_response(jsonify({'success': False, 'message': str(pdf_err)}), 500)
+            base = name.replace('.csv', '').replace('.xlsx', '').strip()
+            name = secure_filename(base) + '.pdf'
+            if not name or name == '.pdf':
+                name = secure_filename(report_type) + '-' + datetime.now().strftime('%Y-%m-%d-%H%M') + '.pdf'
+            os.makedirs(ACCOUNTING_REPORTS_DIR, exist_ok=True)
+            file_path = os.path.join(ACCOUNTING_REPORTS_DIR, name)
+            with open(file_path, 'wb') as f:
+                f.write(pdf_bytes)
+        else:
+            if not name.endswith('.csv'):
+                name = name + '.csv' if fmt == 'csv' else name + '.xlsx'
+            name = secure_filename(name)
+            if not name:
+                name = secure_filename(report_type) + '-' + datetime.now().strftime('%Y-%m-%d-%H%M') + '.csv'
+            else:
+                base, ext = os.path.splitext(name)
+                if not ext:
+                    name = base + '.csv'
+            os.makedirs(ACCOUNTING_REPORTS_DIR, exist_ok=True)
+            file_path = os.path.join(ACCOUNTING_REPORTS_DIR, name)
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+        resp = make_response(jsonify({'success': True, 'data': {'name': name, 'path': file_path}}), 200)
+        return resp
+    except Exception as e:
+        return make_response(jsonify({'success': False, 'message': str(e)}), 500)
+
+@accounting_bp.route('/api/accounting/directory/report/<path:filename>', methods=['GET', 'DELETE', 'PATCH'])
+def api_accounting_directory_report(filename):
+    """Serve (GET), delete (DELETE), or rename (PATCH) a saved report file from the accounting directory."""
+    try:
+        filename = secure_filename(os.path.basename(filename))
+        if not filename or filename.startswith('.'):
+            if request.method in ('DELETE', 'PATCH'):
+                return make_response(jsonify({'success': False, 'message': 'Invalid filename'}), 400)
+            return make_response(jsonify({'error': 'Invalid filename'}), 400)
+        file_path = os.path.join(ACCOUNTING_REPORTS_DIR, filename)
+        if request.method == 'PATCH':
+            data = request.get_json(silent=True) or {}
+            new_name = (data.get('new_name') or data.get('name') or '').strip()
+            if not new_name:
+                return make_response(jsonify({'success': False, 'message': 'New filename is required'}), 400)
+            new_name = secure_filename(os.path.basename(new_name))
+            if not new_name or new_name.startswith('.'):
+                return make_response(jsonify({'success': False, 'message': 'Invalid new filename (use only letters, numbers, hyphens, underscores, and one extension)'}), 400)
+            if new_name == filename:
+                return make_response(jsonify({'success': True, 'data': {'name': filename}}), 200)
+            new_path = os.path.join(ACCOUNTING_REPORTS_DIR, new_name)
+            if not os.path.isfile(file_path):
+                return make_response(jsonify({'success': False, 'message': 'File not found'}), 404)
+            if os.path.exists(new_path) and os.path.abspath(new_path) != os.path.abspath(file_path):
+                return make_response(jsonify({'success': False, 'message': 'A file with that name already exists'}), 409)
+            try:
+                shutil.move(file_path, new_path)
+            except OSError as e:
+                return make_response(jsonify({'success': False, 'message': 'Could not rename file: ' + str(e)}), 500)
+            return make_response(jsonify({'success': True, 'data': {'name': new_name}}), 200)
+        if request.method == 'DELETE':
+            if not os.path.isfile(file_path):
+                return make_response(jsonify({'success': False, 'message': 'File not found'}), 404)
+            os.remove(file_path)
+            return make_response(jsonify({'success': True, 'message': 'Report deleted'}), 200)
+        return send_from_directory(ACCOUNTING_REPORTS_DIR, filename, as_attachment=False)
+    except Exception as e:
+        if request.method in ('DELETE', 'PATCH'):
+            return make_response(jsonify({'success': False, 'message': str(e)}), 500)
+        return make_response(jsonify({'error': str(e)}), 404)
+
+@accounting_bp.route('/api/accounting/directory/shipment/<int:shipment_id>', methods=['GET', 'DELETE'])
+def api_accounting_directory_shipment(shipment_id):
+    """Serve (GET) or remove (DELETE) a shipment document from the directory."""
+    try:
+        conn, cur = _pg_conn()
+        cur.execute(
+            "SELECT file_path FROM pending_shipments WHERE pending_shipment_id = %s AND file_path IS NOT NULL",
+            (shipment_id,)
+        )
+        row = cur.fetchone()
+        if not row:
+            conn.close()
+            if request.method == 'DELETE':
+                return make_response(jsonify({'success': False, 'message': 'Shipment or document not found'}), 404)
+            return make_response(jsonify({'error': 'Shipment or document not found'}), 404)
+        fp = row.get('file_path')
+        if request.method == 'DELETE':
+            cur.execute(
+                "UPDATE pending_shipments SET file_path = NULL WHERE pending_shipment_id = %s",
+                (shipment_id,)
+            )
+            conn.commit()
+            if fp and os.path.isfile(fp):
+                try:
+                    os.remove(fp)
+                except OSError:
+                    pass
+            conn.close()
+            return make_response(jsonify({'success': True, 'message': 'Document removed'}), 200)
+        conn.close()
+        if not fp or not os.path.isfile(fp):
+            return make_response(jsonify({'error': 'File not found'}), 404)
+        directory = os.path.dirname(fp)
+        filename = os.path.basename(fp)
+        return send_from_directory(directory, filename, as_attachment=False)
+    except Exception as e:
+        if request.method == 'DELETE':
+            return make_response(jsonify({'success': False, 'message': str(e)}), 500)
+        return make_response(jsonify({'error': str(e)}), 404)
+
+@accounting_bp.route('/api/accounting/cash-flow', methods=['GET'])
+def api_accounting_cash_flow():
+    return report_controller.get_cash_flow()
+
+@accounting_bp.route('/api/accounting/cash-flow/comparative', methods=['GET'])
+def api_accounting_cash_flow_comparative():
+    return report_controller.get_comparative_cash_flow()
+
+@accounting_bp.route('/api/accounting/aging', methods=['GET'])
+def api_accounting_aging():
+    as_of = request.args.get('as_of_date')
+    if not as_of:
+        as_of = date.today().isoformat()
+    try:
+        d = datetime.fromisoformat(as_of.split('T')[0]).date()
+    except Exception:
+        return jsonify({'success': False, 'message': 'Invalid as_of_date. Use YYYY-MM-DD'}), 400
+    conn, cur = _pg_conn()
+    try:
+        cur.execute("SELECT * FROM accounting.get_aging_report(%s)", (d,))
+        rows = cur.fetchall()
+        data = [dict(row) for row in rows]
+    except Exception:
+        data = []
+    finally:
+        conn.close()
+    return jsonify({'success': True, 'data': data}), 200
+
+@accounting_bp.route('/api/accounting/invoices', methods=['GET'])
+def api_accounting_invoices():
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    conn, cur = _pg_conn()
+    try:
+        cur.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'orders'
+        """)
+        cols = [r[0] for r in cur.fetchall()]
+        has_customer = 'customer_id' in cols
+        q = """
+            SELECT o.order_id AS id, o.order_number AS invoice_number,
+                   o.order_date::text AS invoice_date, o.total AS total_amount,
+                   o.total AS balance_due, o.order_status AS status
+        """
+        if has_customer:
+            q = """
+            SELECT o.order_id AS id, o.order_number AS invoice_number,
+                   o.order_date::text AS invoice_date, o.total AS total_amount,
+                   o.total AS balance_due, o.order_status AS status,
+                   c.customer_name AS customer_name
+            FROM orders o
+            LEFT JOIN customers c ON o.customer_id = c.customer_id
+            WHERE 1=1
+            """
+        else:
+            q = """
+            SELECT o.order_id AS id, o.order_number AS invoice_number,
+                   o.order_date::text AS invoice_date, o.total AS total_amount,
+                   o.total AS balance_due, o.order_status AS status,
+                   NULL AS customer_name
+            FROM orders o
+            WHERE 1=1
+            """
+        params = []
+        if start_date:
+            q += " AND o.order_date::date >= %s"
+            params.append(start_date)
+        if end_date:
+            q += " AND o.order_date::date <= %s"
+            params.append(end_date)
+        q += " ORDER BY o.order_date DESC LIMIT 500"
+        cur.execute(q, params)
+        rows = cur.fetchall()
+        data = [dict(zip([c[0] for c in cur.description], r)) for r in rows] if cur.description else []
+    except Exception as e:
+        data = []
+        print(f"Accounting invoices error: {e}")
+    finally:
+        conn.close()
+    return jsonify({'success': True, 'data': data}), 200
+
+@accounting_bp.route('/api/accounting/bills', methods=['GET'])
+def api_accounting_bills():
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    conn, cur = _pg_conn()
+    try:
+        cur.execute("SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'approved_shipments'")
+        if cur.fetchone():
+            q = """
+                SELECT a.shipment_id AS id, ('BILL-' || a.shipment_id) AS bill_number,
+                       a.received_date::text AS bill_date, a.total_cost AS total_amount,
+                       a.total_cost AS balance_due, 'open' AS status,
+                       v.vendor_name
+                FROM approved_shipments a
+                LEFT JOIN vendors v ON a.vendor_id = v.vendor_id
+                WHERE a.total_cost IS NOT NULL AND a.total_cost > 0
+            """
+            params = []
+            if start_date:
+                q += " AND a.received_date::date >= %s"
+                params.append(start_date)
+            if end_date:
+                q += " AND a.received_date::date <= %s"
+                params.append(end_date)
+            q += " ORDER BY a.received_date DESC LIMIT 500"
+            cur.execute(q, params)
+        else:
+            q2 = """
+                SELECT s.shipment_id AS id, ('BILL-' || s.shipment_id) AS bill_number,
+                       s.shipment_date::text AS bill_date,
+                       COALESCE(SUM(si.quantity_received * si.unit_cost), 0) AS total_amount,
+                       COALESCE(SUM(si.quantity_received * si.unit_cost), 0) AS balance_due,
+                       'open' AS status, v.vendor_name
+                FROM shipments s
+                LEFT JOIN shipment_items si ON s.shipment_id = si.shipment_id
+                LEFT JOIN vendors v ON s.vendor_id = v.vendor_id
+                WHERE 1=1
+            """
+            params2 = []
+            if start_date:
+                q2 += " AND s.shipment_date::date >= %s"
+                params2.append(start_date)
+            if end_date:
+                q2 += " AND s.shipment_date::date <= %s"
+                params2.append(end_date)
+            q2 += " GROUP BY s.shipment_id, s.shipment_date, v.vendor_name ORDER BY s.shipment_date DESC LIMIT 500"
+            cur.execute(q2, params2)
+        rows = cur.fetchall()
+        data = [dict(zip([c[0] for c in cur.description], r)) for r in rows] if cur.description else []
+    except Exception as e:
+        data = []
+        print(f"Accounting bills error: {e}")
+    finally:
+        conn.close()
+    return jsonify({'success': True, 'data': data}), 200
+
+@accounting_bp.route('/api/accounting/customers', methods=['GET'])
+def api_accounting_customers():
+    conn, cur = _pg_conn()
+    try:
+        cur.execute("SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'customers'")
+        if cur.fetchone():
+            cur.execute("""
+                SELECT customer_id AS id, customer_id AS customer_number, customer_name AS name,
+                       customer_name AS display_name, email, phone, COALESCE(address, '') AS address,
+                       0 AS account_balance
+                FROM customers ORDER BY customer_name LIMIT 1000
+            """)
+            rows = cur.fetchall()
+            data = [dict(zip([c[0] for c in cur.description], r)) for r in rows] if cur.description else []
+        else:
+            data = []
+    except Exception as e:
+        data = []
+        print(f"Accounting customers error: {e}")
+    finally:
+        conn.close()
+    return jsonify({'success': True, 'data': data}), 200
+
+@accounting_bp.route('/api/accounting/vendors', methods=['GET'])
+def api_accounting_vendors():
+    try:
+        vendors = list_vendors()
+        data = [{'id': v.get('vendor_id'), 'vendor_number': v.get('vendor_id'), 'vendor_name': v.get('vendor_name'),
+                 'contact_person': v.get('contact_person'), 'email': v.get('email'), 'phone': v.get('phone'),
+                 'address': v.get('address') or '', 'account_balance': 0} for v in (vendors or [])]
+    except Exception as e:
+        data = []
+        print(f"Accounting vendors error: {e}")
+    return jsonify({'success': True, 'data': data}), 200
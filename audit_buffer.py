@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Write-behind buffer for audit_log inserts.
+Entries are queued in-process and flushed with one multi-row INSERT every
+AUDIT_FLUSH_INTERVAL_MS or once AUDIT_FLUSH_MAX_ENTRIES are pending, so
+mutating requests no longer pay for a separate audit round-trip + commit.
+Compliance-critical actions can bypass the buffer and write synchronously.
+"""
+
+import os
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from database_postgres import get_connection
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BUFFER_ENABLED = os.getenv('AUDIT_BUFFER_ENABLED', '1').lower() not in ('0', 'false', 'no')
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', '500'))
+AUDIT_FLUSH_MAX_ENTRIES = int(os.getenv('AUDIT_FLUSH_MAX_ENTRIES', '100'))
+# Upper bound on entries held in memory when the database is unreachable (oldest are dropped first)
+AUDIT_MAX_PENDING = int(os.getenv('AUDIT_MAX_PENDING', str(AUDIT_FLUSH_MAX_ENTRIES * 50)))
+# Employee -> establishment mapping rarely changes; cache it for this many seconds
+AUDIT_ESTABLISHMENT_TTL = int(os.getenv('AUDIT_ESTABLISHMENT_TTL', '300'))
+
+# Actions that are always written (and committed) before the caller continues
+SYNC_ACTION_TYPES = frozenset(
+    a.strip().upper()
+    for a in os.getenv('AUDIT_SYNC_ACTIONS', 'LOGIN,LOGOUT,VOID,RETURN,APPROVE').split(',')
+    if a.strip()
+)
+
+# Column order used for every insert; columns missing from audit_log are dropped at flush time
+_AUDIT_COLUMNS = (
+    'establishment_id', 'table_name', 'record_id', 'action_type', 'employee_id',
+    'action_timestamp', 'old_values', 'new_values', 'ip_address', 'notes',
+    'resource_type', 'details',
+)
+
+
+class AuditLogBuffer:
+    """Accumulates audit_log rows and writes them in batches from a background thread."""
+
+    def __init__(self, flush_interval_ms: int = AUDIT_FLUSH_INTERVAL_MS,
+                 max_entries: int = AUDIT_FLUSH_MAX_ENTRIES,
+                 max_pending: int = AUDIT_MAX_PENDING):
+        self.flush_interval = max(flush_interval_ms, 10) / 1000.0
+        self.max_entries = max(max_entries, 1)
+        self.max_pending = max(max_pending, 1)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._columns: Optional[Tuple[str, ...]] = None
+        self._establishment_cache: Dict[int, Tuple[Optional[int], float]] = {}
+        self._default_establishment_id: Optional[int] = None
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+
+    def log(self, entry: Dict[str, Any], sync: bool = False) -> int:
+        """
+        Queue an audit entry (keys from _AUDIT_COLUMNS).
+        The action timestamp is captured now so batching does not skew the trail.
+        Returns the new audit_id when written synchronously, otherwise 0.
+        """
+        entry = dict(entry)
+        entry.setdefault('action_timestamp', datetime.now())
+        if sync or not AUDIT_BUFFER_ENABLED or self._stopped:
+            return self._write([entry], returning=True)
+
+        with self._lock:
+            self._pending.append(entry)
+            pending = len(self._pending)
+        self._ensure_thread()
+        if pending >= self.max_entries:
+            self._wakeup.set()
+        return 0
+
+    def flush(self) -> int:
+        """Write everything queued so far. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                self._write(batch)
+                return len(batch)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError, ConnectionError) as e:
+                # Database unreachable: keep the entries for the next flush
+                logger.warning("Audit flush failed (%d entries re-queued): %s", len(batch), e)
+                self._requeue(batch)
+                return 0
+            except Exception as e:
+                # A bad row (e.g. CHECK constraint on action_type) must not poison the batch
+                logger.warning("Audit batch insert failed, retrying row by row: %s", e)
+                return self._write_individually(batch)
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        with self._lock:
+            self._pending = batch + self._pending
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                logger.error("Audit buffer full; dropping %d oldest entries", overflow)
+                del self._pending[:overflow]
+
+    def _write_individually(self, batch: List[Dict[str, Any]]) -> int:
+        written = 0
+        for i, entry in enumerate(batch):
+            try:
+                self._write([entry])
+                written += 1
+            except (psycopg2.OperationalError, psycopg2.InterfaceError, ConnectionError):
+                self._requeue(batch[i:])
+                break
+            except Exception as e:
+                logger.error("Dropping audit entry %s/%s (%s): %s", entry.get('table_name'),
+                             entry.get('record_id'), entry.get('action_type'), e)
+        return written
+
+    def shutdown(self):
+        """Stop the background thread and flush remaining entries (registered with atexit)."""
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def cache_establishment(self, employee_id: Optional[int], establishment_id: Optional[int]):
+        """Seed the employee -> establishment cache (e.g. right after login)."""
+        if employee_id is not None:
+            self._establishment_cache[employee_id] = (establishment_id, time.monotonic())
+
+    def invalidate_establishment(self, employee_id: Optional[int] = None):
+        """Drop cached establishment lookups (one employee, or all when employee_id is None)."""
+        if employee_id is None:
+            self._establishment_cache.clear()
+            self._default_establishment_id = None
+        else:
+            self._establishment_cache.pop(employee_id, None)
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='audit-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self.pending_count():
+                self.flush()
+
+    def _audit_columns(self, cursor) -> Tuple[str, ...]:
+        """Columns of audit_log we can write to (probed once per process)."""
+        if self._columns is None:
+            cursor.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = 'audit_log' AND table_schema = 'public'
+            """)
+            present = {row[0] if isinstance(row, tuple) else row.get('column_name') for row in cursor.fetchall()}
+            self._columns = tuple(c for c in _AUDIT_COLUMNS if c in present)
+        return self._columns
+
+    def _resolve_establishments(self, cursor, entries: List[Dict[str, Any]]):
+        """Fill establishment_id for entries that lack it, using one query for all cache misses."""
+        now = time.monotonic()
+        missing = set()
+        for entry in entries:
+            if entry.get('establishment_id') or entry.get('employee_id') is None:
+                continue
+            cached = self._establishment_cache.get(entry['employee_id'])
+            if cached is None or now - cached[1] > AUDIT_ESTABLISHMENT_TTL:
+                missing.add(entry['employee_id'])
+
+        if missing:
+            cursor.execute(
+                "SELECT employee_id, establishment_id FROM employees WHERE employee_id = ANY(%s)",
+                (list(missing),),
+            )
+            for row in cursor.fetchall():
+                emp_id = row[0] if isinstance(row, tuple) else row.get('employee_id')
+                est_id = row[1] if isinstance(row, tuple) else row.get('establishment_id')
+                self._establishment_cache[emp_id] = (est_id, now)
+                missing.discard(emp_id)
+            for emp_id in missing:
+                self._establishment_cache[emp_id] = (None, now)
+
+        for entry in entries:
+            if entry.get('establishment_id'):
+                continue
+            cached = self._establishment_cache.get(entry.get('employee_id'))
+            est_id = cached[0] if cached else None
+            if not est_id:
+                est_id = self._default_establishment(cursor)
+            entry['establishment_id'] = est_id
+
+    def _default_establishment(self, cursor) -> Optional[int]:
+        if self._default_establishment_id is None:
+            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
+            row = cursor.fetchone()
+            if row:
+                self._default_establishment_id = row[0] if isinstance(row, tuple) else row.get('establishment_id')
+        return self._default_establishment_id
+
+    def _write(self, entries: List[Dict[str, Any]], returning: bool = False) -> int:
+        """Insert entries in a single statement and commit."""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            columns = self._audit_columns(cursor)
+            if 'establishment_id' in columns:
+                self._resolve_establishments(cursor, entries)
+            rows = [tuple(entry.get(c) for c in columns) for entry in entries]
+            sql = f"INSERT INTO audit_log ({', '.join(columns)}) VALUES %s"
+            if returning:
+                sql += " RETURNING audit_id"
+            result = execute_values(cursor, sql, rows, page_size=max(len(rows), 1), fetch=returning)
+            conn.commit()
+            if returning and result:
+                row = result[-1]
+                return (row[0] if isinstance(row, tuple) else row.get('audit_id')) or 0
+            return 0
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+
+# Global audit buffer instance
+_audit_buffer = None
+_audit_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer() -> AuditLogBuffer:
+    """Get or create the audit buffer singleton"""
+    global _audit_buffer
+    if _audit_buffer is None:
+        with _audit_buffer_lock:
+            if _audit_buffer is None:
+                _audit_buffer = AuditLogBuffer()
+                atexit.register(_audit_buffer.shutdown)
+    return _audit_buffer
+
+
+def flush_audit_log() -> int:
+    """Flush any buffered audit entries now (e.g. before reading the audit trail)."""
+    if _audit_buffer is None:
+        return 0
+    return _audit_buffer.flush()
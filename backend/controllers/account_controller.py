@@ -133,7 +133,16 @@ class AccountController:
                 except ValueError:
                     return jsonify({'success': False, 'message': 'Invalid rootId'}), 400
             
-            tree = account_service.get_account_tree(root_id)
+            include_balances = (request.args.get('includeBalances') or '').lower() in ('1', 'true')
+            as_of_date = None
+            if request.args.get('asOfDate'):
+                try:
+                    from datetime import date
+                    as_of_date = date.fromisoformat(request.args.get('asOfDate'))
+                except ValueError:
+                    return jsonify({'success': False, 'message': 'Invalid date format. Use YYYY-MM-DD'}), 400
+            
+            tree = account_service.get_account_tree(root_id, include_balances, as_of_date)
             return jsonify({
                 'success': True,
                 'data': tree
@@ -12,12 +12,16 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from backend.services.report_service import report_service
 from backend.middleware.error_handler import AppError
+from database_postgres import replica_reads
+from journal_queue import journalized_reads
 
 
 class ReportController:
     """Controller for report-related endpoints"""
     
     @staticmethod
+    @journalized_reads
+    @replica_reads
     def get_profit_loss() -> tuple:
         """Get Profit & Loss statement"""
         try:
@@ -43,6 +47,8 @@ class ReportController:
             raise AppError(str(e), 500)
     
     @staticmethod
+    @journalized_reads
+    @replica_reads
     def get_comparative_profit_loss() -> tuple:
         """Get comparative Profit & Loss statement"""
         try:
@@ -74,6 +80,8 @@ class ReportController:
             raise AppError(str(e), 500)
 
     @staticmethod
+    @journalized_reads
+    @replica_reads
     def get_balance_sheet() -> tuple:
         """Get Balance Sheet as of date"""
         try:
@@ -88,6 +96,8 @@ class ReportController:
             raise AppError(str(e), 500)
 
     @staticmethod
+    @journalized_reads
+    @replica_reads
     def get_comparative_balance_sheet() -> tuple:
         """Get comparative Balance Sheet"""
         try:
@@ -103,6 +113,8 @@ class ReportController:
             raise AppError(str(e), 500)
 
     @staticmethod
+    @journalized_reads
+    @replica_reads
     def get_cash_flow() -> tuple:
         """Get Cash Flow statement"""
         try:
@@ -121,6 +133,8 @@ class ReportController:
             raise AppError(str(e), 500)
 
     @staticmethod
+    @journalized_reads
+    @replica_reads
     def get_comparative_cash_flow() -> tuple:
         """Get comparative Cash Flow"""
         try:
@@ -4,15 +4,27 @@ Transaction Controller
 Handles HTTP requests and responses for transaction endpoints
 """
 
-from flask import request, jsonify, make_response
+from flask import request, jsonify, make_response, Response, stream_with_context
 from typing import Dict, Any
-from datetime import datetime
+from datetime import datetime, date
+from decimal import Decimal
+import json
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from backend.services.transaction_service import transaction_service
 from backend.middleware.error_handler import AppError
+from journal_queue import journalized_reads
+
+
+def _json_default(value):
+    """json.dumps fallback for ledger rows (dates and NUMERIC amounts)"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
 
 
 class TransactionController:
@@ -58,12 +70,19 @@ class TransactionController:
             
             if request.args.get('limit'):
                 try:
-                    filters['limit'] = int(request.args.get('limit'))
+                    filters['limit'] = min(max(int(request.args.get('limit')), 1), 1000)
                 except ValueError:
                     filters['limit'] = 50
             else:
                 filters['limit'] = 50
             
+            # Keyset pagination: pass back pagination.next_cursor instead of page
+            if request.args.get('cursor'):
+                filters['cursor'] = request.args.get('cursor')
+            
+            if request.args.get('include_total', '').lower() in ('0', 'false'):
+                filters['include_total'] = False
+            
             result = transaction_service.get_all_transactions(filters)
             
             return jsonify({
@@ -73,9 +92,12 @@ class TransactionController:
                     'total': result['total'],
                     'page': result['page'],
                     'limit': filters['limit'],
-                    'total_pages': result['total_pages']
+                    'total_pages': result['total_pages'],
+                    'next_cursor': result.get('next_cursor')
                 }
             }), 200
+        except ValueError as e:
+            raise AppError(str(e), 400)
         except Exception as e:
             raise AppError(str(e), 500)
     
@@ -204,6 +226,7 @@ class TransactionController:
             raise AppError(str(e), 400)
     
     @staticmethod
+    @journalized_reads
     def get_general_ledger() -> tuple:
         """Get general ledger"""
         try:
@@ -228,6 +251,33 @@ class TransactionController:
                 except ValueError:
                     return jsonify({'success': False, 'message': 'Invalid end_date format. Use YYYY-MM-DD'}), 400
             
+            # stream=1: newline-delimited JSON, one ledger line per row, fetched from a server-side cursor
+            if request.args.get('stream', '').lower() in ('1', 'true'):
+                rows = transaction_service.iter_general_ledger(account_id, start_date, end_date)
+                
+                def generate():
+                    for entry in rows:
+                        yield json.dumps(entry, default=_json_default) + '\n'
+                
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+            
+            # limit / cursor: keyset pages on (transaction_date, transaction_id, line_number)
+            if request.args.get('limit') or request.args.get('cursor'):
+                try:
+                    limit = min(max(int(request.args.get('limit') or 500), 1), 5000)
+                except ValueError:
+                    return jsonify({'success': False, 'message': 'Invalid limit'}), 400
+                try:
+                    page = transaction_service.get_general_ledger_page(
+                        account_id, start_date, end_date, cursor=request.args.get('cursor'), limit=limit)
+                except ValueError as e:
+                    return jsonify({'success': False, 'message': str(e)}), 400
+                return jsonify({
+                    'success': True,
+                    'data': page['entries'],
+                    'pagination': {'limit': limit, 'next_cursor': page['next_cursor']}
+                }), 200
+            
             ledger = transaction_service.get_general_ledger(account_id, start_date, end_date)
             
             return jsonify({
@@ -238,6 +288,7 @@ class TransactionController:
             raise AppError(str(e), 500)
     
     @staticmethod
+    @journalized_reads
     def get_account_ledger(account_id: int) -> tuple:
         """Get account ledger with running balance"""
         try:
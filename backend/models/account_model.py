@@ -269,6 +269,28 @@ class AccountRepository:
         finally:
             cursor.close()
     
+    @staticmethod
+    def get_net_debit_totals(as_of_date: Optional[date] = None) -> Dict[int, float]:
+        """
+        Posted activity per account in one query: {account_id: total debits - total credits}
+        for non-void transactions dated on or before as_of_date (default today).
+        Accounts without activity are omitted.
+        """
+        cursor = get_cursor()
+        try:
+            cursor.execute("""
+                SELECT tl.account_id,
+                       COALESCE(SUM(tl.debit_amount), 0) - COALESCE(SUM(tl.credit_amount), 0) AS net_debit
+                FROM accounting.transaction_lines tl
+                JOIN accounting.transactions t ON t.id = tl.transaction_id
+                WHERE t.is_posted = true AND (t.is_void IS NOT TRUE OR t.is_void = false)
+                  AND t.transaction_date <= %s
+                GROUP BY tl.account_id
+            """, (as_of_date if as_of_date is not None else date.today(),))
+            return {row['account_id']: float(row['net_debit'] or 0) for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+    
     @staticmethod
     def get_account_balance(account_id: int, as_of_date: Optional[date] = None) -> float:
         """Get account balance. Uses DB function if present, else computes from transaction_lines."""
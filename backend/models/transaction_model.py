@@ -4,9 +4,10 @@ Transaction Model/Repository Layer
 Handles all database operations for transactions and transaction_lines tables
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from datetime import date, datetime
 from decimal import Decimal
+import itertools
 import sys
 import os
 
@@ -15,6 +16,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspa
 from database_postgres import get_cursor, get_connection
 from psycopg2.extras import RealDictCursor
 
+# Server-side cursor names are per connection; a request-scoped connection may stream several ledgers
+_ledger_stream_ids = itertools.count(1)
+
 
 class Transaction:
     """Transaction entity/model"""
@@ -112,99 +116,127 @@ class TransactionLine:
 class TransactionRepository:
     """Repository for transaction database operations"""
     
+    @staticmethod
+    def _lines_for_transactions(cursor, transaction_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """Lines (with account name/number) for many transactions in one query, keyed by transaction id."""
+        by_txn: Dict[int, List[Dict[str, Any]]] = {tid: [] for tid in transaction_ids}
+        if not transaction_ids:
+            return by_txn
+        cursor.execute("""
+            SELECT tl.*, a.account_name, a.account_number
+            FROM accounting.transaction_lines tl
+            JOIN accounting.accounts a ON tl.account_id = a.id
+            WHERE tl.transaction_id = ANY(%s)
+            ORDER BY tl.transaction_id, tl.line_number
+        """, (list(transaction_ids),))
+        for row in cursor.fetchall():
+            by_txn[row['transaction_id']].append(TransactionLine(dict(row)).to_dict())
+        return by_txn
+
+    @staticmethod
+    def encode_cursor(transaction_date: Any, transaction_id: int) -> str:
+        """Keyset cursor for (transaction_date, id) pagination, e.g. '2024-05-01_1234'."""
+        d = transaction_date.isoformat() if hasattr(transaction_date, 'isoformat') else str(transaction_date)
+        return f"{d[:10]}_{transaction_id}"
+
+    @staticmethod
+    def decode_cursor(cursor_value: str) -> tuple:
+        """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+        d, _, tid = (cursor_value or '').partition('_')
+        return date.fromisoformat(d), int(tid)
+
     @staticmethod
     def find_all(filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Get all transactions with optional filters and pagination"""
+        """
+        Get all transactions with optional filters and pagination.
+        Pass filters['cursor'] (from a previous next_cursor) for keyset pagination on
+        (transaction_date, id) instead of OFFSET; filters['include_total'] = False skips the count.
+        """
+        filters = filters or {}
         cursor = get_cursor()
         try:
-            page = filters.get('page', 1) if filters else 1
-            limit = filters.get('limit', 50) if filters else 50
+            page = filters.get('page', 1) or 1
+            limit = filters.get('limit', 50) or 50
             offset = (page - 1) * limit
             
-            # Build base query
-            query = """
-                SELECT DISTINCT t.*
-                FROM accounting.transactions t
-                LEFT JOIN accounting.transaction_lines tl ON t.id = tl.transaction_id
-                WHERE 1=1
-            """
+            where = ["1=1"]
             params = []
-            param_count = 1
             
-            if filters:
-                if filters.get('start_date'):
-                    query += " AND t.transaction_date >= %s"
-                    params.append(filters['start_date'])
-                
-                if filters.get('end_date'):
-                    query += " AND t.transaction_date <= %s"
-                    params.append(filters['end_date'])
-                
-                if filters.get('account_id'):
-                    query += " AND tl.account_id = %s"
-                    params.append(filters['account_id'])
-                
-                if filters.get('transaction_type'):
-                    query += " AND t.transaction_type = %s"
-                    params.append(filters['transaction_type'])
-                
-                if filters.get('is_posted') is not None:
-                    query += " AND t.is_posted = %s"
-                    params.append(filters['is_posted'])
-                
-                if filters.get('is_void') is not None:
-                    query += " AND t.is_void = %s"
-                    params.append(filters['is_void'])
-                
-                if filters.get('search'):
-                    query += " AND (t.transaction_number ILIKE %s OR t.description ILIKE %s)"
-                    search_term = f"%{filters['search']}%"
-                    params.append(search_term)
-                    params.append(search_term)
-            
-            # Get total count - need to modify query for counting
-            count_query = query.replace('SELECT DISTINCT t.*', 'SELECT COUNT(DISTINCT t.id)')
-            cursor.execute(count_query, params)
-            row = cursor.fetchone()
-            total = (list(row.values())[0] or 0) if row else 0
-            
-            # Add ordering and pagination
-            query += " ORDER BY t.transaction_date DESC, t.id DESC LIMIT %s OFFSET %s"
-            params.append(limit)
-            params.append(offset)
-            
-            cursor.execute(query, params)
-            transaction_rows = cursor.fetchall()
-            
-            # Get lines for each transaction
-            transactions_with_lines = []
-            for txn_row in transaction_rows:
-                txn = Transaction(dict(txn_row))
-                
-                # Get lines for this transaction
-                cursor.execute("""
-                    SELECT tl.*, a.account_name, a.account_number
-                    FROM accounting.transaction_lines tl
-                    JOIN accounting.accounts a ON tl.account_id = a.id
-                    WHERE tl.transaction_id = %s
-                    ORDER BY tl.line_number
-                """, (txn.id,))
-                
-                line_rows = cursor.fetchall()
-                lines = [TransactionLine(dict(row)) for row in line_rows]
-                
-                transactions_with_lines.append({
-                    'transaction': txn.to_dict(),
-                    'lines': [line.to_dict() for line in lines]
-                })
-            
-            total_pages = (total + limit - 1) // limit if limit > 0 else 1
+            if filters.get('start_date'):
+                where.append("t.transaction_date >= %s")
+                params.append(filters['start_date'])
+            
+            if filters.get('end_date'):
+                where.append("t.transaction_date <= %s")
+                params.append(filters['end_date'])
+            
+            if filters.get('account_id'):
+                where.append("""EXISTS (
+                    SELECT 1 FROM accounting.transaction_lines tl
+                    WHERE tl.transaction_id = t.id AND tl.account_id = %s
+                )""")
+                params.append(filters['account_id'])
+            
+            if filters.get('transaction_type'):
+                where.append("t.transaction_type = %s")
+                params.append(filters['transaction_type'])
+            
+            if filters.get('is_posted') is not None:
+                where.append("t.is_posted = %s")
+                params.append(filters['is_posted'])
+            
+            if filters.get('is_void') is not None:
+                where.append("t.is_void = %s")
+                params.append(filters['is_void'])
+            
+            if filters.get('search'):
+                where.append("(t.transaction_number ILIKE %s OR t.description ILIKE %s)")
+                search_term = f"%{filters['search']}%"
+                params.append(search_term)
+                params.append(search_term)
+            
+            where_sql = " AND ".join(where)
+            total = None
+            if filters.get('include_total', True):
+                cursor.execute(f"SELECT COUNT(*) AS total FROM accounting.transactions t WHERE {where_sql}", params)
+                row = cursor.fetchone()
+                total = (row['total'] or 0) if row else 0
+            
+            page_params = list(params)
+            query = f"SELECT t.* FROM accounting.transactions t WHERE {where_sql}"
+            if filters.get('cursor'):
+                after_date, after_id = TransactionRepository.decode_cursor(filters['cursor'])
+                query += " AND (t.transaction_date, t.id) < (%s, %s)"
+                page_params.extend([after_date, after_id])
+                query += " ORDER BY t.transaction_date DESC, t.id DESC LIMIT %s"
+                page_params.append(limit)
+            else:
+                query += " ORDER BY t.transaction_date DESC, t.id DESC LIMIT %s OFFSET %s"
+                page_params.extend([limit, offset])
+            
+            cursor.execute(query, page_params)
+            transactions = [Transaction(dict(row)) for row in cursor.fetchall()]
+            
+            # Lines for the whole page in one query
+            lines_by_txn = TransactionRepository._lines_for_transactions(cursor, [txn.id for txn in transactions])
+            transactions_with_lines = [
+                {'transaction': txn.to_dict(), 'lines': lines_by_txn.get(txn.id, [])}
+                for txn in transactions
+            ]
+            
+            next_cursor = None
+            if len(transactions) == limit:
+                last = transactions[-1]
+                next_cursor = TransactionRepository.encode_cursor(last.transaction_date, last.id)
+            
+            total_pages = ((total + limit - 1) // limit if limit > 0 else 1) if total is not None else None
             
             return {
                 'transactions': transactions_with_lines,
                 'total': total,
                 'page': page,
-                'total_pages': total_pages
+                'total_pages': total_pages,
+                'next_cursor': next_cursor
             }
         finally:
             cursor.close()
@@ -303,6 +335,24 @@ class TransactionRepository:
         finally:
             cursor.close()
     
+    @staticmethod
+    def find_posted_ids_by_source_documents(source_document_type: str, source_document_ids: List[int]) -> Dict[int, int]:
+        """Batch form of find_by_source_document: {source_document_id: transaction id} for posted, non-void transactions."""
+        if not source_document_ids:
+            return {}
+        cursor = get_cursor()
+        try:
+            cursor.execute("""
+                SELECT DISTINCT ON (source_document_id) source_document_id, id
+                FROM accounting.transactions
+                WHERE source_document_type = %s AND source_document_id = ANY(%s)
+                  AND is_posted = true AND (is_void IS NOT TRUE OR is_void = false)
+                ORDER BY source_document_id, id DESC
+            """, (source_document_type, list(source_document_ids)))
+            return {row['source_document_id']: row['id'] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+    
     @staticmethod
     def create(data: Dict[str, Any], user_id: int) -> Dict[str, Any]:
         """Create a new transaction with lines"""
@@ -573,11 +623,56 @@ class TransactionRepository:
         return abs(total_debits - total_credits) < 0.01
     
     @staticmethod
-    def get_general_ledger(account_id: Optional[int] = None, start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[Dict[str, Any]]:
-        """Get general ledger entries"""
-        cursor = get_cursor()
+    def _general_ledger_where(account_id: Optional[int], start_date: Optional[date], end_date: Optional[date]) -> tuple:
+        where = "t.is_posted = true AND t.is_void = false"
+        params: List[Any] = []
+        if account_id:
+            where += " AND tl.account_id = %s"
+            params.append(account_id)
+        if start_date:
+            where += " AND t.transaction_date >= %s"
+            params.append(start_date)
+        if end_date:
+            where += " AND t.transaction_date <= %s"
+            params.append(end_date)
+        return where, params
+
+    @staticmethod
+    def encode_ledger_cursor(entry: Dict[str, Any]) -> str:
+        """Keyset cursor for general ledger rows: '<date>_<transaction_id>_<line_number>'."""
+        d = entry['transaction_date']
+        d = d.isoformat() if hasattr(d, 'isoformat') else str(d)
+        return f"{d[:10]}_{entry['transaction_id']}_{entry['line_number']}"
+
+    @staticmethod
+    def decode_ledger_cursor(cursor_value: str) -> tuple:
+        """Inverse of encode_ledger_cursor. Raises ValueError on a malformed cursor."""
+        d, tid, line = (cursor_value or '').split('_')
+        return date.fromisoformat(d), int(tid), int(line)
+
+    @staticmethod
+    def iter_general_ledger(account_id: Optional[int] = None, start_date: Optional[date] = None,
+                            end_date: Optional[date] = None, after: Optional[str] = None,
+                            limit: Optional[int] = None, fetch_size: int = 2000) -> Iterator[Dict[str, Any]]:
+        """
+        Yield posted general ledger lines in (transaction_date, transaction_id, line_number) order
+        from a server-side cursor, so the full ledger is never held in memory.
+        Each row carries running_balance: the account's cumulative balance (debit-normal accounts
+        debit - credit, credit-normal accounts credit - debit) up to that line, seeded with the
+        account's opening_balance plus every posted line before start_date.
+        after: keyset cursor from encode_ledger_cursor; balances carry over from the skipped rows.
+        """
+        where, params = TransactionRepository._general_ledger_where(account_id, start_date, end_date)
+        conn = get_connection()
         try:
-            query = """
+            keyset = ""
+            keyset_params: List[Any] = []
+            if after:
+                keyset = " AND (t.transaction_date, t.id, tl.line_number) > (%s, %s, %s)"
+                keyset_params = list(TransactionRepository.decode_ledger_cursor(after))
+            balances = TransactionRepository._ledger_opening_balances(conn, account_id, start_date, keyset_params)
+
+            query = f"""
                 SELECT 
                     t.id as transaction_id,
                     t.transaction_number,
@@ -586,41 +681,99 @@ class TransactionRepository:
                     t.description as transaction_description,
                     t.reference_number,
                     tl.id as line_id,
+                    tl.line_number,
                     tl.account_id,
                     a.account_number,
                     a.account_name,
                     a.account_type,
+                    a.balance_type,
                     tl.debit_amount,
                     tl.credit_amount,
                     tl.description as line_description
                 FROM accounting.transactions t
                 JOIN accounting.transaction_lines tl ON t.id = tl.transaction_id
                 JOIN accounting.accounts a ON tl.account_id = a.id
-                WHERE t.is_posted = true AND t.is_void = false
+                WHERE {where}{keyset}
+                ORDER BY t.transaction_date, t.id, tl.line_number
             """
-            params = []
-            param_count = 1
-            
-            if account_id:
-                query += " AND tl.account_id = %s"
-                params.append(account_id)
-            
-            if start_date:
-                query += " AND t.transaction_date >= %s"
-                params.append(start_date)
-            
-            if end_date:
-                query += " AND t.transaction_date <= %s"
-                params.append(end_date)
-            
-            query += " ORDER BY t.transaction_date, t.id, tl.line_number"
-            
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            query_params = params + keyset_params
+            if limit:
+                query += " LIMIT %s"
+                query_params.append(limit)
+
+            # Named (server-side) cursor: rows are fetched fetch_size at a time
+            cursor = conn.cursor(name=f'general_ledger_stream_{next(_ledger_stream_ids)}',
+                                 cursor_factory=RealDictCursor)
+            cursor.itersize = max(fetch_size, 1)
+            cursor.execute(query, query_params)
+            for row in cursor:
+                entry = dict(row)
+                debit = float(entry.get('debit_amount') or 0)
+                credit = float(entry.get('credit_amount') or 0)
+                amount = credit - debit if entry.get('balance_type') == 'credit' else debit - credit
+                balance = balances.get(entry['account_id'], 0.0) + amount
+                balances[entry['account_id']] = balance
+                entry['running_balance'] = round(balance, 4)
+                yield entry
+            cursor.close()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _ledger_opening_balances(conn, account_id: Optional[int], start_date: Optional[date],
+                                 after_key: List[Any]) -> Dict[int, float]:
+        """
+        account_id -> balance (normal direction) before the first streamed line: accounts.opening_balance
+        plus posted lines before start_date, or up to and including after_key when resuming a page.
+        """
+        where, params = TransactionRepository._general_ledger_where(account_id, None, None)
+        if after_key:
+            where += " AND (t.transaction_date, t.id, tl.line_number) <= (%s, %s, %s)"
+            params += list(after_key)
+        elif start_date:
+            where += " AND t.transaction_date < %s"
+            params.append(start_date)
+        else:
+            where = None
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            cursor.execute(
+                "SELECT id AS account_id, opening_balance FROM accounting.accounts"
+                " WHERE COALESCE(opening_balance, 0) <> 0" + (" AND id = %s" if account_id else ""),
+                [account_id] if account_id else [],
+            )
+            balances = {r['account_id']: float(r['opening_balance']) for r in cursor.fetchall()}
+            if where:
+                cursor.execute(f"""
+                    SELECT tl.account_id,
+                           SUM(CASE WHEN a.balance_type = 'credit' THEN tl.credit_amount - tl.debit_amount
+                                    ELSE tl.debit_amount - tl.credit_amount END) AS balance
+                    FROM accounting.transactions t
+                    JOIN accounting.transaction_lines tl ON t.id = tl.transaction_id
+                    JOIN accounting.accounts a ON tl.account_id = a.id
+                    WHERE {where}
+                    GROUP BY tl.account_id
+                """, params)
+                for r in cursor.fetchall():
+                    balances[r['account_id']] = balances.get(r['account_id'], 0.0) + float(r['balance'] or 0)
+            return balances
         finally:
             cursor.close()
 
+    @staticmethod
+    def get_ledger_opening_balance(account_id: int, start_date: Optional[date] = None) -> float:
+        """Balance of one account (normal direction) carried into start_date."""
+        conn = get_connection()
+        try:
+            return TransactionRepository._ledger_opening_balances(conn, account_id, start_date, []).get(account_id, 0.0)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def get_general_ledger(account_id: Optional[int] = None, start_date: Optional[date] = None, end_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Get general ledger entries (whole range; prefer iter_general_ledger for large ledgers)"""
+        return list(TransactionRepository.iter_general_ledger(account_id, start_date, end_date))
+
     @staticmethod
     def get_transactions_with_lines_involving_accounts(
         account_ids: List[int],
@@ -8,10 +8,30 @@ from typing import Optional, Dict, Any, List
 from datetime import date
 import sys
 import os
+import threading
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from backend.models.account_model import Account, AccountRepository
 
+# Chart-of-accounts structure used by get_account_tree. Invalidated by account writes made
+# through AccountService; the TTL covers accounts changed elsewhere (e.g. bootstrap seeding).
+ACCOUNT_TREE_TTL = int(os.getenv('ACCOUNT_TREE_TTL', '300'))
+_account_tree_cache: Optional[Dict[str, Any]] = None
+_account_tree_lock = threading.Lock()
+
+
+def invalidate_account_tree() -> None:
+    """Drop cached account tree / account number map after an account create, update or delete."""
+    global _account_tree_cache
+    with _account_tree_lock:
+        _account_tree_cache = None
+    try:
+        from pos_accounting_bridge import invalidate_account_map
+        invalidate_account_map()
+    except Exception:
+        pass
+
 
 class AccountService:
     """Service layer for account business logic"""
@@ -64,7 +84,9 @@ class AccountService:
             if not parent:
                 raise ValueError('Parent account not found')
         
-        return AccountRepository.create(data, user_id)
+        account = AccountRepository.create(data, user_id)
+        invalidate_account_tree()
+        return account
     
     @staticmethod
     def update_account(account_id: int, data: Dict[str, Any], user_id: int) -> Account:
@@ -97,7 +119,9 @@ class AccountService:
         if 'balance_type' in data and data['balance_type'] not in AccountService.VALID_BALANCE_TYPES:
             raise ValueError('Balance type must be debit or credit')
         
-        return AccountRepository.update(account_id, data, user_id)
+        account = AccountRepository.update(account_id, data, user_id)
+        invalidate_account_tree()
+        return account
     
     @staticmethod
     def delete_account(account_id: int) -> None:
@@ -108,6 +132,7 @@ class AccountService:
             raise ValueError('Cannot delete system account')
         
         AccountRepository.delete(account_id)
+        invalidate_account_tree()
     
     @staticmethod
     def get_account_children(account_id: int) -> List[Account]:
@@ -116,31 +141,64 @@ class AccountService:
         return AccountRepository.find_children(account_id)
     
     @staticmethod
-    def get_account_tree(root_id: Optional[int] = None) -> Dict[str, Any]:
-        """Get hierarchical account tree structure"""
-        def build_tree(parent_id: Optional[int]) -> List[Dict[str, Any]]:
-            if parent_id:
-                accounts = AccountRepository.find_children(parent_id)
-            else:
-                # Get root accounts (no parent)
-                filters = {'parent_account_id': None}
-                accounts = AccountRepository.find_all(filters)
-            
-            result = []
-            for account in accounts:
-                account_dict = account.to_dict()
-                account_dict['children'] = build_tree(account.id)
-                result.append(account_dict)
-            
-            return result
+    def _get_account_tree_index() -> Dict[str, Any]:
+        """All accounts (one query) plus a parent -> children index, cached."""
+        global _account_tree_cache
+        with _account_tree_lock:
+            cached = _account_tree_cache
+            if cached is not None and time.monotonic() - cached['loaded_at'] < ACCOUNT_TREE_TTL:
+                return cached
+        accounts = AccountRepository.find_all()
+        by_id = {account.id: account.to_dict() for account in accounts}
+        children: Dict[Optional[int], List[int]] = {}
+        for account in accounts:
+            parent_id = account.parent_account_id if account.parent_account_id in by_id else None
+            children.setdefault(parent_id, []).append(account.id)
+        for ids in children.values():
+            ids.sort(key=lambda i: (by_id[i].get('account_number') or '', by_id[i].get('account_name') or ''))
+        cached = {'by_id': by_id, 'children': children, 'loaded_at': time.monotonic()}
+        with _account_tree_lock:
+            _account_tree_cache = cached
+        return cached
+    
+    @staticmethod
+    def get_account_tree(root_id: Optional[int] = None, include_balances: bool = False,
+                         as_of_date: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Get hierarchical account tree structure, assembled in memory from the cached account list.
+        include_balances adds 'balance' (the account's own) and 'subtree_balance' (account plus all
+        descendants), both in the account's normal balance direction, from one aggregate query.
+        """
+        index = AccountService._get_account_tree_index()
+        by_id, children = index['by_id'], index['children']
+        net_debits = AccountRepository.get_net_debit_totals(as_of_date) if include_balances else {}
+        visited = set()
+        
+        def build_node(account_id: int) -> Dict[str, Any]:
+            visited.add(account_id)
+            node = dict(by_id[account_id])
+            node['children'] = [build_node(child_id) for child_id in children.get(account_id, []) if child_id not in visited]
+            if include_balances:
+                sign = -1.0 if node.get('balance_type') == 'credit' else 1.0
+                own_net_debit = net_debits.get(account_id, 0.0) + sign * float(node.get('opening_balance') or 0)
+                node['_net_debit'] = own_net_debit + sum(c.pop('_net_debit') for c in node['children'])
+                node['balance'] = round(sign * own_net_debit, 2)
+                node['subtree_balance'] = round(sign * node['_net_debit'], 2)
+            return node
         
         if root_id:
-            root = AccountService.get_account_by_id(root_id)
-            root_dict = root.to_dict()
-            root_dict['children'] = build_tree(root_id)
-            return root_dict
-        
-        return {'accounts': build_tree(None)}
+            if root_id not in by_id:
+                AccountService.get_account_by_id(root_id)  # raises 'Account not found' if really missing
+                invalidate_account_tree()
+                return AccountService.get_account_tree(root_id, include_balances, as_of_date)
+            root = build_node(root_id)
+            root.pop('_net_debit', None)
+            return root
+        
+        roots = [build_node(account_id) for account_id in children.get(None, [])]
+        for root in roots:
+            root.pop('_net_debit', None)
+        return {'accounts': roots}
     
     @staticmethod
     def get_account_balance(account_id: int, as_of_date: Optional[date] = None) -> Dict[str, Any]:
@@ -160,22 +218,26 @@ class AccountService:
     def toggle_account_status(account_id: int, user_id: int) -> Account:
         """Toggle account active status"""
         account = AccountService.get_account_by_id(account_id)
-        return AccountRepository.update(account_id, {'is_active': not account.is_active}, user_id)
+        updated = AccountRepository.update(account_id, {'is_active': not account.is_active}, user_id)
+        invalidate_account_tree()
+        return updated
     
     @staticmethod
     def validate_account_hierarchy(account_id: int, new_parent_id: int) -> bool:
         """Validate that setting parent won't create circular reference"""
-        # Check if new_parent_id is a descendant of account_id
+        # Check if new_parent_id is a descendant of account_id (walk up the cached hierarchy)
+        by_id = AccountService._get_account_tree_index()['by_id']
         current_parent_id = new_parent_id
+        seen = set()
         
-        while current_parent_id:
+        while current_parent_id and current_parent_id not in seen:
             if current_parent_id == account_id:
                 raise ValueError('Cannot create circular parent-child relationship')
-            
-            parent = AccountRepository.find_by_id(current_parent_id)
+            seen.add(current_parent_id)
+            parent = by_id.get(current_parent_id)
             if not parent:
                 break
-            current_parent_id = parent.parent_account_id
+            current_parent_id = parent.get('parent_account_id')
         
         return True
     
@@ -4,7 +4,7 @@ Transaction Service Layer
 Business logic and validation for transactions
 """
 
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterator
 from datetime import date
 import sys
 import os
@@ -24,7 +24,12 @@ class TransactionService:
     
     @staticmethod
     def get_all_transactions(filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Get all transactions with optional filters"""
+        """Get all transactions with optional filters (page/limit, or keyset cursor/limit)"""
+        if filters and filters.get('cursor'):
+            try:
+                TransactionRepository.decode_cursor(filters['cursor'])
+            except ValueError:
+                raise ValueError('Invalid cursor')
         return TransactionRepository.find_all(filters)
     
     @staticmethod
@@ -139,6 +144,24 @@ class TransactionService:
         """Get general ledger entries"""
         return TransactionRepository.get_general_ledger(account_id, start_date, end_date)
     
+    @staticmethod
+    def iter_general_ledger(account_id: Optional[int] = None, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+        """Stream general ledger entries (with running balances) without loading the whole ledger"""
+        return TransactionRepository.iter_general_ledger(account_id, start_date, end_date)
+    
+    @staticmethod
+    def get_general_ledger_page(account_id: Optional[int] = None, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                                cursor: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+        """One keyset page of the general ledger plus the cursor for the next page"""
+        if cursor:
+            try:
+                TransactionRepository.decode_ledger_cursor(cursor)
+            except ValueError:
+                raise ValueError('Invalid cursor')
+        entries = list(TransactionRepository.iter_general_ledger(account_id, start_date, end_date, after=cursor, limit=limit))
+        next_cursor = TransactionRepository.encode_ledger_cursor(entries[-1]) if len(entries) == limit else None
+        return {'entries': entries, 'next_cursor': next_cursor}
+    
     @staticmethod
     def get_account_ledger(account_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Dict[str, Any]:
         """Get account ledger with running balance"""
@@ -147,29 +170,15 @@ class TransactionService:
         if not account:
             raise ValueError('Account not found')
         
+        # Rows carry running_balance seeded with the balance carried into start_date
         ledger = TransactionRepository.get_general_ledger(account_id, start_date, end_date)
-        
-        # Calculate running balance
-        running_balance = 0.0
-        ledger_with_balance = []
-        
-        for entry in ledger:
-            debit = float(entry.get('debit_amount', 0))
-            credit = float(entry.get('credit_amount', 0))
-            amount = debit - credit
-            
-            if account.balance_type == 'debit':
-                running_balance += amount
-            else:
-                running_balance -= amount
-            
-            entry_dict = dict(entry)
-            entry_dict['running_balance'] = running_balance
-            ledger_with_balance.append(entry_dict)
+        opening_balance = TransactionRepository.get_ledger_opening_balance(account_id, start_date)
+        running_balance = ledger[-1]['running_balance'] if ledger else opening_balance
         
         return {
             'account': account.to_dict(),
-            'entries': ledger_with_balance,
+            'entries': ledger,
+            'opening_balance': round(opening_balance, 4),
             'ending_balance': running_balance
         }
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Process-wide background jobs: late clock-in alerts, scheduled orders, dedup cleanup (periodic jobs
+on job_scheduler.JobScheduler) and the accounting journal drain. They must run once per deployment,
+not once per web worker:
+- web_viewer.py (development server) and single-process serve.py start them in-process;
+- serve.py --workers N runs them in one coordinator process (python background_workers.py).
+Starting them in more than one process is safe: only the scheduler's lease holder runs the periodic
+jobs, and already-sent late alerts are remembered in scheduler_job_dedup across restarts.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from database_postgres import get_connection
+
+_started = False
+_start_lock = threading.Lock()
+
+LATE_ALERT_JOB = 'late_clockin_alerts'
+
+
+def check_late_clockins():
+    """Alert on employees whose shift started delay + threshold minutes ago without a clock-in,
+    for every store with late alerts on. Reads the in-memory roster (late_arrivals.py), so a tick
+    with nothing newly late does no database work."""
+    from notification_service import send_late_alert_notification
+    from job_scheduler import get_scheduler
+    from late_arrivals import get_late_roster
+
+    now = datetime.now()
+    due = get_late_roster().due_shifts(now)
+    if not due:
+        return
+    scheduler = get_scheduler()
+    today = now.date().isoformat()
+    for shift in due:
+        store_id, emp_id = shift['store_id'], shift['employee_id']
+        alert_key = f"{store_id}:{today}:{emp_id}"
+        if not scheduler.claim_once(LATE_ALERT_JOB, alert_key):
+            continue
+        try:
+            send_late_alert_notification(
+                store_id=store_id,
+                employee_id=emp_id,
+                employee_name=shift['employee_name'],
+                employee_email=shift['email'],
+                scheduled_start_str=shift['start'].strftime('%I:%M %p').lstrip('0'),
+                now_str=now.strftime('%I:%M %p').lstrip('0'),
+                minutes_late=int((now - shift['start']).total_seconds() / 60),
+            )
+        except Exception as _se:
+            # Not sent: let the next run try again
+            scheduler.release_claim(LATE_ALERT_JOB, alert_key)
+            get_late_roster().reload()
+            print(f'[late-alert] send failed for emp {emp_id}: {_se}', flush=True)
+
+
+def check_scheduled_orders_all():
+    """Create upcoming-order alerts for every active establishment."""
+    from notification_service import check_scheduled_orders
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT establishment_id FROM establishments WHERE is_active ORDER BY establishment_id")
+        establishment_ids = [row[0] for row in cur.fetchall()]
+        conn.commit()
+    finally:
+        conn.close()
+    for establishment_id in establishment_ids:
+        check_scheduled_orders(store_id=establishment_id, establishment_id=establishment_id)
+
+
+def register_jobs(scheduler):
+    """Register the periodic jobs on scheduler (next run times persist in scheduler_jobs)."""
+    from job_scheduler import prune_job_dedup
+    from late_arrivals import get_late_roster, LATE_ROSTER_RELOAD_JOB
+
+    scheduler.register(LATE_ALERT_JOB, check_late_clockins, interval_seconds=60, initial_delay=60)
+    # Pulled forward by late_arrivals.roster_changed() when a web worker edits schedules
+    scheduler.register(LATE_ROSTER_RELOAD_JOB, get_late_roster().reload, interval_seconds=24 * 3600)
+    scheduler.register('scheduled_order_alerts', check_scheduled_orders_all, interval_seconds=60)
+    scheduler.register('prune_job_dedup', prune_job_dedup, interval_seconds=24 * 3600, initial_delay=3600)
+
+
+def ensure_rollup_tables():
+    """Create / backfill the payroll rollup at startup, so checkout and clock-out only write to it."""
+    try:
+        import labor_rollup
+        labor_rollup.ensure_rollup()
+    except Exception as e:
+        print(f"Warning: could not prepare employee_daily_rollup: {e}")
+
+
+def start_background_workers() -> bool:
+    """Start the job scheduler (late alerts, scheduled orders) and journal drain (once per process)."""
+    global _started
+    with _start_lock:
+        if _started:
+            return False
+        _started = True
+    ensure_rollup_tables()
+    try:
+        from job_scheduler import get_scheduler
+        scheduler = get_scheduler()
+        register_jobs(scheduler)
+        scheduler.start()
+        print(f"Job scheduler started ({scheduler.instance_id})")
+    except Exception as e:
+        print(f"Warning: could not start job scheduler: {e}")
+    # Post sales queued for accounting (also by other processes / earlier runs)
+    try:
+        from journal_queue import start_journal_worker
+        start_journal_worker()
+    except Exception as e:
+        print(f"Warning: could not start accounting journal worker: {e}")
+    return True
+
+
+def run_coordinator():
+    """Run the background jobs in this process until interrupted (serve.py coordinator)."""
+    start_background_workers()
+    print("Background coordinator running (job scheduler, journal queue)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    run_coordinator()
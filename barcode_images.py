@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Barcode PNG rendering with a content-addressed cache, and bulk product label sheets (PDF).
+
+Rendering a barcode with python-barcode's ImageWriter (Pillow) costs several ms per image; the same
+product barcode is rendered again on every /api/product_barcode_image request, label reprint and
+receipt reprint. barcode_png() keys each image by sha256(symbology, value, writer options):
+- memory LRU of BARCODE_CACHE_MAX_ENTRIES images per process;
+- on-disk cache in BARCODE_CACHE_DIR (shared by web workers, survives restarts; persist=False
+  keeps one-off images such as receipt order numbers in memory only).
+A key never goes stale: a different value or option produces a different key.
+
+label_sheet_pdf() renders the missing barcodes of a label batch on a process pool
+(BARCODE_LABEL_WORKERS) and lays them out on Letter sheets of Avery 5160-style labels.
+"""
+
+import io
+import os
+import json
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BARCODE_CACHE_MAX_ENTRIES = int(os.getenv('BARCODE_CACHE_MAX_ENTRIES', '2048'))
+BARCODE_CACHE_DIR = os.getenv('BARCODE_CACHE_DIR') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'uploads', 'barcode_cache')
+BARCODE_LABEL_WORKERS = int(os.getenv('BARCODE_LABEL_WORKERS', str(min(os.cpu_count() or 1, 4))))
+# Below this many uncached images a pool costs more than it saves
+BARCODE_POOL_MIN_BATCH = int(os.getenv('BARCODE_POOL_MIN_BATCH', '24'))
+LABEL_SHEET_MAX_LABELS = int(os.getenv('LABEL_SHEET_MAX_LABELS', '3000'))
+
+# Bumped when the rendering itself changes, so old disk entries are not served
+_RENDER_VERSION = 1
+
+# Product barcode image (web_viewer /api/product_barcode_image, printed labels)
+PRODUCT_BARCODE_OPTIONS = {
+    'module_width': 0.5,
+    'module_height': 15.0,
+    'quiet_zone': 6.5,
+    'font_size': 10,
+    'text_distance': 5.0,
+    'background': 'white',
+    'foreground': 'black',
+    'write_text': True,
+}
+
+_memory: 'OrderedDict[str, bytes]' = OrderedDict()
+_memory_lock = threading.Lock()
+_stats = {'memory_hits': 0, 'disk_hits': 0, 'renders': 0}
+
+BARCODE_AVAILABLE = None  # unknown until first render
+_barcode_lib = None
+
+
+def _get_barcode_lib():
+    """(barcode module, ImageWriter) on first use, or None when python-barcode[images] is missing."""
+    global _barcode_lib, BARCODE_AVAILABLE
+    if _barcode_lib is None and BARCODE_AVAILABLE is not False:
+        try:
+            import barcode
+            from barcode.writer import ImageWriter
+            _barcode_lib = (barcode, ImageWriter)
+            BARCODE_AVAILABLE = True
+        except ImportError:
+            BARCODE_AVAILABLE = False
+    return _barcode_lib
+
+
+def ean13_checksum(digits12: str) -> str:
+    """Check digit python-barcode appends to a 12-digit EAN-13 value."""
+    odd = sum(int(d) for d in digits12[0::2])
+    even = sum(int(d) for d in digits12[1::2])
+    return str((10 - (odd + 3 * even) % 10) % 10)
+
+
+def product_symbology(barcode_value: str) -> Tuple[str, str]:
+    """(symbology, encoded value) for a product barcode: 12 digits -> EAN-13 with check digit, else Code128."""
+    if barcode_value.isdigit() and len(barcode_value) == 12:
+        return 'ean13', barcode_value + ean13_checksum(barcode_value)
+    return 'code128', barcode_value
+
+
+def cache_key(symbology: str, value: str, options: Dict[str, Any]) -> str:
+    payload = json.dumps([_RENDER_VERSION, symbology, value, options], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_png(symbology: str, value: str, options: Dict[str, Any]) -> bytes:
+    """Render one barcode PNG (no cache). Top-level so the label process pool can call it."""
+    lib = _get_barcode_lib()
+    if lib is None:
+        raise RuntimeError('python-barcode[images] is not installed')
+    barcode, ImageWriter = lib
+    code = barcode.get(symbology, value, writer=ImageWriter())
+    img = code.render(dict(options))
+    buf = io.BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(BARCODE_CACHE_DIR, key[:2], key + '.png')
+
+
+def _remember(key: str, png: bytes):
+    with _memory_lock:
+        _memory[key] = png
+        _memory.move_to_end(key)
+        while len(_memory) > BARCODE_CACHE_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _cached(key: str) -> Optional[bytes]:
+    with _memory_lock:
+        png = _memory.get(key)
+        if png is not None:
+            _memory.move_to_end(key)
+            _stats['memory_hits'] += 1
+            return png
+    try:
+        with open(_disk_path(key), 'rb') as f:
+            png = f.read()
+    except OSError:
+        return None
+    if not png:
+        return None
+    _stats['disk_hits'] += 1
+    _remember(key, png)
+    return png
+
+
+def _store(key: str, png: bytes, persist: bool):
+    _remember(key, png)
+    if not persist:
+        return
+    path = _disk_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(png)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Warning: could not write barcode cache file {path}: {e}")
+
+
+def barcode_png(symbology: str, value: str, options: Optional[Dict[str, Any]] = None,
+                persist: bool = True) -> Tuple[bytes, str]:
+    """PNG bytes for (symbology, value, options) from cache, rendering on a miss. Returns (png, cache key)."""
+    options = dict(PRODUCT_BARCODE_OPTIONS if options is None else options)
+    key = cache_key(symbology, value, options)
+    png = _cached(key)
+    if png is None:
+        png = render_png(symbology, value, options)
+        _stats['renders'] += 1
+        _store(key, png, persist)
+    return png, key
+
+
+def product_barcode_png(barcode_value: str) -> Tuple[bytes, str, str]:
+    """Product barcode image as shown in the UI and on labels. Returns (png, encoded value, cache key)."""
+    symbology, encoded_value = product_symbology(barcode_value)
+    options = dict(PRODUCT_BARCODE_OPTIONS, text=encoded_value)
+    # EAN-13 is rendered from the 12 digits; python-barcode appends the same check digit
+    png, key = barcode_png(symbology, barcode_value if symbology == 'ean13' else encoded_value, options)
+    return png, encoded_value, key
+
+
+def cache_stats() -> Dict[str, Any]:
+    with _memory_lock:
+        entries = len(_memory)
+        size = sum(len(v) for v in _memory.values())
+    return dict(_stats, memory_entries=entries, memory_bytes=size, cache_dir=BARCODE_CACHE_DIR)
+
+
+# ---------------------------------------------------------------------------- #
+# Bulk rendering and label sheets
+# ---------------------------------------------------------------------------- #
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if BARCODE_LABEL_WORKERS <= 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=BARCODE_LABEL_WORKERS)
+                atexit.register(_pool.shutdown, wait=False)
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def render_many(requests: Iterable[Tuple[str, str, Dict[str, Any]]]) -> Dict[str, bytes]:
+    """PNG bytes by cache key for many (symbology, value, options); misses render on the process pool."""
+    result: Dict[str, bytes] = {}
+    missing: Dict[str, Tuple[str, str, Dict[str, Any]]] = {}
+    for symbology, value, options in requests:
+        key = cache_key(symbology, value, options)
+        if key in result or key in missing:
+            continue
+        png = _cached(key)
+        if png is not None:
+            result[key] = png
+        else:
+            missing[key] = (symbology, value, options)
+    if not missing:
+        return result
+
+    keys = list(missing)
+    pngs: Optional[List[bytes]] = None
+    pool = _get_pool() if len(keys) >= BARCODE_POOL_MIN_BATCH else None
+    if pool is not None:
+        try:
+            chunk = max(1, len(keys) // (BARCODE_LABEL_WORKERS * 4))
+            pngs = list(pool.map(render_png, *zip(*(missing[k] for k in keys)), chunksize=chunk))
+        except Exception as e:
+            # Broken pool (worker killed, no fork under the async server): render here
+            print(f"Warning: barcode process pool failed, rendering in-process: {e}")
+            _reset_pool()
+            pngs = None
+    if pngs is None:
+        pngs = [render_png(*missing[k]) for k in keys]
+    for key, png in zip(keys, pngs):
+        _stats['renders'] += 1
+        _store(key, png, True)
+        result[key] = png
+    return result
+
+
+# Avery 5160 / 8160: 3 x 10 labels of 2.625" x 1" on US Letter
+LABEL_LAYOUTS = {
+    'avery5160': {'cols': 3, 'rows': 10, 'label_w': 2.625, 'label_h': 1.0,
+                  'margin_left': 0.1875, 'margin_top': 0.5, 'gap_x': 0.125, 'gap_y': 0.0},
+    'avery5167': {'cols': 4, 'rows': 20, 'label_w': 1.75, 'label_h': 0.5,
+                  'margin_left': 0.3, 'margin_top': 0.5, 'gap_x': 0.3, 'gap_y': 0.0},
+}
+
+
+def label_sheet_pdf(labels: List[Dict[str, Any]], layout: str = 'avery5160',
+                    show_name: bool = True, show_price: bool = True) -> bytes:
+    """
+    One PDF with a label per copy of each product.
+    labels: [{'barcode_value', 'product_name', 'product_price', 'copies'}] (barcode_value as for
+    product_barcode_png). Raises ValueError for an unknown layout or too many labels.
+    """
+    if layout not in LABEL_LAYOUTS:
+        raise ValueError(f"Unknown label layout '{layout}' (use one of {', '.join(LABEL_LAYOUTS)})")
+    total = sum(max(int(label.get('copies') or 1), 0) for label in labels)
+    if total > LABEL_SHEET_MAX_LABELS:
+        raise ValueError(f"{total} labels requested; at most {LABEL_SHEET_MAX_LABELS} per sheet batch")
+
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.units import inch
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    specs = []
+    for label in labels:
+        symbology, encoded_value = product_symbology(str(label['barcode_value']))
+        options = dict(PRODUCT_BARCODE_OPTIONS, text=encoded_value)
+        value = label['barcode_value'] if symbology == 'ean13' else encoded_value
+        specs.append((symbology, str(value), options))
+    images = render_many(specs)
+
+    spec = LABEL_LAYOUTS[layout]
+    per_page = spec['cols'] * spec['rows']
+    label_w, label_h = spec['label_w'] * inch, spec['label_h'] * inch
+    page_w, page_h = letter
+    pad = 0.06 * inch
+    text_h = 0.13 * inch if label_h >= 0.9 * inch else 0
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=letter)
+    readers: Dict[str, Any] = {}   # one embedded image per distinct barcode
+    slot = 0
+    for label, (symbology, value, options) in zip(labels, specs):
+        key = cache_key(symbology, value, options)
+        reader = readers.get(key)
+        if reader is None:
+            reader = readers[key] = ImageReader(io.BytesIO(images[key]))
+        name = str(label.get('product_name') or '')[:40]
+        price = label.get('product_price')
+        for _ in range(max(int(label.get('copies') or 1), 0)):
+            if slot and slot % per_page == 0:
+                pdf.showPage()
+            col, row = slot % spec['cols'], (slot % per_page) // spec['cols']
+            x = (spec['margin_left'] + col * (spec['label_w'] + spec['gap_x'])) * inch
+            y = page_h - (spec['margin_top'] + (row + 1) * spec['label_h'] + row * spec['gap_y']) * inch
+            top = y + label_h - pad
+            if text_h and show_name and name:
+                pdf.setFont('Helvetica', 7)
+                pdf.drawString(x + pad, top - text_h + 0.03 * inch, name)
+                top -= text_h
+            if text_h and show_price and price is not None:
+                pdf.setFont('Helvetica-Bold', 8)
+                pdf.drawRightString(x + label_w - pad, y + label_h - pad - text_h + 0.03 * inch,
+                                    f"${float(price):.2f}")
+            pdf.drawImage(reader, x + pad, y + pad, width=label_w - 2 * pad, height=top - y - pad,
+                          preserveAspectRatio=True, anchor='c')
+            slot += 1
+    pdf.save()
+    return buf.getvalue()
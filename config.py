@@ -7,4 +7,15 @@ EXTRACTION_CONFIG = {
     "max_retries": 2,
     "supported_formats": ["pdf", "xlsx", "xls", "docx", "jpg", "jpeg", "png"],
     "max_file_size_mb": 20,
+    # PDF text extraction
+    "quality_probe_pages": 2,        # Pages extracted first; text-less/gibberish PDFs stop here (vision path)
+    "parallel_page_threshold": 8,    # Remaining pages needed before using the process pool
+    "pdf_workers": 4,                # Process pool size for page extraction (0 = always serial)
+    # Result cache keyed by file content hash (previews and re-uploads skip extraction)
+    "cache_dir": "uploads/shipments/.extraction_cache",
+    "cache_ttl_hours": 72,
+    "cache_memory_entries": 64,
+    # Background jobs (async preview/upload)
+    "job_workers": 2,
+    "job_ttl_minutes": 60,
 }
@@ -3,10 +3,167 @@ Customer Display System Backend
 Handles transactions, payments, and customer display interactions (PostgreSQL)
 """
 
+import os
 import json
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from decimal import Decimal
 
+# Store tax % / fee rates / establishment used by the display flow are re-read after this many seconds
+DISPLAY_CONTEXT_TTL = int(os.getenv('DISPLAY_CONTEXT_TTL', '60'))
+_LATENCY_SAMPLES = 5000
+
+_TRANSACTIONS_REQUIRED_COLUMNS = [
+    ('establishment_id', 'INTEGER'),
+    ('order_id', 'INTEGER'),
+    ('employee_id', 'INTEGER'),
+    ('customer_id', 'INTEGER'),
+    ('subtotal', 'NUMERIC(10,2) DEFAULT 0'),
+    ('tax', 'NUMERIC(10,2) DEFAULT 0'),
+    ('total', 'NUMERIC(10,2) DEFAULT 0'),
+    ('status', 'TEXT DEFAULT \'pending\''),
+]
+
+# Columns of the tables written by the display flow (probed once per process)
+_schema_caps = None
+_schema_caps_lock = threading.Lock()
+
+# establishment_id -> (default tax rate and fee rates, loaded_at); refreshed every DISPLAY_CONTEXT_TTL seconds
+_display_contexts = {}
+_display_context_lock = threading.Lock()
+
+def _get_schema_caps(cursor):
+    """Column sets for orders / order_items / transactions, from one information_schema query."""
+    global _schema_caps
+    if _schema_caps is not None:
+        return _schema_caps
+    with _schema_caps_lock:
+        if _schema_caps is None:
+            cursor.execute("""
+                SELECT table_name, column_name FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name IN ('orders', 'order_items', 'transactions')
+            """)
+            caps = {'orders': set(), 'order_items': set(), 'transactions': set()}
+            for row in cursor.fetchall():
+                table = row['table_name'] if isinstance(row, dict) else row[0]
+                column = row['column_name'] if isinstance(row, dict) else row[1]
+                caps[table].add(column)
+            _schema_caps = caps
+    return _schema_caps
+
+
+def invalidate_schema_caps():
+    """Forget probed columns (after a migration changes orders / order_items / transactions)."""
+    global _schema_caps
+    with _schema_caps_lock:
+        _schema_caps = None
+
+
+def _ensure_transactions_table(cursor):
+    """Create public.transactions or add missing columns. Only runs while the cached caps show a gap."""
+    caps = _get_schema_caps(cursor)
+    existing = caps['transactions']
+    if existing and all(col in existing for col, _ in _TRANSACTIONS_REQUIRED_COLUMNS):
+        return
+    if not existing:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS public.transactions (
+                transaction_id SERIAL PRIMARY KEY,
+                establishment_id INTEGER NOT NULL REFERENCES public.establishments(establishment_id) ON DELETE CASCADE,
+                order_id INTEGER REFERENCES public.orders(order_id) ON DELETE SET NULL,
+                employee_id INTEGER NOT NULL REFERENCES public.employees(employee_id),
+                customer_id INTEGER REFERENCES public.customers(customer_id),
+                subtotal NUMERIC(10,2) NOT NULL DEFAULT 0,
+                tax NUMERIC(10,2) NOT NULL DEFAULT 0,
+                total NUMERIC(10,2) NOT NULL DEFAULT 0,
+                tip NUMERIC(10,2) DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'completed', 'cancelled')),
+                payment_status TEXT CHECK(payment_status IN ('pending', 'paid', 'partial', 'refunded')),
+                amount_paid NUMERIC(10,2),
+                change_amount NUMERIC(10,2) DEFAULT 0,
+                signature TEXT,
+                completed_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT NOW(),
+                updated_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_establishment ON public.transactions(establishment_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_order_id ON public.transactions(order_id)")
+    else:
+        # Ensure all columns required for INSERT exist (add any missing)
+        for col_name, col_type in _TRANSACTIONS_REQUIRED_COLUMNS:
+            if col_name not in existing:
+                cursor.execute(
+                    "ALTER TABLE public.transactions ADD COLUMN IF NOT EXISTS %s %s" % (col_name, col_type)
+                )
+        if 'establishment_id' not in existing:
+            cursor.execute("""
+                UPDATE public.transactions t
+                SET establishment_id = (SELECT establishment_id FROM public.establishments ORDER BY establishment_id LIMIT 1)
+                WHERE t.establishment_id IS NULL
+            """)
+            cursor.execute("ALTER TABLE public.transactions ALTER COLUMN establishment_id SET NOT NULL")
+            cursor.execute("SAVEPOINT transactions_fk")
+            try:
+                cursor.execute("""
+                    ALTER TABLE public.transactions
+                    ADD CONSTRAINT transactions_establishment_id_fkey
+                    FOREIGN KEY (establishment_id) REFERENCES public.establishments(establishment_id) ON DELETE CASCADE
+                """)
+                cursor.execute("RELEASE SAVEPOINT transactions_fk")
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT transactions_fk")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_establishment ON public.transactions(establishment_id)")
+    # Re-probe after the caller commits
+    invalidate_schema_caps()
+
+
+def get_display_context(refresh=False):
+    """
+    Establishment id, default tax rate (store default_sales_tax_pct / 100) and effective
+    transaction fee rates (pos_settings fee mode applied) of the current establishment.
+    The establishment is resolved on every call; its settings are cached for DISPLAY_CONTEXT_TTL seconds.
+    """
+    from database_postgres import get_current_establishment
+    establishment_id = get_current_establishment()
+    cached = _display_contexts.get(establishment_id)
+    if not refresh and cached is not None and time.monotonic() - cached[1] < DISPLAY_CONTEXT_TTL:
+        return cached[0]
+    with _display_context_lock:
+        cached = _display_contexts.get(establishment_id)
+        if not refresh and cached is not None and time.monotonic() - cached[1] < DISPLAY_CONTEXT_TTL:
+            return cached[0]
+        from database import get_connection, get_establishment_settings, _apply_pos_settings_fee_mode
+        settings = get_establishment_settings(establishment_id)
+        fee_rates = settings.get('transaction_fee_rates') or {}
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            fee_rates = _apply_pos_settings_fee_mode(cursor, fee_rates) or fee_rates
+            conn.rollback()
+        finally:
+            conn.close()
+        tax_pct = float(settings.get('default_sales_tax_pct') or 0)
+        context = {
+            'establishment_id': establishment_id,
+            'tax_rate': tax_pct / 100.0 if tax_pct > 0 else 0.08,
+            'fee_rates': dict(fee_rates),
+        }
+        _display_contexts[establishment_id] = (context, time.monotonic())
+        return context
+
+
+def invalidate_display_context(establishment_id=None):
+    """Drop cached tax / fee settings of one establishment, or of all (after store or POS settings change)."""
+    with _display_context_lock:
+        if establishment_id is None:
+            _display_contexts.clear()
+        else:
+            _display_contexts.pop(establishment_id, None)
+
+
 class CustomerDisplaySystem:
     
     def __init__(self, _db_path=None):
@@ -21,7 +178,7 @@ class CustomerDisplaySystem:
     
     def start_transaction(self, employee_id, items, customer_id=None, discount=0.0, discount_type=None, scheduled_time=None):
         """Start a new transaction. discount is order-level discount amount; discount_type e.g. 'student', 'employee'."""
-        from database_postgres import get_current_establishment
+        context = get_display_context()
         conn, cursor = self.get_connection()
         try:
             # Ensure we start with a clean transaction state
@@ -30,19 +187,14 @@ class CustomerDisplaySystem:
             except:
                 pass
             
-            establishment_id = get_current_establishment()
+            establishment_id = context['establishment_id']
             if establishment_id is None:
-                cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-                row = cursor.fetchone()
-                if row:
-                    establishment_id = row['establishment_id'] if isinstance(row, dict) else row[0]
-                if establishment_id is None:
-                    raise Exception('No establishment found. Please ensure the database has at least one establishment.')
+                raise Exception('No establishment found. Please ensure the database has at least one establishment.')
             
             # Calculate subtotal, tax, and total properly
             subtotal = 0.0
             total_tax = 0.0
-            tax_rate = 0.08  # Default tax rate
+            tax_rate = context['tax_rate']  # Store default tax rate
             
             # Check if items have tax_rate
             if items and len(items) > 0:
@@ -70,9 +222,8 @@ class CustomerDisplaySystem:
             
             # Create order first to get order_id and order_number
             # Check if tip, order_type, discount, discount_type columns exist
-            cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'orders' AND table_schema = 'public'")
-            columns_result = cursor.fetchall()
-            order_columns = [col['column_name'] if isinstance(col, dict) else col[0] for col in columns_result]
+            schema_caps = _get_schema_caps(cursor)
+            order_columns = schema_caps['orders']
             has_tip = 'tip' in order_columns
             has_order_type = 'order_type' in order_columns
             has_tax_rate = 'tax_rate' in order_columns
@@ -119,72 +270,7 @@ class CustomerDisplaySystem:
                 order_number = order_result[1] if len(order_result) > 1 else order_number
             
             # Ensure transactions table exists and has establishment_id (migrate if missing)
-            cursor.execute("""
-                SELECT 1 FROM information_schema.tables
-                WHERE table_schema = 'public' AND table_name = 'transactions'
-            """)
-            if cursor.fetchone() is None:
-                cursor.execute("""
-                    CREATE TABLE public.transactions (
-                        transaction_id SERIAL PRIMARY KEY,
-                        establishment_id INTEGER NOT NULL REFERENCES public.establishments(establishment_id) ON DELETE CASCADE,
-                        order_id INTEGER REFERENCES public.orders(order_id) ON DELETE SET NULL,
-                        employee_id INTEGER NOT NULL REFERENCES public.employees(employee_id),
-                        customer_id INTEGER REFERENCES public.customers(customer_id),
-                        subtotal NUMERIC(10,2) NOT NULL DEFAULT 0,
-                        tax NUMERIC(10,2) NOT NULL DEFAULT 0,
-                        total NUMERIC(10,2) NOT NULL DEFAULT 0,
-                        tip NUMERIC(10,2) DEFAULT 0,
-                        status TEXT NOT NULL DEFAULT 'pending' CHECK(status IN ('pending', 'completed', 'cancelled')),
-                        payment_status TEXT CHECK(payment_status IN ('pending', 'paid', 'partial', 'refunded')),
-                        amount_paid NUMERIC(10,2),
-                        change_amount NUMERIC(10,2) DEFAULT 0,
-                        signature TEXT,
-                        completed_at TIMESTAMP,
-                        created_at TIMESTAMP DEFAULT NOW(),
-                        updated_at TIMESTAMP DEFAULT NOW()
-                    )
-                """)
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_establishment ON public.transactions(establishment_id)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_order_id ON public.transactions(order_id)")
-            else:
-                # Ensure all columns required for INSERT exist (add any missing)
-                required_columns = [
-                    ('establishment_id', 'INTEGER'),
-                    ('order_id', 'INTEGER'),
-                    ('employee_id', 'INTEGER'),
-                    ('customer_id', 'INTEGER'),
-                    ('subtotal', 'NUMERIC(10,2) DEFAULT 0'),
-                    ('tax', 'NUMERIC(10,2) DEFAULT 0'),
-                    ('total', 'NUMERIC(10,2) DEFAULT 0'),
-                    ('status', 'TEXT DEFAULT \'pending\''),
-                ]
-                cursor.execute("""
-                    SELECT column_name FROM information_schema.columns
-                    WHERE table_schema = 'public' AND table_name = 'transactions'
-                """)
-                existing = {row['column_name'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()}
-                for col_name, col_type in required_columns:
-                    if col_name not in existing:
-                        cursor.execute(
-                            "ALTER TABLE public.transactions ADD COLUMN IF NOT EXISTS %s %s" % (col_name, col_type)
-                        )
-                if 'establishment_id' not in existing:
-                    cursor.execute("""
-                        UPDATE public.transactions t
-                        SET establishment_id = (SELECT establishment_id FROM public.establishments ORDER BY establishment_id LIMIT 1)
-                        WHERE t.establishment_id IS NULL
-                    """)
-                    cursor.execute("ALTER TABLE public.transactions ALTER COLUMN establishment_id SET NOT NULL")
-                    try:
-                        cursor.execute("""
-                            ALTER TABLE public.transactions
-                            ADD CONSTRAINT transactions_establishment_id_fkey
-                            FOREIGN KEY (establishment_id) REFERENCES public.establishments(establishment_id) ON DELETE CASCADE
-                        """)
-                    except Exception:
-                        pass
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_establishment ON public.transactions(establishment_id)")
+            _ensure_transactions_table(cursor)
             
             # Now create transaction linked to order (use order_total so transaction total reflects discount)
             cursor.execute("""
@@ -196,35 +282,30 @@ class CustomerDisplaySystem:
             result = cursor.fetchone()
             transaction_id = result['transaction_id'] if isinstance(result, dict) else result[0]
             
-            # Calculate tax rate (8% default, or from items if provided)
-            tax_rate = 0.08
-            if items and len(items) > 0:
-                # Check if items have tax_rate
-                first_item_tax = items[0].get('tax_rate')
-                if first_item_tax is not None:
-                    tax_rate = float(first_item_tax)
-            
             # Sum quantity per product (same product in multiple lines = one inventory decrement)
             product_totals = {}
             for item in items:
                 pid = item['product_id']
                 qty = int(item['quantity'])
                 product_totals[pid] = product_totals.get(pid, 0) + qty
-            # Check availability for current establishment (one check per product)
-            for product_id, total_qty in product_totals.items():
+            # Check availability for current establishment (one query for all products)
+            available_by_product = {}
+            if product_totals:
                 cursor.execute(
-                    "SELECT current_quantity FROM inventory WHERE product_id = %s AND establishment_id = %s",
-                    (product_id, establishment_id)
+                    "SELECT product_id, current_quantity FROM inventory WHERE establishment_id = %s AND product_id = ANY(%s)",
+                    (establishment_id, list(product_totals.keys()))
                 )
-                row = cursor.fetchone()
-                if not row:
+                for row in cursor.fetchall():
+                    pid = row['product_id'] if isinstance(row, dict) else row[0]
+                    available_by_product[pid] = row['current_quantity'] if isinstance(row, dict) else row[1]
+            for product_id, total_qty in product_totals.items():
+                if product_id not in available_by_product:
                     raise Exception(f'Product ID {product_id} does not exist in inventory')
-                available = row['current_quantity'] if isinstance(row, dict) else row[0]
+                available = available_by_product[product_id]
                 if available < total_qty:
                     raise Exception(f'Insufficient inventory for product_id {product_id}. Available: {available}, Requested: {total_qty}')
             # Create order_items for the order (required for returns and order history)
-            cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = 'order_items'")
-            oi_cols = [row['column_name'] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+            oi_cols = schema_caps['order_items']
             has_oi_variant = 'variant_id' in oi_cols
             has_oi_notes = 'notes' in oi_cols
             print(f"Creating order_items for order_id {order_id}, {len(items)} items")
@@ -239,10 +320,6 @@ class CustomerDisplaySystem:
                 variant_id = item.get('variant_id')
                 item_notes = (item.get('notes') or '').strip() or None
 
-                cursor.execute("SELECT product_id FROM inventory WHERE product_id = %s AND establishment_id = %s", (product_id, establishment_id))
-                if not cursor.fetchone():
-                    raise Exception(f'Product ID {product_id} does not exist in inventory')
-
                 try:
                     if has_oi_variant and has_oi_notes:
                         cursor.execute("""
@@ -354,10 +431,9 @@ class CustomerDisplaySystem:
     
     def get_payment_methods(self):
         """Get available payment methods"""
-        from database_postgres import get_current_establishment
+        establishment_id = get_display_context()['establishment_id']
         conn, cursor = self.get_connection()
         try:
-            establishment_id = get_current_establishment()
             cursor.execute("""
                 SELECT * FROM payment_methods
                 WHERE establishment_id = %s AND is_active = 1
@@ -472,8 +548,7 @@ class CustomerDisplaySystem:
                 change = 0
             
             # Create payment record
-            from database_postgres import get_current_establishment
-            payment_establishment_id = get_current_establishment()
+            payment_establishment_id = transaction.get('establishment_id') or get_display_context()['establishment_id']
             if payment_establishment_id is None:
                 # Fallback to get or create default establishment
                 from database import _get_or_create_default_establishment
@@ -530,10 +605,7 @@ class CustomerDisplaySystem:
                         pass
                 
                 # Check if order has tip column
-                cursor.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'orders' AND table_schema = 'public'")
-                columns_result = cursor.fetchall()
-                order_columns = [col['column_name'] if isinstance(col, dict) else col[0] for col in columns_result]
-                has_tip = 'tip' in order_columns
+                has_tip = 'tip' in _get_schema_caps(cursor)['orders']
                 
                 # Use order_payment_status for orders table (allowed: pending, completed, refunded, partially_refunded)
                 # When tip > 0: update tip AND add tip to order total so Recent Orders and receipts show correct amount
@@ -685,11 +757,9 @@ class CustomerDisplaySystem:
     
     def get_display_settings(self):
         """Get customer display settings"""
-        from database_postgres import get_current_establishment
+        establishment_id = get_display_context()['establishment_id']
         conn, cursor = self.get_connection()
         
-        establishment_id = get_current_establishment()
-        
         cursor.execute("""
             SELECT * FROM customer_display_settings
             WHERE establishment_id = %s
@@ -908,3 +978,188 @@ class CustomerDisplaySystem:
             except:
                 pass
 
+
+
+def _cart_line_key(item):
+    """Same identity the POS uses to merge cart lines: product + variant + notes."""
+    variant_id = item.get('variant_id')
+    return f"{item.get('product_id')}:{variant_id if variant_id is not None else ''}:{(item.get('notes') or '').strip()}"
+
+
+class CartDisplayFeed:
+    """
+    Live cart mirror for the customer display.
+    The POS posts its whole cart on every change; only the lines that changed are emitted
+    (as add / update / remove ops with a sequence number), so the display applies a small diff
+    instead of re-rendering a full transaction payload. Displays that miss a sequence number
+    ask for a snapshot. Acks from the display feed the scan-to-display latency metrics.
+    """
+
+    _LINE_FIELDS = ('product_id', 'variant_id', 'product_name', 'variant_name', 'sku', 'notes',
+                    'quantity', 'unit_price', 'discount', 'tax_rate')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lines = {}            # line key -> normalized line
+        self._order = []            # line keys in cart order
+        self._totals = {'subtotal': 0.0, 'tax': 0.0, 'total': 0.0, 'item_count': 0}
+        self._seq = 0
+        self._sent = {}             # seq -> (monotonic emit time, POS scanned_at epoch ms)
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self._emit_to_ack_ms = deque(maxlen=_LATENCY_SAMPLES)
+        self._scan_to_display_ms = deque(maxlen=_LATENCY_SAMPLES)
+        self._diff_count = 0
+        self._op_count = 0
+        self._snapshot_count = 0
+
+    def _normalize(self, item, tax_rate):
+        line = {f: item.get(f) for f in self._LINE_FIELDS if item.get(f) is not None}
+        quantity = float(item.get('quantity') or 0)
+        unit_price = float(item.get('unit_price') or 0)
+        discount = float(item.get('discount') or 0)
+        line_tax_rate = float(item['tax_rate']) if item.get('tax_rate') is not None else tax_rate
+        line['quantity'] = int(quantity) if quantity == int(quantity) else quantity
+        line['unit_price'] = round(unit_price, 2)
+        line['line_subtotal'] = round(quantity * unit_price - discount, 2)
+        line['line_tax'] = round(line['line_subtotal'] * line_tax_rate, 2)
+        return line
+
+    def _snapshot_locked(self):
+        return {
+            'seq': self._seq,
+            'lines': [dict(self._lines[k], key=k) for k in self._order],
+            'totals': dict(self._totals),
+            'sent_at': int(time.time() * 1000),
+        }
+
+    def update(self, items, discount=0.0, scanned_at=None):
+        """Replace the cart with `items` and return the diff to emit (None when nothing changed)."""
+        tax_rate = get_display_context()['tax_rate']
+        new_lines = {}
+        new_order = []
+        for item in items or []:
+            key = _cart_line_key(item)
+            if key in new_lines:
+                new_lines[key]['quantity'] = float(new_lines[key].get('quantity') or 0) + float(item.get('quantity') or 0)
+                continue
+            new_lines[key] = dict(item)
+            new_order.append(key)
+        normalized = {k: self._normalize(v, tax_rate) for k, v in new_lines.items()}
+        subtotal = sum(l['line_subtotal'] for l in normalized.values())
+        tax = sum(l['line_tax'] for l in normalized.values())
+        order_discount = float(discount or 0)
+        totals = {
+            'subtotal': round(subtotal, 2),
+            'tax': round(tax, 2),
+            'discount': round(order_discount, 2),
+            'total': round(max(0.0, subtotal + tax - order_discount), 2),
+            'item_count': sum(l['quantity'] for l in normalized.values()),
+        }
+
+        with self._lock:
+            ops = []
+            for key in self._order:
+                if key not in normalized:
+                    ops.append({'op': 'remove', 'key': key})
+            for index, key in enumerate(new_order):
+                line = normalized[key]
+                previous = self._lines.get(key)
+                if previous is None:
+                    ops.append({'op': 'add', 'key': key, 'index': index, 'line': line})
+                elif previous != line:
+                    changed = {f: v for f, v in line.items() if previous.get(f) != v}
+                    ops.append({'op': 'update', 'key': key, 'fields': changed})
+            if not ops and totals == self._totals:
+                return None
+            self._lines = normalized
+            self._order = new_order
+            self._totals = totals
+            self._seq += 1
+            seq = self._seq
+            self._sent[seq] = (time.monotonic(), scanned_at)
+            # Acks older than the last few hundred diffs will never arrive
+            while len(self._sent) > 500:
+                self._sent.pop(next(iter(self._sent)))
+        with self._metrics_lock:
+            self._diff_count += 1
+            self._op_count += len(ops)
+        return {'seq': seq, 'ops': ops, 'totals': totals, 'scanned_at': scanned_at,
+                'sent_at': int(time.time() * 1000)}
+
+    def snapshot(self):
+        """Full cart state for displays that connect late or detect a sequence gap."""
+        with self._lock:
+            snap = self._snapshot_locked()
+        with self._metrics_lock:
+            self._snapshot_count += 1
+        return snap
+
+    def ack(self, seq, displayed_at=None):
+        """Record that the display rendered diff `seq` (displayed_at: display clock, epoch ms)."""
+        with self._lock:
+            sent = self._sent.pop(seq, None)
+        if sent is None:
+            return
+        emitted_at, scanned_at = sent
+        with self._metrics_lock:
+            self._emit_to_ack_ms.append((time.monotonic() - emitted_at) * 1000.0)
+            # POS and display report wall-clock ms; only meaningful when they share a clock (same host / NTP)
+            if scanned_at is not None and displayed_at is not None:
+                try:
+                    delta = float(displayed_at) - float(scanned_at)
+                    if delta >= 0:
+                        self._scan_to_display_ms.append(delta)
+                except (TypeError, ValueError):
+                    pass
+
+    def metrics(self):
+        """Scan-to-display and emit-to-ack latency percentiles (ms) plus counters."""
+        def summarize(samples):
+            if not samples:
+                return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+            ordered = sorted(samples)
+            pick = lambda pct: round(ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))], 3)
+            return {'count': len(ordered), 'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': round(ordered[-1], 3)}
+
+        with self._metrics_lock:
+            out = {
+                'scan_to_display_ms': summarize(list(self._scan_to_display_ms)),
+                'emit_to_ack_ms': summarize(list(self._emit_to_ack_ms)),
+                'diffs': self._diff_count,
+                'ops': self._op_count,
+                'snapshots': self._snapshot_count,
+            }
+        with self._lock:
+            out['seq'] = self._seq
+            out['lines'] = len(self._order)
+            out['unacked'] = len(self._sent)
+        return out
+
+
+# Cart feeds, one per (establishment_id, register_id)
+_cart_feeds = {}
+_cart_feed_lock = threading.Lock()
+
+
+def cart_display_room(establishment_id=None, register_id=None) -> str:
+    """Socket.IO room of the customer displays mirroring one register's cart."""
+    return f"customer_display:{establishment_id or 0}:{register_id or 0}"
+
+
+def get_cart_display_feed(establishment_id=None, register_id=None) -> CartDisplayFeed:
+    """Get or create the cart display feed of one register (register_id None: the establishment's only one)."""
+    key = (establishment_id, register_id)
+    feed = _cart_feeds.get(key)
+    if feed is None:
+        with _cart_feed_lock:
+            feed = _cart_feeds.get(key)
+            if feed is None:
+                feed = _cart_feeds[key] = CartDisplayFeed()
+    return feed
+
+
+def all_cart_display_feeds():
+    """(establishment_id, register_id) -> feed, for metrics."""
+    with _cart_feed_lock:
+        return dict(_cart_feeds)
@@ -4,6 +4,8 @@ Database utility functions for inventory management
 PostgreSQL ONLY - All SQLite code has been removed
 """
 
+import base64
+import binascii
 import hashlib
 import logging
 import secrets
@@ -11,21 +13,30 @@ import json
 import re
 import os
 import threading
+import time
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
 logger = logging.getLogger(__name__)
 _ensure_metadata_lock = threading.Lock()
-_category_path_cache: Dict[str, int] = {}
-_category_cache_max_size = 1000
+# In-process category tree (id -> row/path, path -> id, id -> children); reloaded after
+# CATEGORY_TREE_TTL seconds or immediately when invalidate_category_cache() is called on writes.
+_category_tree_lock = threading.Lock()
+_category_tree: Optional[Dict[str, Any]] = None
+_category_tree_loaded_at = 0.0
+CATEGORY_TREE_TTL = int(os.getenv('CATEGORY_TREE_TTL', '60'))
 _ensure_shipment_lock = threading.Lock()
+_shipment_tables_ready = False
 
 # Import local PostgreSQL connection - this is the ONLY database backend
 try:
     from database_postgres import (
         get_connection as get_postgres_connection,
         get_current_establishment,
-        set_current_establishment
+        set_current_establishment,
+        register_prepared_statement,
+        execute_prepared,
+        invalidate_establishment_cache,
     )
 except ImportError:
     raise ImportError(
@@ -33,6 +44,74 @@ except ImportError:
         "This system requires PostgreSQL. Install: pip3 install psycopg2-binary python-dotenv"
     )
 
+# Per-employee per-day labor / tip totals for payroll views (maintained on clock-out, breaks, tips)
+import labor_rollup
+# Today's shift roster for late clock-in alerts (clock-ins and schedule changes update it)
+import late_arrivals
+
+# Optional tables (older schemas lack employee_tips / receipt_preferences); probed once per process
+_optional_tables: Dict[str, bool] = {}
+
+
+def _has_optional_table(cursor, name: str) -> bool:
+    present = _optional_tables.get(name)
+    if present is None:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS present", (f'public.{name}',))
+        row = cursor.fetchone()
+        present = _optional_tables[name] = bool(row['present'] if hasattr(row, 'keys') else row[0])
+    return present
+
+
+def _has_employee_tips_table(cursor) -> bool:
+    return _has_optional_table(cursor, 'employee_tips')
+
+# Recent orders list (list_orders / count_orders). List views read ORDER_LIST_COLUMNS of orders
+# (those present in this schema, probed once per process) and page with a keyset cursor on
+# (order_date, order_id). Counts are cached per filter for ORDERS_COUNT_TTL seconds; an unfiltered
+# count of a table larger than ORDERS_COUNT_ESTIMATE_MIN rows uses the planner's estimate.
+ORDERS_COUNT_TTL = int(os.getenv('ORDERS_COUNT_TTL', '30'))
+ORDERS_COUNT_ESTIMATE_MIN = int(os.getenv('ORDERS_COUNT_ESTIMATE_MIN', '200000'))
+ORDER_LIST_COLUMNS = (
+    'order_id', 'establishment_id', 'order_number', 'order_date', 'customer_id', 'employee_id',
+    'subtotal', 'tax_rate', 'tax_amount', 'discount', 'discount_type', 'transaction_fee', 'tip',
+    'total', 'payment_status', 'order_status', 'payment_method', 'order_type', 'notes',
+    'customer_phone', 'order_source', 'prepare_by', 'dasher_status', 'dasher_status_at',
+    'dasher_info', 'exchange_return_id', 'external_order_id', 'integration_experience',
+    'doordash_promo_details', 'doordash_total_merchant_funded_discount_cents',
+    'doordash_total_doordash_funded_discount_cents',
+)
+_order_list_projection: Optional[str] = None
+_order_count_lock = threading.Lock()
+_order_count_cache: Dict[tuple, tuple] = {}
+
+# Hot POS statements, prepared once per pooled connection (see database_postgres.execute_prepared)
+register_prepared_statement(
+    'pos_inventory_availability',
+    "SELECT product_id, current_quantity, establishment_id FROM inventory"
+    " WHERE establishment_id = %s AND product_id = ANY(%s)",
+    ('integer', 'integer[]'),
+)
+register_prepared_statement(
+    'pos_product_by_barcode',
+    "SELECT product_id, establishment_id, product_name, sku, barcode, product_price, product_cost,"
+    " vendor_id, photo, current_quantity, category, last_restocked, created_at, updated_at"
+    " FROM inventory WHERE barcode = %s",
+    ('text',),
+)
+register_prepared_statement(
+    'pos_verify_session',
+    """
+    SELECT es.session_id, es.establishment_id, es.employee_id, es.login_time, es.session_token,
+           e.first_name, e.last_name, e.position, e.active, e.email
+    FROM employee_sessions es
+    JOIN employees e ON es.employee_id = e.employee_id
+    WHERE es.session_token = %s
+      AND es.is_active = 1
+      AND e.active = 1
+    """,
+    ('text',),
+)
+
 def generate_unique_barcode(pending_shipment_id: int, line_number: int, product_sku: str = '') -> str:
     """
     Generate a unique 12-digit barcode for a shipment item
@@ -201,7 +280,10 @@ def ensure_metadata_tables(conn=None):
                     pass
 
 def ensure_shipment_verification_tables(conn=None):
-    """Ensure shipment verification tables and columns exist."""
+    """Ensure shipment verification tables and columns exist (checked once per process)."""
+    global _shipment_tables_ready
+    if _shipment_tables_ready:
+        return
     with _ensure_shipment_lock:
         should_close = False
         if conn is None:
@@ -211,6 +293,7 @@ def ensure_shipment_verification_tables(conn=None):
             cursor = conn.cursor()
             cursor.execute("SELECT 1 FROM pg_tables WHERE schemaname = 'public' AND tablename = 'shipment_verification_settings'")
             if cursor.fetchone():
+                _shipment_tables_ready = True
                 if should_close:
                     try:
                         conn.close()
@@ -319,6 +402,7 @@ def ensure_shipment_verification_tables(conn=None):
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_verification_sessions_shipment ON verification_sessions(pending_shipment_id)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_approved_shipments_pending ON approved_shipments(pending_shipment_id)")
             conn.commit()
+            _shipment_tables_ready = True
         except Exception:
             try:
                 conn.rollback()
@@ -342,6 +426,125 @@ def _normalize_category_path(category_path: str) -> List[str]:
     return parts
 
 
+def invalidate_category_cache() -> None:
+    """Drop the in-process category tree. Call after any INSERT/UPDATE/DELETE on categories."""
+    global _category_tree
+    with _category_tree_lock:
+        _category_tree = None
+
+
+def _load_category_tree(conn) -> Dict[str, Any]:
+    """Read all categories in one query and index them by id, path and parent."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'categories'
+          AND column_name IN ('category_path', 'archived')
+    """)
+    present = {row[0] if isinstance(row, tuple) else row.get('column_name') for row in cursor.fetchall()}
+    cursor.execute(
+        "SELECT category_id, category_name, parent_category_id"
+        + (", category_path" if 'category_path' in present else ", NULL AS category_path")
+        + (", archived" if 'archived' in present else ", NULL AS archived")
+        + " FROM categories"
+    )
+    by_id: Dict[int, Dict[str, Any]] = {}
+    for row in cursor.fetchall():
+        if isinstance(row, dict):
+            r = dict(row)
+        else:
+            r = dict(zip(('category_id', 'category_name', 'parent_category_id', 'category_path', 'archived'), row))
+        by_id[r['category_id']] = r
+
+    path_by_id: Dict[int, str] = {}
+    children: Dict[int, List[int]] = {}
+    for cid, r in by_id.items():
+        path_by_id[cid] = r.get('category_path') or _build_category_path(cid, by_id)
+        parent_id = r.get('parent_category_id')
+        if parent_id is not None:
+            children.setdefault(parent_id, []).append(cid)
+    id_by_path = {path: cid for cid, path in path_by_id.items() if path}
+    return {
+        'by_id': by_id,
+        'path_by_id': path_by_id,
+        'id_by_path': id_by_path,
+        'children': children,
+        'materialized': 'category_path' in present,
+    }
+
+
+def _get_category_tree(conn=None) -> Dict[str, Any]:
+    """Return the cached category tree, loading it (one query) when missing or stale."""
+    global _category_tree, _category_tree_loaded_at
+    tree = _category_tree
+    if tree is not None and time.monotonic() - _category_tree_loaded_at < CATEGORY_TREE_TTL:
+        return tree
+    with _category_tree_lock:
+        if _category_tree is not None and time.monotonic() - _category_tree_loaded_at < CATEGORY_TREE_TTL:
+            return _category_tree
+        should_close = conn is None
+        if should_close:
+            conn = get_connection()
+        try:
+            _category_tree = _load_category_tree(conn)
+            _category_tree_loaded_at = time.monotonic()
+        finally:
+            if should_close:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        return _category_tree
+
+
+def get_category_paths() -> Dict[int, str]:
+    """Map of category_id -> full path ('Electronics > Phones'), served from the category cache."""
+    return _get_category_tree()['path_by_id']
+
+
+def get_category_subtree_ids(category_id: int) -> List[int]:
+    """category_id plus all of its descendants (from the category cache)."""
+    tree = _get_category_tree()
+    if category_id not in tree['by_id']:
+        return []
+    out = []
+    stack = [category_id]
+    seen = set()
+    while stack:
+        cid = stack.pop()
+        if cid in seen:
+            continue
+        seen.add(cid)
+        out.append(cid)
+        stack.extend(tree['children'].get(cid, ()))
+    return out
+
+
+def _lookup_category_path(cursor, parts: List[str], materialized: bool) -> Optional[int]:
+    """Resolve a path against the database: one query with category_path, else one per level."""
+    if materialized:
+        cursor.execute("SELECT category_id FROM categories WHERE category_path = %s LIMIT 1", (" > ".join(parts),))
+        row = cursor.fetchone()
+        return (row[0] if isinstance(row, tuple) else row.get('category_id')) if row else None
+    parent_id = None
+    for category_name in parts:
+        if parent_id is not None:
+            cursor.execute("""
+                SELECT category_id FROM categories
+                WHERE category_name = %s AND parent_category_id = %s
+            """, (category_name, parent_id))
+        else:
+            cursor.execute("""
+                SELECT category_id FROM categories
+                WHERE category_name = %s AND parent_category_id IS NULL
+            """, (category_name,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        parent_id = row[0] if isinstance(row, tuple) else row.get('category_id')
+    return parent_id
+
+
 def get_category_by_path(category_path: str, conn=None) -> Optional[int]:
     """
     Look up category_id by path (read-only). Does not create.
@@ -351,34 +554,21 @@ def get_category_by_path(category_path: str, conn=None) -> Optional[int]:
     if not parts:
         return None
     path_key = " > ".join(parts)
-    if path_key in _category_path_cache:
-        return _category_path_cache[path_key]
     if conn is None:
         conn = get_connection()
         should_close = True
     else:
         should_close = False
     try:
-        cursor = conn.cursor()
-        parent_id = None
-        for category_name in parts:
-            if parent_id is not None:
-                cursor.execute("""
-                    SELECT category_id FROM categories
-                    WHERE category_name = %s AND parent_category_id = %s
-                """, (category_name, parent_id))
-            else:
-                cursor.execute("""
-                    SELECT category_id FROM categories
-                    WHERE category_name = %s AND parent_category_id IS NULL
-                """, (category_name,))
-            row = cursor.fetchone()
-            if not row:
-                return None
-            parent_id = row[0]
-        if len(_category_path_cache) < _category_cache_max_size:
-            _category_path_cache[path_key] = parent_id
-        return parent_id
+        tree = _get_category_tree(conn)
+        category_id = tree['id_by_path'].get(path_key)
+        if category_id is not None:
+            return category_id
+        # Not in the cache: may have been created by another process since the last load
+        category_id = _lookup_category_path(conn.cursor(), parts, tree['materialized'])
+        if category_id is not None:
+            invalidate_category_cache()
+        return category_id
     except Exception as e:
         logger.warning("get_category_by_path failed: %s", e)
         return None
@@ -397,6 +587,7 @@ def create_or_get_category_with_hierarchy(category_path: str, conn=None) -> Opti
     - Electronics (parent)
     - Phones (child of Electronics)
     - Smartphones (child of Phones)
+    Existing prefixes are resolved from the category cache, so only missing levels hit the DB.
     Uses RETURNING for Postgres; normalizes/validates path; idempotent under races.
     """
     import psycopg2
@@ -405,17 +596,27 @@ def create_or_get_category_with_hierarchy(category_path: str, conn=None) -> Opti
         logger.debug("create_or_get_category: empty or invalid path %r", category_path)
         return None
     path_key = " > ".join(parts)
-    if path_key in _category_path_cache:
-        return _category_path_cache[path_key]
     if conn is None:
         conn = get_connection()
         should_close = True
     else:
         should_close = False
     try:
-        cursor = conn.cursor()
+        tree = _get_category_tree(conn)
+        if path_key in tree['id_by_path']:
+            return tree['id_by_path'][path_key]
+
+        # Longest prefix that already exists
+        depth = len(parts)
         parent_id = None
-        for category_name in parts:
+        while depth > 0:
+            parent_id = tree['id_by_path'].get(" > ".join(parts[:depth]))
+            if parent_id is not None:
+                break
+            depth -= 1
+
+        cursor = conn.cursor()
+        for category_name in parts[depth:]:
             if parent_id is not None:
                 cursor.execute("""
                     SELECT category_id FROM categories
@@ -457,8 +658,7 @@ def create_or_get_category_with_hierarchy(category_path: str, conn=None) -> Opti
                     return None
             parent_id = category_id
         conn.commit()
-        if len(_category_path_cache) < _category_cache_max_size:
-            _category_path_cache[path_key] = parent_id
+        invalidate_category_cache()
         return parent_id
     except Exception as e:
         logger.warning("create_or_get_category_with_hierarchy failed: %s", e)
@@ -478,7 +678,9 @@ def _build_category_path(category_id: int, by_id: Dict[int, Dict]) -> str:
     """Build full path (e.g. 'Electronics > Phones') by walking parent_category_id."""
     parts = []
     cid = category_id
-    while cid:
+    seen = set()
+    while cid and cid not in seen:
+        seen.add(cid)
         node = by_id.get(cid)
         if not node:
             break
@@ -525,9 +727,13 @@ def list_categories(include_path: bool = True, archived_only: bool = False) -> L
             return []
         out = [dict(row) for row in rows]
         if include_path:
-            by_id = {r["category_id"]: r for r in out}
+            # Materialized category_path column when migrated; otherwise paths from the category cache
+            path_by_id = None
             for r in out:
-                r["category_path"] = _build_category_path(r["category_id"], by_id)
+                if not r.get("category_path"):
+                    if path_by_id is None:
+                        path_by_id = get_category_paths()
+                    r["category_path"] = path_by_id.get(r["category_id"], "")
         return out
     except Exception as e:
         error_message = str(e).lower()
@@ -559,6 +765,7 @@ def delete_category(category_id: int) -> bool:
         cursor.execute("UPDATE product_metadata SET category_id = NULL WHERE category_id = %s", (category_id,))
         cursor.execute("DELETE FROM categories WHERE category_id = %s", (category_id,))
         conn.commit()
+        invalidate_category_cache()
         return cursor.rowcount > 0
     finally:
         conn.close()
@@ -863,7 +1070,7 @@ def get_product_by_barcode(barcode: str) -> Optional[Dict[str, Any]]:
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute("SELECT * FROM inventory WHERE barcode = %s", (barcode,))
+    execute_prepared(cursor, 'pos_product_by_barcode', (barcode,))
     row = cursor.fetchone()
     conn.close()
     
@@ -1403,6 +1610,13 @@ def update_quantity(product_id: int, quantity_change: int) -> bool:
 def _get_or_create_default_establishment(conn=None) -> int:
     """Get or create a default establishment (for local PostgreSQL)"""
     from psycopg2.extras import RealDictCursor
+    import psycopg2.extensions
+    # Usual case: the request's / cached establishment, no query
+    establishment_id = get_current_establishment()
+    if establishment_id is not None:
+        if conn is not None and conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            conn.rollback()
+        return establishment_id
     should_close = False
     if conn is None:
         conn = get_connection()
@@ -1508,6 +1722,7 @@ def _get_or_create_default_establishment(conn=None) -> int:
         if not establishment_id:
             raise ValueError("Failed to get or create default establishment")
         
+        invalidate_establishment_cache()
         return establishment_id
     finally:
         if should_close:
@@ -1527,9 +1742,7 @@ def get_establishment_settings(establishment_id: Optional[int] = None) -> Dict[s
     cursor = conn.cursor()
     try:
         if establishment_id is None:
-            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-            row = cursor.fetchone()
-            establishment_id = row[0] if row and (isinstance(row, tuple) or hasattr(row, '__getitem__')) else (row.get('establishment_id') if isinstance(row, dict) else None)
+            establishment_id = get_current_establishment()
         if not establishment_id:
             conn.close()
             return _default_store_settings()
@@ -1597,9 +1810,7 @@ def update_establishment_settings(establishment_id: Optional[int], settings: Dic
     cursor = conn.cursor()
     try:
         if establishment_id is None:
-            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-            row = cursor.fetchone()
-            establishment_id = row[0] if row and (isinstance(row, tuple) or hasattr(row, '__getitem__')) else (row.get('establishment_id') if isinstance(row, dict) else None)
+            establishment_id = get_current_establishment()
         if not establishment_id:
             conn.close()
             return False
@@ -1656,31 +1867,32 @@ def update_establishment_settings(establishment_id: Optional[int], settings: Dic
 
 def get_labor_summary(start_date: str, end_date: str, establishment_id: Optional[int] = None) -> Dict[str, Any]:
     """
-    Sum hours and labor cost from time_clock joined with employees (hourly_rate).
+    Sum hours (completed shifts, by clock-in day) and labor cost from the daily labor rollup joined with employees (hourly_rate).
     Returns: total_hours, total_labor_cost, entries (list of { employee_id, name, hours, hourly_rate, labor_cost }).
     """
     from psycopg2.extras import RealDictCursor
+    # Startup normally did this; never inside the connection below (see labor_rollup.ensure_rollup)
+    labor_rollup.ensure_rollup()
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     try:
         if establishment_id is None:
-            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-            row = cursor.fetchone()
-            establishment_id = row['establishment_id'] if row else None
+            establishment_id = get_current_establishment()
         if not establishment_id:
             conn.close()
             return {'total_hours': 0.0, 'total_labor_cost': 0.0, 'entries': []}
+        # One range scan of the daily rollup (labor_rollup.py) instead of every time_clock row
         cursor.execute("""
-            SELECT tc.employee_id,
+            SELECT r.employee_id,
                    e.first_name || ' ' || e.last_name AS employee_name,
-                   COALESCE(SUM(tc.total_hours), 0) AS hours,
+                   SUM(r.hours) AS hours,
                    COALESCE(e.hourly_rate, 0) AS hourly_rate
-            FROM time_clock tc
-            JOIN employees e ON e.employee_id = tc.employee_id
-            WHERE tc.establishment_id = %s
-              AND tc.clock_out IS NOT NULL
-              AND DATE(tc.clock_in) >= %s AND DATE(tc.clock_in) <= %s
-            GROUP BY tc.employee_id, e.first_name, e.last_name, e.hourly_rate
+            FROM employee_daily_rollup r
+            JOIN employees e ON e.employee_id = r.employee_id
+            WHERE r.establishment_id = %s
+              AND r.work_date >= %s AND r.work_date <= %s
+              AND r.shifts > 0
+            GROUP BY r.employee_id, e.first_name, e.last_name, e.hourly_rate
         """, (establishment_id, start_date, end_date))
         rows = cursor.fetchall()
         entries = []
@@ -1900,6 +2112,7 @@ def set_archived_category(category_id: int, archived: bool = True) -> bool:
     try:
         cursor.execute("UPDATE categories SET archived = %s WHERE category_id = %s", (archived, category_id))
         conn.commit()
+        invalidate_category_cache()
         return cursor.rowcount > 0
     except Exception as e:
         if "archived" in str(e).lower() and "does not exist" in str(e).lower():
@@ -2742,6 +2955,9 @@ def add_pending_shipment_item(
         if pending_item_id is None:
             raise ValueError("Failed to create pending shipment item - no ID returned")
         
+        from scan_sessions import invalidate_scan_sessions
+        invalidate_scan_sessions(pending_shipment_id=pending_shipment_id)
+        
         return pending_item_id
     except Exception as e:
         try:
@@ -2791,8 +3007,10 @@ def get_pending_shipment(pending_shipment_id: int) -> Optional[Dict[str, Any]]:
         traceback.print_exc()
         raise
     finally:
-        # Don't close the shared global connection
-        pass
+        try:
+            conn.close()
+        except:
+            pass
 
 def get_pending_shipment_items(pending_shipment_id: int) -> List[Dict[str, Any]]:
     """Get all items for a pending shipment"""
@@ -2834,8 +3052,10 @@ def get_pending_shipment_items(pending_shipment_id: int) -> List[Dict[str, Any]]
         traceback.print_exc()
         raise
     finally:
-        # Don't close the shared global connection
-        pass
+        try:
+            conn.close()
+        except:
+            pass
 
 def get_pending_shipment_details(pending_shipment_id: int) -> Optional[Dict[str, Any]]:
     """Get full pending shipment details including vendor and items"""
@@ -3291,6 +3511,9 @@ def update_pending_item_verification(
 ) -> bool:
     """Update verified quantity and product match for a pending item"""
     import time
+    from scan_sessions import invalidate_scan_sessions, notify_progress
+    # Write queued scans first and drop the cached session; it reloads with this change on the next scan
+    invalidate_scan_sessions(pending_item_id=pending_item_id)
     max_retries = 5
     retry_delay = 0.1  # Start with 100ms
     
@@ -3362,11 +3585,15 @@ def update_pending_item_verification(
                 return False
             
             values.append(pending_item_id)
-            query = f"UPDATE pending_shipment_items SET {', '.join(updates)} WHERE pending_item_id = %s"
+            query = f"UPDATE pending_shipment_items SET {', '.join(updates)} WHERE pending_item_id = %s RETURNING pending_shipment_id"
             
             cursor.execute(query, values)
+            updated_row = cursor.fetchone()
             conn.commit()
-            success = cursor.rowcount > 0
+            success = updated_row is not None
+            if success:
+                invalidate_scan_sessions(pending_item_id=pending_item_id)
+                notify_progress([updated_row[0]])
             
             # Extract metadata if product was matched/created
             if success and product_id is not None:
@@ -3615,6 +3842,9 @@ def auto_match_pending_items(pending_shipment_id: int) -> Dict[str, Any]:
     conn.commit()
     conn.close()
     
+    from scan_sessions import invalidate_scan_sessions
+    invalidate_scan_sessions(pending_shipment_id=pending_shipment_id)
+    
     return {
         'total_items': len(items),
         'matched': matched,
@@ -4390,8 +4620,41 @@ def add_customer_points(customer_id: int, points: int, reason: Optional[str] = N
         conn.close()
 
 
+_customer_search_caps: Optional[Dict[str, bool]] = None
+
+
+def _get_customer_search_caps(cursor) -> Dict[str, bool]:
+    """Probe (once per process) which customer search features the schema supports."""
+    global _customer_search_caps
+    if _customer_search_caps is None:
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'customers'
+              AND column_name IN ('address', 'phone_digits')
+        """)
+        cols = {row[0] for row in cursor.fetchall()}
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        has_trgm = cursor.fetchone() is not None
+        _customer_search_caps = {
+            'address': 'address' in cols,
+            'phone_digits': 'phone_digits' in cols,
+            'trgm': has_trgm,
+        }
+    return _customer_search_caps
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE/ILIKE wildcards so user input is matched literally."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
 def search_customers(establishment_id: Optional[int], q: str, limit: int = 20) -> List[Dict[str, Any]]:
-    """Search customers by name, email, or phone (establishment-scoped). Returns list with loyalty_points."""
+    """
+    Search customers by name, email, or phone (establishment-scoped). Returns list with loyalty_points.
+    Prefix matches (name/email starting with q, phone digits starting with q's digits) come first;
+    remaining slots are filled by substring/trigram matches ranked by similarity.
+    Index-backed when migrations/add_customers_search_index.sql has been applied.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     try:
@@ -4400,37 +4663,65 @@ def search_customers(establishment_id: Optional[int], q: str, limit: int = 20) -
             establishment_id = get_current_establishment()
         if establishment_id is None:
             establishment_id = _get_or_create_default_establishment(conn)
-        term = f"%{(q or '').strip()}%"
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'customers' AND column_name = 'address'
-        """)
-        has_address_col = cursor.fetchone() is not None
-        if has_address_col:
-            cursor.execute("""
-                SELECT customer_id, establishment_id, customer_name, email, phone, COALESCE(address, '') AS address, loyalty_points, created_date
-                FROM customers
-                WHERE establishment_id = %s
-                  AND (customer_name ILIKE %s OR email ILIKE %s OR phone ILIKE %s)
-                ORDER BY customer_name NULLS LAST
-                LIMIT %s
-            """, (establishment_id, term, term, term, limit))
-            cols = ['customer_id', 'establishment_id', 'customer_name', 'email', 'phone', 'address', 'loyalty_points', 'created_date']
+        caps = _get_customer_search_caps(cursor)
+        cols = ['customer_id', 'establishment_id', 'customer_name', 'email', 'phone', 'address', 'loyalty_points', 'created_date']
+        select_sql = (
+            "SELECT customer_id, establishment_id, customer_name, email, phone, "
+            + ("COALESCE(address, '') AS address" if caps['address'] else "'' AS address")
+            + ", loyalty_points, created_date FROM customers WHERE establishment_id = %s"
+        )
+        term = (q or '').strip()
+        if not term:
+            cursor.execute(select_sql + " ORDER BY customer_name NULLS LAST LIMIT %s", (establishment_id, limit))
+            return [dict(zip(cols, row)) for row in cursor.fetchall()]
+
+        lowered = term.lower()
+        digits = re.sub(r'\D', '', term)
+
+        # 1) Prefix-first fast path (B-tree text_pattern_ops indexes)
+        prefix = _escape_like(lowered) + '%'
+        conds = ["lower(customer_name) LIKE %s", "lower(email) LIKE %s"]
+        params: List[Any] = [establishment_id, prefix, prefix]
+        if digits and caps['phone_digits']:
+            conds.append("phone_digits LIKE %s")
+            params.append(digits + '%')
+        cursor.execute(
+            select_sql + " AND (" + " OR ".join(conds) + ") ORDER BY customer_name NULLS LAST LIMIT %s",
+            params + [limit]
+        )
+        result = [dict(zip(cols, row)) for row in cursor.fetchall()]
+        if len(result) >= limit:
+            return result
+
+        # 2) Substring / fuzzy matches for the remaining slots
+        seen_ids = [r['customer_id'] for r in result]
+        contains = '%' + _escape_like(lowered) + '%'
+        if caps['trgm']:
+            score_terms = ["similarity(lower(customer_name), %s)", "similarity(lower(COALESCE(email, '')), %s)"]
+            score_params: List[Any] = [lowered, lowered]
+            conds = ["lower(customer_name) LIKE %s", "lower(email) LIKE %s", "lower(customer_name) %% %s"]
+            params = [establishment_id, contains, contains, lowered]
+            if digits and caps['phone_digits']:
+                score_terms.append("similarity(phone_digits, %s)")
+                score_params.append(digits)
+                conds.append("phone_digits LIKE %s")
+                params.append('%' + digits + '%')
+            elif digits:
+                conds.append("phone ILIKE %s")
+                params.append(contains)
+            cursor.execute(
+                select_sql + " AND customer_id <> ALL(%s) AND (" + " OR ".join(conds) + ")"
+                + " ORDER BY GREATEST(" + ", ".join(score_terms) + ") DESC, customer_name NULLS LAST LIMIT %s",
+                params[:1] + [seen_ids] + params[1:] + score_params + [limit - len(result)]
+            )
         else:
-            cursor.execute("""
-                SELECT customer_id, establishment_id, customer_name, email, phone, loyalty_points, created_date
-                FROM customers
-                WHERE establishment_id = %s
-                  AND (customer_name ILIKE %s OR email ILIKE %s OR phone ILIKE %s)
-                ORDER BY customer_name NULLS LAST
-                LIMIT %s
-            """, (establishment_id, term, term, term, limit))
-            cols = ['customer_id', 'establishment_id', 'customer_name', 'email', 'phone', 'loyalty_points', 'created_date']
-        rows = cursor.fetchall()
-        result = [dict(zip(cols, row)) for row in rows] if rows else []
-        if result and not has_address_col:
-            for r in result:
-                r['address'] = ''
+            cursor.execute(
+                select_sql + " AND customer_id <> ALL(%s)"
+                " AND (customer_name ILIKE %s OR email ILIKE %s OR phone ILIKE %s)"
+                " ORDER BY customer_name NULLS LAST LIMIT %s",
+                (establishment_id, seen_ids, contains, contains, contains, limit - len(result))
+            )
+        result.extend(dict(zip(cols, row)) for row in cursor.fetchall())
         return result
     finally:
         conn.close()
@@ -4662,12 +4953,20 @@ def create_order(
             quantity = int(item['quantity'])
             product_quantity_requested[product_id] = product_quantity_requested.get(product_id, 0) + quantity
 
+        # One prepared lookup for every product in the cart
+        execute_prepared(
+            cursor, 'pos_inventory_availability',
+            (establishment_id, [int(pid) for pid in product_quantity_requested])
+        )
+        inventory_rows = {}
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                inventory_rows[row.get('product_id')] = row
+            else:
+                inventory_rows[row[0]] = {'current_quantity': row[1], 'establishment_id': row[2]}
+
         for product_id, total_quantity in product_quantity_requested.items():
-            cursor.execute(
-                "SELECT current_quantity, establishment_id FROM inventory WHERE product_id = %s AND establishment_id = %s",
-                (product_id, establishment_id)
-            )
-            row = cursor.fetchone()
+            row = inventory_rows.get(int(product_id))
 
             if not row:
                 conn.rollback()
@@ -4678,12 +4977,8 @@ def create_order(
                     'order_id': None
                 }
 
-            if isinstance(row, dict):
-                available_qty = row.get('current_quantity', 0)
-                product_establishment_id = row.get('establishment_id')
-            else:
-                available_qty = row[0] if row else 0
-                product_establishment_id = row[1] if len(row) > 1 else None
+            available_qty = row.get('current_quantity', 0)
+            product_establishment_id = row.get('establishment_id')
 
             product_establishment_map[product_id] = product_establishment_id or establishment_id
 
@@ -5085,15 +5380,13 @@ def create_order(
                 transaction_id = result[0] if result else None
             
             if tip > 0 and transaction_id is not None:
-                cursor.execute("""
-                    SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'employee_tips'
-                """)
-                if cursor.fetchone():
+                if _has_employee_tips_table(cursor):
                     cursor.execute("""
                         INSERT INTO employee_tips (
                             employee_id, order_id, transaction_id, tip_amount, payment_method
                         ) VALUES (%s, %s, %s, %s, %s)
                     """, (employee_id, order_id, transaction_id, tip, payment_method))
+                labor_rollup.add_tip(cursor, establishment_id, employee_id, tip)
         
         # Track customer spending and award rewards only when payment completed
         rewards_info = {'points_earned': 0, 'discount_amount': 0.0, 'reward_type': 'points'}
@@ -5317,6 +5610,21 @@ def update_order_status(
                     RETURNING transaction_id
                 """, (establishment_id, order_id, pay_method, pre_fee_total, transaction_fee,
                       fee_calc.get('fee_rate', 0), fee_calc.get('net_amount', pre_fee_total - transaction_fee), tip, emp_id))
+                if tip > 0:
+                    result = cursor.fetchone()
+                    if isinstance(result, dict):
+                        transaction_id = result.get('transaction_id')
+                    else:
+                        transaction_id = result[0] if result else None
+                    # Same records as create_order: employee_tips (read by tip reports and by
+                    # labor_rollup.rebuild()) plus the incremental rollup
+                    if transaction_id is not None and _has_employee_tips_table(cursor):
+                        cursor.execute("""
+                            INSERT INTO employee_tips (
+                                employee_id, order_id, transaction_id, tip_amount, payment_method
+                            ) VALUES (%s, %s, %s, %s, %s)
+                        """, (emp_id, order_id, transaction_id, tip, pay_method))
+                    labor_rollup.add_tip(cursor, establishment_id, emp_id, tip)
             else:
                 cursor.execute("""
                     INSERT INTO payment_transactions (
@@ -5568,9 +5876,7 @@ def create_pending_return(
         order = dict(order)
         establishment_id = order.get('establishment_id')
         if establishment_id is None:
-            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-            row = cursor.fetchone()
-            establishment_id = row['establishment_id'] if row else None
+            establishment_id = get_current_establishment()
         if establishment_id is None:
             conn.close()
             return {'success': False, 'message': 'No establishment found; cannot create return'}
@@ -5925,9 +6231,7 @@ def process_return_immediate(
             order['tip'] = 0
         establishment_id = order.get('establishment_id')
         if establishment_id is None:
-            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-            row = cursor.fetchone()
-            establishment_id = row['establishment_id'] if row else None
+            establishment_id = get_current_establishment()
         if establishment_id is None:
             conn.close()
             return {'success': False, 'message': 'No establishment found; cannot process return'}
@@ -6756,6 +7060,85 @@ def get_latest_doordash_store_deactivation(establishment_id: int) -> Optional[Di
         conn.close()
 
 
+def _order_filters(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    employee_id: Optional[int] = None,
+    order_status: Optional[str] = None,
+    order_status_in: Optional[List[str]] = None,
+    order_type_in: Optional[List[str]] = None
+) -> tuple:
+    """WHERE conditions (on alias o) and params shared by list_orders and count_orders.
+    Date filters are half-open ranges on order_date, so the (order_date, order_id) index serves them."""
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append("o.order_date >= %s::date")
+        params.append(start_date)
+    if end_date:
+        conditions.append("o.order_date < %s::date + 1")
+        params.append(end_date)
+    if employee_id:
+        conditions.append("o.employee_id = %s")
+        params.append(employee_id)
+    if order_status:
+        conditions.append("o.order_status = %s")
+        params.append(order_status)
+    if order_status_in:
+        placeholders = ', '.join(['%s'] * len(order_status_in))
+        conditions.append("LOWER(COALESCE(o.order_status, '')) IN (" + placeholders + ")")
+        params.extend([s.lower() for s in order_status_in])
+    if order_type_in:
+        in_person = 'in-person' in [t.lower() for t in order_type_in]
+        others = [t for t in order_type_in if (t or '').lower() != 'in-person']
+        in_person_cond = "(o.order_type IS NULL OR TRIM(COALESCE(o.order_type, '')) = '' OR LOWER(o.order_type) = 'in-person')"
+        if in_person and others:
+            placeholders = ', '.join(['%s'] * len(others))
+            conditions.append("(" + in_person_cond + " OR LOWER(COALESCE(o.order_type, '')) IN (" + placeholders + "))")
+            params.extend([o.lower() for o in others])
+        elif in_person:
+            conditions.append(in_person_cond)
+        else:
+            placeholders = ', '.join(['%s'] * len(others))
+            conditions.append("LOWER(COALESCE(o.order_type, '')) IN (" + placeholders + ")")
+            params.extend([o.lower() for o in others])
+    return conditions, params
+
+
+def _order_list_columns(cursor) -> str:
+    """Projection of ORDER_LIST_COLUMNS present in this schema (optional columns are added by migrations)."""
+    global _order_list_projection
+    if _order_list_projection is None:
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'orders'
+        """)
+        present = {row['column_name'] if hasattr(row, 'keys') else row[0] for row in cursor.fetchall()}
+        _order_list_projection = ', '.join(f'o.{c}' for c in ORDER_LIST_COLUMNS if c in present)
+    return _order_list_projection
+
+
+def order_list_cursor(order: Dict[str, Any]) -> Optional[str]:
+    """Keyset cursor for the page after `order` (the last row of a list_orders page)."""
+    order_date = order.get('order_date')
+    if order_date is None or order.get('order_id') is None:
+        return None
+    if isinstance(order_date, datetime):
+        order_date = order_date.isoformat()
+    raw = f"{order_date}|{int(order['order_id'])}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_order_list_cursor(cursor_token: str) -> tuple:
+    """(order_date, order_id) from order_list_cursor(); ValueError when malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor_token + '=' * (-len(cursor_token) % 4)).decode()
+        order_date, order_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(order_date), int(order_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid orders cursor: {cursor_token!r}") from e
+
+
 def list_orders(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -6764,11 +7147,16 @@ def list_orders(
     order_status_in: Optional[List[str]] = None,
     order_type_in: Optional[List[str]] = None,
     limit: Optional[int] = None,
-    offset: Optional[int] = None
+    offset: Optional[int] = None,
+    after: Optional[str] = None,
+    lean: bool = False
 ) -> List[Dict[str, Any]]:
-    """List orders with optional filters, including receipt preferences.
+    """List orders with optional filters, including receipt preferences, newest first.
     order_status_in: e.g. ['returned', 'voided', 'out_for_delivery'] (OR).
     order_type_in: e.g. ['pickup', 'delivery'] or include 'in-person' for null/empty order_type (OR).
+    after: order_list_cursor() of the previous page's last row; pages by (order_date, order_id)
+    instead of offset, so deep pages cost the same as the first one.
+    lean: only ORDER_LIST_COLUMNS of orders (list views) instead of o.*.
     """
     from psycopg2.extras import RealDictCursor
     
@@ -6776,87 +7164,47 @@ def list_orders(
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
-        # Check if receipt_preferences table exists
-        check_cursor = conn.cursor()
-        check_cursor.execute("""
-            SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'receipt_preferences'
-        """)
-        has_receipt_prefs = check_cursor.fetchone() is not None
-        check_cursor.close()
+        order_columns = _order_list_columns(cursor) if lean else 'o.*'
+        conditions, params = _order_filters(
+            start_date, end_date, employee_id, order_status, order_status_in, order_type_in
+        )
+        if after:
+            conditions.append("(o.order_date, o.order_id) < (%s, %s)")
+            params.extend(_decode_order_list_cursor(after))
         
-        if has_receipt_prefs:
-            # Join with receipt preferences through payment_transactions
-            # Note: If multiple transactions exist, this will get the first matching receipt preference
-            query = """
-                SELECT DISTINCT
-                    o.*,
-                    e.first_name || ' ' || e.last_name as employee_name,
-                    c.customer_name,
+        if _has_optional_table(cursor, 'receipt_preferences'):
+            # One receipt preference per order (first transaction that has one), looked up per listed row
+            receipt_select = """,
                     rp.receipt_type,
-                    rp.email_address as receipt_email,
-                    rp.phone_number as receipt_phone
-                FROM orders o
-                LEFT JOIN employees e ON o.employee_id = e.employee_id
-                LEFT JOIN customers c ON o.customer_id = c.customer_id
-                LEFT JOIN payment_transactions pt ON o.order_id = pt.order_id
-                LEFT JOIN receipt_preferences rp ON pt.transaction_id = rp.transaction_id
-                WHERE 1=1
-            """
+                    rp.receipt_email,
+                    rp.receipt_phone"""
+            receipt_join = """
+                LEFT JOIN LATERAL (
+                    SELECT rp.receipt_type, rp.email_address AS receipt_email, rp.phone_number AS receipt_phone
+                    FROM payment_transactions pt
+                    JOIN receipt_preferences rp ON rp.transaction_id = pt.transaction_id
+                    WHERE pt.order_id = o.order_id
+                    ORDER BY pt.transaction_id, rp.preference_id
+                    LIMIT 1
+                ) rp ON TRUE"""
         else:
-            query = """
-                SELECT 
-                    o.*,
-                    e.first_name || ' ' || e.last_name as employee_name,
-                    c.customer_name
-                FROM orders o
-                LEFT JOIN employees e ON o.employee_id = e.employee_id
-                LEFT JOIN customers c ON o.customer_id = c.customer_id
-                WHERE 1=1
-            """
-        
-        params = []
-        
-        if start_date:
-            query += " AND DATE(o.order_date) >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND DATE(o.order_date) <= %s"
-            params.append(end_date)
-        
-        if employee_id:
-            query += " AND o.employee_id = %s"
-            params.append(employee_id)
-        
-        if order_status:
-            query += " AND o.order_status = %s"
-            params.append(order_status)
-        
-        if order_status_in:
-            placeholders = ', '.join(['%s'] * len(order_status_in))
-            query += " AND LOWER(COALESCE(o.order_status, '')) IN (" + placeholders + ")"
-            params.extend([s.lower() for s in order_status_in])
-        
-        if order_type_in:
-            in_person = 'in-person' in [t.lower() for t in order_type_in]
-            others = [t for t in order_type_in if (t or '').lower() != 'in-person']
-            in_person_cond = "(o.order_type IS NULL OR TRIM(COALESCE(o.order_type, '')) = '' OR LOWER(o.order_type) = 'in-person')"
-            if in_person and others:
-                placeholders = ', '.join(['%s'] * len(others))
-                query += " AND (" + in_person_cond + " OR LOWER(COALESCE(o.order_type, '')) IN (" + placeholders + "))"
-                params.extend([o.lower() for o in others])
-            elif in_person:
-                query += " AND " + in_person_cond
-            else:
-                placeholders = ', '.join(['%s'] * len(others))
-                query += " AND LOWER(COALESCE(o.order_type, '')) IN (" + placeholders + ")"
-                params.extend([o.lower() for o in others])
+            receipt_select = receipt_join = ""
         
-        query += " ORDER BY o.order_date DESC"
+        query = f"""
+            SELECT
+                {order_columns},
+                e.first_name || ' ' || e.last_name as employee_name,
+                c.customer_name{receipt_select}
+            FROM orders o
+            LEFT JOIN employees e ON o.employee_id = e.employee_id
+            LEFT JOIN customers c ON o.customer_id = c.customer_id{receipt_join}
+            WHERE {' AND '.join(conditions) or 'TRUE'}
+            ORDER BY o.order_date DESC, o.order_id DESC
+        """
         if limit is not None:
             query += " LIMIT %s"
             params.append(limit)
-        if offset is not None:
+        if offset is not None and not after:
             query += " OFFSET %s"
             params.append(offset)
         
@@ -6875,47 +7223,134 @@ def count_orders(
     employee_id: Optional[int] = None,
     order_status: Optional[str] = None,
     order_status_in: Optional[List[str]] = None,
-    order_type_in: Optional[List[str]] = None
+    order_type_in: Optional[List[str]] = None,
+    exact: bool = False
 ) -> int:
-    """Count orders with the same filters as list_orders (no limit/offset)."""
+    """Count orders with the same filters as list_orders (no limit/offset).
+    Unless exact, the count is cached per filter for ORDERS_COUNT_TTL seconds, and an unfiltered
+    count of more than ORDERS_COUNT_ESTIMATE_MIN orders is the planner's estimate (pagination totals)."""
+    key = (start_date, end_date, employee_id, order_status,
+           tuple(order_status_in or ()), tuple(order_type_in or ()))
+    if not exact:
+        with _order_count_lock:
+            cached = _order_count_cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < ORDERS_COUNT_TTL:
+            return cached[0]
+    conditions, params = _order_filters(
+        start_date, end_date, employee_id, order_status, order_status_in, order_type_in
+    )
     conn = get_connection()
     cursor = conn.cursor()
     try:
-        query = "SELECT COUNT(*) AS c FROM orders o WHERE 1=1"
-        params = []
-        if start_date:
-            query += " AND DATE(o.order_date) >= %s"
-            params.append(start_date)
-        if end_date:
-            query += " AND DATE(o.order_date) <= %s"
-            params.append(end_date)
-        if employee_id:
-            query += " AND o.employee_id = %s"
-            params.append(employee_id)
-        if order_status:
-            query += " AND o.order_status = %s"
-            params.append(order_status)
-        if order_status_in:
-            placeholders = ', '.join(['%s'] * len(order_status_in))
-            query += " AND LOWER(COALESCE(o.order_status, '')) IN (" + placeholders + ")"
-            params.extend([s.lower() for s in order_status_in])
-        if order_type_in:
-            in_person = 'in-person' in [t.lower() for t in order_type_in]
-            others = [t for t in order_type_in if (t or '').lower() != 'in-person']
-            in_person_cond = "(o.order_type IS NULL OR TRIM(COALESCE(o.order_type, '')) = '' OR LOWER(o.order_type) = 'in-person')"
-            if in_person and others:
-                placeholders = ', '.join(['%s'] * len(others))
-                query += " AND (" + in_person_cond + " OR LOWER(COALESCE(o.order_type, '')) IN (" + placeholders + "))"
-                params.extend([o.lower() for o in others])
-            elif in_person:
-                query += " AND " + in_person_cond
+        total = None
+        if not conditions and not exact:
+            cursor.execute("SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = 'public.orders'::regclass")
+            row = cursor.fetchone()
+            estimate = (row['estimate'] if hasattr(row, 'keys') else row[0]) if row else None
+            if estimate is not None and estimate > ORDERS_COUNT_ESTIMATE_MIN:
+                total = int(estimate)
+        if total is None:
+            cursor.execute(
+                f"SELECT COUNT(*) AS c FROM orders o WHERE {' AND '.join(conditions) or 'TRUE'}", params
+            )
+            row = cursor.fetchone()
+            total = (row['c'] if hasattr(row, 'keys') else row[0]) if row else 0
+    finally:
+        conn.close()
+    with _order_count_lock:
+        if len(_order_count_cache) > 256:
+            _order_count_cache.clear()
+        _order_count_cache[key] = (total, time.monotonic())
+    return total
+
+
+_order_lookup_caps: Optional[Dict[str, bool]] = None
+
+
+def _get_order_lookup_caps(cursor) -> Dict[str, bool]:
+    """Probe (once per process) whether orders.order_number_digits and pg_trgm are available."""
+    global _order_lookup_caps
+    if _order_lookup_caps is None:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'orders' AND column_name = 'order_number_digits'
+        """)
+        has_digits = cursor.fetchone() is not None
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        _order_lookup_caps = {'order_number_digits': has_digits, 'trgm': cursor.fetchone() is not None}
+    return _order_lookup_caps
+
+
+def find_orders_by_number(term: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Look up orders by a typed or scanned order number, newest first. Scanners mangle the
+    punctuation of "ORD-20250114-0007" (e.g. "ORD#20250114,0007"), so after the exact number the
+    lookup compares digits only. Stops at the first step that finds anything:
+    1) exact order_number, then exact digits;
+    2) digits prefix (truncated scan);
+    3) digits substring / trigram similarity (dropped or misread characters);
+    4) the digits as an order_id (receipts that print the id).
+    Index-backed when migrations/add_orders_number_lookup_index.sql has been applied.
+    """
+    from psycopg2.extras import RealDictCursor
+
+    term = (term or '').strip()
+    if not term:
+        return []
+    digits = re.sub(r'\D', '', term)
+    conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        caps = _get_order_lookup_caps(cursor)
+        digits_col = ("o.order_number_digits" if caps['order_number_digits']
+                      else "regexp_replace(COALESCE(o.order_number, ''), '[^0-9]', '', 'g')")
+        select_sql = """
+            SELECT
+                o.*,
+                e.first_name || ' ' || e.last_name as employee_name,
+                c.customer_name
+            FROM orders o
+            LEFT JOIN employees e ON o.employee_id = e.employee_id
+            LEFT JOIN customers c ON o.customer_id = c.customer_id
+        """
+
+        def run(condition: str, params: List[Any], order_by: str = "o.order_date DESC", order_params=()):
+            cursor.execute(select_sql + " WHERE " + condition + " ORDER BY " + order_by + " LIMIT %s",
+                           params + list(order_params) + [limit])
+            return [dict(row) for row in cursor.fetchall()]
+
+        # 1) Exact number, then exact digits ("ORD#20250114,0007" -> 202501140007)
+        rows = run("o.order_number = %s", [term])
+        if not rows and digits and digits != term:
+            rows = run(digits_col + " = %s", [digits])
+        if rows:
+            return rows
+        if not digits:
+            # Letters only: no digits to normalize on, plain substring match
+            return run("o.order_number ILIKE %s", ['%' + _escape_like(term) + '%'])
+
+        # 2) Digits prefix (B-tree text_pattern_ops)
+        rows = run(digits_col + " LIKE %s", [digits + '%'])
+        if rows:
+            return rows
+
+        # 3) Digits substring / similarity (pg_trgm GIN); needs enough digits to mean anything
+        if len(digits) >= 4:
+            contains = '%' + digits + '%'
+            if caps['trgm']:
+                rows = run(
+                    "(" + digits_col + " LIKE %s OR " + digits_col + " %% %s)", [contains, digits],
+                    "similarity(" + digits_col + ", %s) DESC, o.order_date DESC", [digits]
+                )
             else:
-                placeholders = ', '.join(['%s'] * len(others))
-                query += " AND LOWER(COALESCE(o.order_type, '')) IN (" + placeholders + ")"
-                params.extend([o.lower() for o in others])
-        cursor.execute(query, params)
-        row = cursor.fetchone()
-        return row[0] if row else 0
+                rows = run(digits_col + " LIKE %s", [contains])
+            if rows:
+                return rows
+
+        # 4) Order id (e.g. "ORD#,4:" -> 4)
+        if len(digits) <= 9:
+            return run("o.order_id = %s", [int(digits)])
+        return []
     finally:
         conn.close()
 
@@ -6925,75 +7360,41 @@ def get_tips_by_employee(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None
 ) -> List[Dict[str, Any]]:
-    """Get tips received by employees"""
+    """Get tips received by employees, per employee per day (from the daily tip rollup, see labor_rollup.py)"""
+    labor_rollup.ensure_rollup()
     conn = get_connection()
     cursor = conn.cursor()
     
-    # Check if employee_tips table exists
-    cursor.execute("""
-        SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'employee_tips'
-    """)
-    has_tips_table = cursor.fetchone() is not None
+    query = """
+        SELECT 
+            r.employee_id,
+            e.first_name || ' ' || e.last_name as employee_name,
+            SUM(r.tip_count) as num_transactions,
+            SUM(r.tips) as total_tips,
+            SUM(r.tips) / NULLIF(SUM(r.tip_count), 0) as avg_tip,
+            r.work_date as tip_date
+        FROM employee_daily_rollup r
+        JOIN employees e ON r.employee_id = e.employee_id
+        WHERE r.tip_count > 0
+    """
+    params = []
     
-    if has_tips_table:
-        # Use employee_tips table
-        query = """
-            SELECT 
-                et.employee_id,
-                e.first_name || ' ' || e.last_name as employee_name,
-                COUNT(et.tip_id) as num_transactions,
-                SUM(et.tip_amount) as total_tips,
-                AVG(et.tip_amount) as avg_tip,
-                DATE(et.tip_date) as tip_date
-            FROM employee_tips et
-            JOIN employees e ON et.employee_id = e.employee_id
-            WHERE et.tip_amount > 0
-        """
-        params = []
-        
-        if employee_id:
-            query += " AND et.employee_id = %s"
-            params.append(employee_id)
-        
-        if start_date:
-            query += " AND DATE(et.tip_date) >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND DATE(et.tip_date) <= %s"
-            params.append(end_date)
-        
-        query += " GROUP BY et.employee_id, DATE(et.tip_date) ORDER BY tip_date DESC, total_tips DESC"
-    else:
-        # Fallback to payment_transactions
-        query = """
-            SELECT 
-                pt.employee_id,
-                e.first_name || ' ' || e.last_name as employee_name,
-                COUNT(pt.transaction_id) as num_transactions,
-                SUM(COALESCE(pt.tip, 0)) as total_tips,
-                AVG(COALESCE(pt.tip, 0)) as avg_tip,
-                DATE(pt.transaction_date) as tip_date
-            FROM payment_transactions pt
-            JOIN orders o ON pt.order_id = o.order_id
-            JOIN employees e ON COALESCE(pt.employee_id, o.employee_id) = e.employee_id
-            WHERE COALESCE(pt.tip, 0) > 0
-        """
-        params = []
-        
-        if employee_id:
-            query += " AND COALESCE(pt.employee_id, o.employee_id) = %s"
-            params.append(employee_id)
-        
-        if start_date:
-            query += " AND DATE(pt.transaction_date) >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND DATE(pt.transaction_date) <= %s"
-            params.append(end_date)
-        
-        query += " GROUP BY pt.employee_id, DATE(pt.transaction_date) ORDER BY tip_date DESC, total_tips DESC"
+    if employee_id:
+        query += " AND r.employee_id = %s"
+        params.append(employee_id)
+    
+    if start_date:
+        query += " AND r.work_date >= %s"
+        params.append(start_date)
+    
+    if end_date:
+        query += " AND r.work_date <= %s"
+        params.append(end_date)
+    
+    query += """
+        GROUP BY r.employee_id, e.first_name, e.last_name, r.work_date
+        ORDER BY tip_date DESC, total_tips DESC
+    """
     
     cursor.execute(query, params)
     rows = cursor.fetchall()
@@ -7006,60 +7407,31 @@ def get_employee_tip_summary(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Get tip summary for a specific employee"""
+    """Get tip summary for a specific employee (from the daily tip rollup, see labor_rollup.py)"""
+    labor_rollup.ensure_rollup()
     conn = get_connection()
     cursor = conn.cursor()
     
-    # Check if employee_tips table exists
-    cursor.execute("""
-        SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'employee_tips'
-    """)
-    has_tips_table = cursor.fetchone() is not None
+    query = """
+        SELECT 
+            COALESCE(SUM(r.tip_count), 0) as num_transactions,
+            SUM(r.tips) as total_tips,
+            SUM(r.tips) / NULLIF(SUM(r.tip_count), 0) as avg_tip,
+            MIN(r.tip_min) as min_tip,
+            MAX(r.tip_max) as max_tip
+        FROM employee_daily_rollup r
+        WHERE r.employee_id = %s
+          AND r.tip_count > 0
+    """
+    params = [employee_id]
     
-    if has_tips_table:
-        query = """
-            SELECT 
-                COUNT(et.tip_id) as num_transactions,
-                SUM(et.tip_amount) as total_tips,
-                AVG(et.tip_amount) as avg_tip,
-                MIN(et.tip_amount) as min_tip,
-                MAX(et.tip_amount) as max_tip
-            FROM employee_tips et
-            WHERE et.employee_id = %s
-              AND et.tip_amount > 0
-        """
-        params = [employee_id]
-        
-        if start_date:
-            query += " AND DATE(et.tip_date) >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND DATE(et.tip_date) <= %s"
-            params.append(end_date)
-    else:
-        # Fallback to payment_transactions
-        query = """
-            SELECT 
-                COUNT(pt.transaction_id) as num_transactions,
-                SUM(COALESCE(pt.tip, 0)) as total_tips,
-                AVG(COALESCE(pt.tip, 0)) as avg_tip,
-                MIN(COALESCE(pt.tip, 0)) as min_tip,
-                MAX(COALESCE(pt.tip, 0)) as max_tip
-            FROM payment_transactions pt
-            JOIN orders o ON pt.order_id = o.order_id
-            WHERE COALESCE(pt.employee_id, o.employee_id) = %s
-              AND COALESCE(pt.tip, 0) > 0
-        """
-        params = [employee_id]
-        
-        if start_date:
-            query += " AND DATE(pt.transaction_date) >= %s"
-            params.append(start_date)
-        
-        if end_date:
-            query += " AND DATE(pt.transaction_date) <= %s"
-            params.append(end_date)
+    if start_date:
+        query += " AND r.work_date >= %s"
+        params.append(start_date)
+    
+    if end_date:
+        query += " AND r.work_date <= %s"
+        params.append(end_date)
     
     cursor.execute(query, params)
     row = cursor.fetchone()
@@ -7084,11 +7456,7 @@ def get_employee_tips(
     conn = get_connection()
     cursor = conn.cursor()
     
-    # Check if employee_tips table exists
-    cursor.execute("""
-        SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'employee_tips'
-    """)
-    has_tips_table = cursor.fetchone() is not None
+    has_tips_table = _has_employee_tips_table(cursor)
     
     if has_tips_table:
         query = """
@@ -7104,11 +7472,11 @@ def get_employee_tips(
         params = [employee_id]
         
         if start_date:
-            query += " AND DATE(et.tip_date) >= %s"
+            query += " AND et.tip_date >= %s::date"
             params.append(start_date)
         
         if end_date:
-            query += " AND DATE(et.tip_date) <= %s"
+            query += " AND et.tip_date < %s::date + 1"
             params.append(end_date)
         
         query += " ORDER BY et.tip_date DESC"
@@ -7134,11 +7502,11 @@ def get_employee_tips(
         params = [employee_id]
         
         if start_date:
-            query += " AND DATE(pt.transaction_date) >= %s"
+            query += " AND pt.transaction_date >= %s::date"
             params.append(start_date)
         
         if end_date:
-            query += " AND DATE(pt.transaction_date) <= %s"
+            query += " AND pt.transaction_date < %s::date + 1"
             params.append(end_date)
         
         query += " ORDER BY pt.transaction_date DESC"
@@ -7174,6 +7542,8 @@ def add_schedule(
     conn.commit()
     schedule_id = cursor.lastrowid
     conn.close()
+    if str(schedule_date)[:10] == datetime.now().date().isoformat():
+        late_arrivals.roster_changed()
     
     return schedule_id
 
@@ -7235,6 +7605,8 @@ def clock_in(employee_id: int, schedule_id: Optional[int] = None, schedule_date:
         
         conn.commit()
         conn.close()
+        # No late clock-in alert for this employee today (in-memory roster, late_arrivals.py)
+        late_arrivals.note_clock_in(employee_id)
         
         return {
             'success': True,
@@ -7309,6 +7681,7 @@ def clock_out(employee_id: int, schedule_id: Optional[int] = None, latitude: Opt
             WHERE time_entry_id = %s
         """, (time_entry_id,))
         
+        labor_rollup.refresh_labor_day(cursor, employee_id, clock_in_time)
         conn.commit()
         conn.close()
         
@@ -7777,14 +8150,7 @@ def verify_session(session_token: str) -> Dict[str, Any]:
         
         cursor = conn.cursor(cursor_factory=RealDictCursor)
         
-        cursor.execute("""
-            SELECT es.*, e.first_name, e.last_name, e.position, e.active, e.email
-            FROM employee_sessions es
-            JOIN employees e ON es.employee_id = e.employee_id
-            WHERE es.session_token = %s 
-              AND es.is_active = 1
-              AND e.active = 1
-        """, (session_token,))
+        execute_prepared(cursor, 'pos_verify_session', (session_token,))
         
         session = cursor.fetchone()
         
@@ -8032,6 +8398,7 @@ def time_clock_out(employee_id: int) -> Dict[str, Any]:
             total_hours = %s
         WHERE time_entry_id = %s
     """, (total_hours, time_entry_id))
+    labor_rollup.refresh_labor_day(cursor, employee_id, clock_in)
     
     conn.commit()
     
@@ -8088,12 +8455,18 @@ def time_end_break(employee_id: int) -> Dict[str, Any]:
           AND clock_out IS NULL
           AND break_start IS NOT NULL
           AND break_end IS NULL
+        RETURNING establishment_id, clock_in,
+                  EXTRACT(EPOCH FROM (break_end - break_start)) / 60.0 AS break_minutes
     """, (employee_id,))
+    ended = cursor.fetchall()
     
-    if cursor.rowcount == 0:
+    if not ended:
         conn.close()
         return {'success': False, 'message': 'No active break'}
     
+    for row in ended:
+        row = dict(row) if hasattr(row, 'keys') else dict(zip(('establishment_id', 'clock_in', 'break_minutes'), row))
+        labor_rollup.add_break(cursor, row['establishment_id'], employee_id, row['clock_in'], row['break_minutes'] or 0)
     conn.commit()
     conn.close()
     
@@ -8104,9 +8477,10 @@ def get_timesheet(employee_id: int, start_date: str, end_date: str) -> Dict[str,
     conn = get_connection()
     cursor = conn.cursor()
     
+    # Half-open clock_in range: served by idx_time_clock_employee_clock_in (labor_rollup.py)
     cursor.execute("""
         SELECT 
-            DATE(clock_in) as work_date,
+            clock_in::date as work_date,
             clock_in,
             clock_out,
             break_start,
@@ -8115,23 +8489,15 @@ def get_timesheet(employee_id: int, start_date: str, end_date: str) -> Dict[str,
             status
         FROM time_clock
         WHERE employee_id = %s
-          AND DATE(clock_in) >= %s AND DATE(clock_in) <= %s
+          AND clock_in >= %s::date AND clock_in < %s::date + 1
         ORDER BY clock_in DESC
     """, (employee_id, start_date, end_date))
     
     timesheet = [dict(row) for row in cursor.fetchall()]
     
-    # Calculate total hours
-    cursor.execute("""
-        SELECT SUM(total_hours) as total
-        FROM time_clock
-        WHERE employee_id = %s
-          AND DATE(clock_in) >= %s AND DATE(clock_in) <= %s
-          AND clock_out IS NOT NULL
-    """, (employee_id, start_date, end_date))
-    
-    total_row = cursor.fetchone()
-    total_hours = total_row['total'] if total_row and total_row['total'] else 0.0
+    # Total hours of completed shifts (same rows; no second scan)
+    completed = [row['total_hours'] for row in timesheet if row['clock_out'] is not None and row['total_hours'] is not None]
+    total_hours = sum(completed) if completed else 0.0
     
     conn.close()
     
@@ -8152,57 +8518,29 @@ def log_audit_action(
     old_values: Optional[Dict[str, Any]] = None,
     new_values: Optional[Dict[str, Any]] = None,
     ip_address: Optional[str] = None,
-    notes: Optional[str] = None
+    notes: Optional[str] = None,
+    sync: Optional[bool] = None
 ) -> int:
-    """Log any database action to audit log"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    old_values_json = json.dumps(old_values) if old_values else None
-    new_values_json = json.dumps(new_values) if new_values else None
-    
-    # Get establishment_id if needed
-    establishment_id = None
-    cursor.execute("""
-        SELECT column_name FROM information_schema.columns 
-        WHERE table_name = 'audit_log' AND table_schema = 'public' AND column_name = 'establishment_id'
-    """)
-    has_establishment_id = cursor.fetchone() is not None
-    
-    if has_establishment_id:
-        # Try to get establishment_id from employee
-        try:
-            emp_cursor = conn.cursor()
-            emp_cursor.execute("SELECT establishment_id FROM employees WHERE employee_id = %s", (employee_id,))
-            est_row = emp_cursor.fetchone()
-            if est_row:
-                establishment_id = est_row.get('establishment_id') if isinstance(est_row, dict) else est_row[0]
-            emp_cursor.close()
-        except:
-            pass
-    
-    if has_establishment_id and establishment_id:
-        cursor.execute("""
-            INSERT INTO audit_log (
-                establishment_id, table_name, record_id, action_type, employee_id,
-                old_values, new_values, ip_address, notes
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (establishment_id, table_name, record_id, action_type, employee_id,
-              old_values_json, new_values_json, ip_address, notes))
-    else:
-        cursor.execute("""
-            INSERT INTO audit_log (
-                table_name, record_id, action_type, employee_id,
-                old_values, new_values, ip_address, notes
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        """, (table_name, record_id, action_type, employee_id,
-              old_values_json, new_values_json, ip_address, notes))
-    
-    conn.commit()
-    audit_id = cursor.lastrowid
-    conn.close()
-    
-    return audit_id
+    """
+    Log any database action to audit log.
+    Entries go through the write-behind audit buffer and are flushed in batches;
+    compliance-critical action types (audit_buffer.SYNC_ACTION_TYPES) or sync=True
+    are written before returning. Returns the audit_id for synchronous writes, else 0.
+    """
+    from audit_buffer import get_audit_buffer, SYNC_ACTION_TYPES
+
+    if sync is None:
+        sync = (action_type or '').upper() in SYNC_ACTION_TYPES
+    return get_audit_buffer().log({
+        'table_name': table_name,
+        'record_id': record_id,
+        'action_type': action_type,
+        'employee_id': employee_id,
+        'old_values': json.dumps(old_values) if old_values else None,
+        'new_values': json.dumps(new_values) if new_values else None,
+        'ip_address': ip_address,
+        'notes': notes,
+    }, sync=sync)
 
 def get_audit_trail(
     table_name: Optional[str] = None,
@@ -8210,9 +8548,13 @@ def get_audit_trail(
     employee_id: Optional[int] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    limit: int = 1000
+    limit: int = 1000,
+    before_id: Optional[int] = None
 ) -> List[Dict[str, Any]]:
-    """Retrieve audit trail with filters"""
+    """Retrieve audit trail with filters, newest first. before_id continues after the last audit_id of a previous page."""
+    from audit_buffer import flush_audit_log
+    flush_audit_log()
+
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -8247,7 +8589,12 @@ def get_audit_trail(
         query += " AND DATE(al.action_timestamp) <= %s"
         params.append(end_date)
     
-    query += " ORDER BY al.action_timestamp DESC LIMIT %s"
+    if before_id is not None:
+        query += " AND al.audit_id < %s"
+        params.append(before_id)
+    
+    # Primary-key order (audit rows are inserted in time order) so pages come off the index
+    query += " ORDER BY al.audit_id DESC LIMIT %s"
     params.append(limit)
     
     cursor.execute(query, params)
@@ -9147,6 +9494,13 @@ def start_verification_session(pending_shipment_id: int, employee_id: int, devic
 
         conn.commit()
 
+        # Preload barcode/SKU -> item map so scans are answered from memory
+        try:
+            from scan_sessions import get_scan_session_manager
+            get_scan_session_manager().load(pending_shipment_id)
+        except Exception as e:
+            logger.warning("Could not preload scan session for shipment %s: %s", pending_shipment_id, e)
+
         return {
             'session_id': session_id,
             'shipment': shipment
@@ -9162,101 +9516,26 @@ def start_verification_session(pending_shipment_id: int, employee_id: int, devic
 def scan_item(pending_shipment_id: int, barcode: str, employee_id: int, 
               device_id: Optional[str] = None, session_id: Optional[int] = None, 
               location: Optional[str] = None) -> Dict[str, Any]:
-    """Process a scanned barcode during verification"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    """
+    Process a scanned barcode during verification.
+    Matches against the shipment's in-memory scan session (barcode, SKU or linked inventory barcode);
+    quantity updates, scan log rows and session stats are written back in batches by scan_sessions.
+    """
+    from scan_sessions import get_scan_session_manager
 
-    ensure_shipment_verification_tables(conn)
-    
-    # Find matching item in pending shipment
-    cursor.execute("""
-        SELECT psi.*, i.product_id, i.product_name as inventory_name
-        FROM pending_shipment_items psi
-        LEFT JOIN inventory i ON (psi.product_sku = i.sku OR psi.barcode = i.barcode OR i.barcode = %s)
-        WHERE psi.pending_shipment_id = %s 
-        AND (psi.barcode = %s OR psi.product_sku = %s OR i.barcode = %s)
-        AND psi.status != 'verified'
-    """, (barcode, pending_shipment_id, barcode, barcode, barcode))
-    row = cursor.fetchone()
-    item = dict(zip([c[0] for c in cursor.description], row)) if row and cursor.description else None
-
-    scan_result = 'unknown'
-    response = {}
-    pending_item_id = None
-
-    if item:
-        pending_item_id = item['pending_item_id']
-        
-        # Check if already fully verified
-        if item.get('quantity_verified', 0) >= item.get('quantity_expected', 0):
-            scan_result = 'duplicate'
-            response = {
-                'status': 'duplicate',
-                'message': f"Item already fully verified ({item.get('quantity_expected', 0)} units)",
-                'item': item
-            }
-        else:
-            # Increment verified quantity
-            new_quantity = item.get('quantity_verified', 0) + 1
-            scan_result = 'match'
-            
-            # Determine new status
-            new_status = 'verified' if new_quantity >= item.get('quantity_expected', 0) else 'pending'
-            
-            cursor.execute("""
-                UPDATE pending_shipment_items
-                SET quantity_verified = %s,
-                    verified_by = %s,
-                    verified_at = CURRENT_TIMESTAMP,
-                    status = %s
-                WHERE pending_item_id = %s
-            """, (new_quantity, employee_id, new_status, item['pending_item_id']))
-            
-            response = {
-                'status': 'success',
-                'item': item,
-                'quantity_verified': new_quantity,
-                'quantity_expected': item.get('quantity_expected', 0),
-                'remaining': item.get('quantity_expected', 0) - new_quantity,
-                'fully_verified': new_quantity >= item.get('quantity_expected', 0)
-            }
-            
-            # Update session stats if session_id provided
-            if session_id:
-                cursor.execute("""
-                    UPDATE verification_sessions
-                    SET total_scans = total_scans + 1,
-                        items_verified = items_verified + 1
-                    WHERE session_id = %s
-                """, (session_id,))
-    else:
-        # Unknown item scanned
-        scan_result = 'mismatch'
-        response = {
-            'status': 'unknown',
-            'message': 'Item not found in this shipment',
-            'barcode': barcode,
-            'suggest_issue': True
-        }
-    
-    # Log the scan
-    cursor.execute("""
-        INSERT INTO shipment_scan_log
-        (pending_shipment_id, pending_item_id, scanned_barcode, 
-         scanned_by, scan_result, device_id, location)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-    """, (pending_shipment_id, pending_item_id, barcode, employee_id, scan_result, device_id, location))
-    
-    conn.commit()
-    conn.close()
-    
-    return response
+    ensure_shipment_verification_tables()
+    return get_scan_session_manager().scan(
+        pending_shipment_id, barcode, employee_id,
+        device_id=device_id, session_id=session_id, location=location
+    )
 
 def report_shipment_issue(pending_shipment_id: int, pending_item_id: Optional[int], 
                          issue_type: str, description: str, quantity_affected: int,
                          employee_id: int, severity: str = 'minor', 
                          photo_path: Optional[str] = None) -> int:
     """Report an issue with a shipment item"""
+    from scan_sessions import flush_scan_sessions
+    flush_scan_sessions()
     conn = get_connection()
     cursor = conn.cursor()
 
@@ -9298,6 +9577,11 @@ def report_shipment_issue(pending_shipment_id: int, pending_item_id: Optional[in
     conn.commit()
     conn.close()
     
+    from scan_sessions import invalidate_scan_sessions, notify_progress
+    invalidate_scan_sessions(pending_shipment_id=pending_shipment_id)
+    if pending_item_id:
+        notify_progress([pending_shipment_id])
+    
     return issue_id
 
 
@@ -9430,6 +9714,8 @@ def get_shipment_issues(pending_shipment_id: int) -> List[Dict[str, Any]]:
 def get_verification_progress(pending_shipment_id: int) -> Dict[str, Any]:
     """Get current verification progress"""
     from psycopg2.extras import RealDictCursor
+    from scan_sessions import flush_scan_sessions
+    flush_scan_sessions()
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
@@ -9440,23 +9726,34 @@ def get_verification_progress(pending_shipment_id: int) -> Dict[str, Any]:
         except:
             pass
         
-        # Overall stats - calculate verified/issue status based on quantity_verified and discrepancy_notes
-        cursor.execute("""
-            SELECT 
-                COUNT(*) as total_items,
-                COALESCE(SUM(quantity_expected), 0) as total_expected_quantity,
-                COALESCE(SUM(quantity_verified), 0) as total_verified_quantity,
-                SUM(CASE 
-                    WHEN COALESCE(quantity_verified, 0) >= quantity_expected 
-                    THEN 1 ELSE 0 
-                END) as items_fully_verified,
-                SUM(CASE 
-                    WHEN discrepancy_notes IS NOT NULL AND discrepancy_notes != '' 
-                    THEN 1 ELSE 0 
-                END) as items_with_issues
-            FROM pending_shipment_items
-            WHERE pending_shipment_id = %s
-        """, (pending_shipment_id,))
+        # Overall stats - precomputed counters when available, else calculated from
+        # quantity_verified and discrepancy_notes
+        if _get_shipment_progress_caps(cursor)['counters']:
+            cursor.execute("""
+                SELECT item_count as total_items,
+                       expected_quantity as total_expected_quantity,
+                       verified_quantity as total_verified_quantity,
+                       items_fully_verified, items_with_issues
+                FROM pending_shipments
+                WHERE pending_shipment_id = %s
+            """, (pending_shipment_id,))
+        else:
+            cursor.execute("""
+                SELECT 
+                    COUNT(*) as total_items,
+                    COALESCE(SUM(quantity_expected), 0) as total_expected_quantity,
+                    COALESCE(SUM(quantity_verified), 0) as total_verified_quantity,
+                    SUM(CASE 
+                        WHEN COALESCE(quantity_verified, 0) >= quantity_expected 
+                        THEN 1 ELSE 0 
+                    END) as items_fully_verified,
+                    SUM(CASE 
+                        WHEN discrepancy_notes IS NOT NULL AND discrepancy_notes != '' 
+                        THEN 1 ELSE 0 
+                    END) as items_with_issues
+                FROM pending_shipment_items
+                WHERE pending_shipment_id = %s
+            """, (pending_shipment_id,))
         
         progress_row = cursor.fetchone()
         if isinstance(progress_row, dict):
@@ -9571,6 +9868,9 @@ def complete_verification(pending_shipment_id: int, employee_id: int, notes: Opt
     print(f"Starting completion for shipment {pending_shipment_id} (employee {employee_id})")
     print(f"{'='*60}")
     
+    from scan_sessions import invalidate_scan_sessions
+    invalidate_scan_sessions(pending_shipment_id=pending_shipment_id)
+    
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -9951,6 +10251,95 @@ def complete_verification(pending_shipment_id: int, employee_id: int, notes: Opt
         'issue_count': shipment['issue_count']
     }
 
+_shipment_progress_caps = None
+
+
+def _get_shipment_progress_caps(cursor) -> Dict[str, bool]:
+    """Probe whether pending_shipments exists and carries the progress counters
+    (migrations/add_pending_shipment_progress_counters.sql). Cached once the table exists."""
+    global _shipment_progress_caps
+    if _shipment_progress_caps is not None:
+        return _shipment_progress_caps
+    cursor.execute("""
+        SELECT
+            to_regclass('public.pending_shipments') IS NOT NULL AS table_exists,
+            EXISTS (SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = 'public' AND table_name = 'pending_shipments'
+                      AND column_name = 'items_with_issues') AS counters
+    """)
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        caps = {'table_exists': bool(row['table_exists']), 'counters': bool(row['counters'])}
+    else:
+        caps = {'table_exists': bool(row[0]), 'counters': bool(row[1])}
+    if caps['table_exists']:
+        _shipment_progress_caps = caps
+    return caps
+
+
+def _progress_percentage(expected, verified) -> float:
+    expected = float(expected or 0)
+    return round(float(verified or 0) * 100.0 / expected, 2) if expected > 0 else 0.0
+
+
+def get_shipment_progress_summary(pending_shipment_id: int, conn=None) -> Optional[Dict[str, Any]]:
+    """
+    Verification counters for one shipment (no item list). One primary-key read when the
+    progress counters migration is applied; otherwise aggregates the shipment's items.
+    Used for Socket.IO progress pushes and /api/shipments/<id>/progress?summary=1.
+    """
+    from psycopg2.extras import RealDictCursor
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        caps = _get_shipment_progress_caps(cursor)
+        if not caps['table_exists']:
+            return None
+        if caps['counters']:
+            cursor.execute("""
+                SELECT pending_shipment_id, status,
+                       item_count AS total_items,
+                       expected_quantity AS total_expected_quantity,
+                       verified_quantity AS total_verified_quantity,
+                       items_fully_verified, items_with_issues, progress_updated_at
+                FROM pending_shipments
+                WHERE pending_shipment_id = %s
+            """, (pending_shipment_id,))
+        else:
+            cursor.execute("""
+                SELECT ps.pending_shipment_id, ps.status,
+                       COUNT(psi.pending_item_id) AS total_items,
+                       COALESCE(SUM(psi.quantity_expected), 0) AS total_expected_quantity,
+                       COALESCE(SUM(COALESCE(psi.quantity_verified, 0)), 0) AS total_verified_quantity,
+                       COUNT(*) FILTER (WHERE COALESCE(psi.quantity_verified, 0) >= psi.quantity_expected) AS items_fully_verified,
+                       COUNT(*) FILTER (WHERE psi.discrepancy_notes IS NOT NULL AND psi.discrepancy_notes != '') AS items_with_issues,
+                       NULL AS progress_updated_at
+                FROM pending_shipments ps
+                LEFT JOIN pending_shipment_items psi ON psi.pending_shipment_id = ps.pending_shipment_id
+                WHERE ps.pending_shipment_id = %s
+                GROUP BY ps.pending_shipment_id, ps.status
+            """, (pending_shipment_id,))
+        row = cursor.fetchone()
+        if own_conn:
+            conn.rollback()
+        if not row:
+            return None
+        summary = dict(row)
+        for key in ('total_items', 'total_expected_quantity', 'total_verified_quantity',
+                    'items_fully_verified', 'items_with_issues'):
+            summary[key] = int(summary.get(key) or 0)
+        summary['completion_percentage'] = _progress_percentage(
+            summary['total_expected_quantity'], summary['total_verified_quantity'])
+        if summary.get('progress_updated_at') is not None:
+            summary['progress_updated_at'] = summary['progress_updated_at'].isoformat()
+        return summary
+    finally:
+        if own_conn:
+            conn.close()
+
+
 def get_pending_shipments_with_progress(status: Optional[str] = None) -> List[Dict[str, Any]]:
     """Get list of pending shipments with verification progress"""
     from psycopg2.extras import RealDictCursor
@@ -9964,24 +10353,56 @@ def get_pending_shipments_with_progress(status: Optional[str] = None) -> List[Di
         except:
             pass  # Ignore if already rolled back or no transaction
         
-        # Check if pending_shipments table exists
-        cursor.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = 'pending_shipments'
-            )
-        """)
-        table_exists = cursor.fetchone()
-        if isinstance(table_exists, dict):
-            table_exists = table_exists.get('exists', False)
-        else:
-            table_exists = table_exists[0] if table_exists else False
-        
-        if not table_exists:
-            # Table doesn't exist, return empty list
+        caps = _get_shipment_progress_caps(cursor)
+        if not caps['table_exists']:
             return []
+        if caps['counters']:
+            # Counters are kept current by trg_pending_shipment_items_progress: no per-call aggregation
+            query = """
+                SELECT 
+                    ps.pending_shipment_id,
+                    ps.establishment_id,
+                    ps.vendor_id,
+                    ps.expected_date,
+                    ps.upload_timestamp,
+                    ps.file_path,
+                    ps.purchase_order_number,
+                    ps.tracking_number,
+                    ps.status,
+                    ps.uploaded_by,
+                    ps.approved_by,
+                    ps.approved_date,
+                    ps.reviewed_by,
+                    ps.reviewed_date,
+                    ps.notes,
+                    ps.started_by,
+                    v.vendor_name,
+                    e1.first_name || ' ' || e1.last_name as uploaded_by_name,
+                    e2.first_name || ' ' || e2.last_name as started_by_name,
+                    ps.item_count as total_items,
+                    ps.expected_quantity as total_expected,
+                    ps.verified_quantity as total_verified,
+                    ps.items_with_issues as issue_count,
+                    CASE 
+                        WHEN ps.expected_quantity > 0 
+                        THEN ROUND((ps.verified_quantity * 100.0 / ps.expected_quantity), 2)
+                        ELSE 0
+                    END as progress_percentage
+                FROM pending_shipments ps
+                JOIN vendors v ON ps.vendor_id = v.vendor_id
+                LEFT JOIN employees e1 ON ps.uploaded_by = e1.employee_id
+                LEFT JOIN employees e2 ON ps.started_by = e2.employee_id
+            """
+            if status:
+                cursor.execute(query + " WHERE ps.status = %s ORDER BY ps.upload_timestamp DESC", (status,))
+            else:
+                cursor.execute(query + " ORDER BY ps.upload_timestamp DESC")
+            shipments = [dict(row) for row in cursor.fetchall()]
+            for shipment in shipments:
+                shipment['progress_percentage'] = float(shipment.get('progress_percentage') or 0)
+            return shipments
         
+        # Counters migration not applied: aggregate items per shipment
         # Use a subquery approach to handle GROUP BY properly with ps.*
         base_query = """
             SELECT 
@@ -10105,7 +10526,8 @@ def create_shipment_from_document(
     uploaded_by: Optional[int] = None,
     column_mapping: Optional[Dict[str, str]] = None,
     verification_mode: str = 'verify_whole_shipment',
-    use_legacy_scraper: bool = False
+    use_legacy_scraper: bool = False,
+    progress_callback=None
 ) -> Dict[str, Any]:
     """
     Create a pending shipment from a scraped vendor document
@@ -10119,6 +10541,7 @@ def create_shipment_from_document(
         column_mapping: Optional column mapping (legacy scraper only)
         verification_mode: 'auto_add' or 'verify_whole_shipment' (default)
         use_legacy_scraper: If True, use legacy PDF/Excel/CSV scraper instead of AI
+        progress_callback: Optional callable(stage, percent) for background jobs
     
     Returns:
         Dictionary with pending_shipment_id and items created
@@ -10136,7 +10559,7 @@ def create_shipment_from_document(
         from shipment_processor import ShipmentProcessor, ai_products_to_shipment_items
         try:
             processor = ShipmentProcessor()
-            result = processor.process_shipment(file_path)
+            result = processor.process_shipment(file_path, progress_callback=progress_callback)
         except Exception as e:
             return {
                 'success': False,
@@ -11652,6 +12075,46 @@ def open_cash_register(employee_id: int, register_id: int = 1, starting_cash: fl
         traceback.print_exc()
         return {'success': False, 'message': str(e)}
 
+def _compute_session_cash_totals(cursor, session_id: int, opened_at, establishment_id: Optional[int] = None) -> tuple:
+    """Cash sales / refunds / in / out for a session by scanning orders and cash_transactions
+    (used when the register running-totals migration has not been applied). Same rules as
+    migrations/add_register_session_totals_and_events.sql: non-voided cash orders are sales,
+    returned ones are also refunds, deposits count as cash in and withdrawals as cash out."""
+    establishment_filter = "AND o.establishment_id = %s" if establishment_id is not None else ""
+    params = (opened_at, establishment_id) if establishment_id is not None else (opened_at,)
+    cursor.execute(f"""
+        SELECT 
+            COALESCE(SUM(CASE WHEN o.order_status != 'voided' THEN o.total ELSE 0 END), 0) as cash_sales,
+            COALESCE(SUM(CASE WHEN o.order_status = 'returned' THEN o.total ELSE 0 END), 0) as cash_refunds
+        FROM orders o
+        WHERE o.payment_method = 'cash'
+        AND o.order_date >= %s AND o.order_date <= CURRENT_TIMESTAMP
+        {establishment_filter}
+    """, params)
+    
+    sales_data = cursor.fetchone()
+    if isinstance(sales_data, dict):
+        sales_data = (sales_data.get('cash_sales'), sales_data.get('cash_refunds'))
+    # Convert Decimal to float for calculations
+    cash_sales = float(sales_data[0]) if sales_data and sales_data[0] is not None else 0.0
+    cash_refunds = float(sales_data[1]) if sales_data and sales_data[1] is not None else 0.0
+    
+    # Calculate cash in/out transactions
+    cursor.execute("""
+        SELECT 
+            COALESCE(SUM(CASE WHEN transaction_type IN ('cash_in', 'deposit') THEN amount ELSE 0 END), 0) as cash_in,
+            COALESCE(SUM(CASE WHEN transaction_type IN ('cash_out', 'withdrawal') THEN amount ELSE 0 END), 0) as cash_out
+        FROM cash_transactions
+        WHERE session_id = %s
+    """, (session_id,))
+    
+    trans_data = cursor.fetchone()
+    if isinstance(trans_data, dict):
+        trans_data = (trans_data.get('cash_in'), trans_data.get('cash_out'))
+    cash_in = float(trans_data[0]) if trans_data and trans_data[0] is not None else 0.0
+    cash_out = float(trans_data[1]) if trans_data and trans_data[1] is not None else 0.0
+    return cash_sales, cash_refunds, cash_in, cash_out
+
 def close_cash_register(session_id: int, employee_id: int, ending_cash: float, notes: Optional[str] = None) -> Dict[str, Any]:
     """
     Close a cash register session and calculate reconciliation
@@ -11669,11 +12132,13 @@ def close_cash_register(session_id: int, employee_id: int, ending_cash: float, n
     cursor = conn.cursor()
     
     try:
-        # Get session details
+        # Get session details (locked so the running totals cannot move while closing)
         cursor.execute("""
-            SELECT register_id, employee_id, starting_cash, opened_at, status
+            SELECT register_id, employee_id, starting_cash, opened_at, status,
+                   cash_sales, cash_refunds, cash_in, cash_out, establishment_id
             FROM cash_register_sessions
             WHERE register_session_id = %s
+            FOR UPDATE
         """, (session_id,))
         
         session = cursor.fetchone()
@@ -11681,40 +12146,22 @@ def close_cash_register(session_id: int, employee_id: int, ending_cash: float, n
             conn.close()
             return {'success': False, 'message': 'Session not found'}
         
-        session = dict(zip(['register_id', 'employee_id', 'starting_cash', 'opened_at', 'status'], session))
+        session = dict(zip(['register_id', 'employee_id', 'starting_cash', 'opened_at', 'status',
+                            'cash_sales', 'cash_refunds', 'cash_in', 'cash_out', 'establishment_id'], session))
         
         if session['status'] != 'open':
             conn.close()
             return {'success': False, 'message': f"Session is already {session['status']}"}
         
-        # Calculate cash sales and refunds from orders
-        cursor.execute("""
-            SELECT 
-                COALESCE(SUM(CASE WHEN o.payment_method = 'cash' THEN o.total ELSE 0 END), 0) as cash_sales,
-                COALESCE(SUM(CASE WHEN o.payment_method = 'cash' AND o.order_status = 'returned' THEN o.total ELSE 0 END), 0) as cash_refunds
-            FROM orders o
-            WHERE o.payment_method = 'cash'
-            AND o.order_date >= %s AND o.order_date <= CURRENT_TIMESTAMP
-        """, (session['opened_at'],))
-        
-        sales_data = cursor.fetchone()
-        # Convert Decimal to float for calculations
-        cash_sales = float(sales_data[0]) if sales_data and sales_data[0] is not None else 0.0
-        cash_refunds = float(sales_data[1]) if sales_data and sales_data[1] is not None else 0.0
-        
-        # Calculate cash in/out transactions
-        cursor.execute("""
-            SELECT 
-                COALESCE(SUM(CASE WHEN transaction_type IN ('cash_in', 'deposit') THEN amount ELSE 0 END), 0) as cash_in,
-                COALESCE(SUM(CASE WHEN transaction_type IN ('cash_out', 'withdrawal') THEN amount ELSE 0 END), 0) as cash_out
-            FROM cash_transactions
-            WHERE session_id = %s
-        """, (session_id,))
-        
-        trans_data = cursor.fetchone()
-        # Convert Decimal to float for calculations
-        cash_in = float(trans_data[0]) if trans_data and trans_data[0] is not None else 0.0
-        cash_out = float(trans_data[1]) if trans_data and trans_data[1] is not None else 0.0
+        if _get_register_cash_caps(cursor)['session_totals']:
+            # Per-session running totals maintained by triggers
+            cash_sales = float(session['cash_sales'] or 0)
+            cash_refunds = float(session['cash_refunds'] or 0)
+            cash_in = float(session['cash_in'] or 0)
+            cash_out = float(session['cash_out'] or 0)
+        else:
+            cash_sales, cash_refunds, cash_in, cash_out = _compute_session_cash_totals(
+                cursor, session_id, session['opened_at'], session['establishment_id'])
         
         # Convert starting_cash to float
         starting_cash = float(session['starting_cash']) if session.get('starting_cash') is not None else 0.0
@@ -11868,6 +12315,28 @@ def add_cash_transaction(session_id: Optional[int], employee_id: int, transactio
         traceback.print_exc()
         return {'success': False, 'message': str(e)}
 
+_register_cash_caps = None
+
+
+def _get_register_cash_caps(cursor) -> Dict[str, bool]:
+    """Probe (once per process) whether migrations/add_register_session_totals_and_events.sql is applied."""
+    global _register_cash_caps
+    if _register_cash_caps is None:
+        cursor.execute("""
+            SELECT
+                EXISTS (SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = 'public' AND table_name = 'orders'
+                          AND column_name = 'register_session_id') AS session_totals,
+                to_regclass('public.register_events') IS NOT NULL AS event_log
+        """)
+        row = cursor.fetchone()
+        if isinstance(row, dict):
+            _register_cash_caps = {'session_totals': bool(row['session_totals']), 'event_log': bool(row['event_log'])}
+        else:
+            _register_cash_caps = {'session_totals': bool(row[0]), 'event_log': bool(row[1])}
+    return _register_cash_caps
+
+
 def _enrich_session_expected_cash(conn, cursor, session: Dict[str, Any]) -> Dict[str, Any]:
     """Add expected_cash and cash_sales to an open session for display."""
     s = dict(session)
@@ -11879,41 +12348,28 @@ def _enrich_session_expected_cash(conn, cursor, session: Dict[str, Any]) -> Dict
     if not sid or not opened_at:
         return s
     try:
-        # Cash sales from orders (payment_method=cash, non-voided) since session opened
-        if establishment_id is not None:
-            cursor.execute("""
-                SELECT COALESCE(SUM(CASE WHEN o.order_status != 'voided' THEN o.total ELSE 0 END), 0) as cash_sales
-                FROM orders o
-                WHERE o.payment_method = 'cash'
-                AND o.order_date >= %s
-                AND o.establishment_id = %s
-            """, (opened_at, establishment_id))
-        else:
-            cursor.execute("""
-                SELECT COALESCE(SUM(CASE WHEN o.order_status != 'voided' THEN o.total ELSE 0 END), 0) as cash_sales
-                FROM orders o
-                WHERE o.payment_method = 'cash'
-                AND o.order_date >= %s
-            """, (opened_at,))
-        sales_row = cursor.fetchone()
-        cash_sales = float((sales_row or {}).get('cash_sales') or 0)
-
-        # Cash in/out from cash_transactions for this session
-        cursor.execute("""
-            SELECT
-                COALESCE(SUM(CASE WHEN transaction_type = 'cash_in' THEN amount ELSE 0 END), 0) as cash_in,
-                COALESCE(SUM(CASE WHEN transaction_type = 'cash_out' THEN amount ELSE 0 END), 0) as cash_out
-            FROM cash_transactions
-            WHERE session_id = %s
-        """, (sid,))
-        tx_row = cursor.fetchone()
-        tx = tx_row if isinstance(tx_row, dict) else {}
-        cash_in = float(tx.get('cash_in') or 0)
-        cash_out = float(tx.get('cash_out') or 0)
-
         starting = float(s.get('starting_cash') or 0)
+        if _get_register_cash_caps(cursor)['session_totals']:
+            # Running totals kept up to date by triggers as cash orders / transactions are recorded
+            cash_sales = float(s.get('cash_sales') or 0)
+            cash_refunds = float(s.get('cash_refunds') or 0)
+            cash_in = float(s.get('cash_in') or 0)
+            cash_out = float(s.get('cash_out') or 0)
+            s['cash_sales'] = cash_sales
+            s['cash_refunds'] = cash_refunds
+            s['cash_in'] = cash_in
+            s['cash_out'] = cash_out
+            s['expected_cash'] = starting + cash_sales - cash_refunds + cash_in - cash_out
+            return s
+
+        # No running totals: scan this session's orders / cash transactions with the same rules
+        cash_sales, cash_refunds, cash_in, cash_out = _compute_session_cash_totals(
+            cursor, sid, opened_at, establishment_id)
         s['cash_sales'] = cash_sales
-        s['expected_cash'] = starting + cash_sales + cash_in - cash_out
+        s['cash_refunds'] = cash_refunds
+        s['cash_in'] = cash_in
+        s['cash_out'] = cash_out
+        s['expected_cash'] = starting + cash_sales - cash_refunds + cash_in - cash_out
     except Exception as ex:
         # Fallback so UI still shows something
         s['expected_cash'] = float(s.get('starting_cash') or 0)
@@ -12421,9 +12877,21 @@ def save_daily_cash_count(
         traceback.print_exc()
         return {'success': False, 'message': str(e)}
 
+def _decode_register_event_cursor(before: str) -> tuple:
+    """(occurred_at, event_log_id) from an event's 'cursor' value; ValueError when malformed."""
+    occurred_at, sep, event_log_id = before.rpartition('_')
+    try:
+        if not sep:
+            raise ValueError('missing separator')
+        return datetime.fromisoformat(occurred_at), int(event_log_id)
+    except ValueError as e:
+        raise ValueError(f"Invalid register events cursor: {before!r}") from e
+
+
 def get_register_events(
     register_id: Optional[int] = None,
-    limit: Optional[int] = 100
+    limit: Optional[int] = 100,
+    before: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Get all register events (open, close, drop, take out) as a unified list
@@ -12431,15 +12899,58 @@ def get_register_events(
     Args:
         register_id: Filter by register ID
         limit: Maximum number of events to return
+        before: Keyset cursor (an event's 'cursor' value) to page back from
     
     Returns:
-        List of event dicts with unified structure
+        List of event dicts with unified structure, newest first
+
+    Raises:
+        ValueError: `before` is not a cursor returned by this function
     """
     from psycopg2.extras import RealDictCursor
+    before_key = _decode_register_event_cursor(before) if before else None
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     
     try:
+        if _get_register_cash_caps(cursor)['event_log']:
+            # Unified event log (maintained by triggers): one ordered, limited, indexed query
+            query = """
+                SELECT re.event_log_id, re.event_type, re.source_id, re.amount, re.occurred_at,
+                       re.employee_id, e.first_name || ' ' || e.last_name as employee_name,
+                       re.notes, COALESCE(re.register_id, 1) as register_id
+                FROM register_events re
+                LEFT JOIN employees e ON re.employee_id = e.employee_id
+                WHERE 1=1
+            """
+            params = []
+            if register_id:
+                # Take-outs recorded without a session belong to every register (as before)
+                query += " AND (re.register_id = %s OR re.register_id IS NULL)"
+                params.append(register_id)
+            if before_key:
+                query += " AND (re.occurred_at, re.event_log_id) < (%s::timestamp, %s)"
+                params.extend(before_key)
+            query += " ORDER BY re.occurred_at DESC, re.event_log_id DESC"
+            if limit:
+                query += " LIMIT %s"
+                params.append(limit)
+            cursor.execute(query, params)
+            prefixes = {'open': 'open', 'close': 'close', 'drop': 'drop', 'take_out': 'takeout'}
+            events = [{
+                'event_id': f"{prefixes.get(row['event_type'], row['event_type'])}_{row['source_id']}",
+                'event_type': row['event_type'],
+                'amount': float(row['amount']) if row['amount'] else 0,
+                'timestamp': row['occurred_at'],
+                'employee_id': row['employee_id'],
+                'employee_name': row['employee_name'],
+                'notes': row['notes'],
+                'register_id': row['register_id'],
+                'cursor': f"{row['occurred_at'].isoformat()}_{row['event_log_id']}",
+            } for row in cursor.fetchall()]
+            conn.close()
+            return events
+        
         all_events = []
         
         # Get open/close events from cash_register_sessions
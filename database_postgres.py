@@ -3,18 +3,35 @@
 Local PostgreSQL database connection module for POS system
 Replaces Supabase with local PostgreSQL database.
 Uses a connection pool so each request reuses connections (faster for remote DBs e.g. Supabase).
+The pool queues callers when exhausted (DB_POOL_TIMEOUT), validates idle connections lazily
+on checkout and, inside a request scope, hands nested get_connection() calls the request's
+connection. Report reads can be routed to a replica (DATABASE_REPLICA_URL, see use_replica).
+Hot statements can be registered as server-side prepared statements (register_prepared_statement /
+execute_prepared): PREPAREd once per pooled connection, EXECUTEd thereafter.
+Pooled connections are instrumented: per-request statement counts, DB time, pool wait and
+slow statements are collected (see begin_request_stats / get_perf_summary).
 """
 
 import os
+import re
+import time
 import atexit
-from typing import Optional
+import functools
+import itertools
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
 import threading
 
 # Connection pool (lazily created)
-_pg_pool: Optional[pool.ThreadedConnectionPool] = None
+_pg_pool: Optional['AdaptiveConnectionPool'] = None
+_replica_pool: Optional['AdaptiveConnectionPool'] = None
 _pool_lock = threading.Lock()
 
 # Database configuration (from environment variables)
@@ -33,13 +50,436 @@ _is_local_db = (DB_URL or '').lower().count('localhost') > 0 or (os.getenv('DB_H
 _default_pool_max = 25 if _is_local_db else 3
 POOL_MIN_CONN = int(os.getenv('DB_POOL_MIN', '1'))
 POOL_MAX_CONN = int(os.getenv('DB_POOL_MAX', str(_default_pool_max)))
+# Seconds a checkout waits for a free connection when the pool is exhausted (queued, FIFO-ish)
+POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Idle connections above DB_POOL_MIN are closed after this many seconds unused
+POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+# A connection idle longer than this is pinged before being handed out (stale / server-closed)
+POOL_VALIDATE_AFTER = float(os.getenv('DB_POOL_VALIDATE_AFTER', '30'))
+# Nested get_connection() calls inside one request share the request's connection
+REQUEST_SCOPED_CONNECTIONS = os.getenv('DB_REQUEST_SCOPED_CONNECTIONS', '1').strip().lower() not in ('0', 'false', 'no')
+
+# Optional read replica for read-only report queries (see use_replica / replica_reads)
+DB_REPLICA_URL = (os.getenv('DATABASE_REPLICA_URL') or '').strip()
+REPLICA_POOL_MAX = int(os.getenv('DB_REPLICA_POOL_MAX', str(POOL_MAX_CONN)))
+
+# Server-side prepared statements for registered hot queries. Off by default behind a
+# transaction-mode pooler (pgbouncer / Supabase port 6543), which does not keep them per client.
+_default_prepared = '0' if ':6543' in (DB_URL or '') else '1'
+PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', _default_prepared).strip().lower() not in ('0', 'false', 'no')
+
+# Instrumentation (set DB_INSTRUMENTATION=0 to create plain connections)
+DB_INSTRUMENTATION = os.getenv('DB_INSTRUMENTATION', '1').strip().lower() not in ('0', 'false', 'no')
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+# The same statement run this many times in one request is reported as a likely N+1
+DB_N_PLUS_ONE_THRESHOLD = int(os.getenv('DB_N_PLUS_ONE_THRESHOLD', '10'))
+_SLOW_QUERY_SAMPLES = 200
+
+
+# --------------------------------------------------------------------------- #
+# Instrumentation
+# --------------------------------------------------------------------------- #
+
+class RequestDBStats:
+    """DB work done on one thread between begin_request_stats() and end_request_stats()."""
+    __slots__ = ('statements', 'db_time_ms', 'pool_wait_ms', 'checkouts', 'statement_counts', 'slow', 'started')
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time_ms = 0.0
+        self.pool_wait_ms = 0.0
+        self.checkouts = 0
+        self.statement_counts: Dict[Any, int] = {}
+        self.slow: List[tuple] = []
+        self.started = time.perf_counter()
+
+
+_request_stats = threading.local()
+_perf_lock = threading.Lock()
+_perf_endpoints: Dict[str, Dict[str, Any]] = {}
+_perf_n_plus_one: Dict[tuple, Dict[str, Any]] = {}
+_perf_slow = deque(maxlen=_SLOW_QUERY_SAMPLES)
+_perf_since = time.time()
+
+_SQL_COMMENT = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SQL_IN_LIST = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)')
+_SQL_SPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql) -> str:
+    """Statement shape for grouping: no comments / literals, collapsed whitespace and IN lists."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    elif not isinstance(sql, str):
+        sql = str(sql)
+    sql = _SQL_COMMENT.sub(' ', sql)
+    sql = _SQL_STRING.sub('?', sql)
+    sql = _SQL_NUMBER.sub('?', sql)
+    sql = _SQL_SPACE.sub(' ', sql).strip()
+    sql = _SQL_IN_LIST.sub('(...)', sql)
+    return sql[:500]
+
+
+def begin_request_stats() -> RequestDBStats:
+    """Start collecting DB stats for the current thread (call at the start of a request)."""
+    stats = RequestDBStats()
+    _request_stats.current = stats
+    return stats
+
+
+def current_request_stats() -> Optional[RequestDBStats]:
+    return getattr(_request_stats, 'current', None)
+
+
+def end_request_stats(endpoint: Optional[str] = None) -> Optional[RequestDBStats]:
+    """Stop collecting for this thread and fold the request into the per-endpoint aggregates."""
+    stats = getattr(_request_stats, 'current', None)
+    _request_stats.current = None
+    if stats is None:
+        return None
+    endpoint = endpoint or '(unknown)'
+    elapsed_ms = (time.perf_counter() - stats.started) * 1000.0
+    repeated = [(sql, n) for sql, n in stats.statement_counts.items() if n >= DB_N_PLUS_ONE_THRESHOLD]
+    with _perf_lock:
+        agg = _perf_endpoints.get(endpoint)
+        if agg is None:
+            agg = _perf_endpoints[endpoint] = {
+                'requests': 0, 'statements': 0, 'max_statements': 0, 'db_time_ms': 0.0,
+                'pool_wait_ms': 0.0, 'max_pool_wait_ms': 0.0, 'elapsed_ms': 0.0, 'checkouts': 0,
+                'slow_statements': 0,
+            }
+        agg['requests'] += 1
+        agg['statements'] += stats.statements
+        agg['max_statements'] = max(agg['max_statements'], stats.statements)
+        agg['db_time_ms'] += stats.db_time_ms
+        agg['pool_wait_ms'] += stats.pool_wait_ms
+        agg['max_pool_wait_ms'] = max(agg['max_pool_wait_ms'], stats.pool_wait_ms)
+        agg['elapsed_ms'] += elapsed_ms
+        agg['checkouts'] += stats.checkouts
+        agg['slow_statements'] += len(stats.slow)
+        for sql, n in repeated:
+            key = (endpoint, normalize_sql(sql))
+            entry = _perf_n_plus_one.get(key)
+            if entry is None:
+                entry = _perf_n_plus_one[key] = {'requests': 0, 'max_per_request': 0, 'total': 0}
+            entry['requests'] += 1
+            entry['total'] += n
+            entry['max_per_request'] = max(entry['max_per_request'], n)
+        for sql, ms in stats.slow:
+            _perf_slow.append({'endpoint': endpoint, 'ms': round(ms, 2), 'sql': normalize_sql(sql),
+                               'at': time.strftime('%Y-%m-%dT%H:%M:%S')})
+    return stats
+
+
+def _record_statement(sql, elapsed_ms: float):
+    stats = getattr(_request_stats, 'current', None)
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time_ms += elapsed_ms
+        stats.statement_counts[sql] = stats.statement_counts.get(sql, 0) + 1
+        if elapsed_ms >= DB_SLOW_QUERY_MS:
+            stats.slow.append((sql, elapsed_ms))
+    elif elapsed_ms >= DB_SLOW_QUERY_MS:
+        # Background workers / scripts: no request to attribute to
+        with _perf_lock:
+            _perf_slow.append({'endpoint': f'(thread {threading.current_thread().name})', 'ms': round(elapsed_ms, 2),
+                               'sql': normalize_sql(sql), 'at': time.strftime('%Y-%m-%dT%H:%M:%S')})
+
+
+def get_perf_summary(reset: bool = False, limit: int = 25) -> Dict[str, Any]:
+    """Aggregated per-endpoint DB stats, likely N+1 statements and recent slow statements."""
+    global _perf_since
+    with _perf_lock:
+        endpoints = []
+        for name, agg in _perf_endpoints.items():
+            n = agg['requests'] or 1
+            endpoints.append({
+                'endpoint': name,
+                'requests': agg['requests'],
+                'avg_statements': round(agg['statements'] / n, 2),
+                'max_statements': agg['max_statements'],
+                'avg_db_time_ms': round(agg['db_time_ms'] / n, 3),
+                'total_db_time_ms': round(agg['db_time_ms'], 3),
+                'avg_pool_wait_ms': round(agg['pool_wait_ms'] / n, 3),
+                'max_pool_wait_ms': round(agg['max_pool_wait_ms'], 3),
+                'avg_checkouts': round(agg['checkouts'] / n, 2),
+                'avg_elapsed_ms': round(agg['elapsed_ms'] / n, 3),
+                'slow_statements': agg['slow_statements'],
+            })
+        endpoints.sort(key=lambda e: e['total_db_time_ms'], reverse=True)
+        n_plus_one = [
+            {'endpoint': ep, 'sql': sql, **entry}
+            for (ep, sql), entry in _perf_n_plus_one.items()
+        ]
+        n_plus_one.sort(key=lambda e: e['total'], reverse=True)
+        slow = list(_perf_slow)[-limit:][::-1]
+        out = {
+            'since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(_perf_since)),
+            'instrumentation': DB_INSTRUMENTATION,
+            'slow_query_ms': DB_SLOW_QUERY_MS,
+            'n_plus_one_threshold': DB_N_PLUS_ONE_THRESHOLD,
+            'endpoints': endpoints[:limit] if limit else endpoints,
+            'n_plus_one': n_plus_one[:limit],
+            'slow_statements': slow,
+            'pool': pool_stats(),
+            'prepared_statements': prepared_statement_stats(),
+        }
+        if reset:
+            _perf_endpoints.clear()
+            _perf_n_plus_one.clear()
+            _perf_slow.clear()
+            _perf_since = time.time()
+    return out
+
+
+def _statement_text(cursor, query) -> str:
+    """SQL text of an execute() argument (str, bytes or a psycopg2.sql composition) for the stats."""
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    try:
+        return query.as_string(cursor)
+    except Exception:
+        return str(query)
+
+
+_instrumented_cursor_classes: Dict[Any, Any] = {}
+_instrumented_cursor_lock = threading.Lock()
+
+
+def _instrumented_cursor_class(base):
+    """Subclass of the requested cursor factory that times execute() / executemany()."""
+    cls = _instrumented_cursor_classes.get(base)
+    if cls is None:
+        with _instrumented_cursor_lock:
+            cls = _instrumented_cursor_classes.get(base)
+            if cls is None:
+                class InstrumentedCursor(base):
+                    def execute(self, query, vars=None):
+                        started = time.perf_counter()
+                        try:
+                            return super().execute(query, vars)
+                        finally:
+                            _record_statement(_statement_text(self, query), (time.perf_counter() - started) * 1000.0)
+
+                    def executemany(self, query, vars_list):
+                        started = time.perf_counter()
+                        try:
+                            return super().executemany(query, vars_list)
+                        finally:
+                            _record_statement(_statement_text(self, query), (time.perf_counter() - started) * 1000.0)
+
+                InstrumentedCursor.__name__ = f'Instrumented{base.__name__}'
+                cls = _instrumented_cursor_classes[base] = InstrumentedCursor
+    return cls
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors (any cursor_factory) record statement timings."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = _instrumented_cursor_class(base)
+        return super().cursor(*args, **kwargs)
+
+
+class PoolTimeoutError(pool.PoolError):
+    """No pooled connection became free within the checkout timeout."""
+
+
+class AdaptiveConnectionPool:
+    """
+    Thread-safe connection pool.
+    - Exhausted: callers queue on a condition variable for up to DB_POOL_TIMEOUT seconds
+      instead of failing immediately.
+    - Returned connections stay open for reuse (most recently used first); idle ones above
+      minconn are closed after DB_POOL_IDLE_TIMEOUT.
+    - Validation is lazy: a connection idle longer than DB_POOL_VALIDATE_AFTER is pinged on
+      checkout, broken ones are discarded and replaced.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, dsn: str, connection_factory=None,
+                 readonly: bool = False, name: str = 'primary'):
+        self.minconn = max(int(minconn), 0)
+        self.maxconn = max(int(maxconn), 1)
+        self.name = name
+        self.closed = False
+        self._dsn = dsn
+        self._connection_factory = connection_factory
+        self._readonly = readonly
+        self._cond = threading.Condition()
+        self._idle: List[tuple] = []  # [(conn, idle_since)], oldest first
+        self._size = 0  # open connections, including ones being opened
+        self._in_use = 0
+        self._waiting = 0
+        self._counters = {
+            'checkouts': 0, 'waited': 0, 'timeouts': 0, 'created': 0, 'discarded': 0,
+            'trimmed': 0, 'validated': 0, 'wait_ms_total': 0.0, 'wait_ms_max': 0.0,
+        }
+        for _ in range(min(self.minconn, self.maxconn)):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        kwargs = {'connection_factory': self._connection_factory} if self._connection_factory else {}
+        conn = psycopg2.connect(self._dsn, **kwargs)
+        if self._readonly:
+            conn.set_session(readonly=True, autocommit=False)
+        with self._cond:
+            self._counters['created'] += 1
+        return conn
+
+    def _usable(self, conn, idle_since: float) -> bool:
+        if conn.closed:
+            return False
+        status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                return False
+        if time.monotonic() - idle_since < POOL_VALIDATE_AFTER:
+            return True
+        with self._cond:
+            self._counters['validated'] += 1
+        try:
+            # Plain cursor: the ping is not a request statement
+            cur = psycopg2.extensions.connection.cursor(conn)
+            cur.execute('SELECT 1')
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._counters['discarded'] += 1
+            self._cond.notify()
+
+    def getconn(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to `timeout` seconds (default DB_POOL_TIMEOUT)."""
+        if timeout is None:
+            timeout = POOL_CHECKOUT_TIMEOUT
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+        while True:
+            conn = None
+            idle_since = 0.0
+            with self._cond:
+                while True:
+                    if self.closed:
+                        raise pool.PoolError("connection pool is closed")
+                    if self._idle:
+                        conn, idle_since = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"{self.name} connection pool exhausted: no connection free within {timeout:g}s "
+                            f"({self.maxconn} in use, {self._waiting} waiting). Raise DB_POOL_MAX or DB_POOL_TIMEOUT."
+                        )
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._usable(conn, idle_since):
+                self._discard(conn)
+                continue
+            wait_ms = (time.monotonic() - started) * 1000.0
+            with self._cond:
+                self._in_use += 1
+                self._counters['checkouts'] += 1
+                if waited:
+                    self._counters['waited'] += 1
+                    self._counters['wait_ms_total'] += wait_ms
+                    self._counters['wait_ms_max'] = max(self._counters['wait_ms_max'], wait_ms)
+            return conn
+
+    def putconn(self, conn, close: bool = False):
+        """Return a connection; broken, mid-transaction or surplus idle connections are closed."""
+        now = time.monotonic()
+        to_close = []
+        with self._cond:
+            self._in_use = max(self._in_use - 1, 0)
+            broken = (
+                close or self.closed or conn.closed
+                or conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            )
+            if broken:
+                to_close.append(conn)
+                self._size -= 1
+                self._counters['discarded'] += 1
+            else:
+                self._idle.append((conn, now))
+            while (self._idle and self._size > self.minconn
+                   and now - self._idle[0][1] > POOL_IDLE_TIMEOUT):
+                to_close.append(self._idle.pop(0)[0])
+                self._size -= 1
+                self._counters['trimmed'] += 1
+            self._cond.notify()
+        for c in to_close:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+    def closeall(self):
+        with self._cond:
+            self.closed = True
+            idle = [c for c, _ in self._idle]
+            self._size -= len(idle)
+            self._idle = []
+            self._cond.notify_all()
+        for c in idle:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            out = {
+                'name': self.name, 'min': self.minconn, 'max': self.maxconn, 'size': self._size,
+                'idle': len(self._idle), 'in_use': self._in_use, 'waiting': self._waiting,
+                'checkout_timeout_s': POOL_CHECKOUT_TIMEOUT,
+            }
+            out.update(self._counters)
+        out['wait_ms_total'] = round(out['wait_ms_total'], 3)
+        out['wait_ms_max'] = round(out['wait_ms_max'], 3)
+        return out
 
 
 class _PooledConnectionWrapper:
     """Wraps a pooled connection so .close() returns it to the pool instead of closing."""
     __slots__ = ('_pool', '_conn', '_returned')
 
-    def __init__(self, pg_pool: pool.ThreadedConnectionPool, conn):
+    def __init__(self, pg_pool: AdaptiveConnectionPool, conn):
         self._pool = pg_pool
         self._conn = conn
         self._returned = False
@@ -57,6 +497,13 @@ class _PooledConnectionWrapper:
         except Exception:
             pass
 
+    def __del__(self):
+        # Dropped without close(): the pool holds no reference to checked-out connections, so
+        # its slot would be lost for good (and the pool exhausted after DB_POOL_MAX such leaks)
+        if not self._returned:
+            print("Warning: pooled connection dropped without close(); returning it to the pool")
+            self.close()
+
     @property
     def closed(self):
         return self._returned or self._conn.closed
@@ -67,6 +514,273 @@ class _PooledConnectionWrapper:
         return getattr(self._conn, name)
 
 
+# --------------------------------------------------------------------------- #
+# Request-scoped connection sharing
+# --------------------------------------------------------------------------- #
+
+_request_scope = threading.local()
+
+
+class _RequestConnectionScope:
+    """The connection shared by every get_connection() handle open on one request thread.
+    Checked out on the first handle and returned to the pool when the last handle closes."""
+    __slots__ = ('conn', 'pool', 'handles', 'generation', 'savepoints', 'released_work')
+
+    def __init__(self):
+        self.conn = None
+        self.pool = None
+        # Weak: a handle its caller dropped without close() stops counting once it is collected
+        self.handles = weakref.WeakSet()
+        # Bumped on every real commit / rollback: savepoints taken before it no longer exist
+        self.generation = 0
+        self.savepoints = 0
+        # A nested handle committed (released its savepoint) into the open transaction
+        self.released_work = False
+
+    @property
+    def open_handles(self):
+        return len(self.handles)
+
+    def handle(self):
+        if self.conn is None:
+            self.pool = _get_pool()
+            self.conn = _checkout(self.pool)
+        handle = _ScopedConnectionHandle(self)
+        self.handles.add(handle)
+        return handle
+
+    def handle_closed(self, handle):
+        self.handles.discard(handle)
+        if not self.handles:
+            self.release()
+
+    def transaction_owned(self, handle) -> bool:
+        """True if another open handle has started work, i.e. the open transaction is still someone's."""
+        return any(other is not handle and other._mode is not None for other in list(self.handles))
+
+    def release(self):
+        conn, self.conn = self.conn, None
+        leaked = len(self.handles)
+        self.handles = weakref.WeakSet()
+        if conn is None:
+            return
+        if (self.released_work and conn.info.transaction_status
+                == psycopg2.extensions.TRANSACTION_STATUS_INTRANS):
+            print(f"Warning: request ended with {leaked} unclosed DB handle(s); "
+                  f"rolling back their transaction, including work committed by nested handles")
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        try:
+            self.pool.putconn(conn)
+        except Exception:
+            pass
+
+
+class _ScopedConnectionHandle:
+    """
+    get_connection() result inside a request scope. Shares the request's connection; a handle that
+    starts work while another handle has a transaction open runs inside a SAVEPOINT, so its
+    rollback / close-without-commit only undo its own statements, and its commit() only releases
+    the savepoint: the work becomes durable when the outer transaction commits (and is undone if
+    it rolls back). Helpers whose writes must be durable on their own use get_independent_connection().
+    """
+    __slots__ = ('_scope', '_mode', '_savepoint', '_generation', '_returned', '__weakref__')
+
+    def __init__(self, scope: _RequestConnectionScope):
+        self._scope = scope
+        self._mode = None  # None until first cursor(), then 'top' or 'nested'
+        self._savepoint = None
+        self._generation = 0
+        self._returned = False
+
+    def _conn(self):
+        if self._returned:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return self._scope.conn
+
+    def _run(self, sql: str):
+        cur = self._scope.conn.cursor()
+        try:
+            cur.execute(sql)
+        finally:
+            cur.close()
+
+    def _real_end(self, commit: bool):
+        conn = self._scope.conn
+        if commit:
+            conn.commit()
+        else:
+            conn.rollback()
+        self._scope.generation += 1
+        self._scope.released_work = False
+
+    def _nested(self) -> bool:
+        return self._mode == 'nested' and self._generation == self._scope.generation
+
+    def _resolve(self):
+        if self._mode is not None:
+            return
+        conn = self._scope.conn
+        status = conn.info.transaction_status
+        if (status != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+                and not self._scope.transaction_owned(self)):
+            # Left open by a handle that was dropped without close() (e.g. a read helper that
+            # never closed its connection): nobody will commit it, so don't nest under it
+            self._real_end(False)
+            status = conn.info.transaction_status
+        if status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS:
+            self._scope.savepoints += 1
+            self._savepoint = f'scoped_{self._scope.savepoints}'
+            self._run(f'SAVEPOINT {self._savepoint}')
+            self._generation = self._scope.generation
+            self._mode = 'nested'
+        else:
+            if status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                self._real_end(False)
+            self._mode = 'top'
+
+    def cursor(self, *args, **kwargs):
+        conn = self._conn()
+        self._resolve()
+        return conn.cursor(*args, **kwargs)
+
+    def commit(self):
+        self._conn()
+        if self._nested():
+            # Part of the outer handle's transaction: keep the work, leave the commit to the outer handle
+            self._run(f'RELEASE SAVEPOINT {self._savepoint}')
+            self._scope.released_work = True
+            self._mode = None
+            self._savepoint = None
+        elif self._mode == 'nested':
+            # The outer transaction already ended (real commit / rollback) and took our savepoint with it
+            self._mode = None
+            self._savepoint = None
+            if self._scope.conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self._real_end(True)
+        else:
+            self._real_end(True)
+
+    def rollback(self):
+        self._conn()
+        if self._nested():
+            self._run(f'ROLLBACK TO SAVEPOINT {self._savepoint}')
+        elif self._mode is None and self._scope.open_handles > 1:
+            # Nothing of ours to undo (e.g. a defensive rollback() before first use); leave the
+            # other handles' transaction alone
+            return
+        else:
+            self._real_end(False)
+
+    def close(self):
+        if self._returned:
+            return
+        try:
+            if self._nested():
+                self._run(f'ROLLBACK TO SAVEPOINT {self._savepoint}; RELEASE SAVEPOINT {self._savepoint}')
+            elif (self._mode == 'top' and self._scope.conn.info.transaction_status
+                  != psycopg2.extensions.TRANSACTION_STATUS_IDLE):
+                self._real_end(False)
+        except Exception:
+            try:
+                self._real_end(False)
+            except Exception:
+                pass
+        self._returned = True
+        self._scope.handle_closed(self)
+
+    @property
+    def closed(self):
+        return self._returned or self._scope.conn is None or self._scope.conn.closed
+
+    def __getattr__(self, name):
+        return getattr(self._conn(), name)
+
+
+def begin_request_scope():
+    """Share one pooled connection between all get_connection() calls on this thread until end_request_scope()."""
+    if REQUEST_SCOPED_CONNECTIONS:
+        _request_scope.current = _RequestConnectionScope()
+
+
+def end_request_scope():
+    """Return the request's connection to the pool (also covers handles that were never closed)."""
+    scope = getattr(_request_scope, 'current', None)
+    _request_scope.current = None
+    if scope is not None:
+        scope.release()
+
+
+# --------------------------------------------------------------------------- #
+# Read replica routing
+# --------------------------------------------------------------------------- #
+
+_replica_routing = threading.local()
+_replica_failed_at = 0.0
+_REPLICA_RETRY_SECONDS = 30
+
+
+@contextmanager
+def use_replica():
+    """Route get_connection() / get_cursor() on this thread to the read replica, when DATABASE_REPLICA_URL
+    is set. Replica sessions are read-only; falls back to the primary if the replica is unreachable."""
+    previous = getattr(_replica_routing, 'active', False)
+    _replica_routing.active = True
+    try:
+        yield
+    finally:
+        _replica_routing.active = previous
+
+
+def replica_reads(func):
+    """Decorator: run a read-only (report) function under use_replica()."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _get_replica_pool() -> Optional[AdaptiveConnectionPool]:
+    global _replica_pool, _replica_failed_at
+    if not DB_REPLICA_URL:
+        return None
+    with _pool_lock:
+        if _replica_pool is not None:
+            return _replica_pool
+        if time.monotonic() - _replica_failed_at < _REPLICA_RETRY_SECONDS:
+            return None
+        try:
+            _replica_pool = AdaptiveConnectionPool(
+                0, REPLICA_POOL_MAX, DB_REPLICA_URL,
+                connection_factory=InstrumentedConnection if DB_INSTRUMENTATION else None,
+                readonly=True, name='replica',
+            )
+        except Exception as e:
+            _replica_failed_at = time.monotonic()
+            print(f"Warning: read replica unavailable, using primary: {e}")
+            return None
+        return _replica_pool
+
+
+def _get_replica_connection():
+    """Replica connection wrapper, or None to use the primary."""
+    global _replica_failed_at
+    rp = _get_replica_pool()
+    if rp is None:
+        return None
+    try:
+        return _PooledConnectionWrapper(rp, _checkout(rp))
+    except PoolTimeoutError:
+        return None
+    except Exception as e:
+        _replica_failed_at = time.monotonic()
+        print(f"Warning: read replica checkout failed, using primary: {e}")
+        return None
+
+
 def _build_connection_string():
     """Build PostgreSQL connection string from environment variables"""
     if DB_URL:
@@ -74,7 +788,7 @@ def _build_connection_string():
     return f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 
-def _get_pool() -> pool.ThreadedConnectionPool:
+def _get_pool() -> AdaptiveConnectionPool:
     """Create or return the global connection pool (thread-safe)."""
     global _pg_pool
     with _pool_lock:
@@ -87,10 +801,11 @@ def _get_pool() -> pool.ThreadedConnectionPool:
                 "Set DATABASE_URL or DB_HOST, DB_NAME, DB_USER, DB_PASSWORD environment variables."
             )
         try:
-            _pg_pool = pool.ThreadedConnectionPool(
+            _pg_pool = AdaptiveConnectionPool(
                 POOL_MIN_CONN,
                 POOL_MAX_CONN,
                 connection_string,
+                connection_factory=InstrumentedConnection if DB_INSTRUMENTATION else None,
             )
         except Exception as e:
             raise ConnectionError(
@@ -100,16 +815,35 @@ def _get_pool() -> pool.ThreadedConnectionPool:
         return _pg_pool
 
 
+def _checkout(p: AdaptiveConnectionPool):
+    """Raw connection from `p`, with the wait recorded on the current request's stats."""
+    started = time.perf_counter()
+    conn = p.getconn()
+    stats = getattr(_request_stats, 'current', None)
+    if stats is not None:
+        stats.pool_wait_ms += (time.perf_counter() - started) * 1000.0
+        stats.checkouts += 1
+    conn.set_session(autocommit=False)
+    return conn
+
+
 def get_connection():
     """
     Get a connection from the pool. Call conn.close() when done; the connection
     is returned to the pool for reuse (faster for remote DBs like Supabase).
+    Inside a request scope, nested calls share the request's connection; under
+    use_replica() the connection comes from the read replica when one is configured.
     """
-    p = _get_pool()
     try:
-        conn = p.getconn()
-        conn.set_session(autocommit=False)
-        return _PooledConnectionWrapper(p, conn)
+        if getattr(_replica_routing, 'active', False):
+            replica = _get_replica_connection()
+            if replica is not None:
+                return replica
+        scope = getattr(_request_scope, 'current', None)
+        if scope is not None:
+            return scope.handle()
+        p = _get_pool()
+        return _PooledConnectionWrapper(p, _checkout(p))
     except Exception as e:
         raise ConnectionError(
             f"Failed to connect to PostgreSQL: {str(e)}. "
@@ -117,6 +851,140 @@ def get_connection():
         ) from e
 
 
+def get_independent_connection():
+    """
+    A pooled primary connection of its own, outside any request scope: its commit() is durable
+    regardless of the request's transaction (audit trails, queue markers, schema setup).
+    Call conn.close() when done.
+    """
+    try:
+        p = _get_pool()
+        return _PooledConnectionWrapper(p, _checkout(p))
+    except Exception as e:
+        raise ConnectionError(
+            f"Failed to connect to PostgreSQL: {str(e)}. "
+            "Check your database connection settings (DATABASE_URL or DB_* variables)."
+        ) from e
+
+
+# --------------------------------------------------------------------------- #
+# Prepared statements
+# --------------------------------------------------------------------------- #
+
+class _PreparedStatement:
+    __slots__ = ('name', 'sql', 'prepare_sql', 'execute_sql')
+
+    def __init__(self, name: str, sql: str, param_types):
+        counter = itertools.count(1)
+        positional = re.sub(r'%%|%s', lambda m: '%' if m.group(0) == '%%' else f'${next(counter)}', sql)
+        nparams = next(counter) - 1
+        if param_types and len(param_types) != nparams:
+            raise ValueError(f"prepared statement {name}: {nparams} placeholders but {len(param_types)} types")
+        types = f" ({', '.join(param_types)})" if param_types else ''
+        self.name = name
+        self.sql = sql
+        self.prepare_sql = f'PREPARE {name}{types} AS {positional}'
+        self.execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * nparams)})" if nparams else f'EXECUTE {name}'
+
+
+_prepared_statements: Dict[str, _PreparedStatement] = {}
+# Raw connection -> {name: True when prepared, False when the server copy is stale (DEALLOCATE
+# before re-preparing)}. A replaced (reconnected) connection starts empty, so statements are
+# re-prepared on it transparently.
+_prepared_on = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+_prepared_counters = {'prepares': 0, 'executes': 0, 'reprepares': 0}
+_PREPARED_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def register_prepared_statement(name: str, sql: str, param_types=None):
+    """
+    Register a hot statement for execute_prepared(). `sql` uses the usual %s placeholders;
+    `param_types` (Postgres type names, one per placeholder) pins parameter types, e.g. for arrays.
+    Avoid SELECT * where a migration may add columns (re-prepared automatically, but it costs a retry).
+    """
+    if not _PREPARED_NAME.match(name):
+        raise ValueError(f"invalid prepared statement name: {name!r}")
+    with _prepared_lock:
+        _prepared_statements[name] = _PreparedStatement(name, sql, param_types)
+
+
+def get_prepared_statement_sql(name: str) -> str:
+    """Plain (%s) SQL of a registered statement."""
+    return _prepared_statements[name].sql
+
+
+def execute_prepared(cursor, name: str, params=()):
+    """
+    Run registered statement `name` on `cursor`: PREPARE on first use per connection, then EXECUTE.
+    If the server lost the statement (DISCARD ALL, pooler) or its result type changed after a
+    migration, only that statement is re-prepared (DEALLOCATE first when the server still holds it)
+    and retried when no transaction was open; otherwise the error propagates and the next call re-prepares.
+    With DB_PREPARED_STATEMENTS=0 the plain SQL is executed instead.
+    """
+    stmt = _prepared_statements[name]
+    if not PREPARED_STATEMENTS:
+        cursor.execute(stmt.sql, params)
+        return cursor
+    conn = cursor.connection
+    with _prepared_lock:
+        names = _prepared_on.get(conn)
+        if names is None:
+            names = _prepared_on[conn] = {}
+    idle_before = conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    if not names.get(name):
+        _prepare(cursor, stmt, names, idle_before)
+    try:
+        cursor.execute(stmt.execute_sql, params)
+    except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported) as e:
+        if isinstance(e, psycopg2.errors.InvalidSqlStatementName):
+            names.pop(name, None)       # gone from the server: plain PREPARE
+        else:
+            names[name] = False         # result type changed: DEALLOCATE, then PREPARE
+        if not idle_before:
+            raise
+        conn.rollback()
+        _prepare(cursor, stmt, names, idle_before)
+        with _prepared_lock:
+            _prepared_counters['reprepares'] += 1
+        cursor.execute(stmt.execute_sql, params)
+    with _prepared_lock:
+        _prepared_counters['executes'] += 1
+    return cursor
+
+
+def _prepare(cursor, stmt: _PreparedStatement, names: Dict[str, bool], idle_before: bool):
+    """PREPARE `stmt` on the cursor's connection and record it in `names`."""
+    if names.get(stmt.name) is False:
+        cursor.execute(f'DEALLOCATE {stmt.name}')
+    try:
+        cursor.execute(stmt.prepare_sql)
+    except psycopg2.errors.DuplicatePreparedStatement:
+        # Already on the server though not tracked here: same registered SQL, use it
+        names[stmt.name] = True
+        if not idle_before:
+            raise
+        cursor.connection.rollback()
+        return
+    names[stmt.name] = True
+    with _prepared_lock:
+        _prepared_counters['prepares'] += 1
+
+
+def prepared_statement_stats() -> Dict[str, Any]:
+    with _prepared_lock:
+        return {'enabled': PREPARED_STATEMENTS, 'registered': sorted(_prepared_statements),
+                'connections': len(_prepared_on), **_prepared_counters}
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Size / idle / in-use / waiting counts and checkout counters for the primary (and replica) pool."""
+    out = {'primary': _pg_pool.stats() if _pg_pool is not None else None}
+    if DB_REPLICA_URL:
+        out['replica'] = _replica_pool.stats() if _replica_pool is not None else None
+    return out
+
+
 class _PooledCursorWrapper:
     """Wraps a cursor so closing it also returns the connection to the pool."""
     __slots__ = ('_conn', '_cursor', '_closed')
@@ -152,15 +1020,17 @@ def get_cursor():
     return _PooledCursorWrapper(conn, cursor)
 
 def close_connection():
-    """Close the connection pool (all connections)."""
-    global _pg_pool
+    """Close the connection pools (all connections)."""
+    global _pg_pool, _replica_pool
     with _pool_lock:
-        if _pg_pool is not None:
-            try:
-                _pg_pool.closeall()
-            except Exception:
-                pass
-            _pg_pool = None
+        for p in (_pg_pool, _replica_pool):
+            if p is not None:
+                try:
+                    p.closeall()
+                except Exception:
+                    pass
+        _pg_pool = None
+        _replica_pool = None
 
 
 def reset_connection():
@@ -175,53 +1045,134 @@ def _close_pool_on_exit():
 
 atexit.register(_close_pool_on_exit)
 
-# Compatibility functions for code that might reference establishment context
-# These are no-ops since we're not using multi-tenant establishment isolation
+# --------------------------------------------------------------------------- #
+# Establishment context
+# --------------------------------------------------------------------------- #
+# get_current_establishment() is called from most data helpers (often several times per request).
+# It resolves, without a query: the thread's explicit context (set_current_establishment, set per
+# request from the signed-in employee when the database holds several establishments), else the
+# process-wide default (first establishment), cached for ESTABLISHMENT_CACHE_TTL seconds.
+
+ESTABLISHMENT_CACHE_TTL = float(os.getenv('ESTABLISHMENT_CACHE_TTL', '300'))
+_SESSION_ESTABLISHMENT_CACHE_SIZE = 1024
+
+_establishment_context = threading.local()
+_establishment_lock = threading.Lock()
+_default_establishment: Optional[int] = None
+_multiple_establishments = False
+_establishment_loaded_at = 0.0
+_session_establishments: Dict[str, tuple] = {}  # session_token -> (establishment_id, cached_at)
+
+
 def set_current_establishment(establishment_id: Optional[int]):
-    """No-op: establishment context not used in local PostgreSQL"""
-    pass
+    """Set (or clear with None) the establishment used by get_current_establishment() on this thread."""
+    _establishment_context.establishment_id = establishment_id
 
-def get_current_establishment() -> Optional[int]:
-    """Get or create default establishment for local PostgreSQL"""
+
+def invalidate_establishment_cache():
+    """Forget the cached default establishment and session lookups (call after creating / deleting establishments)."""
+    global _default_establishment, _establishment_loaded_at
+    with _establishment_lock:
+        _default_establishment = None
+        _establishment_loaded_at = 0.0
+        _session_establishments.clear()
+
+
+def _load_default_establishment() -> Optional[int]:
+    """First establishment (created as 'Default Store' when there is none); also notes whether there are several."""
+    global _default_establishment, _multiple_establishments, _establishment_loaded_at
     conn = get_connection()
     cursor = conn.cursor()
-    
+    establishment_id = None
+    multiple = False
     try:
-        # Try to get the first establishment
-        cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-        row = cursor.fetchone()
-        
-        if row:
-            establishment_id = row[0] if isinstance(row, tuple) else row.get('establishment_id')
-            conn.close()
-            return establishment_id
-        
-        # If no establishment exists, create a default one
-        cursor.execute("""
-            INSERT INTO establishments (establishment_name, establishment_type, address, phone, email)
-            VALUES ('Default Store', 'retail', NULL, NULL, NULL)
-            RETURNING establishment_id
-        """)
-        result = cursor.fetchone()
-        establishment_id = result[0] if isinstance(result, tuple) else result.get('establishment_id')
-        conn.commit()
-        conn.close()
-        return establishment_id
-    except Exception as e:
+        cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 2")
+        rows = cursor.fetchall()
+        if rows:
+            establishment_id = rows[0][0] if isinstance(rows[0], tuple) else rows[0].get('establishment_id')
+            multiple = len(rows) > 1
+        else:
+            # If no establishment exists, create a default one
+            cursor.execute("""
+                INSERT INTO establishments (establishment_name, establishment_type, address, phone, email)
+                VALUES ('Default Store', 'retail', NULL, NULL, NULL)
+                RETURNING establishment_id
+            """)
+            result = cursor.fetchone()
+            establishment_id = result[0] if isinstance(result, tuple) else result.get('establishment_id')
+            conn.commit()
+    except Exception:
         try:
             conn.rollback()
-        except:
+        except Exception:
             pass
-        conn.close()
-        # If there's an error, try to get any establishment or return None
+        # If there's an error (e.g. schema without establishment_type), try to get any establishment
         try:
-            conn2 = get_connection()
-            cursor2 = conn2.cursor()
-            cursor2.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-            row2 = cursor2.fetchone()
-            conn2.close()
-            if row2:
-                return row2[0] if isinstance(row2, tuple) else row2.get('establishment_id')
-        except:
+            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
+            row = cursor.fetchone()
+            if row:
+                establishment_id = row[0] if isinstance(row, tuple) else row.get('establishment_id')
+        except Exception:
             pass
+    finally:
+        conn.close()
+    if establishment_id is not None:
+        with _establishment_lock:
+            _default_establishment = establishment_id
+            _multiple_establishments = multiple
+            _establishment_loaded_at = time.monotonic()
+    return establishment_id
+
+
+def _default_establishment_id() -> Optional[int]:
+    with _establishment_lock:
+        if (_default_establishment is not None
+                and time.monotonic() - _establishment_loaded_at < ESTABLISHMENT_CACHE_TTL):
+            return _default_establishment
+    return _load_default_establishment()
+
+
+def has_multiple_establishments() -> bool:
+    """True when the database holds more than one establishment (cached with the default)."""
+    _default_establishment_id()
+    return _multiple_establishments
+
+
+def establishment_for_session(session_token: str) -> Optional[int]:
+    """Establishment of the employee signed in with `session_token` (cached per token), or None."""
+    if not session_token:
         return None
+    now = time.monotonic()
+    with _establishment_lock:
+        cached = _session_establishments.get(session_token)
+        if cached is not None and now - cached[1] < ESTABLISHMENT_CACHE_TTL:
+            return cached[0]
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT e.establishment_id
+            FROM employee_sessions es
+            JOIN employees e ON e.employee_id = es.employee_id
+            WHERE es.session_token = %s AND es.is_active = 1
+        """, (session_token,))
+        row = cursor.fetchone()
+    except Exception:
+        row = None
+    finally:
+        conn.close()
+    establishment_id = (row[0] if isinstance(row, tuple) else row.get('establishment_id')) if row else None
+    if establishment_id is not None:
+        with _establishment_lock:
+            if len(_session_establishments) >= _SESSION_ESTABLISHMENT_CACHE_SIZE:
+                _session_establishments.clear()
+            _session_establishments[session_token] = (establishment_id, now)
+    return establishment_id
+
+
+def get_current_establishment() -> Optional[int]:
+    """Current establishment: this thread's context if set, else the cached default (created if none exists)."""
+    establishment_id = getattr(_establishment_context, 'establishment_id', None)
+    if establishment_id is not None:
+        return establishment_id
+    return _default_establishment_id()
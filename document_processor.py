@@ -4,10 +4,34 @@ shipment documents (PDF, Excel, Word, images) and routing to AI extraction.
 """
 
 import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 from config import EXTRACTION_CONFIG
 
+# Shared process pool for page-level PDF extraction (created on first large PDF)
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool():
+    global _page_pool
+    workers = int(EXTRACTION_CONFIG.get("pdf_workers", 0) or 0)
+    if workers <= 0:
+        return None
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(max_workers=workers)
+        return _page_pool
+
+
+def _extract_pdf_page_range(file_path, start, end):
+    """Extract text for pages [start, end). Runs in a pool worker process."""
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages[start:end]]
+
 
 class ShipmentDocumentProcessor:
     def __init__(self, ai_extractor=None):
@@ -39,10 +63,11 @@ class ShipmentDocumentProcessor:
         """Public helper: return supported extension or None."""
         return self._detect_file_type(file_path)
 
-    def extract_text_fast(self, file_path):
+    def extract_text_fast(self, file_path, progress_callback=None):
         """
         Fast text extraction based on file type.
         Returns (text, quality) where quality is 'good', 'medium', or 'poor'.
+        progress_callback(done_pages, total_pages) is called during PDF extraction.
         """
         file_type = self._detect_file_type(file_path)
         if not file_type or file_type not in self.supported:
@@ -53,7 +78,7 @@ class ShipmentDocumentProcessor:
 
         text = None
         if file_type == "pdf":
-            text = self._extract_pdf(file_path)
+            text = self._extract_pdf(file_path, progress_callback)
         elif file_type in ("xlsx", "xls"):
             text = self._extract_excel(file_path)
         elif file_type == "docx":
@@ -65,22 +90,88 @@ class ShipmentDocumentProcessor:
         quality = self.assess_quality(text)
         return text, quality
 
-    def _extract_pdf(self, file_path):
-        """Extract text from PDF using pdfplumber."""
+    def _extract_pdf(self, file_path, progress_callback=None):
+        """
+        Extract text from PDF using pdfplumber.
+        The first few pages are read first; if they have no usable text layer (scanned PDF)
+        we stop there, since the document will go to the vision path anyway. Remaining pages
+        of large PDFs are extracted in parallel in the page process pool.
+        """
         try:
             import pdfplumber
+            probe = max(int(EXTRACTION_CONFIG.get("quality_probe_pages", 2)), 1)
             with pdfplumber.open(file_path) as pdf:
-                parts = []
-                for page in pdf.pages:
-                    t = page.extract_text()
-                    if t:
-                        parts.append(t)
-                return "\n\n".join(parts) if parts else None
+                total = len(pdf.pages)
+                pages = [page.extract_text() or "" for page in pdf.pages[:probe]]
+            if progress_callback:
+                progress_callback(len(pages), total)
+
+            probe_text = "\n\n".join(t for t in pages if t)
+            if total > probe and (not probe_text.strip() or (len(probe_text) >= 20 and self.is_gibberish(probe_text))):
+                return probe_text or None
+
+            if total > probe:
+                pages.extend(self._extract_pdf_remaining(file_path, probe, total, progress_callback))
+            parts = [t for t in pages if t]
+            return "\n\n".join(parts) if parts else None
         except Exception:
             return None
 
+    def _extract_pdf_remaining(self, file_path, start, total, progress_callback=None):
+        """Pages [start, total) in order; parallel for large PDFs, serial otherwise or on pool failure."""
+        remaining = total - start
+        pool = None
+        if remaining >= int(EXTRACTION_CONFIG.get("parallel_page_threshold", 8)):
+            pool = _get_page_pool()
+        if pool is not None:
+            try:
+                workers = max(int(EXTRACTION_CONFIG.get("pdf_workers", 1)), 1)
+                chunk = max((remaining + workers - 1) // workers, 1)
+                ranges = [(s, min(s + chunk, total)) for s in range(start, total, chunk)]
+                futures = [pool.submit(_extract_pdf_page_range, file_path, s, e) for s, e in ranges]
+                out = []
+                for (s, e), fut in zip(ranges, futures):
+                    out.extend(fut.result())
+                    if progress_callback:
+                        progress_callback(e, total)
+                return out
+            except Exception:
+                pass
+        import pdfplumber
+        out = []
+        with pdfplumber.open(file_path) as pdf:
+            for i, page in enumerate(pdf.pages[start:total], start=start + 1):
+                out.append(page.extract_text() or "")
+                if progress_callback:
+                    progress_callback(i, total)
+        return out
+
     def _extract_excel(self, file_path):
-        """Extract text from Excel preserving table structure."""
+        """
+        Extract text from Excel preserving table structure (tab-delimited rows).
+        .xlsx is streamed row by row with openpyxl in read-only mode; .xls falls back to pandas.
+        """
+        if str(file_path).lower().endswith(".xlsx"):
+            try:
+                from openpyxl import load_workbook
+                wb = load_workbook(file_path, read_only=True, data_only=True)
+                try:
+                    parts = []
+                    for ws in wb.worksheets:
+                        lines = []
+                        for row in ws.iter_rows(values_only=True):
+                            cells = ["" if v is None else str(v) for v in row]
+                            while cells and cells[-1] == "":
+                                cells.pop()
+                            if cells:
+                                lines.append("\t".join(cells))
+                        if lines:
+                            parts.append("\n".join(lines))
+                    return "\n\n".join(parts) if parts else None
+                finally:
+                    wb.close()
+            except Exception:
+                pass
         try:
             import pandas as pd
             xl = pd.ExcelFile(file_path)
@@ -1,10 +1,26 @@
-import { useState, useEffect, useCallback } from 'react'
+import { useState, useEffect, useCallback, useRef } from 'react'
 import { io } from 'socket.io-client'
 import { useTheme } from '../contexts/ThemeContext'
 import { getBackendOrigin } from '../utils/backendUrl'
 import { cachedFetch } from '../services/offlineSync'
 import './CustomerDisplay.css'
 
+// Apply add / update / remove ops from a cart_diff event to the displayed lines
+const applyCartOps = (lines, ops) => {
+  let next = lines.slice()
+  for (const op of ops) {
+    if (op.op === 'remove') {
+      next = next.filter(line => line.key !== op.key)
+    } else if (op.op === 'update') {
+      next = next.map(line => (line.key === op.key ? { ...line, ...op.fields } : line))
+    } else if (op.op === 'add') {
+      const line = { ...op.line, key: op.key }
+      next.splice(Math.min(op.index ?? next.length, next.length), 0, line)
+    }
+  }
+  return next
+}
+
 function CustomerDisplay() {
   const { themeColor, themeMode } = useTheme()
   
@@ -43,6 +59,7 @@ function CustomerDisplay() {
   const [receiptType, setReceiptType] = useState(null)
   const [receiptContact, setReceiptContact] = useState('')
   const [socket, setSocket] = useState(null)
+  const cartSeqRef = useRef(null)
   
   // Update CSS variables when theme changes
   useEffect(() => {
@@ -68,13 +85,47 @@ function CustomerDisplay() {
     
     newSocket.on('connect', () => {
       console.log('Connected to Socket.IO server')
-      newSocket.emit('join', { room: 'customer_display' })
+      // The session token picks this store's cart feed
+      const sessionToken = localStorage.getItem('sessionToken') || sessionStorage.getItem('sessionToken')
+      newSocket.emit('join', { room: 'customer_display', session_token: sessionToken })
     })
     
     newSocket.on('disconnect', () => {
       console.log('Disconnected from Socket.IO server')
     })
     
+    const applyCartTotals = (totals) => {
+      if (!totals) return
+      setSubtotal(totals.subtotal || 0)
+      setTax(totals.tax || 0)
+      setTotal(totals.total || 0)
+    }
+
+    newSocket.on('cart_snapshot', (data) => {
+      cartSeqRef.current = data.seq
+      setItems(data.lines || [])
+      applyCartTotals(data.totals)
+      if (data.lines && data.lines.length > 0) {
+        setCurrentScreen(screen => (screen === 'idle' ? 'transaction' : screen))
+      }
+    })
+
+    newSocket.on('cart_diff', (data) => {
+      // Missed a diff (reconnect, dropped packet): ask for the whole cart instead
+      if (cartSeqRef.current != null && data.seq !== cartSeqRef.current + 1) {
+        newSocket.emit('cart_resync')
+        return
+      }
+      cartSeqRef.current = data.seq
+      setItems(prev => applyCartOps(prev, data.ops || []))
+      applyCartTotals(data.totals)
+      setCurrentScreen(screen => (screen === 'idle' ? 'transaction' : screen))
+      // Ack after the frame is painted so the server can measure scan-to-display latency
+      requestAnimationFrame(() => {
+        newSocket.emit('cart_diff_ack', { seq: data.seq, displayed_at: Date.now() })
+      })
+    })
+
     newSocket.on('transaction_started', (data) => {
       console.log('Transaction started:', data)
       setTransaction(data)
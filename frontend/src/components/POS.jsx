@@ -197,6 +197,28 @@ function POS({ employeeId, employeeName }) {
     }
   }
 
+  // Mirror the cart to the customer display; the server emits only the changed lines
+  useEffect(() => {
+    const token = localStorage.getItem('sessionToken')
+    if (!token) return
+    fetch('/api/customer-display/cart', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+      body: JSON.stringify({
+        scanned_at: Date.now(),
+        items: cart.map(item => ({
+          product_id: item.product_id,
+          variant_id: item.variant_id ?? null,
+          product_name: item.product_name,
+          notes: item.notes || null,
+          quantity: item.quantity,
+          unit_price: item.unit_price,
+          tax_rate: item.tax_rate ?? taxRate
+        }))
+      })
+    }).catch(() => {})
+  }, [cart, taxRate])
+
   // Check for exchange credit on mount
   useEffect(() => {
     const exchangeCredit = localStorage.getItem('exchangeCredit')
@@ -1788,7 +1810,7 @@ function POS({ employeeId, employeeName }) {
             let foundOrderNumber = currentOrderNumber
             if (transactionId && !currentOrderId) {
               try {
-                const orderLookupResponse = await fetch(`/api/payment_transactions`)
+                const orderLookupResponse = await fetch(`/api/payment_transactions?transaction_id=${encodeURIComponent(transactionId)}`)
                 const orderLookupResult = await orderLookupResponse.json()
                 if (orderLookupResult.data && orderLookupResult.data.length > 0) {
                   // Find payment_transaction with matching transaction_id
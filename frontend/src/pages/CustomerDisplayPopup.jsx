@@ -101,7 +101,9 @@ function CustomerDisplayPopup() {
     
     newSocket.on('connect', () => {
       console.log('Customer display connected to Socket.IO')
-      newSocket.emit('join', { room: 'customer_display' })
+      // The session token picks this store's cart feed
+      const sessionToken = localStorage.getItem('sessionToken') || sessionStorage.getItem('sessionToken')
+      newSocket.emit('join', { room: 'customer_display', session_token: sessionToken })
     })
     
     newSocket.on('disconnect', () => {
@@ -12,6 +12,8 @@ import CustomerDisplayPopup from '../components/CustomerDisplayPopup'
 import { playNewOrderSound } from '../utils/notificationSound'
 import { useToast } from '../contexts/ToastContext'
 
+// Newest order items cached for item search; also the page size when paging /api/order_items (server maximum)
+const ORDER_ITEMS_CACHE_LIMIT = 5000
 const NEW_ORDER_TOAST_OPTIONS_KEY = 'pos_new_order_toast_options'
 const DEFAULT_NEW_ORDER_TOAST_OPTIONS = { play_sound: true, sound_type: 'default', volume: 0.5, sound_until_dismiss: false, auto_dismiss_sec: 0, click_action: 'go_to_order' }
 
@@ -31,6 +33,7 @@ function RecentOrders() {
   const location = useLocation()
   const { themeColor, themeMode } = useTheme()
   const [ordersPage, setOrdersPage] = useState(0)
+  const ordersPageCursors = useRef({}) // 'filters|page' -> next_cursor of the previous page (keyset paging)
 
   useEffect(() => {
     if (location.state?.searchQuery) {
@@ -62,6 +65,7 @@ function RecentOrders() {
   const [allOrderItems, setAllOrderItems] = useState([]) // Cache all order items for searching
   const [scannedProducts, setScannedProducts] = useState([]) // Array of {product_id, product_name, sku, barcode}
   const [orderItemsMap, setOrderItemsMap] = useState({}) // Map of order_id -> order items
+  const [scannedProductOrderIds, setScannedProductOrderIds] = useState(null) // Set of order_ids containing a scanned product (null while loading)
   const [highlightedOrderId, setHighlightedOrderId] = useState(null) // Order ID to highlight in table
   const [scannedOrderId, setScannedOrderId] = useState(null) // Order ID from scanned receipt barcode (filters table to show only this order)
   const [toast, setToast] = useState(null) // { message, type: 'success' | 'error' }
@@ -144,7 +148,10 @@ function RecentOrders() {
     queryFn: async () => {
       const params = new URLSearchParams()
       params.set('limit', String(ORDERS_PAGE_SIZE))
-      params.set('offset', String(ordersPage * ORDERS_PAGE_SIZE))
+      const cursorKey = ordersQueryKey.slice(1, -1).join('|')
+      const pageCursor = ordersPage > 0 ? ordersPageCursors.current[`${cursorKey}|${ordersPage}`] : null
+      if (pageCursor) params.set('cursor', pageCursor)
+      else params.set('offset', String(ordersPage * ORDERS_PAGE_SIZE))
       const statusIn = []
       if (filterReturns) statusIn.push('returned')
       if (filterCanceled) statusIn.push('voided')
@@ -157,6 +164,7 @@ function RecentOrders() {
       const res = await cachedFetch(`/api/orders?${params.toString()}`)
       const result = await res.json()
       if (!res.ok) throw new Error(result.message || 'Failed to load orders')
+      if (result.next_cursor) ordersPageCursors.current[`${cursorKey}|${ordersPage + 1}`] = result.next_cursor
       return result
     },
     staleTime: 60 * 1000
@@ -340,7 +348,7 @@ function RecentOrders() {
   // Load all order items when products are scanned (for filtering)
   const loadAllOrderItems = async () => {
     try {
-      const itemsResponse = await fetch('/api/order_items')
+      const itemsResponse = await fetch(`/api/order_items?limit=${ORDER_ITEMS_CACHE_LIMIT}`)
       const itemsResult = await itemsResponse.json()
       const items = itemsResult.data || []
       setAllOrderItems(items)
@@ -369,7 +377,7 @@ function RecentOrders() {
 
   const loadOrderItems = async () => {
     try {
-      const itemsResponse = await fetch('/api/order_items')
+      const itemsResponse = await fetch(`/api/order_items?limit=${ORDER_ITEMS_CACHE_LIMIT}`)
       const itemsResult = await itemsResponse.json()
       setAllOrderItems(itemsResult.data || [])
     } catch (err) {
@@ -377,13 +385,39 @@ function RecentOrders() {
     }
   }
 
-  // Load order items when products are scanned
-  useEffect(() => {
-    if (scannedProducts.length > 0) {
-      console.log('Loading order items for scanned products:', scannedProducts)
-      loadAllOrderItems()
+  // Orders containing any scanned product, from the server-side product filter (all pages, not only the cached newest items)
+  const loadScannedProductOrders = async (productIds, isCurrent) => {
+    const orderIds = new Set()
+    let after = null
+    try {
+      do {
+        const params = new URLSearchParams({ product_id: productIds.join(','), limit: String(ORDER_ITEMS_CACHE_LIMIT) })
+        if (after) params.set('after', after)
+        const res = await fetch(`/api/order_items?${params.toString()}`)
+        const result = await res.json()
+        if (!res.ok) throw new Error(result.error || 'Failed to load order items')
+        const items = result.data || []
+        items.forEach(item => {
+          const orderId = parseInt(item.order_id)
+          if (!isNaN(orderId)) orderIds.add(orderId)
+        })
+        after = result.has_more ? result.next_cursor : null
+      } while (after && isCurrent())
+      if (isCurrent()) setScannedProductOrderIds(orderIds)
+    } catch (err) {
+      console.error('Error loading orders for scanned products:', err)
     }
-  }, [scannedProducts.length])
+  }
+
+  // Load the matching orders when products are scanned
+  const scannedProductIdsKey = scannedProducts.map(p => p.product_id).filter(id => id != null).join(',')
+  useEffect(() => {
+    setScannedProductOrderIds(null)
+    if (!scannedProductIdsKey) return
+    let current = true
+    loadScannedProductOrders(scannedProductIdsKey.split(','), () => current)
+    return () => { current = false }
+  }, [scannedProductIdsKey])
 
   // Load all order items when in cards view so each card can show purchased items
   useEffect(() => {
@@ -568,7 +602,7 @@ function RecentOrders() {
       setOrder(foundOrder)
 
       // Get order items
-      const itemsResponse = await fetch('/api/order_items')
+      const itemsResponse = await fetch(`/api/order_items?order_id=${parseInt(orderId)}`)
       const itemsResult = await itemsResponse.json()
       const items = itemsResult.data?.filter(item => item.order_id === parseInt(orderId)) || []
       setOrderItems(items)
@@ -799,7 +833,7 @@ function RecentOrders() {
 
     setLoadingDetails(prev => ({ ...prev, [normalizedOrderId]: true }))
     try {
-      const itemsResponse = await fetch('/api/order_items')
+      const itemsResponse = await fetch(`/api/order_items?order_id=${normalizedOrderId}`)
       const itemsResult = await itemsResponse.json()
       const items = itemsResult.data || []
       const orderItems = items.filter(item => parseInt(item.order_id || item.orderId) === normalizedOrderId)
@@ -1198,86 +1232,9 @@ function RecentOrders() {
         return true
       }
 
-      // Check order items map first
-      const items = orderItemsMap[normalizedOrderId]
-      if (items && items.length > 0) {
-        const matches = scannedProducts.some(scanned => {
-          const found = items.some(item => {
-            const itemProductId = item.product_id || item.productId
-            const itemSku = (item.sku || '').toString().trim()
-            const itemBarcode = (item.barcode || '').toString().trim()
-            const scannedSku = (scanned.sku || '').toString().trim()
-            const scannedBarcode = (scanned.barcode || '').toString().trim()
-
-            const productIdMatch = itemProductId === scanned.product_id
-            const skuMatch = itemSku && scannedSku && itemSku === scannedSku
-            const barcodeMatch = itemBarcode && scannedBarcode && itemBarcode === scannedBarcode
-
-            return productIdMatch || skuMatch || barcodeMatch
-          })
-          if (found) {
-            console.log('Match found for scanned product:', scanned.product_name, 'in order:', normalizedOrderId)
-          }
-          return found
-        })
-        return matches
-      }
-
-      // Check order details if available
-      if (orderDetails[normalizedOrderId] && orderDetails[normalizedOrderId].items) {
-        const items = orderDetails[normalizedOrderId].items
-        const matches = scannedProducts.some(scanned => {
-          const found = items.some(item => {
-            const itemProductId = item.product_id || item.productId
-            const itemSku = (item.sku || '').toString().trim()
-            const itemBarcode = (item.barcode || '').toString().trim()
-            const scannedSku = (scanned.sku || '').toString().trim()
-            const scannedBarcode = (scanned.barcode || '').toString().trim()
-
-            const productIdMatch = itemProductId === scanned.product_id
-            const skuMatch = itemSku && scannedSku && itemSku === scannedSku
-            const barcodeMatch = itemBarcode && scannedBarcode && itemBarcode === scannedBarcode
-
-            return productIdMatch || skuMatch || barcodeMatch
-          })
-          if (found) {
-            console.log('Match found in orderDetails for scanned product:', scanned.product_name, 'in order:', normalizedOrderId)
-          }
-          return found
-        })
-        return matches
-      }
-
-      // Check allOrderItems as fallback
-      const orderItems = allOrderItems.filter(item => {
-        const itemOrderId = item.order_id || item.orderId
-        return parseInt(itemOrderId) === normalizedOrderId
-      })
-      if (orderItems.length > 0) {
-        const matches = scannedProducts.some(scanned => {
-          const found = orderItems.some(item => {
-            const itemProductId = item.product_id || item.productId
-            const itemSku = (item.sku || '').toString().trim()
-            const itemBarcode = (item.barcode || '').toString().trim()
-            const scannedSku = (scanned.sku || '').toString().trim()
-            const scannedBarcode = (scanned.barcode || '').toString().trim()
-
-            const productIdMatch = itemProductId === scanned.product_id
-            const skuMatch = itemSku && scannedSku && itemSku === scannedSku
-            const barcodeMatch = itemBarcode && scannedBarcode && itemBarcode === scannedBarcode
-
-            return productIdMatch || skuMatch || barcodeMatch
-          })
-          if (found) {
-            console.log('Match found in allOrderItems for scanned product:', scanned.product_name, 'in order:', normalizedOrderId)
-          }
-          return found
-        })
-        return matches
-      }
-
-      // If we don't have items loaded yet, include it (will be filtered when items load)
-      return true
+      // Until the matching orders have loaded, keep the row (filtered when they arrive)
+      if (!scannedProductOrderIds) return true
+      return scannedProductOrderIds.has(normalizedOrderId)
     })
   }
 
@@ -1412,7 +1369,7 @@ function RecentOrders() {
   const loadOrderDetailsForModal = async (orderId) => {
     setStatusPhaseModalLoadingItems(true)
     try {
-      const itemsResponse = await fetch('/api/order_items')
+      const itemsResponse = await fetch(`/api/order_items?order_id=${orderId}`)
       const itemsResult = await itemsResponse.json()
       const items = itemsResult.data || []
       const orderItems = items.filter(item => parseInt(item.order_id || item.orderId) === orderId)
@@ -1,5 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react'
 import { useNavigate, useParams, useSearchParams, useLocation } from 'react-router-dom'
+import { io } from 'socket.io-client'
+import { getBackendOrigin } from '../utils/backendUrl'
 import { useTheme } from '../contexts/ThemeContext'
 import { usePageScroll } from '../contexts/PageScrollContext'
 import { useNotifications } from '../contexts/NotificationContext'
@@ -871,9 +873,33 @@ function ShipmentVerificationDetail({ shipmentId }) {
         }
       }
       fetchIssues()
-      // Auto-refresh progress every 5 seconds
-      const interval = setInterval(loadProgress, 5000)
-      return () => clearInterval(interval)
+      // Counters are pushed over Socket.IO as scans are written; the slow poll refreshes item details
+      const backendOrigin = getBackendOrigin()
+      const socketOpts = { transports: ['polling'], upgrade: false, path: '/socket.io/' }
+      if (backendOrigin) {
+        socketOpts.url = backendOrigin
+      }
+      const socket = io(socketOpts)
+      socket.on('connect', () => {
+        socket.emit('join', { room: `shipment_${actualId}` })
+      })
+      socket.on('shipment_progress', (summary) => {
+        if (String(summary.pending_shipment_id) !== String(actualId)) return
+        setProgress(prev => (prev ? {
+          ...prev,
+          total_items: summary.total_items,
+          total_expected_quantity: summary.total_expected_quantity,
+          total_verified_quantity: summary.total_verified_quantity,
+          items_fully_verified: summary.items_fully_verified,
+          items_with_issues: summary.items_with_issues,
+          completion_percentage: summary.completion_percentage
+        } : prev))
+      })
+      const interval = setInterval(loadProgress, 30000)
+      return () => {
+        clearInterval(interval)
+        socket.close()
+      }
     }
   }, [actualId])
 
@@ -207,6 +207,7 @@ function Tables() {
   const [activeTab, setActiveTab] = useState(() => getInitialCategoryAndTab().tableId)
   const [data, setData] = useState(null)
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [error, setError] = useState(null)
   const [selectedRowIds, setSelectedRowIds] = useState(() => new Set())
   const [editorOpen, setEditorOpen] = useState(false)
@@ -308,6 +309,26 @@ function Tables() {
     }
   }
 
+  // Pages are bounded server-side; append the next one (keyset cursor) on demand
+  const loadMore = async () => {
+    if (!activeTab || !data?.next_cursor) return
+    setLoadingMore(true)
+    try {
+      const response = await fetch(`/api/tables/${activeTab}?after=${encodeURIComponent(data.next_cursor)}`)
+      const result = await response.json()
+      if (result.error) {
+        setError(result.error)
+      } else {
+        setData(prev => prev ? { ...result, data: [...(prev.data || []), ...(result.data || [])] } : result)
+      }
+    } catch (err) {
+      console.error(err)
+      setError('Error loading data')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const getRowId = (row, idx) => {
     const pk = data?.primary_key || []
     if (pk.length === 1) {
@@ -808,6 +829,22 @@ function Tables() {
                   <Pencil size={14} />
                   {editorOpen ? 'Close Editor' : 'Open Editor'}
                 </button>
+                <a
+                  href={`/api/tables/${activeTab}/export?format=csv`}
+                  download
+                  style={{
+                    padding: '8px 12px',
+                    backgroundColor: isDarkMode ? 'rgba(255,255,255,0.12)' : 'rgba(0,0,0,0.06)',
+                    color: isDarkMode ? 'var(--text-primary, #fff)' : '#333',
+                    border: isDarkMode ? '1px solid var(--border-light, #333)' : '1px solid #ddd',
+                    borderRadius: '6px',
+                    fontSize: '13px',
+                    fontWeight: 600,
+                    textDecoration: 'none'
+                  }}
+                >
+                  Export CSV
+                </a>
                 <button
                   onClick={handleDeleteSelected}
                   disabled={selectedRowIds.size === 0}
@@ -926,6 +963,27 @@ function Tables() {
                 themeColorRgb={themeColorRgb}
                 stickyHeader
               />
+              {data.has_more && (
+                <div style={{ padding: '12px', textAlign: 'center' }}>
+                  <button
+                    type="button"
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    style={{
+                      padding: '8px 16px',
+                      backgroundColor: isDarkMode ? 'rgba(255,255,255,0.12)' : 'rgba(0,0,0,0.06)',
+                      color: isDarkMode ? 'var(--text-primary, #fff)' : '#333',
+                      border: isDarkMode ? '1px solid var(--border-light, #333)' : '1px solid #ddd',
+                      borderRadius: '6px',
+                      cursor: loadingMore ? 'wait' : 'pointer',
+                      fontSize: '13px',
+                      fontWeight: 600
+                    }}
+                  >
+                    {loadingMore ? 'Loading…' : `Load more (${data.data.length} shown)`}
+                  </button>
+                </div>
+              )}
 
               {/* Floating draggable Row Editor modal */}
               {editorOpen && (
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Background job scheduler: one thread per process runs registered periodic jobs in next-fire-time
+order, plus a bounded pool for fire-and-forget tasks (notification emails) instead of ad-hoc threads.
+
+Job state lives in PostgreSQL (see migrations/add_job_scheduler.sql; created on first use):
+- scheduler_jobs: next_run_at per job (survives restarts) and per-job metrics (runs, failures,
+  last duration, lag = how late the run started versus next_run_at);
+- scheduler_leader: a single-row lease. Only the process holding it runs periodic jobs, so several
+  web workers / coordinators can start the scheduler safely. The lease is renewed every
+  JOB_SCHEDULER_LEASE_SECONDS / 3 and taken over by another process once it expires;
+- scheduler_job_dedup: keys claimed with claim_once() (e.g. one late alert per shift per day),
+  pruned after JOB_DEDUP_RETENTION_DAYS.
+
+Each run is claimed by advancing next_run_at in one UPDATE, so a job never runs twice for the
+same fire time even if two processes briefly both believe they are leader.
+"""
+
+import os
+import atexit
+import socket
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, List, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from database_postgres import get_connection, get_independent_connection
+
+logger = logging.getLogger(__name__)
+
+JOB_SCHEDULER_ENABLED = os.getenv('JOB_SCHEDULER_ENABLED', '1').lower() not in ('0', 'false', 'no')
+JOB_SCHEDULER_LEASE_SECONDS = max(int(os.getenv('JOB_SCHEDULER_LEASE_SECONDS', '30')), 3)
+JOB_SCHEDULER_WORKERS = max(int(os.getenv('JOB_SCHEDULER_WORKERS', '4')), 1)
+JOB_DEDUP_RETENTION_DAYS = int(os.getenv('JOB_DEDUP_RETENTION_DAYS', '14'))
+
+
+class _Job:
+    __slots__ = ('name', 'func', 'interval', 'initial_delay', 'running',
+                 'runs', 'failures', 'last_duration_ms', 'total_duration_ms', 'last_lag_ms', 'last_error')
+
+    def __init__(self, name: str, func: Callable[[], Any], interval: float, initial_delay: float):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.initial_delay = initial_delay
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_duration_ms: Optional[float] = None
+        self.total_duration_ms = 0.0
+        self.last_lag_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+class JobScheduler:
+    """Leader-elected periodic jobs with persistent state, and a shared pool for one-off tasks."""
+
+    def __init__(self, lease_seconds: int = JOB_SCHEDULER_LEASE_SECONDS, workers: int = JOB_SCHEDULER_WORKERS):
+        self.lease_seconds = lease_seconds
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+        self._tables_ready = False
+        self._is_leader = False
+        self._leader_since: Optional[float] = None
+        self._registered_in_db = False
+        self._tasks_submitted = 0
+        self._tasks_failed = 0
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+
+    def register(self, name: str, func: Callable[[], Any], interval_seconds: float, initial_delay: float = 0):
+        """Run func every interval_seconds (first run initial_delay after the job is first seen)."""
+        with self._lock:
+            self._jobs[name] = _Job(name, func, float(interval_seconds), float(initial_delay))
+            self._registered_in_db = False
+        self._wakeup.set()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """Run a one-off task on the scheduler's pool (any process, not only the leader)."""
+        future = self._executor.submit(func, *args, **kwargs)
+        self._tasks_submitted += 1
+        future.add_done_callback(self._task_done)
+        return future
+
+    def claim_once(self, job_name: str, dedup_key: str) -> bool:
+        """Persistently claim dedup_key for job_name; False if it was already claimed (even before a restart)."""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._ensure_tables()
+            cursor.execute("""
+                INSERT INTO scheduler_job_dedup (job_name, dedup_key) VALUES (%s, %s)
+                ON CONFLICT (job_name, dedup_key) DO NOTHING
+                RETURNING 1
+            """, (job_name, dedup_key))
+            claimed = cursor.fetchone() is not None
+            conn.commit()
+            return claimed
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def release_claim(self, job_name: str, dedup_key: str):
+        """Undo claim_once (the guarded action failed and should be retried next run)."""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM scheduler_job_dedup WHERE job_name = %s AND dedup_key = %s",
+                           (job_name, dedup_key))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def run_now(self, name: str):
+        """Make a registered job due immediately (e.g. from an admin endpoint)."""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._ensure_tables()
+            cursor.execute("UPDATE scheduler_jobs SET next_run_at = CURRENT_TIMESTAMP WHERE job_name = %s", (name,))
+            conn.commit()
+        finally:
+            conn.close()
+        self._wakeup.set()
+
+    def start(self):
+        """Start the scheduler thread (no-op if already running or disabled)."""
+        if not JOB_SCHEDULER_ENABLED or self._stopped:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        """Stop the scheduler thread, give up the leader lease and let running tasks finish (atexit)."""
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        if self._is_leader:
+            try:
+                conn = get_connection()
+                try:
+                    conn.cursor().execute("DELETE FROM scheduler_leader WHERE holder = %s", (self.instance_id,))
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception as e:
+                logger.warning("Scheduler lease release failed: %s", e)
+            self._is_leader = False
+        self._executor.shutdown(wait=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Leader status plus per-job persisted state (next run, runs, failures, duration, lag)."""
+        rows: Dict[str, Dict[str, Any]] = {}
+        leader = None
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            self._ensure_tables()
+            cursor.execute("""
+                SELECT job_name, interval_seconds, next_run_at, last_started_at, last_finished_at,
+                       last_duration_ms, last_lag_ms, run_count, failure_count, last_error,
+                       EXTRACT(EPOCH FROM (next_run_at - CURRENT_TIMESTAMP)) AS due_in_seconds
+                FROM scheduler_jobs ORDER BY next_run_at
+            """)
+            rows = {r['job_name']: dict(r) for r in cursor.fetchall()}
+            cursor.execute("SELECT holder, lease_until, acquired_at FROM scheduler_leader WHERE id = 1")
+            leader = cursor.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+
+        jobs = []
+        with self._lock:
+            local = dict(self._jobs)
+        for name in list(rows) + [n for n in local if n not in rows]:
+            row = rows.get(name, {'job_name': name})
+            job = local.get(name)
+            for key in ('next_run_at', 'last_started_at', 'last_finished_at'):
+                if row.get(key) is not None:
+                    row[key] = row[key].isoformat()
+            if row.get('due_in_seconds') is not None:
+                row['due_in_seconds'] = round(float(row['due_in_seconds']), 3)
+            if job is not None:
+                row['process'] = {
+                    'runs': job.runs,
+                    'failures': job.failures,
+                    'running': job.running,
+                    'last_duration_ms': job.last_duration_ms,
+                    'avg_duration_ms': round(job.total_duration_ms / job.runs, 3) if job.runs else None,
+                    'last_lag_ms': job.last_lag_ms,
+                }
+            jobs.append(row)
+        return {
+            'enabled': JOB_SCHEDULER_ENABLED,
+            'instance_id': self.instance_id,
+            'is_leader': self._is_leader,
+            'leader': {
+                'holder': leader['holder'],
+                'lease_until': leader['lease_until'].isoformat() if leader['lease_until'] else None,
+                'acquired_at': leader['acquired_at'].isoformat() if leader['acquired_at'] else None,
+            } if leader else None,
+            'running': bool(self._thread is not None and self._thread.is_alive()),
+            'tasks_submitted': self._tasks_submitted,
+            'tasks_failed': self._tasks_failed,
+            'jobs': jobs,
+        }
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+
+    def _task_done(self, future: Future):
+        error = future.exception()
+        if error is not None:
+            self._tasks_failed += 1
+            logger.warning("Background task failed: %s", error)
+
+    def _run(self):
+        renew_at = 0.0
+        while not self._stopped:
+            now = time.monotonic()
+            sleep_for = self.lease_seconds / 3.0
+            try:
+                if now >= renew_at:
+                    self._renew_lease()
+                    renew_at = now + self.lease_seconds / 3.0
+                if self._is_leader:
+                    next_due = self._run_due_jobs()
+                    if next_due is not None:
+                        sleep_for = min(sleep_for, max(next_due, 0.05))
+                sleep_for = min(sleep_for, max(renew_at - time.monotonic(), 0.05))
+            except Exception as e:
+                logger.warning("Job scheduler iteration failed: %s", e)
+            self._wakeup.wait(sleep_for)
+            self._wakeup.clear()
+
+    def _renew_lease(self):
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._ensure_tables()
+            cursor.execute("""
+                INSERT INTO scheduler_leader (id, holder, lease_until)
+                VALUES (1, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 second')
+                ON CONFLICT (id) DO UPDATE
+                SET holder = EXCLUDED.holder,
+                    lease_until = EXCLUDED.lease_until,
+                    acquired_at = CASE WHEN scheduler_leader.holder = EXCLUDED.holder
+                                       THEN scheduler_leader.acquired_at ELSE CURRENT_TIMESTAMP END
+                WHERE scheduler_leader.holder = EXCLUDED.holder
+                   OR scheduler_leader.lease_until < CURRENT_TIMESTAMP
+                RETURNING holder
+            """, (self.instance_id, self.lease_seconds))
+            leader = cursor.fetchone() is not None
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            leader = False
+            raise
+        finally:
+            conn.close()
+            if not leader and self._is_leader:
+                logger.warning("Job scheduler %s lost the leader lease", self.instance_id)
+            if leader and not self._is_leader:
+                logger.info("Job scheduler %s is now leader", self.instance_id)
+                self._leader_since = time.monotonic()
+                self._registered_in_db = False
+            self._is_leader = leader
+
+    def _register_jobs_in_db(self, cursor, jobs: List[_Job]):
+        """Insert new jobs (first run after initial_delay); keep next_run_at of jobs seen before,
+        pulled in when the interval was shortened since."""
+        for job in jobs:
+            cursor.execute("""
+                INSERT INTO scheduler_jobs (job_name, interval_seconds, next_run_at)
+                VALUES (%s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 second')
+                ON CONFLICT (job_name) DO UPDATE
+                SET interval_seconds = EXCLUDED.interval_seconds,
+                    next_run_at = LEAST(scheduler_jobs.next_run_at,
+                                        CURRENT_TIMESTAMP + EXCLUDED.interval_seconds * INTERVAL '1 second')
+            """, (job.name, job.interval, job.initial_delay))
+        self._registered_in_db = True
+
+    def _run_due_jobs(self) -> Optional[float]:
+        """Start every due job that isn't already running; return seconds until the next one is due."""
+        with self._lock:
+            jobs = dict(self._jobs)
+        if not jobs:
+            return None
+        due: List[tuple] = []
+        next_due = None
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._ensure_tables()
+            if not self._registered_in_db:
+                self._register_jobs_in_db(cursor, list(jobs.values()))
+            cursor.execute("""
+                SELECT job_name, EXTRACT(EPOCH FROM (next_run_at - CURRENT_TIMESTAMP)) AS wait_seconds
+                FROM scheduler_jobs
+                WHERE job_name = ANY(%s)
+                ORDER BY next_run_at
+            """, (list(jobs),))
+            for name, wait_seconds in cursor.fetchall():
+                wait_seconds = float(wait_seconds)
+                job = jobs[name]
+                if wait_seconds > 0:
+                    next_due = wait_seconds if next_due is None else min(next_due, wait_seconds)
+                    continue
+                if job.running:
+                    continue
+                # Claim this fire time: advance next_run_at only if nobody else did
+                cursor.execute("""
+                    UPDATE scheduler_jobs
+                    SET next_run_at = CURRENT_TIMESTAMP + interval_seconds * INTERVAL '1 second',
+                        last_started_at = CURRENT_TIMESTAMP
+                    WHERE job_name = %s AND next_run_at <= CURRENT_TIMESTAMP
+                    RETURNING 1
+                """, (name,))
+                if cursor.fetchone() is not None:
+                    due.append((job, -wait_seconds * 1000.0))
+                    next_due = job.interval if next_due is None else min(next_due, job.interval)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        for job, lag_ms in due:
+            job.running = True
+            self._executor.submit(self._execute, job, lag_ms)
+        return next_due
+
+    def _execute(self, job: _Job, lag_ms: float):
+        start = time.perf_counter()
+        error = None
+        try:
+            job.func()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"[:1000]
+            logger.warning("Scheduled job %s failed: %s", job.name, error)
+        duration_ms = round((time.perf_counter() - start) * 1000.0, 3)
+        job.running = False
+        job.runs += 1
+        job.total_duration_ms += duration_ms
+        job.last_duration_ms = duration_ms
+        job.last_lag_ms = round(lag_ms, 3)
+        job.last_error = error
+        if error:
+            job.failures += 1
+        try:
+            conn = get_connection()
+            try:
+                conn.cursor().execute("""
+                    UPDATE scheduler_jobs
+                    SET last_finished_at = CURRENT_TIMESTAMP,
+                        last_duration_ms = %s,
+                        last_lag_ms = %s,
+                        run_count = run_count + 1,
+                        failure_count = failure_count + %s,
+                        last_error = %s
+                    WHERE job_name = %s
+                """, (duration_ms, job.last_lag_ms, 1 if error else 0, error, job.name))
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning("Recording run of job %s failed: %s", job.name, e)
+        self._wakeup.set()
+
+    def _ensure_tables(self):
+        """Create the scheduler tables if missing (once per process; see migrations/add_job_scheduler.sql)."""
+        if self._tables_ready:
+            return
+        # Own connection: DDL must not ride on (and be rolled back with) a caller's transaction
+        conn = get_independent_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS scheduler_jobs (
+                    job_name TEXT PRIMARY KEY,
+                    interval_seconds DOUBLE PRECISION NOT NULL,
+                    next_run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    last_started_at TIMESTAMP,
+                    last_finished_at TIMESTAMP,
+                    last_duration_ms DOUBLE PRECISION,
+                    last_lag_ms DOUBLE PRECISION,
+                    run_count BIGINT NOT NULL DEFAULT 0,
+                    failure_count BIGINT NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS scheduler_leader (
+                    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                    holder TEXT NOT NULL,
+                    lease_until TIMESTAMP NOT NULL,
+                    acquired_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS scheduler_job_dedup (
+                    job_name TEXT NOT NULL,
+                    dedup_key TEXT NOT NULL,
+                    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (job_name, dedup_key)
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_scheduler_job_dedup_created
+                ON scheduler_job_dedup (created_at)
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+        self._tables_ready = True
+
+
+def prune_job_dedup(retention_days: int = JOB_DEDUP_RETENTION_DAYS) -> int:
+    """Delete dedup keys older than retention_days (registered as a daily job). Returns rows deleted."""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM scheduler_job_dedup WHERE created_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 day'",
+                       (retention_days,))
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    finally:
+        conn.close()
+
+
+# Global scheduler instance
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> JobScheduler:
+    """Get or create the job scheduler singleton"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = JobScheduler()
+                atexit.register(_scheduler.shutdown)
+    return _scheduler
+
+
+def run_in_background(func: Callable, *args, **kwargs) -> Future:
+    """Fire-and-forget func(*args, **kwargs) on the scheduler's bounded pool (replaces ad-hoc threads)."""
+    return get_scheduler().submit(func, *args, **kwargs)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Deferred, batched POS -> accounting journalization.
+Checkout only records a "to journalize" marker (one INSERT into accounting_journal_queue);
+a background worker drains the queue every JOURNAL_DRAIN_INTERVAL_MS in batches of up to
+JOURNAL_BATCH_SIZE orders via pos_accounting_bridge.journalize_sales_batch_to_accounting.
+The worker runs only where start_journal_worker() was called (background_workers: the dev
+server, single-process serve.py, or the serve.py coordinator), not in every web worker.
+The queue lives in the database, so markers survive restarts and several app processes can
+drain it concurrently (rows are claimed with FOR UPDATE SKIP LOCKED).
+Failed orders are retried with backoff; after JOURNAL_MAX_ATTEMPTS they stay in the queue
+with last_error set and are reported by metrics().
+Accounting reports are wrapped in journalized_reads, which drains what is due (for at most
+JOURNAL_REPORT_FLUSH_SECONDS) first, so a report does not miss sales still waiting in the queue.
+"""
+
+import os
+import atexit
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional, List, Dict, Any
+
+from psycopg2.extras import execute_values, RealDictCursor
+
+from database_postgres import get_connection, get_independent_connection
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_QUEUE_ENABLED = os.getenv('JOURNAL_QUEUE_ENABLED', '1').lower() not in ('0', 'false', 'no')
+JOURNAL_DRAIN_INTERVAL_MS = int(os.getenv('JOURNAL_DRAIN_INTERVAL_MS', '1000'))
+JOURNAL_BATCH_SIZE = int(os.getenv('JOURNAL_BATCH_SIZE', '200'))
+JOURNAL_MAX_ATTEMPTS = int(os.getenv('JOURNAL_MAX_ATTEMPTS', '10'))
+# Longest an accounting report waits for queued sales to be journalized (0 = don't wait)
+JOURNAL_REPORT_FLUSH_SECONDS = float(os.getenv('JOURNAL_REPORT_FLUSH_SECONDS', '5'))
+# Window (seconds) for the journalized-per-second throughput figure
+_THROUGHPUT_WINDOW = 60
+
+
+class JournalQueue:
+    """Persistent queue of orders waiting to be journalized, drained by a background thread."""
+
+    def __init__(self, drain_interval_ms: int = JOURNAL_DRAIN_INTERVAL_MS,
+                 batch_size: int = JOURNAL_BATCH_SIZE,
+                 max_attempts: int = JOURNAL_MAX_ATTEMPTS):
+        self.drain_interval = max(drain_interval_ms, 10) / 1000.0
+        self.batch_size = max(batch_size, 1)
+        self.max_attempts = max(max_attempts, 1)
+        self._table_ready = False
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self._enqueued = 0
+        self._journalized = 0
+        self._skipped = 0
+        self._failed = 0
+        self._batches = 0
+        self._last_batch_ms: Optional[float] = None
+        self._last_lag_seconds: Optional[float] = None
+        self._recent: deque = deque()  # (monotonic time, orders journalized)
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+
+    def enqueue(self, order_id: int, employee_id: Optional[int]) -> bool:
+        """Record that order_id needs journalizing. Returns False if the marker could not be written."""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self._ensure_table()
+            cursor.execute("""
+                INSERT INTO accounting_journal_queue (order_id, employee_id)
+                VALUES (%s, %s)
+                ON CONFLICT (order_id) DO NOTHING
+            """, (order_id, employee_id))
+            conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            logger.warning("Journal queue enqueue failed for order %s: %s", order_id, e)
+            return False
+        finally:
+            conn.close()
+        with self._metrics_lock:
+            self._enqueued += 1
+        # Wakes the drain thread if this process runs one (start_journal_worker); web workers
+        # under serve.py --workers leave the draining to the coordinator
+        self._wakeup.set()
+        return True
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        """Journalize up to limit (default batch_size) due orders. Returns the number journalized."""
+        limit = limit or self.batch_size
+        with self._drain_lock:
+            # Own connection: the batch commits on its own even when called inside a request scope
+            conn = get_independent_connection()
+            try:
+                cursor = conn.cursor(cursor_factory=RealDictCursor)
+                self._ensure_table()
+                cursor.execute("""
+                    SELECT order_id, employee_id, enqueued_at::date AS transaction_date,
+                           EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - enqueued_at)) AS age_seconds
+                    FROM accounting_journal_queue
+                    WHERE attempts < %s AND next_attempt_at <= CURRENT_TIMESTAMP
+                    ORDER BY enqueued_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                """, (self.max_attempts, limit))
+                entries = [dict(r) for r in cursor.fetchall()]
+                if not entries:
+                    conn.commit()
+                    return 0
+
+                start = time.perf_counter()
+                # Ledger inserts and queue bookkeeping commit together
+                results = self._journalize(conn, entries)
+                elapsed_ms = (time.perf_counter() - start) * 1000.0
+
+                done = [oid for oid, r in results.items() if r.get('success')]
+                failed = [(oid, (r.get('message') or 'unknown')[:1000]) for oid, r in results.items() if not r.get('success')]
+                if done:
+                    cursor.execute("DELETE FROM accounting_journal_queue WHERE order_id = ANY(%s)", (done,))
+                if failed:
+                    # Exponential backoff: 2, 4, 8 ... seconds, capped at one hour
+                    execute_values(cursor, """
+                        UPDATE accounting_journal_queue q
+                        SET attempts = q.attempts + 1,
+                            last_error = v.last_error,
+                            next_attempt_at = CURRENT_TIMESTAMP + LEAST(POWER(2, q.attempts + 1), 3600) * INTERVAL '1 second'
+                        FROM (VALUES %s) AS v(order_id, last_error)
+                        WHERE q.order_id = v.order_id
+                    """, failed)
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                conn.close()
+
+        skipped = sum(1 for r in results.values() if r.get('success') and r.get('skipped'))
+        for oid, message in failed:
+            logger.warning("Journalize sale failed (order %s): %s", oid, message)
+        with self._metrics_lock:
+            self._journalized += len(done) - skipped
+            self._skipped += skipped
+            self._failed += len(failed)
+            self._batches += 1
+            self._last_batch_ms = round(elapsed_ms, 3)
+            self._last_lag_seconds = round(max(float(e['age_seconds'] or 0) for e in entries), 3)
+            now = time.monotonic()
+            self._recent.append((now, len(done)))
+            while self._recent and now - self._recent[0][0] > _THROUGHPUT_WINDOW:
+                self._recent.popleft()
+        return len(done)
+
+    def drain_all(self, max_seconds: Optional[float] = None) -> int:
+        """Drain until nothing is due or max_seconds have passed (before an accounting report)."""
+        deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+        total = 0
+        while True:
+            n = self.drain()
+            total += n
+            if n < self.batch_size or (deadline is not None and time.monotonic() >= deadline):
+                return total
+
+    def start(self):
+        """Start the background drain thread (no-op if already running)."""
+        if self._stopped or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='journal-queue-worker', daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        """Stop the background thread and make a last drain attempt (registered with atexit)."""
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        try:
+            self.drain()
+        except Exception as e:
+            logger.warning("Journal queue drain on shutdown failed: %s", e)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, lag (age of the oldest pending marker) and throughput counters."""
+        depth = dead = 0
+        oldest_age = None
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            self._ensure_table()
+            cursor.execute("""
+                SELECT COUNT(*) FILTER (WHERE attempts < %s) AS depth,
+                       COUNT(*) FILTER (WHERE attempts >= %s) AS dead,
+                       EXTRACT(EPOCH FROM (CURRENT_TIMESTAMP - MIN(enqueued_at) FILTER (WHERE attempts < %s))) AS oldest_age
+                FROM accounting_journal_queue
+            """, (self.max_attempts, self.max_attempts, self.max_attempts))
+            row = cursor.fetchone() or {}
+            conn.commit()
+            depth = int(row.get('depth') or 0)
+            dead = int(row.get('dead') or 0)
+            oldest_age = round(float(row['oldest_age']), 3) if row.get('oldest_age') is not None else None
+        finally:
+            conn.close()
+
+        with self._metrics_lock:
+            now = time.monotonic()
+            recent = sum(n for t, n in self._recent if now - t <= _THROUGHPUT_WINDOW)
+            return {
+                'pending': depth,
+                'dead_letters': dead,
+                'lag_seconds': oldest_age or 0.0,
+                'last_batch_lag_seconds': self._last_lag_seconds,
+                'last_batch_ms': self._last_batch_ms,
+                'throughput_per_second': round(recent / float(_THROUGHPUT_WINDOW), 3),
+                'enqueued': self._enqueued,
+                'journalized': self._journalized,
+                'skipped_already_posted': self._skipped,
+                'failed_attempts': self._failed,
+                'batches': self._batches,
+                'worker_running': bool(self._thread is not None and self._thread.is_alive()),
+            }
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+
+    def _journalize(self, conn, entries: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        from pos_accounting_bridge import journalize_sales_batch_to_accounting
+        cursor = conn.cursor()
+        cursor.execute("SAVEPOINT journal_batch")
+        try:
+            return journalize_sales_batch_to_accounting(entries, conn=conn)
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT journal_batch")
+            if len(entries) == 1:
+                return {int(entries[0]['order_id']): {'success': False, 'message': str(e)}}
+            # One bad order must not hold up the batch: retry individually
+            logger.warning("Journal batch of %d failed, retrying order by order: %s", len(entries), e)
+            results = {}
+            for entry in entries:
+                cursor.execute("SAVEPOINT journal_order")
+                try:
+                    results.update(journalize_sales_batch_to_accounting([entry], conn=conn))
+                    cursor.execute("RELEASE SAVEPOINT journal_order")
+                except Exception as single_error:
+                    cursor.execute("ROLLBACK TO SAVEPOINT journal_order")
+                    results[int(entry['order_id'])] = {'success': False, 'message': str(single_error)}
+            return results
+
+    def _ensure_table(self):
+        """Create accounting_journal_queue if missing (once per process; see migrations/add_accounting_journal_queue.sql)."""
+        if self._table_ready:
+            return
+        # Own connection: DDL must not ride on (and be rolled back with) a caller's transaction
+        conn = get_independent_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS accounting_journal_queue (
+                    order_id INTEGER PRIMARY KEY,
+                    employee_id INTEGER,
+                    enqueued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    last_error TEXT
+                )
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_journal_queue_due
+                ON accounting_journal_queue (next_attempt_at, enqueued_at)
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+        self._table_ready = True
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.drain_interval)
+            self._wakeup.clear()
+            try:
+                # Keep draining while full batches come back (catching up after a backlog)
+                while not self._stopped and self.drain() >= self.batch_size:
+                    pass
+            except Exception as e:
+                logger.warning("Journal queue drain failed: %s", e)
+
+
+# Global journal queue instance
+_journal_queue = None
+_journal_queue_lock = threading.Lock()
+
+
+def get_journal_queue() -> JournalQueue:
+    """Get or create the journal queue singleton"""
+    global _journal_queue
+    if _journal_queue is None:
+        with _journal_queue_lock:
+            if _journal_queue is None:
+                _journal_queue = JournalQueue()
+                atexit.register(_journal_queue.shutdown)
+    return _journal_queue
+
+
+def enqueue_sale_journalization(order_id: int, employee_id: Optional[int]) -> Dict[str, Any]:
+    """
+    Schedule a completed sale for journalizing (off the checkout path).
+    Falls back to journalizing inline when the queue is disabled or unavailable.
+    """
+    if JOURNAL_QUEUE_ENABLED and get_journal_queue().enqueue(int(order_id), employee_id):
+        return {'success': True, 'queued': True}
+    from pos_accounting_bridge import journalize_sale_to_accounting
+    return journalize_sale_to_accounting(int(order_id), int(employee_id) if employee_id is not None else None)
+
+
+def flush_pending_sales() -> int:
+    """Journalize sales still queued (bounded by JOURNAL_REPORT_FLUSH_SECONDS). Never raises."""
+    if not JOURNAL_QUEUE_ENABLED or JOURNAL_REPORT_FLUSH_SECONDS <= 0:
+        return 0
+    try:
+        return get_journal_queue().drain_all(JOURNAL_REPORT_FLUSH_SECONDS)
+    except Exception as e:
+        logger.warning("Journal queue flush before report failed: %s", e)
+        return 0
+
+
+def journalized_reads(func):
+    """Decorator: flush_pending_sales() before an accounting report. Put it above @replica_reads
+    so the drain writes to the primary."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        flush_pending_sales()
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def start_journal_worker():
+    """Start draining markers left by earlier runs (call once at app startup)."""
+    if JOURNAL_QUEUE_ENABLED:
+        get_journal_queue().start()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Per-employee, per-day labor and tip rollup (employee_daily_rollup) for payroll views.
+
+Timesheet and tip summaries used to aggregate every time_clock / payment_transactions row of the
+pay period on each request, through DATE(column) filters no index could serve. The rollup keeps
+one row per (establishment, employee, day), maintained where the source rows are written:
+- clock_out / time_clock_out: refresh_labor_day() recomputes hours and shifts for that day from
+  time_clock (idempotent, so a retried or edited clock-out can't double count);
+- time_end_break: add_break() adds the finished break's minutes;
+- tip recording at payment: add_tip() adds the tip (count, sum, min, max).
+Labor is attributed to the day of clock_in, tips to the day they were recorded, matching the
+DATE(clock_in) / DATE(transaction_date) grouping of the old queries.
+
+The table comes from migrations/add_employee_daily_rollup.sql; ensure_rollup() also creates it
+at process startup (serve.py workers, background_workers) and backfills it from history while it
+is empty. The write hooks never create anything: they run in the caller's transaction, inside a
+savepoint, so a failure there (e.g. a missing table) never aborts the clock-out or checkout
+itself; rebuild() recomputes any date range after manual edits or missed writes.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Union
+
+from database_postgres import get_independent_connection
+
+logger = logging.getLogger(__name__)
+
+_ready = False
+_ready_lock = threading.Lock()
+
+DateLike = Union[str, date, datetime, None]
+
+
+def _row_value(row, key: str, index: int = 0):
+    """Column of a dict-like or tuple row."""
+    if row is None:
+        return None
+    return row[key] if hasattr(row, 'keys') else row[index]
+
+
+def _relation_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS present", (f'public.{name}',))
+    return bool(_row_value(cursor.fetchone(), 'present'))
+
+
+@contextmanager
+def _savepoint(cursor, what: str):
+    """Run a rollup update inside the caller's transaction without letting its failure abort it
+    (clock-out or checkout must not fail over a summary table; rebuild() repairs missed days)."""
+    cursor.execute("SAVEPOINT labor_rollup")
+    try:
+        yield
+        cursor.execute("RELEASE SAVEPOINT labor_rollup")
+    except Exception as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT labor_rollup")
+        logger.warning("employee_daily_rollup %s failed: %s", what, e)
+
+
+def ensure_rollup():
+    """Create employee_daily_rollup (and its indexes) once per process, backfilling it while empty.
+    Call at startup or before a read, never from a write path: it takes its own pooled connection
+    (outside any request scope) and commits, and its DDL locks time_clock."""
+    global _ready
+    if _ready:
+        return
+    with _ready_lock:
+        if _ready:
+            return
+        conn = get_independent_connection()
+        try:
+            cursor = conn.cursor()
+            # Concurrent startups: one process creates and backfills, the others then see it filled
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('employee_daily_rollup'))")
+            _create_and_backfill(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        _ready = True
+
+
+def _create_and_backfill(cursor):
+    """Tables and indexes (CREATE ... IF NOT EXISTS); full rebuild() while the rollup is empty."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS employee_daily_rollup (
+            establishment_id INTEGER NOT NULL,
+            employee_id INTEGER NOT NULL,
+            work_date DATE NOT NULL,
+            hours NUMERIC(10,2) NOT NULL DEFAULT 0,
+            shifts INTEGER NOT NULL DEFAULT 0,
+            break_minutes NUMERIC(10,2) NOT NULL DEFAULT 0,
+            tips NUMERIC(12,2) NOT NULL DEFAULT 0,
+            tip_count INTEGER NOT NULL DEFAULT 0,
+            tip_min NUMERIC(10,2),
+            tip_max NUMERIC(10,2),
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (establishment_id, employee_id, work_date)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employee_daily_rollup_date
+        ON employee_daily_rollup (establishment_id, work_date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_employee_daily_rollup_employee
+        ON employee_daily_rollup (employee_id, work_date)
+    """)
+    # One employee's shifts in a date range (refresh_labor_day, get_timesheet)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_time_clock_employee_clock_in
+        ON time_clock (employee_id, clock_in)
+    """)
+    cursor.execute("SELECT EXISTS (SELECT 1 FROM employee_daily_rollup) AS filled")
+    if not _row_value(cursor.fetchone(), 'filled'):
+        rebuild(cursor)
+
+
+def refresh_labor_day(cursor, employee_id: int, work_date: DateLike = None):
+    """Recompute hours / shifts of employee_id's completed shifts that started on work_date (default today)."""
+    day = _as_date(work_date)
+    with _savepoint(cursor, 'labor refresh'):
+        cursor.execute("""
+            INSERT INTO employee_daily_rollup (establishment_id, employee_id, work_date, hours, shifts)
+            SELECT tc.establishment_id, tc.employee_id, %s::date,
+                   COALESCE(SUM(tc.total_hours), 0), COUNT(*)
+            FROM time_clock tc
+            WHERE tc.employee_id = %s
+              AND tc.clock_in >= %s::date AND tc.clock_in < %s::date + 1
+              AND tc.clock_out IS NOT NULL
+            GROUP BY tc.establishment_id, tc.employee_id
+            ON CONFLICT (establishment_id, employee_id, work_date) DO UPDATE
+            SET hours = EXCLUDED.hours,
+                shifts = EXCLUDED.shifts,
+                updated_at = CURRENT_TIMESTAMP
+        """, (day, employee_id, day, day))
+
+
+def add_break(cursor, establishment_id: int, employee_id: int, work_date: DateLike, minutes: float):
+    """Add a finished break of `minutes` to the day its shift started."""
+    with _savepoint(cursor, 'break'):
+        cursor.execute("""
+            INSERT INTO employee_daily_rollup (establishment_id, employee_id, work_date, break_minutes)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (establishment_id, employee_id, work_date) DO UPDATE
+            SET break_minutes = employee_daily_rollup.break_minutes + EXCLUDED.break_minutes,
+                updated_at = CURRENT_TIMESTAMP
+        """, (establishment_id, employee_id, _as_date(work_date), round(max(float(minutes), 0.0), 2)))
+
+
+def add_tip(cursor, establishment_id: int, employee_id: int, amount: float, work_date: DateLike = None):
+    """Add one recorded tip to employee_id's day (default the database's CURRENT_DATE, the day
+    rebuild() takes from tip_date::date)."""
+    if not establishment_id or not employee_id or not amount or float(amount) <= 0:
+        return
+    with _savepoint(cursor, 'tip'):
+        cursor.execute("""
+            INSERT INTO employee_daily_rollup
+                (establishment_id, employee_id, work_date, tips, tip_count, tip_min, tip_max)
+            VALUES (%s, %s, COALESCE(%s::date, CURRENT_DATE), %s, 1, %s, %s)
+            ON CONFLICT (establishment_id, employee_id, work_date) DO UPDATE
+            SET tips = employee_daily_rollup.tips + EXCLUDED.tips,
+                tip_count = employee_daily_rollup.tip_count + 1,
+                tip_min = LEAST(employee_daily_rollup.tip_min, EXCLUDED.tip_min),
+                tip_max = GREATEST(employee_daily_rollup.tip_max, EXCLUDED.tip_max),
+                updated_at = CURRENT_TIMESTAMP
+        """, (establishment_id, employee_id, _as_date(work_date) if work_date else None, amount, amount, amount))
+
+
+def rebuild(cursor, start_date: DateLike = None, end_date: DateLike = None):
+    """
+    Recompute the rollup from time_clock and tips (employee_tips when present, else
+    payment_transactions.tip) for start_date..end_date inclusive (default: all history).
+    Break minutes are taken from each shift's recorded break_start / break_end.
+    """
+    start = _as_date(start_date) if start_date else date(1970, 1, 1)
+    end = _as_date(end_date) if end_date else date(9999, 12, 30)
+    cursor.execute("""
+        DELETE FROM employee_daily_rollup WHERE work_date >= %s AND work_date <= %s
+    """, (start, end))
+    cursor.execute("""
+        INSERT INTO employee_daily_rollup
+            (establishment_id, employee_id, work_date, hours, shifts, break_minutes)
+        SELECT tc.establishment_id, tc.employee_id, tc.clock_in::date,
+               COALESCE(SUM(tc.total_hours) FILTER (WHERE tc.clock_out IS NOT NULL), 0),
+               COUNT(*) FILTER (WHERE tc.clock_out IS NOT NULL),
+               COALESCE(SUM(EXTRACT(EPOCH FROM (tc.break_end - tc.break_start)) / 60.0)
+                        FILTER (WHERE tc.break_end IS NOT NULL AND tc.break_start IS NOT NULL), 0)
+        FROM time_clock tc
+        WHERE tc.clock_in >= %s AND tc.clock_in < %s::date + 1
+        GROUP BY tc.establishment_id, tc.employee_id, tc.clock_in::date
+    """, (start, end))
+    if _relation_exists(cursor, 'employee_tips'):
+        tips_sql = """
+            SELECT o.establishment_id, et.employee_id, et.tip_date::date AS work_date, et.tip_amount AS tip
+            FROM employee_tips et
+            JOIN orders o ON o.order_id = et.order_id
+            WHERE et.tip_amount > 0
+              AND et.tip_date >= %s AND et.tip_date < %s::date + 1
+        """
+    else:
+        tips_sql = """
+            SELECT pt.establishment_id, COALESCE(pt.employee_id, o.employee_id) AS employee_id,
+                   pt.transaction_date::date AS work_date, pt.tip AS tip
+            FROM payment_transactions pt
+            JOIN orders o ON o.order_id = pt.order_id
+            WHERE COALESCE(pt.tip, 0) > 0
+              AND COALESCE(pt.employee_id, o.employee_id) IS NOT NULL
+              AND pt.transaction_date >= %s AND pt.transaction_date < %s::date + 1
+        """
+    cursor.execute(f"""
+        INSERT INTO employee_daily_rollup
+            (establishment_id, employee_id, work_date, tips, tip_count, tip_min, tip_max)
+        SELECT t.establishment_id, t.employee_id, t.work_date,
+               SUM(t.tip), COUNT(*), MIN(t.tip), MAX(t.tip)
+        FROM ({tips_sql}) t
+        GROUP BY t.establishment_id, t.employee_id, t.work_date
+        ON CONFLICT (establishment_id, employee_id, work_date) DO UPDATE
+        SET tips = EXCLUDED.tips,
+            tip_count = EXCLUDED.tip_count,
+            tip_min = EXCLUDED.tip_min,
+            tip_max = EXCLUDED.tip_max,
+            updated_at = CURRENT_TIMESTAMP
+    """, (start, end))
+
+
+def _as_date(value: DateLike) -> date:
+    if value is None:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+In-memory roster of today's scheduled shifts for the late clock-in alert job.
+
+The job used to query every employee_schedule row of the day (with a NOT EXISTS on time_clock)
+each minute and parse each start time in Python. The roster loads the day's shifts of every store
+with late alerts enabled once, sorted by expected start, and each tick only bisects to the shifts
+whose alert time (start + delay + threshold) has passed since the previous tick: no database work
+unless an alert is actually due.
+
+The roster is rebuilt when the date changes, when a schedule is added or deleted or the late-alert settings change (reload(),
+propagated to the scheduler leader through the 'late_roster_reload' job), and every
+LATE_ROSTER_MAX_AGE seconds as a safety net. Clock-ins seen by this process remove the employee
+(note_clock_in); for clock-ins handled by other web workers, a due shift is confirmed with one
+indexed time_clock lookup before its alert is sent.
+"""
+
+import os
+import bisect
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional, Set
+
+from psycopg2.extras import RealDictCursor
+
+from database_postgres import get_connection
+
+LATE_ROSTER_MAX_AGE = int(os.getenv('LATE_ROSTER_MAX_AGE', '1800'))
+LATE_ROSTER_RELOAD_JOB = 'late_roster_reload'
+
+
+def _shift_start(start_t) -> dt_time:
+    """employee_schedule.start_time as a time (TIME column, timedelta or 'HH:MM' text)."""
+    if isinstance(start_t, dt_time):
+        return start_t
+    if hasattr(start_t, 'total_seconds'):
+        sched_h, sched_m = divmod(int(start_t.total_seconds()) // 60, 60)
+    else:
+        parts = str(start_t).split(':')
+        sched_h, sched_m = int(parts[0]), int(parts[1])
+    return dt_time(sched_h, sched_m)
+
+
+class _StoreRoster:
+    """One store's shifts of the day, sorted by alert time; `position` = first shift not yet checked."""
+    __slots__ = ('store_id', 'grace', 'alert_at', 'shifts', 'position')
+
+    def __init__(self, store_id: int, grace_minutes: int, shifts: List[Dict]):
+        self.store_id = store_id
+        self.grace = timedelta(minutes=grace_minutes)
+        shifts.sort(key=lambda s: s['start'])
+        self.shifts = shifts
+        self.alert_at = [s['start'] + self.grace for s in shifts]
+        self.position = 0
+
+    def take_due(self, now: datetime) -> List[Dict]:
+        """Shifts whose alert time passed since the last call (O(log n) when none did)."""
+        end = bisect.bisect_right(self.alert_at, now, lo=self.position)
+        due = self.shifts[self.position:end]
+        self.position = end
+        return due
+
+
+class LateArrivalRoster:
+    """Today's shifts per store plus the employees known to have clocked in."""
+
+    def __init__(self, max_age: int = LATE_ROSTER_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self._loaded_at = 0.0
+        self._stale = True
+        self._stores: Dict[int, _StoreRoster] = {}
+        self._clocked_in: Set[int] = set()
+        self._loads = 0
+        self._ticks = 0
+
+    def reload(self):
+        """Rebuild on the next tick (schedule or late-alert settings changed)."""
+        self._stale = True
+
+    def note_clock_in(self, employee_id: int):
+        """Employee clocked in (this process): never alert for them today."""
+        with self._lock:
+            self._clocked_in.add(int(employee_id))
+
+    def due_shifts(self, now: Optional[datetime] = None) -> List[Dict]:
+        """Shifts that became late since the last call and whose employee has not clocked in.
+        If the clock-in lookup fails, the taken shifts are put back so the next tick retries them."""
+        now = now or datetime.now()
+        with self._lock:
+            self._ticks += 1
+            if (self._stale or self._day != now.date()
+                    or time.monotonic() - self._loaded_at > self.max_age):
+                self._load(now)
+            due = []
+            taken = []
+            for roster in self._stores.values():
+                start = roster.position
+                shifts = roster.take_due(now)
+                if shifts:
+                    taken.append((roster, start, roster.position))
+                for shift in shifts:
+                    if shift['employee_id'] not in self._clocked_in:
+                        due.append(shift)
+        try:
+            return self._without_clock_ins(due, now.date())
+        except Exception:
+            with self._lock:
+                for roster, start, end in taken:
+                    # Unless a reload replaced the roster (its next tick returns them anyway)
+                    if roster.position == end:
+                        roster.position = start
+            raise
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                'day': self._day.isoformat() if self._day else None,
+                'stores': len(self._stores),
+                'shifts': sum(len(r.shifts) for r in self._stores.values()),
+                'pending': sum(len(r.shifts) - r.position for r in self._stores.values()),
+                'clocked_in': len(self._clocked_in),
+                'loads': self._loads,
+                'ticks': self._ticks,
+            }
+
+    def _load(self, now: datetime):
+        """Load settings and today's not-yet-clocked-in shifts of every store with late alerts on.
+        Shifts that were already late before a reload are returned again by the next tick; the
+        alert job's dedup keys keep them from being alerted twice."""
+        today = now.date()
+        conn = get_connection()
+        try:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur.execute("""
+                SELECT store_id, late_alert_delay_min, late_alert_threshold_min
+                FROM clockin_notification_settings
+                WHERE late_alert_enabled
+            """)
+            settings = cur.fetchall()
+            rows = []
+            if settings:
+                cur.execute("""
+                    SELECT
+                        ss.establishment_id,
+                        ss.employee_id,
+                        ss.start_time,
+                        e.first_name || ' ' || e.last_name AS employee_name,
+                        e.email
+                    FROM employee_schedule ss
+                    JOIN employees e ON e.employee_id = ss.employee_id
+                    WHERE ss.schedule_date = %s
+                      AND ss.establishment_id = ANY(%s)
+                      AND ss.start_time IS NOT NULL
+                      AND NOT EXISTS (
+                        SELECT 1 FROM time_clock tc
+                        WHERE tc.employee_id = ss.employee_id
+                          AND tc.clock_in >= %s
+                          AND tc.clock_in < %s + INTERVAL '1 day'
+                      )
+                """, (today, [s['store_id'] for s in settings], today, today))
+                rows = cur.fetchall()
+            conn.commit()
+        finally:
+            conn.close()
+
+        by_store: Dict[int, List[Dict]] = {}
+        for row in rows:
+            try:
+                start = datetime.combine(today, _shift_start(row['start_time']))
+            except Exception as _pe:
+                print(f"[late-alert] parse error for emp {row['employee_id']}: {_pe}", flush=True)
+                continue
+            by_store.setdefault(row['establishment_id'], []).append({
+                'store_id': row['establishment_id'],
+                'employee_id': row['employee_id'],
+                'employee_name': row['employee_name'],
+                'email': row.get('email') or '',
+                'start': start,
+            })
+
+        stores = {}
+        for s in settings:
+            delay_min = int(15 if s['late_alert_delay_min'] is None else s['late_alert_delay_min'])
+            threshold_min = int(10 if s['late_alert_threshold_min'] is None else s['late_alert_threshold_min'])
+            stores[s['store_id']] = _StoreRoster(s['store_id'], delay_min + threshold_min,
+                                                 by_store.get(s['store_id'], []))
+        if self._day != today:
+            self._clocked_in = set()
+        self._stores = stores
+        self._day = today
+        self._loaded_at = time.monotonic()
+        self._stale = False
+        self._loads += 1
+
+    @staticmethod
+    def _without_clock_ins(due: List[Dict], today: date) -> List[Dict]:
+        """Drop due shifts whose employee clocked in through another process since the roster loaded."""
+        if not due:
+            return due
+        conn = get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT DISTINCT employee_id FROM time_clock
+                WHERE employee_id = ANY(%s)
+                  AND clock_in >= %s AND clock_in < %s + INTERVAL '1 day'
+            """, (list({s['employee_id'] for s in due}), today, today))
+            clocked = {row['employee_id'] if hasattr(row, 'keys') else row[0] for row in cur.fetchall()}
+            conn.commit()
+        finally:
+            conn.close()
+        return [s for s in due if s['employee_id'] not in clocked]
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def get_late_roster() -> LateArrivalRoster:
+    """Get or create the process-wide late arrival roster"""
+    global _roster
+    if _roster is None:
+        with _roster_lock:
+            if _roster is None:
+                _roster = LateArrivalRoster()
+    return _roster
+
+
+def note_clock_in(employee_id: int):
+    """Clock-in hook for web_viewer: drop the employee from today's roster in this process."""
+    if _roster is not None:
+        _roster.note_clock_in(employee_id)
+
+
+def roster_changed():
+    """Schedule add / delete and late-alert settings hook: reload this process's roster and, through the job scheduler's
+    'late_roster_reload' job, the roster of the process running the late alerts."""
+    if _roster is not None:
+        _roster.reload()
+    try:
+        from job_scheduler import get_scheduler
+        get_scheduler().run_now(LATE_ROSTER_RELOAD_JOB)
+    except Exception as e:
+        print(f"[late-alert] roster reload signal failed: {e}", flush=True)
@@ -8,6 +8,8 @@ import json
 import logging
 import re
 import time
+import threading
+import importlib.util
 from collections import Counter
 from typing import Dict, List, Optional
 
@@ -23,17 +25,6 @@ except ImportError:
     REQUESTS_AVAILABLE = False
     logger.warning("requests not installed. Barcode lookup disabled. pip install requests")
 
-# Optional: sklearn for ML features (will fail gracefully if not installed)
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.cluster import KMeans
-    from sklearn.metrics.pairwise import cosine_similarity
-    import numpy as np
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
-    logger.warning("scikit-learn not installed. Clustering disabled. pip install scikit-learn")
-
 # Optional: fuzzywuzzy for fuzzy matching (will fail gracefully if not installed)
 try:
     from fuzzywuzzy import fuzz
@@ -42,36 +33,58 @@ except ImportError:
     FUZZYWUZZY_AVAILABLE = False
     logger.warning("fuzzywuzzy not installed. Fuzzy matching disabled. pip install fuzzywuzzy")
 
-# Optional: spaCy for NLP (will fail gracefully if not installed)
-try:
-    import spacy
-    SPACY_AVAILABLE = True
-except (ImportError, Exception):
-    SPACY_AVAILABLE = False
-    # Don't print warning - spaCy is optional and may have compatibility issues
+# Optional heavy libraries (scikit-learn + numpy, spaCy, Ollama) are imported on first use, not
+# when database.py / the web app imports this module: _load_sklearn(), _load_ollama(), and the
+# FreeMetadataSystem.nlp property. The *_AVAILABLE flags say whether each package is installed.
+SKLEARN_AVAILABLE = importlib.util.find_spec('sklearn') is not None
+SPACY_AVAILABLE = importlib.util.find_spec('spacy') is not None
+OLLAMA_AVAILABLE = importlib.util.find_spec('ollama') is not None
+_optional_import_lock = threading.Lock()
+TfidfVectorizer = KMeans = cosine_similarity = np = None
+ollama = None
 
-# Optional: Ollama for LLM-based category naming (will fail gracefully if not installed)
-try:
-    import ollama
-    OLLAMA_AVAILABLE = True
-except ImportError:
-    OLLAMA_AVAILABLE = False
-    # Don't print warning by default - it's optional
 
-from database import get_connection
+def _load_sklearn() -> bool:
+    """Import scikit-learn / numpy into this module on first use. Returns SKLEARN_AVAILABLE."""
+    global SKLEARN_AVAILABLE, TfidfVectorizer, KMeans, cosine_similarity, np
+    if not SKLEARN_AVAILABLE or TfidfVectorizer is not None:
+        return SKLEARN_AVAILABLE
+    with _optional_import_lock:
+        if TfidfVectorizer is None:
+            try:
+                from sklearn.feature_extraction.text import TfidfVectorizer as _tfidf
+                from sklearn.cluster import KMeans
+                from sklearn.metrics.pairwise import cosine_similarity
+                import numpy as np
+                TfidfVectorizer = _tfidf
+            except ImportError:
+                SKLEARN_AVAILABLE = False
+                logger.warning("scikit-learn not installed. Clustering disabled. pip install scikit-learn")
+    return SKLEARN_AVAILABLE
+
+
+def _load_ollama() -> bool:
+    """Import the Ollama client on first use. Returns OLLAMA_AVAILABLE."""
+    global OLLAMA_AVAILABLE, ollama
+    if not OLLAMA_AVAILABLE or ollama is not None:
+        return OLLAMA_AVAILABLE
+    with _optional_import_lock:
+        if ollama is None:
+            try:
+                import ollama
+            except ImportError:
+                OLLAMA_AVAILABLE = False
+    return OLLAMA_AVAILABLE
+
+from database import get_connection, invalidate_category_cache
 
 
 class FreeMetadataSystem:
     
     def __init__(self):
-        # Load spaCy for NLP (free, runs locally)
-        self.nlp = None
-        if SPACY_AVAILABLE:
-            try:
-                self.nlp = spacy.load("en_core_web_sm")
-            except OSError:
-                logger.warning("spaCy model 'en_core_web_sm' not found. python -m spacy download en_core_web_sm")
-                self.nlp = None
+        # spaCy for NLP (free, runs locally) is loaded by the nlp property on first use
+        self._nlp = None
+        self._nlp_loaded = False
         
         # Load product knowledge base
         self.category_keywords = self._load_category_keywords()
@@ -79,6 +92,22 @@ class FreeMetadataSystem:
         self.product_knowledge = self._load_product_knowledge_base()
         self.product_to_category = self._load_product_to_category_mapping()
     
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded on first use; None when spaCy or its model isn't installed."""
+        if not self._nlp_loaded:
+            self._nlp_loaded = True
+            if SPACY_AVAILABLE:
+                try:
+                    import spacy
+                    self._nlp = spacy.load("en_core_web_sm")
+                except OSError:
+                    logger.warning("spaCy model 'en_core_web_sm' not found. python -m spacy download en_core_web_sm")
+                except Exception:
+                    # spaCy is optional and may have compatibility issues
+                    pass
+        return self._nlp
+    
     def _load_product_knowledge_base(self):
         """
         Human-like product knowledge base
@@ -1184,7 +1213,7 @@ class FreeMetadataSystem:
         Generate a better category name using local LLM (Mistral via Ollama)
         Falls back to keyword-based naming if LLM not available
         """
-        if not OLLAMA_AVAILABLE:
+        if not _load_ollama():
             return None
         
         try:
@@ -1367,7 +1396,7 @@ Category name only (no explanation):"""
         """
         Auto-categorize using K-Means clustering (FREE, runs locally)
         """
-        if not SKLEARN_AVAILABLE:
+        if not _load_sklearn():
             raise Exception("scikit-learn is required for K-Means clustering. Install with: pip install scikit-learn")
         
         conn = get_connection()
@@ -1494,6 +1523,7 @@ Category name only (no explanation):"""
         conn.commit()
         cursor.close()
         conn.close()
+        invalidate_category_cache()
         
         print(f"Created {n_clusters} categories using K-Means clustering")
     
@@ -1528,7 +1558,7 @@ Category name only (no explanation):"""
         
         all_products = cursor.fetchall()
         
-        if not SKLEARN_AVAILABLE:
+        if not _load_sklearn():
             # Fallback to simple text matching
             query_lower = query.lower()
             results = []
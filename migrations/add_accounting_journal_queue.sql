@@ -0,0 +1,22 @@
+-- Migration: Deferred POS -> accounting journalization queue
+-- Checkout inserts one marker row per paid order; journal_queue.py drains the queue in
+-- batches (FOR UPDATE SKIP LOCKED) and writes accounting.transactions / transaction_lines
+-- with multi-row INSERTs. Rows are deleted once the sale is posted; failures keep
+-- attempts / last_error and are retried at next_attempt_at.
+-- journal_queue.py also creates the table on first use. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS accounting_journal_queue (
+    order_id INTEGER PRIMARY KEY,
+    employee_id INTEGER,
+    enqueued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_journal_queue_due
+    ON accounting_journal_queue (next_attempt_at, enqueued_at);
+
+-- Idempotency lookups (find_by_source_document / find_posted_ids_by_source_documents)
+CREATE INDEX IF NOT EXISTS idx_acc_txn_source_document
+    ON accounting.transactions (source_document_type, source_document_id);
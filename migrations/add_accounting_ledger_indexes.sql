@@ -0,0 +1,24 @@
+-- Migration: Indexes for transaction list / general ledger pagination
+-- /api/v1/transactions pages with keyset (transaction_date, id) and the general ledger
+-- streams lines in (transaction_date, transaction_id, line_number) order.
+-- Safe to re-run.
+
+-- Transaction list: ORDER BY transaction_date DESC, id DESC with (transaction_date, id) < cursor
+CREATE INDEX IF NOT EXISTS idx_acc_txn_date_id
+    ON accounting.transactions (transaction_date, id);
+
+-- Posted, non-void ledger scans
+CREATE INDEX IF NOT EXISTS idx_acc_txn_posted_date_id
+    ON accounting.transactions (transaction_date, id)
+    WHERE is_posted = true AND is_void = false;
+
+-- Lines for a page of transactions (transaction_id = ANY(...)) in line order
+CREATE INDEX IF NOT EXISTS idx_acc_txl_txn_line
+    ON accounting.transaction_lines (transaction_id, line_number);
+
+-- account_id filter (EXISTS lookup) and single-account ledgers
+CREATE INDEX IF NOT EXISTS idx_acc_txl_account_txn
+    ON accounting.transaction_lines (account_id, transaction_id);
+
+ANALYZE accounting.transactions;
+ANALYZE accounting.transaction_lines;
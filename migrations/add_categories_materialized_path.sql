@@ -0,0 +1,77 @@
+-- Migration: Materialized category paths
+-- Stores the full "Parent > Child > Leaf" path on every category row so path lookups
+-- and subtree filters are a single indexed query instead of one query per level.
+-- category_path is maintained by triggers: set on insert / rename / re-parent and
+-- cascaded to all descendants when an ancestor's path changes.
+-- Run after categories_unique_name_parent.sql. Safe to re-run.
+
+-- 1. Column
+ALTER TABLE categories ADD COLUMN IF NOT EXISTS category_path TEXT;
+
+-- 2. Backfill existing rows (recursive walk from the roots)
+WITH RECURSIVE tree AS (
+    SELECT category_id, category_name::TEXT AS path
+    FROM categories
+    WHERE parent_category_id IS NULL
+    UNION ALL
+    SELECT c.category_id, t.path || ' > ' || c.category_name
+    FROM categories c
+    JOIN tree t ON c.parent_category_id = t.category_id
+)
+UPDATE categories c
+SET category_path = tree.path
+FROM tree
+WHERE c.category_id = tree.category_id
+  AND c.category_path IS DISTINCT FROM tree.path;
+
+-- 3. Indexes: exact path lookup and prefix (subtree) scans
+CREATE INDEX IF NOT EXISTS idx_categories_path ON categories (category_path);
+CREATE INDEX IF NOT EXISTS idx_categories_path_prefix ON categories (category_path text_pattern_ops);
+
+-- 4. Compute path from the parent on insert / rename / re-parent
+CREATE OR REPLACE FUNCTION categories_set_path()
+RETURNS TRIGGER AS $$
+DECLARE
+    parent_path TEXT;
+BEGIN
+    IF NEW.parent_category_id IS NULL THEN
+        NEW.category_path := NEW.category_name;
+    ELSE
+        IF NEW.parent_category_id = NEW.category_id THEN
+            RAISE EXCEPTION 'Category % cannot be its own parent', NEW.category_id;
+        END IF;
+        SELECT category_path INTO parent_path
+        FROM categories WHERE category_id = NEW.parent_category_id;
+        -- Reject moves that would put a category under its own descendant
+        IF TG_OP = 'UPDATE' AND OLD.category_path IS NOT NULL
+           AND parent_path LIKE OLD.category_path || ' > %' THEN
+            RAISE EXCEPTION 'Circular category hierarchy for category %', NEW.category_id;
+        END IF;
+        NEW.category_path := COALESCE(parent_path, '') || ' > ' || NEW.category_name;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_categories_set_path ON categories;
+CREATE TRIGGER trg_categories_set_path
+    BEFORE INSERT OR UPDATE OF category_name, parent_category_id ON categories
+    FOR EACH ROW EXECUTE FUNCTION categories_set_path();
+
+-- 5. Cascade a changed path to the direct children (which cascade further down)
+CREATE OR REPLACE FUNCTION categories_cascade_path()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE categories
+    SET category_path = NEW.category_path || ' > ' || category_name
+    WHERE parent_category_id = NEW.category_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_categories_cascade_path ON categories;
+CREATE TRIGGER trg_categories_cascade_path
+    AFTER UPDATE ON categories
+    FOR EACH ROW
+    WHEN (OLD.category_path IS DISTINCT FROM NEW.category_path)
+    EXECUTE FUNCTION categories_cascade_path();
@@ -0,0 +1,32 @@
+-- Migration: Indexed customer search (POS customer lookup)
+-- search_customers used ILIKE '%term%' on name/email/phone, which cannot use a B-tree index.
+-- This adds:
+--   * phone_digits: phone with all non-digits stripped, so "(555) 123-4567" matches "5551234"
+--   * B-tree text_pattern_ops indexes for the prefix-first fast path (LIKE 'term%')
+--   * pg_trgm GIN indexes for substring / similarity matching and ranking
+-- Safe to re-run. pg_trgm ships with PostgreSQL contrib (available on Supabase).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 1. Normalized phone digits (kept in sync by PostgreSQL)
+ALTER TABLE customers
+    ADD COLUMN IF NOT EXISTS phone_digits TEXT
+    GENERATED ALWAYS AS (regexp_replace(COALESCE(phone, ''), '[^0-9]', '', 'g')) STORED;
+
+-- 2. Prefix lookups, scoped by establishment
+CREATE INDEX IF NOT EXISTS idx_customers_name_prefix
+    ON customers (establishment_id, lower(customer_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_email_prefix
+    ON customers (establishment_id, lower(email) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_phone_digits_prefix
+    ON customers (establishment_id, phone_digits text_pattern_ops);
+
+-- 3. Trigram indexes for substring + similarity search
+CREATE INDEX IF NOT EXISTS idx_customers_name_trgm
+    ON customers USING gin (lower(customer_name) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_email_trgm
+    ON customers USING gin (lower(email) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_customers_phone_digits_trgm
+    ON customers USING gin (phone_digits gin_trgm_ops);
+
+ANALYZE customers;
@@ -0,0 +1,34 @@
+-- Migration: Per-employee per-day labor and tip rollup (labor_rollup.py)
+-- One row per (establishment, employee, day): completed shift hours by clock-in day, finished
+-- break minutes, and tips recorded that day. Maintained on clock-out, end of break and tip
+-- recording; payroll views (labor summary, tip reports) read it with one range scan.
+-- labor_rollup.ensure_rollup() also creates the table at process startup and backfills it from
+-- time_clock and payment_transactions / employee_tips while it is empty; the clock-out, break and
+-- tip hooks only write to it. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS employee_daily_rollup (
+    establishment_id INTEGER NOT NULL,
+    employee_id INTEGER NOT NULL,
+    work_date DATE NOT NULL,
+    hours NUMERIC(10,2) NOT NULL DEFAULT 0,
+    shifts INTEGER NOT NULL DEFAULT 0,
+    break_minutes NUMERIC(10,2) NOT NULL DEFAULT 0,
+    tips NUMERIC(12,2) NOT NULL DEFAULT 0,
+    tip_count INTEGER NOT NULL DEFAULT 0,
+    tip_min NUMERIC(10,2),
+    tip_max NUMERIC(10,2),
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (establishment_id, employee_id, work_date)
+);
+
+-- Pay-period summaries for a store
+CREATE INDEX IF NOT EXISTS idx_employee_daily_rollup_date
+    ON employee_daily_rollup (establishment_id, work_date);
+
+-- One employee's tips / hours
+CREATE INDEX IF NOT EXISTS idx_employee_daily_rollup_employee
+    ON employee_daily_rollup (employee_id, work_date);
+
+-- Timesheets and the clock-out refresh: one employee's shifts in a clock-in range
+CREATE INDEX IF NOT EXISTS idx_time_clock_employee_clock_in
+    ON time_clock (employee_id, clock_in);
@@ -0,0 +1,36 @@
+-- Migration: Background job scheduler state (job_scheduler.py)
+-- scheduler_jobs keeps each periodic job's next run time and run metrics, so schedules survive
+-- restarts. scheduler_leader is a single-row lease: only the holder runs periodic jobs.
+-- scheduler_job_dedup remembers work already done (e.g. one late clock-in alert per shift per day).
+-- job_scheduler.py also creates the tables on first use. Safe to re-run.
+
+CREATE TABLE IF NOT EXISTS scheduler_jobs (
+    job_name TEXT PRIMARY KEY,
+    interval_seconds DOUBLE PRECISION NOT NULL,
+    next_run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_started_at TIMESTAMP,
+    last_finished_at TIMESTAMP,
+    last_duration_ms DOUBLE PRECISION,
+    last_lag_ms DOUBLE PRECISION,
+    run_count BIGINT NOT NULL DEFAULT 0,
+    failure_count BIGINT NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS scheduler_leader (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    holder TEXT NOT NULL,
+    lease_until TIMESTAMP NOT NULL,
+    acquired_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS scheduler_job_dedup (
+    job_name TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (job_name, dedup_key)
+);
+
+-- Daily prune of old dedup keys
+CREATE INDEX IF NOT EXISTS idx_scheduler_job_dedup_created
+    ON scheduler_job_dedup (created_at);
@@ -0,0 +1,17 @@
+-- Migration: Indexes for the recent orders list (database.list_orders / count_orders)
+-- list_orders pages newest-first with a keyset cursor on (order_date, order_id) and looks up one
+-- receipt preference per listed order through payment_transactions. This adds:
+--   * (order_date DESC, order_id DESC): first page and every later page read only their own rows;
+--     also serves the half-open order_date range filters
+--   * payment_transactions(order_id): the per-order receipt preference lookup (and order refunds /
+--     receipts), which had no index on order_id
+-- Safe to re-run. On a large live table, run the statements with CREATE INDEX CONCURRENTLY instead.
+
+CREATE INDEX IF NOT EXISTS idx_orders_date_id_desc
+    ON orders (order_date DESC, order_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_payment_transactions_order
+    ON payment_transactions (order_id);
+
+ANALYZE orders;
+ANALYZE payment_transactions;
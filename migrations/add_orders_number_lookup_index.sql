@@ -0,0 +1,31 @@
+-- Migration: Indexed order number lookup (returns / exchanges at the counter, /api/orders/search)
+-- The lookup used ILIKE '%number%' and digit-only ILIKE patterns on order_number, which cannot use
+-- a B-tree index. database.find_orders_by_number now cascades exact -> prefix -> fuzzy. This adds:
+--   * order_number: B-tree for the exact match (the unique key leads with establishment_id)
+--   * order_number_digits: order_number with all non-digits stripped, so a scanner's
+--     "ORD#20250114,0007" matches "ORD-20250114-0007"
+--   * B-tree text_pattern_ops on the digits for exact and prefix (truncated scan) matches
+--   * pg_trgm GIN on the digits for substring / similarity matches (dropped or misread characters)
+-- Safe to re-run. Adding the stored column rewrites orders once; run it off-hours on large tables.
+-- pg_trgm ships with PostgreSQL contrib (available on Supabase).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 1. Normalized order number digits (kept in sync by PostgreSQL)
+ALTER TABLE orders
+    ADD COLUMN IF NOT EXISTS order_number_digits TEXT
+    GENERATED ALWAYS AS (regexp_replace(COALESCE(order_number, ''), '[^0-9]', '', 'g')) STORED;
+
+-- 2. Exact order number
+CREATE INDEX IF NOT EXISTS idx_orders_order_number
+    ON orders (order_number);
+
+-- 3. Exact / prefix digits
+CREATE INDEX IF NOT EXISTS idx_orders_number_digits_prefix
+    ON orders (order_number_digits text_pattern_ops);
+
+-- 4. Trigram index for substring + similarity matches
+CREATE INDEX IF NOT EXISTS idx_orders_number_digits_trgm
+    ON orders USING gin (order_number_digits gin_trgm_ops);
+
+ANALYZE orders;
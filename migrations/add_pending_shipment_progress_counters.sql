@@ -0,0 +1,84 @@
+-- Migration: Precomputed verification progress counters on pending_shipments
+-- pending_shipments keeps item_count / expected_quantity / verified_quantity /
+-- items_fully_verified / items_with_issues, adjusted by a trigger whenever a
+-- pending_shipment_items row is inserted, updated (scans, manual quantity edits,
+-- reported issues) or deleted. The shipment list and the progress summary become a
+-- single primary-key / indexed read instead of a GROUP BY over every shipment's items.
+-- Safe to re-run (re-running also re-syncs the counters).
+
+ALTER TABLE pending_shipments ADD COLUMN IF NOT EXISTS item_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE pending_shipments ADD COLUMN IF NOT EXISTS expected_quantity BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE pending_shipments ADD COLUMN IF NOT EXISTS verified_quantity BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE pending_shipments ADD COLUMN IF NOT EXISTS items_fully_verified INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE pending_shipments ADD COLUMN IF NOT EXISTS items_with_issues INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE pending_shipments ADD COLUMN IF NOT EXISTS progress_updated_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_pending_shipments_status_uploaded
+    ON pending_shipments (status, upload_timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_pending_shipment_items_shipment
+    ON pending_shipment_items (pending_shipment_id);
+
+-- Apply one item row's contribution (sign = +1 to add, -1 to remove) to its shipment
+CREATE OR REPLACE FUNCTION pending_shipment_items_update_progress()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND OLD.pending_shipment_id = NEW.pending_shipment_id
+       AND OLD.quantity_expected IS NOT DISTINCT FROM NEW.quantity_expected
+       AND OLD.quantity_verified IS NOT DISTINCT FROM NEW.quantity_verified
+       AND OLD.discrepancy_notes IS NOT DISTINCT FROM NEW.discrepancy_notes THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE pending_shipments
+        SET item_count = item_count - 1,
+            expected_quantity = expected_quantity - COALESCE(OLD.quantity_expected, 0),
+            verified_quantity = verified_quantity - COALESCE(OLD.quantity_verified, 0),
+            items_fully_verified = items_fully_verified
+                - CASE WHEN COALESCE(OLD.quantity_verified, 0) >= OLD.quantity_expected THEN 1 ELSE 0 END,
+            items_with_issues = items_with_issues
+                - CASE WHEN OLD.discrepancy_notes IS NOT NULL AND OLD.discrepancy_notes <> '' THEN 1 ELSE 0 END,
+            progress_updated_at = CURRENT_TIMESTAMP
+        WHERE pending_shipment_id = OLD.pending_shipment_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE pending_shipments
+        SET item_count = item_count + 1,
+            expected_quantity = expected_quantity + COALESCE(NEW.quantity_expected, 0),
+            verified_quantity = verified_quantity + COALESCE(NEW.quantity_verified, 0),
+            items_fully_verified = items_fully_verified
+                + CASE WHEN COALESCE(NEW.quantity_verified, 0) >= NEW.quantity_expected THEN 1 ELSE 0 END,
+            items_with_issues = items_with_issues
+                + CASE WHEN NEW.discrepancy_notes IS NOT NULL AND NEW.discrepancy_notes <> '' THEN 1 ELSE 0 END,
+            progress_updated_at = CURRENT_TIMESTAMP
+        WHERE pending_shipment_id = NEW.pending_shipment_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_pending_shipment_items_progress ON pending_shipment_items;
+CREATE TRIGGER trg_pending_shipment_items_progress
+    AFTER INSERT OR UPDATE OR DELETE ON pending_shipment_items
+    FOR EACH ROW EXECUTE FUNCTION pending_shipment_items_update_progress();
+
+-- Backfill / re-sync existing shipments
+UPDATE pending_shipments ps
+SET item_count = COALESCE(s.item_count, 0),
+    expected_quantity = COALESCE(s.expected_quantity, 0),
+    verified_quantity = COALESCE(s.verified_quantity, 0),
+    items_fully_verified = COALESCE(s.items_fully_verified, 0),
+    items_with_issues = COALESCE(s.items_with_issues, 0),
+    progress_updated_at = CURRENT_TIMESTAMP
+FROM pending_shipments p
+LEFT JOIN (
+    SELECT pending_shipment_id,
+           COUNT(*) AS item_count,
+           SUM(quantity_expected) AS expected_quantity,
+           SUM(COALESCE(quantity_verified, 0)) AS verified_quantity,
+           SUM(CASE WHEN COALESCE(quantity_verified, 0) >= quantity_expected THEN 1 ELSE 0 END) AS items_fully_verified,
+           SUM(CASE WHEN discrepancy_notes IS NOT NULL AND discrepancy_notes <> '' THEN 1 ELSE 0 END) AS items_with_issues
+    FROM pending_shipment_items
+    GROUP BY pending_shipment_id
+) s ON s.pending_shipment_id = p.pending_shipment_id
+WHERE ps.pending_shipment_id = p.pending_shipment_id;
@@ -0,0 +1,260 @@
+-- Migration: Incremental register session cash totals + unified register event log
+-- 1. Open sessions keep running cash_sales / cash_refunds / cash_in / cash_out, updated by
+--    triggers as cash orders and cash transactions are recorded, voided or edited, so showing
+--    a session no longer re-sums every cash order since opened_at.
+--    Cash orders are attributed to a session via orders.register_session_id (set on insert to
+--    the establishment's most recently opened open session when the caller does not set it).
+--    ASSUMPTION: one cash register open per establishment at a time. The POS does not send its
+--    register with an order, so with two registers open at once every cash order is credited to
+--    the one opened last and the other register's expected cash is short. Stores running several
+--    registers must set orders.register_session_id when inserting the order (the trigger keeps
+--    an explicit value) before relying on these totals.
+-- 2. register_events: one row per open / close / drop / take_out, written by triggers on
+--    cash_register_sessions, daily_cash_counts and cash_transactions, so the register history
+--    is a single ordered, LIMITed, index-backed query.
+-- Safe to re-run.
+
+-- ============================================================================
+-- 1. Session running totals
+-- ============================================================================
+
+ALTER TABLE orders ADD COLUMN IF NOT EXISTS register_session_id INTEGER;
+CREATE INDEX IF NOT EXISTS idx_orders_register_session
+    ON orders (register_session_id) WHERE register_session_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_cash_register_sessions_open
+    ON cash_register_sessions (establishment_id, opened_at DESC) WHERE status = 'open';
+CREATE INDEX IF NOT EXISTS idx_cash_transactions_session
+    ON cash_transactions (session_id);
+
+-- Assign new cash orders to the open register session of their establishment.
+-- Single-register assumption (see header): with several open sessions the newest one gets the order.
+CREATE OR REPLACE FUNCTION orders_assign_register_session()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.register_session_id IS NULL AND NEW.payment_method = 'cash' THEN
+        SELECT register_session_id INTO NEW.register_session_id
+        FROM cash_register_sessions
+        WHERE status = 'open'
+          AND establishment_id = NEW.establishment_id
+          AND opened_at <= COALESCE(NEW.order_date, CURRENT_TIMESTAMP)
+        ORDER BY opened_at DESC
+        LIMIT 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_orders_assign_register_session ON orders;
+CREATE TRIGGER trg_orders_assign_register_session
+    BEFORE INSERT ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_assign_register_session();
+
+-- Apply the change in an order's cash contribution to its (open) session
+CREATE OR REPLACE FUNCTION orders_update_session_cash()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.register_session_id IS NOT NULL
+       AND OLD.payment_method = 'cash' THEN
+        UPDATE cash_register_sessions
+        SET cash_sales = COALESCE(cash_sales, 0) - CASE WHEN OLD.order_status <> 'voided' THEN COALESCE(OLD.total, 0) ELSE 0 END,
+            cash_refunds = COALESCE(cash_refunds, 0) - CASE WHEN OLD.order_status = 'returned' THEN COALESCE(OLD.total, 0) ELSE 0 END
+        WHERE register_session_id = OLD.register_session_id AND status = 'open';
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.register_session_id IS NOT NULL
+       AND NEW.payment_method = 'cash' THEN
+        UPDATE cash_register_sessions
+        SET cash_sales = COALESCE(cash_sales, 0) + CASE WHEN NEW.order_status <> 'voided' THEN COALESCE(NEW.total, 0) ELSE 0 END,
+            cash_refunds = COALESCE(cash_refunds, 0) + CASE WHEN NEW.order_status = 'returned' THEN COALESCE(NEW.total, 0) ELSE 0 END
+        WHERE register_session_id = NEW.register_session_id AND status = 'open';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_orders_session_cash_ins_del ON orders;
+CREATE TRIGGER trg_orders_session_cash_ins_del
+    AFTER INSERT OR DELETE ON orders
+    FOR EACH ROW EXECUTE FUNCTION orders_update_session_cash();
+
+DROP TRIGGER IF EXISTS trg_orders_session_cash_upd ON orders;
+CREATE TRIGGER trg_orders_session_cash_upd
+    AFTER UPDATE OF total, order_status, payment_method, register_session_id ON orders
+    FOR EACH ROW
+    WHEN (OLD.total IS DISTINCT FROM NEW.total
+          OR OLD.order_status IS DISTINCT FROM NEW.order_status
+          OR OLD.payment_method IS DISTINCT FROM NEW.payment_method
+          OR OLD.register_session_id IS DISTINCT FROM NEW.register_session_id)
+    EXECUTE FUNCTION orders_update_session_cash();
+
+-- Cash in (cash_in, deposit) / cash out (cash_out, withdrawal) per session
+CREATE OR REPLACE FUNCTION cash_transactions_update_session_cash()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.session_id IS NOT NULL THEN
+        UPDATE cash_register_sessions
+        SET cash_in = COALESCE(cash_in, 0) - CASE WHEN OLD.transaction_type IN ('cash_in', 'deposit') THEN OLD.amount ELSE 0 END,
+            cash_out = COALESCE(cash_out, 0) - CASE WHEN OLD.transaction_type IN ('cash_out', 'withdrawal') THEN OLD.amount ELSE 0 END
+        WHERE register_session_id = OLD.session_id AND status = 'open';
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.session_id IS NOT NULL THEN
+        UPDATE cash_register_sessions
+        SET cash_in = COALESCE(cash_in, 0) + CASE WHEN NEW.transaction_type IN ('cash_in', 'deposit') THEN NEW.amount ELSE 0 END,
+            cash_out = COALESCE(cash_out, 0) + CASE WHEN NEW.transaction_type IN ('cash_out', 'withdrawal') THEN NEW.amount ELSE 0 END
+        WHERE register_session_id = NEW.session_id AND status = 'open';
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_cash_transactions_session_cash ON cash_transactions;
+CREATE TRIGGER trg_cash_transactions_session_cash
+    AFTER INSERT OR UPDATE OR DELETE ON cash_transactions
+    FOR EACH ROW EXECUTE FUNCTION cash_transactions_update_session_cash();
+
+-- Backfill open sessions: attribute their cash orders and recompute the running totals
+UPDATE orders o
+SET register_session_id = s.register_session_id
+FROM cash_register_sessions s
+WHERE s.status = 'open'
+  AND o.register_session_id IS NULL
+  AND o.payment_method = 'cash'
+  AND o.establishment_id = s.establishment_id
+  AND o.order_date >= s.opened_at
+  AND NOT EXISTS (
+      SELECT 1 FROM cash_register_sessions s2
+      WHERE s2.status = 'open' AND s2.establishment_id = s.establishment_id
+        AND s2.opened_at > s.opened_at AND s2.opened_at <= o.order_date
+  );
+
+UPDATE cash_register_sessions s
+SET cash_sales = COALESCE((
+        SELECT SUM(CASE WHEN o.order_status <> 'voided' THEN o.total ELSE 0 END)
+        FROM orders o
+        WHERE o.register_session_id = s.register_session_id AND o.payment_method = 'cash'), 0),
+    cash_refunds = COALESCE((
+        SELECT SUM(CASE WHEN o.order_status = 'returned' THEN o.total ELSE 0 END)
+        FROM orders o
+        WHERE o.register_session_id = s.register_session_id AND o.payment_method = 'cash'), 0),
+    cash_in = COALESCE((
+        SELECT SUM(ct.amount) FROM cash_transactions ct
+        WHERE ct.session_id = s.register_session_id AND ct.transaction_type IN ('cash_in', 'deposit')), 0),
+    cash_out = COALESCE((
+        SELECT SUM(ct.amount) FROM cash_transactions ct
+        WHERE ct.session_id = s.register_session_id AND ct.transaction_type IN ('cash_out', 'withdrawal')), 0)
+WHERE s.status = 'open';
+
+-- ============================================================================
+-- 2. Unified register event log
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS register_events (
+    event_log_id BIGSERIAL PRIMARY KEY,
+    event_type TEXT NOT NULL CHECK (event_type IN ('open', 'close', 'drop', 'take_out')),
+    source_id INTEGER NOT NULL,
+    register_id INTEGER,
+    establishment_id INTEGER,
+    amount NUMERIC(10,2) DEFAULT 0,
+    employee_id INTEGER,
+    occurred_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    notes TEXT,
+    UNIQUE (event_type, source_id)
+);
+CREATE INDEX IF NOT EXISTS idx_register_events_time
+    ON register_events (occurred_at DESC, event_log_id DESC);
+CREATE INDEX IF NOT EXISTS idx_register_events_register_time
+    ON register_events (register_id, occurred_at DESC, event_log_id DESC);
+
+CREATE OR REPLACE FUNCTION register_events_from_session()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+        VALUES ('open', NEW.register_session_id, NEW.register_id, NEW.establishment_id, NEW.starting_cash,
+                NEW.employee_id, COALESCE(NEW.opened_at, CURRENT_TIMESTAMP), COALESCE(NEW.notes, 'Register opened'))
+        ON CONFLICT (event_type, source_id) DO NOTHING;
+    ELSIF NEW.status = 'closed' AND NEW.closed_at IS NOT NULL
+          AND (OLD.status IS DISTINCT FROM 'closed' OR OLD.closed_at IS NULL) THEN
+        INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+        VALUES ('close', NEW.register_session_id, NEW.register_id, NEW.establishment_id, NEW.ending_cash,
+                NEW.closed_by, NEW.closed_at, COALESCE(NEW.notes, 'Register closed'))
+        ON CONFLICT (event_type, source_id) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_register_events_session ON cash_register_sessions;
+CREATE TRIGGER trg_register_events_session
+    AFTER INSERT OR UPDATE OF status, closed_at ON cash_register_sessions
+    FOR EACH ROW EXECUTE FUNCTION register_events_from_session();
+
+CREATE OR REPLACE FUNCTION register_events_from_cash_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.count_type = 'drop' THEN
+        INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+        VALUES ('drop', NEW.count_id, NEW.register_id, NEW.establishment_id, NEW.total_amount,
+                NEW.counted_by, COALESCE(NEW.counted_at, CURRENT_TIMESTAMP), COALESCE(NEW.notes, 'Cash drop'))
+        ON CONFLICT (event_type, source_id) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_register_events_cash_count ON daily_cash_counts;
+CREATE TRIGGER trg_register_events_cash_count
+    AFTER INSERT ON daily_cash_counts
+    FOR EACH ROW EXECUTE FUNCTION register_events_from_cash_count();
+
+CREATE OR REPLACE FUNCTION register_events_from_cash_transaction()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.transaction_type = 'cash_out' THEN
+        INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+        SELECT 'take_out', NEW.transaction_id, s.register_id, NEW.establishment_id, NEW.amount,
+               NEW.employee_id, COALESCE(NEW.transaction_date, CURRENT_TIMESTAMP),
+               COALESCE(NEW.reason || CASE WHEN NEW.notes IS NOT NULL THEN ': ' || NEW.notes ELSE '' END, 'Money taken out')
+        FROM (SELECT 1) one
+        LEFT JOIN cash_register_sessions s ON s.register_session_id = NEW.session_id
+        ON CONFLICT (event_type, source_id) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_register_events_cash_transaction ON cash_transactions;
+CREATE TRIGGER trg_register_events_cash_transaction
+    AFTER INSERT ON cash_transactions
+    FOR EACH ROW EXECUTE FUNCTION register_events_from_cash_transaction();
+
+-- Backfill from existing history
+INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+SELECT 'open', register_session_id, register_id, establishment_id, starting_cash, employee_id,
+       COALESCE(opened_at, CURRENT_TIMESTAMP), COALESCE(notes, 'Register opened')
+FROM cash_register_sessions
+ON CONFLICT (event_type, source_id) DO NOTHING;
+
+INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+SELECT 'close', register_session_id, register_id, establishment_id, ending_cash, closed_by,
+       closed_at, COALESCE(notes, 'Register closed')
+FROM cash_register_sessions
+WHERE status = 'closed' AND closed_at IS NOT NULL
+ON CONFLICT (event_type, source_id) DO NOTHING;
+
+INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+SELECT 'drop', count_id, register_id, establishment_id, total_amount, counted_by,
+       COALESCE(counted_at, CURRENT_TIMESTAMP), COALESCE(notes, 'Cash drop')
+FROM daily_cash_counts
+WHERE count_type = 'drop'
+ON CONFLICT (event_type, source_id) DO NOTHING;
+
+INSERT INTO register_events (event_type, source_id, register_id, establishment_id, amount, employee_id, occurred_at, notes)
+SELECT 'take_out', ct.transaction_id, s.register_id, ct.establishment_id, ct.amount, ct.employee_id,
+       COALESCE(ct.transaction_date, CURRENT_TIMESTAMP),
+       COALESCE(ct.reason || CASE WHEN ct.notes IS NOT NULL THEN ': ' || ct.notes ELSE '' END, 'Money taken out')
+FROM cash_transactions ct
+LEFT JOIN cash_register_sessions s ON s.register_session_id = ct.session_id
+WHERE ct.transaction_type = 'cash_out'
+ON CONFLICT (event_type, source_id) DO NOTHING;
+
+ANALYZE register_events;
@@ -0,0 +1,8 @@
+-- Migration: Indexes for shipment verification scan sessions
+-- Scan sessions preload all items of a shipment joined to inventory by SKU
+-- (scan_sessions.ScanSessionManager.load) and batch-update items by primary key.
+
+CREATE INDEX IF NOT EXISTS idx_pending_shipment_items_shipment
+    ON pending_shipment_items (pending_shipment_id);
+CREATE INDEX IF NOT EXISTS idx_inventory_sku_lookup ON inventory (sku);
+CREATE INDEX IF NOT EXISTS idx_inventory_barcode ON inventory (barcode);
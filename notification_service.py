@@ -66,6 +66,7 @@ DEFAULT_PREFS = {
 
 def _get_sms_settings(store_id: int = 1):
     """Load sms_settings for store. Returns None if not found. Tolerates missing email_* columns."""
+    conn = None
     try:
         from database_postgres import get_connection
         conn = get_connection()
@@ -81,13 +82,13 @@ def _get_sms_settings(store_id: int = 1):
             )
             extended = True
         except Exception:
+            conn.rollback()
             cur.execute(
                 f"""SELECT {base_cols} FROM sms_settings WHERE store_id = %s AND is_active = 1 LIMIT 1""",
                 (store_id,)
             )
             extended = False
         row = cur.fetchone()
-        conn.close()
         if row:
             d = dict(row) if hasattr(row, 'keys') else None
             if d is None:
@@ -107,6 +108,9 @@ def _get_sms_settings(store_id: int = 1):
             return d
     except Exception as e:
         logger.warning("notification_service: could not load sms_settings: %s", e)
+    finally:
+        if conn is not None:
+            conn.close()
     return None
 
 
@@ -2130,11 +2134,12 @@ def send_register_notification(
         results["email"].append({"to": addr, **r})
 
     return results
-def check_scheduled_orders(store_id: int = 1):
+def check_scheduled_orders(store_id: int = 1, establishment_id: Optional[int] = None):
     """
     Check for orders scheduled in the next 30 minutes.
     If an order is found and no alert has been created for it yet, create one.
     Also sends email/SMS notifications based on preferences.
+    establishment_id limits the check to that establishment's orders (the scheduler runs it per establishment).
     """
     try:
         from database_postgres import get_connection
@@ -2160,7 +2165,8 @@ def check_scheduled_orders(store_id: int = 1):
                   WHERE a.order_id = o.order_id 
                     AND a.alert_type = 'upcoming'
               )
-        """, (now, upcoming_window))
+              AND (%s::int IS NULL OR o.establishment_id = %s)
+        """, (now, upcoming_window, establishment_id, establishment_id))
         
         upcoming_orders = cur.fetchall()
         
@@ -2201,13 +2207,3 @@ def check_scheduled_orders(store_id: int = 1):
     except Exception as e:
         logger.error(f"Error in check_scheduled_orders: {e}")
 
-def scheduled_orders_worker():
-    """Background worker to check for scheduled orders periodically."""
-    import time
-    logger.info("Starting scheduled_orders_worker")
-    while True:
-        try:
-            check_scheduled_orders()
-        except Exception as e:
-            logger.error(f"Worker iteration failed: {e}")
-        time.sleep(60) # Check every minute
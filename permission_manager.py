@@ -10,6 +10,7 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 from functools import wraps
 from database import get_connection
+from audit_buffer import get_audit_buffer, flush_audit_log
 from psycopg2.extras import RealDictCursor
 
 
@@ -244,7 +245,8 @@ class PermissionManager:
                 granted_by, 'grant_permission', 'employee',
                 employee_id,
                 f"Granted {permission_name} to employee {employee_id}",
-                None
+                None,
+                sync=True
             )
             
             return True
@@ -294,7 +296,8 @@ class PermissionManager:
                 revoked_by, 'revoke_permission', 'employee',
                 employee_id,
                 f"Revoked {permission_name} from employee {employee_id}",
-                None
+                None,
+                sync=True
             )
             
             return True
@@ -307,43 +310,25 @@ class PermissionManager:
             conn.close()
     
     def log_activity(self, employee_id: int, action: str, resource_type: Optional[str],
-                     resource_id: Optional[int], details: str, ip_address: Optional[str] = None):
-        """Log employee activity into audit_log (single audit trail)."""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+                     resource_id: Optional[int], details: str, ip_address: Optional[str] = None,
+                     sync: bool = False):
+        """Log employee activity into audit_log (single audit trail) via the write-behind audit buffer."""
         try:
-            cursor.execute(
-                "SELECT establishment_id FROM employees WHERE employee_id = %s",
-                (employee_id,),
-            )
-            row = cursor.fetchone()
-            establishment_id = row[0] if row and (isinstance(row, tuple) and row[0]) else None
-            if not establishment_id:
-                cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-                row = cursor.fetchone()
-                establishment_id = row[0] if row and (isinstance(row, tuple) and row[0]) else 1
-            cursor.execute("""
-                INSERT INTO audit_log
-                (establishment_id, table_name, record_id, action_type, employee_id, details, ip_address, resource_type)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                establishment_id,
-                resource_type or "activity",
-                resource_id or 0,
-                action,
-                employee_id,
-                details,
-                ip_address,
-                resource_type,
-            ))
-            conn.commit()
+            get_audit_buffer().log({
+                'table_name': resource_type or "activity",
+                'record_id': resource_id or 0,
+                'action_type': action,
+                'employee_id': employee_id,
+                'details': details,
+                'ip_address': ip_address,
+                'resource_type': resource_type,
+            }, sync=sync)
         except Exception as e:
             print(f"Error logging activity: {e}")
-        finally:
-            conn.close()
 
     def get_activity_log(self, limit: int = 100, employee_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get activity entries from audit_log (single audit trail). Returns shape compatible with former activity_log."""
+        flush_audit_log()
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
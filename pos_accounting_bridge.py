@@ -5,6 +5,9 @@ when POS events occur (sale completed, shipment received).
 Uses accounting.accounts / accounting.transactions (same data the Accounting page shows).
 """
 
+import os
+import threading
+import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
@@ -13,22 +16,60 @@ from database import get_connection
 from psycopg2.extras import RealDictCursor
 
 # Accounting backend (accounting schema)
-from backend.models.account_model import AccountRepository
 from backend.models.transaction_model import TransactionRepository
 
 
+# Chart of accounts map (account_number -> account id); accounts change rarely, so it is cached
+ACCOUNT_MAP_TTL = int(os.getenv('ACCOUNT_MAP_TTL', '300'))
+_account_map: Optional[Dict[str, int]] = None
+_account_map_loaded_at = 0.0
+_account_map_lock = threading.Lock()
+
+
+def invalidate_account_map() -> None:
+    """Drop the cached chart-of-accounts map (reloaded on next use)."""
+    global _account_map
+    with _account_map_lock:
+        _account_map = None
+
+
+def get_account_id_map(refresh: bool = False) -> Dict[str, int]:
+    """Return {account_number: account_id} for all accounts, loaded with one query and cached."""
+    global _account_map, _account_map_loaded_at
+    with _account_map_lock:
+        if (not refresh and _account_map is not None
+                and time.monotonic() - _account_map_loaded_at < ACCOUNT_MAP_TTL):
+            return _account_map
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("""
+                SELECT id, account_number FROM accounting.accounts
+                WHERE account_number IS NOT NULL
+            """)
+            _account_map = {str(r['account_number']): r['id'] for r in cursor.fetchall()}
+            _account_map_loaded_at = time.monotonic()
+        finally:
+            conn.close()
+        return _account_map
+
+
 def _resolve_lines_to_account_ids(line_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """Convert line items with account_number to lines with account_id. Raises if any account missing."""
+    accounts = get_account_id_map()
+    if any(str(item.get('account_number')) not in accounts for item in line_items if item.get('account_number')):
+        # Account may have been added since the map was loaded
+        accounts = get_account_id_map(refresh=True)
     out = []
     for item in line_items:
         acct_num = item.get('account_number')
         if not acct_num:
             raise ValueError('Line item missing account_number')
-        account = AccountRepository.find_by_account_number(str(acct_num))
-        if not account:
+        account_id = accounts.get(str(acct_num))
+        if not account_id:
             raise ValueError(f'Account not found: {acct_num}')
         out.append({
-            'account_id': account.id,
+            'account_id': account_id,
             'debit_amount': float(item.get('debit_amount', 0)),
             'credit_amount': float(item.get('credit_amount', 0)),
             'description': item.get('description', ''),
@@ -55,11 +96,59 @@ def _ensure_accounting_ready() -> None:
         print(f"Accounting bootstrap check: {e}")
 
 
+_orders_has_tip_and_payment: Optional[bool] = None
+
+
+def _orders_sale_select(cursor) -> str:
+    """SELECT list for sale journalizing; orders columns are probed once per process."""
+    global _orders_has_tip_and_payment
+    if _orders_has_tip_and_payment is None:
+        cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = 'orders'
+        """)
+        columns = [r['column_name'] for r in cursor.fetchall()]
+        _orders_has_tip_and_payment = 'tip' in columns and 'payment_method' in columns
+    if _orders_has_tip_and_payment:
+        return "o.order_id, o.total, o.tax_amount, o.subtotal, o.transaction_fee, o.tip, o.payment_method"
+    return ("o.order_id, o.total, o.tax_amount, o.subtotal, "
+            "COALESCE(o.transaction_fee, 0) as transaction_fee, "
+            "0.0 as tip, COALESCE(o.payment_method, 'cash') as payment_method")
+
+
+def _build_sale_line_items(order: Dict[str, Any], payment: Optional[Dict[str, Any]], cogs: float) -> List[Dict[str, Any]]:
+    """Journal lines (by account_number) for a completed sale."""
+    if not payment:
+        payment = {
+            'net_amount': order['total'],
+            'transaction_fee': order.get('transaction_fee', 0.0)
+        }
+    cash_account = _payment_account_for_order(order)
+    tip_amount = float(order.get('tip', 0) or 0)
+
+    line_items = [
+        {'account_number': cash_account, 'debit_amount': float(payment['net_amount'] or 0) + tip_amount, 'credit_amount': 0, 'description': 'Payment received (net + tip)'},
+        {'account_number': '4000', 'debit_amount': 0, 'credit_amount': float(order['subtotal'] or 0), 'description': 'Sales revenue'},
+        {'account_number': '2040', 'debit_amount': 0, 'credit_amount': float(order['tax_amount'] or 0), 'description': 'Sales tax collected'},
+        {'account_number': '5000', 'debit_amount': cogs, 'credit_amount': 0, 'description': 'Cost of goods sold'},
+        {'account_number': '1200', 'debit_amount': 0, 'credit_amount': cogs, 'description': 'Inventory reduction'},
+    ]
+    if tip_amount > 0:
+        line_items.append({'account_number': '4100', 'debit_amount': 0, 'credit_amount': tip_amount, 'description': 'Tip income'})
+    fee = float(payment.get('transaction_fee', 0) or 0)
+    if fee > 0:
+        line_items.append({'account_number': '5100', 'debit_amount': fee, 'credit_amount': 0, 'description': 'Payment processing fee'})
+        gross = float(order['total'] or 0)
+        line_items[0]['debit_amount'] = gross + tip_amount
+    return line_items
+
+
 def journalize_sale_to_accounting(order_id: int, employee_id: int) -> Dict[str, Any]:
     """
     Create and post a sales_receipt transaction in accounting.transactions for a completed order.
     Uses same logic as database.journalize_sale but writes to accounting schema.
     Idempotent: skips if a posted transaction already exists for this order.
+    Checkout paths should prefer journal_queue.enqueue_sale_journalization (batched, off the request path).
     """
     _ensure_accounting_ready()
     # Idempotency: skip if we already posted a sale for this order
@@ -70,27 +159,7 @@ def journalize_sale_to_accounting(order_id: int, employee_id: int) -> Dict[str,
     conn = get_connection()
     cursor = conn.cursor(cursor_factory=RealDictCursor)
     try:
-        # Check order columns (tip, payment_method)
-        cursor.execute("""
-            SELECT column_name FROM information_schema.columns
-            WHERE table_schema = 'public' AND table_name = 'orders'
-        """)
-        columns = [r['column_name'] for r in cursor.fetchall()]
-        has_tip = 'tip' in columns
-        has_payment = 'payment_method' in columns
-
-        if has_tip and has_payment:
-            cursor.execute("""
-                SELECT o.total, o.tax_amount, o.subtotal, o.transaction_fee, o.tip, o.payment_method
-                FROM orders o WHERE o.order_id = %s
-            """, (order_id,))
-        else:
-            cursor.execute("""
-                SELECT o.total, o.tax_amount, o.subtotal,
-                       COALESCE(o.transaction_fee, 0) as transaction_fee,
-                       0.0 as tip, COALESCE(o.payment_method, 'cash') as payment_method
-                FROM orders o WHERE o.order_id = %s
-            """, (order_id,))
+        cursor.execute(f"SELECT {_orders_sale_select(cursor)} FROM orders o WHERE o.order_id = %s", (order_id,))
 
         order_row = cursor.fetchone()
         if not order_row:
@@ -102,10 +171,7 @@ def journalize_sale_to_accounting(order_id: int, employee_id: int) -> Dict[str,
             SELECT net_amount, transaction_fee FROM payment_transactions WHERE order_id = %s LIMIT 1
         """, (order_id,))
         pay_row = cursor.fetchone()
-        payment = dict(pay_row) if pay_row else {
-            'net_amount': order['total'],
-            'transaction_fee': order.get('transaction_fee', 0.0)
-        }
+        payment = dict(pay_row) if pay_row else None
         cursor.execute("""
             SELECT COALESCE(SUM(oi.quantity * i.product_cost), 0) as cogs
             FROM order_items oi
@@ -116,25 +182,7 @@ def journalize_sale_to_accounting(order_id: int, employee_id: int) -> Dict[str,
         cogs = float(cogs_row['cogs'] or 0) if cogs_row else 0.0
         conn.close()
 
-        cash_account = _payment_account_for_order(order)
-        tip_amount = float(order.get('tip', 0) or 0)
-
-        line_items = [
-            {'account_number': cash_account, 'debit_amount': float(payment['net_amount'] or 0) + tip_amount, 'credit_amount': 0, 'description': 'Payment received (net + tip)'},
-            {'account_number': '4000', 'debit_amount': 0, 'credit_amount': float(order['subtotal'] or 0), 'description': 'Sales revenue'},
-            {'account_number': '2040', 'debit_amount': 0, 'credit_amount': float(order['tax_amount'] or 0), 'description': 'Sales tax collected'},
-            {'account_number': '5000', 'debit_amount': cogs, 'credit_amount': 0, 'description': 'Cost of goods sold'},
-            {'account_number': '1200', 'debit_amount': 0, 'credit_amount': cogs, 'description': 'Inventory reduction'},
-        ]
-        if tip_amount > 0:
-            line_items.append({'account_number': '4100', 'debit_amount': 0, 'credit_amount': tip_amount, 'description': 'Tip income'})
-        fee = float(payment.get('transaction_fee', 0) or 0)
-        if fee > 0:
-            line_items.append({'account_number': '5100', 'debit_amount': fee, 'credit_amount': 0, 'description': 'Payment processing fee'})
-            gross = float(order['total'] or 0)
-            line_items[0]['debit_amount'] = gross + tip_amount
-
-        lines = _resolve_lines_to_account_ids(line_items)
+        lines = _resolve_lines_to_account_ids(_build_sale_line_items(order, payment, cogs))
         data = {
             'transaction_number': f'POS-{order_id}',
             'transaction_date': datetime.now().date().isoformat(),
@@ -158,6 +206,110 @@ def journalize_sale_to_accounting(order_id: int, employee_id: int) -> Dict[str,
         return {'success': False, 'message': str(e)}
 
 
+def journalize_sales_batch_to_accounting(entries: List[Dict[str, Any]], conn=None) -> Dict[int, Dict[str, Any]]:
+    """
+    Journalize many completed orders at once (used by the journal queue worker).
+    entries: [{'order_id', 'employee_id', 'transaction_date'}]. Orders, payments and COGS are
+    fetched with one query each, accounts come from the cached chart-of-accounts map, and all
+    transactions + lines are inserted (already posted) with two multi-row INSERTs.
+    Commits unless conn is passed, in which case the caller owns the transaction.
+    Idempotent like journalize_sale_to_accounting. Returns {order_id: result} for every entry.
+    Raises if the batch insert fails, so the caller can retry orders one by one.
+    """
+    from psycopg2.extras import execute_values
+
+    _ensure_accounting_ready()
+    by_order = {int(e['order_id']): e for e in entries}
+    order_ids = list(by_order)
+    if not order_ids:
+        return {}
+    results: Dict[int, Dict[str, Any]] = {}
+
+    for oid, txn_id in TransactionRepository.find_posted_ids_by_source_documents('order', order_ids).items():
+        results[oid] = {'success': True, 'transaction_id': txn_id, 'skipped': True}
+    todo = [oid for oid in order_ids if oid not in results]
+    if not todo:
+        return results
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(f"SELECT {_orders_sale_select(cursor)} FROM orders o WHERE o.order_id = ANY(%s)", (todo,))
+        orders = {r['order_id']: dict(r) for r in cursor.fetchall()}
+        cursor.execute("""
+            SELECT DISTINCT ON (order_id) order_id, net_amount, transaction_fee
+            FROM payment_transactions WHERE order_id = ANY(%s)
+            ORDER BY order_id
+        """, (todo,))
+        payments = {r['order_id']: dict(r) for r in cursor.fetchall()}
+        cursor.execute("""
+            SELECT oi.order_id, COALESCE(SUM(oi.quantity * i.product_cost), 0) as cogs
+            FROM order_items oi
+            JOIN inventory i ON oi.product_id = i.product_id
+            WHERE oi.order_id = ANY(%s)
+            GROUP BY oi.order_id
+        """, (todo,))
+        cogs_by_order = {r['order_id']: float(r['cogs'] or 0) for r in cursor.fetchall()}
+
+        headers = []
+        lines_by_order: Dict[int, List[Dict[str, Any]]] = {}
+        for oid in todo:
+            order = orders.get(oid)
+            if not order:
+                results[oid] = {'success': False, 'message': 'Order not found'}
+                continue
+            try:
+                lines = _resolve_lines_to_account_ids(
+                    _build_sale_line_items(order, payments.get(oid), cogs_by_order.get(oid, 0.0)))
+                if not TransactionRepository.validate_balance(lines):
+                    raise ValueError('Transaction is not balanced. Total debits must equal total credits.')
+            except Exception as e:
+                results[oid] = {'success': False, 'message': str(e)}
+                continue
+            employee_id = by_order[oid].get('employee_id')
+            txn_date = by_order[oid].get('transaction_date') or datetime.now().date()
+            headers.append((f'POS-{oid}', txn_date, 'sales_receipt', f'Sale – Order #{oid}',
+                            oid, 'order', True, employee_id, employee_id))
+            lines_by_order[oid] = lines
+
+        if headers:
+            created = execute_values(cursor, """
+                INSERT INTO accounting.transactions (
+                    transaction_number, transaction_date, transaction_type, description,
+                    source_document_id, source_document_type, is_posted, created_by, updated_by
+                ) VALUES %s
+                RETURNING id, source_document_id, transaction_number
+            """, headers, page_size=len(headers), fetch=True)
+            line_rows = []
+            for row in created:
+                oid = row['source_document_id']
+                for i, line in enumerate(lines_by_order[oid], 1):
+                    line_rows.append((row['id'], line['account_id'], i, line['debit_amount'],
+                                      line['credit_amount'], line['description']))
+                results[oid] = {'success': True, 'transaction_id': row['id'], 'entry_number': row['transaction_number']}
+            if line_rows:
+                execute_values(cursor, """
+                    INSERT INTO accounting.transaction_lines (
+                        transaction_id, account_id, line_number, debit_amount, credit_amount, description
+                    ) VALUES %s
+                """, line_rows, page_size=1000)
+        if own_conn:
+            conn.commit()
+        return results
+    except Exception:
+        if own_conn:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+
 def journalize_shipment_received_to_accounting(pending_shipment_id: int, employee_id: int) -> Dict[str, Any]:
     """
     Create and post a journal entry in accounting.transactions when a pending shipment
@@ -7,34 +7,55 @@ import re
 from typing import Dict, Any, Optional
 from datetime import datetime
 import io
+import threading
 
-try:
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.units import inch
-    from reportlab.pdfgen import canvas
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
-    print("Warning: reportlab not installed. Receipt generation will be limited.")
+from barcode_images import barcode_png
 
-try:
-    import qrcode
-    QRCODE_AVAILABLE = True
-except ImportError:
-    QRCODE_AVAILABLE = False
-    print("Warning: qrcode not installed. QR code generation will be limited.")
+# reportlab, qrcode and python-barcode are imported by _load_pdf_libs() on the first PDF / barcode,
+# so reading receipt settings or email data doesn't load them
+REPORTLAB_AVAILABLE = False
+QRCODE_AVAILABLE = False
+BARCODE_AVAILABLE = False
+_pdf_libs_loaded = False
+_pdf_libs_lock = threading.Lock()
 
-try:
-    import barcode
-    from barcode.writer import ImageWriter
-    BARCODE_AVAILABLE = True
-except ImportError:
-    BARCODE_AVAILABLE = False
-    print("Warning: python-barcode not installed. Barcode generation will be limited.")
+
+def _load_pdf_libs():
+    """Import the optional PDF / barcode libraries into this module (once) and set the *_AVAILABLE flags."""
+    global _pdf_libs_loaded, REPORTLAB_AVAILABLE, QRCODE_AVAILABLE, BARCODE_AVAILABLE
+    global letter, A4, inch, canvas, colors, getSampleStyleSheet, ParagraphStyle
+    global SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, TA_CENTER, TA_LEFT, TA_RIGHT
+    global qrcode, barcode, ImageWriter
+    if _pdf_libs_loaded:
+        return
+    with _pdf_libs_lock:
+        if _pdf_libs_loaded:
+            return
+        try:
+            from reportlab.lib.pagesizes import letter, A4
+            from reportlab.lib.units import inch
+            from reportlab.pdfgen import canvas
+            from reportlab.lib import colors
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+            from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+            REPORTLAB_AVAILABLE = True
+        except ImportError:
+            print("Warning: reportlab not installed. Receipt generation will be limited.")
+
+        try:
+            import qrcode
+            QRCODE_AVAILABLE = True
+        except ImportError:
+            print("Warning: qrcode not installed. QR code generation will be limited.")
+
+        try:
+            import barcode
+            from barcode.writer import ImageWriter
+            BARCODE_AVAILABLE = True
+        except ImportError:
+            print("Warning: python-barcode not installed. Barcode generation will be limited.")
+        _pdf_libs_loaded = True
 
 def get_receipt_settings() -> Dict[str, Any]:
     """Get receipt settings from database (PostgreSQL). Merges in store_location_settings
@@ -127,7 +148,7 @@ def _to_reportlab_align(align: str):
     return TA_LEFT
 
 
-def _build_style(ts: dict, prefix: str, default_font_size: float, parent_style, default_bold: bool = False, align_fallback: str = None) -> ParagraphStyle:
+def _build_style(ts: dict, prefix: str, default_font_size: float, parent_style, default_bold: bool = False, align_fallback: str = None) -> 'ParagraphStyle':
     """Build a ParagraphStyle from template_styles using prefix (e.g. store_name, item_name)."""
     bold_default = default_bold if prefix == 'store_name' else ts.get('bold_item_names', False)
     font = _to_reportlab_font(
@@ -153,8 +174,21 @@ def _build_style(ts: dict, prefix: str, default_font_size: float, parent_style,
     )
 
 
+# Order-number barcode on receipts, optimized for fast scanning: wider bars, taller height,
+# larger quiet zone; the order number is printed separately, not under the bars
+RECEIPT_BARCODE_OPTIONS = {
+    'module_width': 0.4,
+    'module_height': 20.0,
+    'quiet_zone': 6.0,
+    'font_size': 8,
+    'text_distance': 3.0,
+    'write_text': False,
+}
+
+
 def generate_barcode_data(order_number: str) -> bytes:
     """Generate Code128 barcode image data for order number"""
+    _load_pdf_libs()
     if not BARCODE_AVAILABLE:
         # Fallback to QR code if barcode library not available
         if QRCODE_AVAILABLE:
@@ -176,27 +210,9 @@ def generate_barcode_data(order_number: str) -> bytes:
         return b''
     
     try:
-        # Generate Code128 barcode
-        code128 = barcode.get_barcode_class('code128')
-        barcode_instance = code128(order_number, writer=ImageWriter())
-        
-        # Create image with custom options for receipt printing
-        # Optimized for fast scanning: wider bars, taller height, larger quiet zone
-        options = {
-            'module_width': 0.4,  # Slightly wider bars for easier scanning (was 0.3)
-            'module_height': 20.0,  # Taller barcode for better alignment (was 15.0)
-            'quiet_zone': 6.0,  # Larger quiet zone - critical for scanner detection (was 2.0)
-            'font_size': 8,  # Font size for text below barcode
-            'text_distance': 3.0,  # Distance between barcode and text
-            'write_text': False,  # Don't show order number below barcode (we display it separately)
-        }
-        
-        # Generate barcode image using render() method which returns a PIL Image
-        img = barcode_instance.render(options)
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        barcode_bytes = img_bytes.getvalue()
-        img_bytes.close()
+        # Code128 from the barcode image cache (barcode_images.py): the receipt, its email and
+        # reprints of the same order render the image once. Memory only: order numbers don't repeat.
+        barcode_bytes, _ = barcode_png('code128', order_number, RECEIPT_BARCODE_OPTIONS, persist=False)
         
         if len(barcode_bytes) > 0:
             return barcode_bytes
@@ -239,6 +255,7 @@ def generate_receipt_pdf(order_data: Dict[str, Any], order_items: list, settings
     Returns:
         PDF bytes
     """
+    _load_pdf_libs()
     if not REPORTLAB_AVAILABLE:
         raise ImportError("reportlab is required for receipt generation. Install with: pip install reportlab")
     
@@ -1484,6 +1501,7 @@ def generate_return_receipt(return_id: int) -> Optional[bytes]:
     from database import get_connection
     from psycopg2.extras import RealDictCursor
     
+    _load_pdf_libs()
     if not REPORTLAB_AVAILABLE:
         print("ReportLab not available. Cannot generate return receipt.")
         return None
@@ -1619,6 +1637,7 @@ def generate_return_receipt(return_id: int) -> Optional[bytes]:
 
 def generate_exchange_receipt(exchange_credit_id: int, exchange_credit_number: str, credit_amount: float) -> Optional[bytes]:
     """Generate exchange receipt (store credit) PDF with barcode"""
+    _load_pdf_libs()
     if not REPORTLAB_AVAILABLE:
         print("ReportLab not available. Cannot generate exchange receipt.")
         return None
@@ -1683,6 +1702,7 @@ def generate_exchange_completion_receipt(return_id: int, order_id: int) -> Optio
     from database import get_connection
     from psycopg2.extras import RealDictCursor
 
+    _load_pdf_libs()
     if not REPORTLAB_AVAILABLE:
         return None
 
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+In-memory scan sessions for shipment verification.
+When verification starts, the shipment's items are preloaded into a barcode/SKU -> item map,
+so each handheld scan is a dictionary lookup plus an in-memory counter increment.
+Counter deltas, scan log rows and session stats are written back in batches
+(one UPDATE ... FROM (VALUES ...) per table) every SCAN_FLUSH_INTERVAL_MS or SCAN_FLUSH_MAX_SCANS scans.
+Increments are applied as deltas (quantity_verified = quantity_verified + n) so concurrent
+writers cannot lose updates, capped at quantity_expected: each process decides match / duplicate
+from its own in-memory counts, so two processes can both accept the last unit of an item; the
+capped flush keeps the stored count right and reloads the sessions that over-counted.
+A flush that cannot reach the database re-queues its batch for the next one.
+"""
+
+import os
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from database_postgres import get_connection, register_prepared_statement, execute_prepared
+
+logger = logging.getLogger(__name__)
+
+register_prepared_statement(
+    'scan_session_items',
+    """
+    SELECT psi.pending_item_id, psi.establishment_id, psi.pending_shipment_id, psi.product_sku,
+           psi.product_name, psi.quantity_expected, psi.quantity_verified, psi.unit_cost, psi.lot_number,
+           psi.expiration_date, psi.discrepancy_notes, psi.barcode, psi.line_number, psi.status,
+           psi.verified_by, psi.verified_at,
+           i.product_id, i.product_name AS inventory_name, i.barcode AS inventory_barcode
+    FROM pending_shipment_items psi
+    LEFT JOIN inventory i ON i.sku = psi.product_sku
+    WHERE psi.pending_shipment_id = %s
+    ORDER BY COALESCE(psi.line_number, psi.pending_item_id), psi.pending_item_id
+    """,
+    ('integer',),
+)
+
+SCAN_FLUSH_INTERVAL_MS = int(os.getenv('SCAN_FLUSH_INTERVAL_MS', '250'))
+SCAN_FLUSH_MAX_SCANS = int(os.getenv('SCAN_FLUSH_MAX_SCANS', '50'))
+# Sessions not scanned for this long are dropped (reloaded from the DB on the next scan)
+SCAN_SESSION_IDLE_SECONDS = int(os.getenv('SCAN_SESSION_IDLE_SECONDS', '1800'))
+# Upper bound on scan log rows held in memory while the database is unreachable (oldest dropped first;
+# counter deltas are never dropped)
+SCAN_MAX_PENDING = int(os.getenv('SCAN_MAX_PENDING', str(SCAN_FLUSH_MAX_SCANS * 200)))
+_LATENCY_SAMPLES = 5000
+_CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, ConnectionError)
+
+
+class ShipmentScanSession:
+    """Preloaded items of one pending shipment, indexed by every code that may be scanned."""
+
+    def __init__(self, pending_shipment_id: int, items: Dict[int, Dict[str, Any]]):
+        self.pending_shipment_id = pending_shipment_id
+        self.items = items
+        self.lookup: Dict[str, List[int]] = {}
+        # Line order so the first matching line is filled first (same as the old query)
+        for item_id in sorted(items, key=lambda i: (items[i].get('line_number') or i, i)):
+            item = items[item_id]
+            for code in (item.get('barcode'), item.get('product_sku'), item.get('inventory_barcode')):
+                code = (str(code).strip() if code is not None else '')
+                if code and item_id not in self.lookup.get(code, []):
+                    self.lookup.setdefault(code, []).append(item_id)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class ScanSessionManager:
+    """Holds scan sessions for all shipments being verified in this process."""
+
+    def __init__(self):
+        self._sessions: Dict[int, ShipmentScanSession] = {}
+        self._sessions_lock = threading.Lock()
+        # Pending writes
+        self._pending_lock = threading.Lock()
+        self._item_deltas: Dict[int, List[Any]] = {}        # pending_item_id -> [delta, employee_id, verified_at]
+        self._scan_log: List[tuple] = []
+        self._session_stats: Dict[int, List[int]] = {}      # session_id -> [total_scans, items_verified]
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self._scan_latency_ms = deque(maxlen=_LATENCY_SAMPLES)
+        self._flush_latency_ms = deque(maxlen=_LATENCY_SAMPLES)
+        self._scan_count = 0
+        self._flush_count = 0
+        self._session_loads = 0
+
+    # ------------------------------------------------------------------ #
+    # Sessions
+    # ------------------------------------------------------------------ #
+
+    def load(self, pending_shipment_id: int, conn=None) -> ShipmentScanSession:
+        """(Re)load the shipment's items into memory. Flushes pending writes first."""
+        self.flush()
+        should_close = conn is None
+        if should_close:
+            conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            execute_prepared(cursor, 'scan_session_items', (pending_shipment_id,))
+            cols = [c[0] for c in cursor.description] if cursor.description else []
+            items: Dict[int, Dict[str, Any]] = {}
+            for row in cursor.fetchall():
+                item = dict(row) if isinstance(row, dict) else dict(zip(cols, row))
+                item_id = item['pending_item_id']
+                # inventory.sku is not unique; keep the first joined row per item
+                if item_id not in items:
+                    item['quantity_verified'] = item.get('quantity_verified') or 0
+                    item['quantity_expected'] = item.get('quantity_expected') or 0
+                    items[item_id] = item
+        finally:
+            if should_close:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        session = ShipmentScanSession(pending_shipment_id, items)
+        with self._sessions_lock:
+            self._sessions[pending_shipment_id] = session
+            self._drop_idle_sessions()
+        with self._metrics_lock:
+            self._session_loads += 1
+        return session
+
+    def get(self, pending_shipment_id: int) -> ShipmentScanSession:
+        with self._sessions_lock:
+            session = self._sessions.get(pending_shipment_id)
+        if session is None:
+            session = self.load(pending_shipment_id)
+        return session
+
+    def invalidate(self, pending_shipment_id: Optional[int] = None, pending_item_id: Optional[int] = None):
+        """
+        Flush and drop cached sessions after items are changed outside scan_item
+        (manual quantity edits, new items, product matching). No arguments drops all.
+        """
+        self.flush()
+        with self._sessions_lock:
+            if pending_shipment_id is not None:
+                self._sessions.pop(pending_shipment_id, None)
+            elif pending_item_id is not None:
+                for sid in [s for s, sess in self._sessions.items() if pending_item_id in sess.items]:
+                    del self._sessions[sid]
+            else:
+                self._sessions.clear()
+
+    def _drop_idle_sessions(self):
+        cutoff = time.monotonic() - SCAN_SESSION_IDLE_SECONDS
+        for sid in [s for s, sess in self._sessions.items() if sess.last_used < cutoff]:
+            del self._sessions[sid]
+
+    # ------------------------------------------------------------------ #
+    # Scanning
+    # ------------------------------------------------------------------ #
+
+    def scan(self, pending_shipment_id: int, barcode: str, employee_id: int,
+             device_id: Optional[str] = None, session_id: Optional[int] = None,
+             location: Optional[str] = None) -> Dict[str, Any]:
+        """Apply one scan in memory and queue the DB writes. Same response shape as database.scan_item."""
+        started = time.perf_counter()
+        session = self.get(pending_shipment_id)
+        code = (barcode or '').strip()
+        now = datetime.now()
+        pending_item_id = None
+
+        with session.lock:
+            session.last_used = time.monotonic()
+            candidates = [session.items[i] for i in session.lookup.get(code, ())]
+            item = next((it for it in candidates if it.get('status') != 'verified'
+                         and it['quantity_verified'] < it['quantity_expected']), None)
+            if item is None and candidates:
+                item = candidates[0]
+
+            if item is None:
+                scan_result = 'mismatch'
+                response = {
+                    'status': 'unknown',
+                    'message': 'Item not found in this shipment',
+                    'barcode': barcode,
+                    'suggest_issue': True
+                }
+            else:
+                pending_item_id = item['pending_item_id']
+                expected = item['quantity_expected']
+                if item['quantity_verified'] >= expected:
+                    scan_result = 'duplicate'
+                    response = {
+                        'status': 'duplicate',
+                        'message': f"Item already fully verified ({expected} units)",
+                        'item': dict(item)
+                    }
+                else:
+                    scan_result = 'match'
+                    snapshot = dict(item)
+                    new_quantity = item['quantity_verified'] + 1
+                    item['quantity_verified'] = new_quantity
+                    item['status'] = 'verified' if new_quantity >= expected else 'pending'
+                    item['verified_by'] = employee_id
+                    response = {
+                        'status': 'success',
+                        'item': snapshot,
+                        'quantity_verified': new_quantity,
+                        'quantity_expected': expected,
+                        'remaining': expected - new_quantity,
+                        'fully_verified': new_quantity >= expected
+                    }
+
+        with self._pending_lock:
+            if scan_result == 'match':
+                delta = self._item_deltas.setdefault(pending_item_id, [0, employee_id, now])
+                delta[0] += 1
+                delta[1] = employee_id
+                delta[2] = now
+                if session_id:
+                    stats = self._session_stats.setdefault(session_id, [0, 0])
+                    stats[0] += 1
+                    stats[1] += 1
+            self._scan_log.append((pending_shipment_id, pending_item_id, barcode, employee_id,
+                                   now, scan_result, device_id, location))
+            queued = len(self._scan_log)
+
+        self._ensure_thread()
+        if queued >= SCAN_FLUSH_MAX_SCANS:
+            self._wakeup.set()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._metrics_lock:
+            self._scan_latency_ms.append(elapsed_ms)
+            self._scan_count += 1
+        return response
+
+    # ------------------------------------------------------------------ #
+    # Write-back
+    # ------------------------------------------------------------------ #
+
+    def flush(self) -> int:
+        """Write queued counter deltas, scan log rows and session stats. Returns scans written.
+        When the database is unreachable the batch is re-queued for the next flush."""
+        with self._flush_lock:
+            with self._pending_lock:
+                deltas, self._item_deltas = self._item_deltas, {}
+                logs, self._scan_log = self._scan_log, []
+                stats, self._session_stats = self._session_stats, {}
+            if not (deltas or logs or stats):
+                return 0
+            started = time.perf_counter()
+            try:
+                overcounted = self._write(deltas, stats, logs)
+            except _CONNECTION_ERRORS as e:
+                # Database unreachable: the scanners were already told these scans counted, keep them
+                logger.warning("Scan flush failed (%d scans re-queued): %s", len(logs), e)
+                self._requeue(deltas, logs, stats)
+                return 0
+            except Exception as e:
+                # A bad scan log row must not cost the verified counts
+                logger.warning("Scan flush failed, writing counters and scan log separately: %s", e)
+                overcounted = self._write_separately(deltas, stats, logs)
+            if overcounted:
+                # Counters capped at quantity_expected (another process accepted the same units):
+                # reload so the next scan sees the stored counts
+                with self._sessions_lock:
+                    for sid in overcounted:
+                        self._sessions.pop(sid, None)
+            with self._metrics_lock:
+                self._flush_latency_ms.append((time.perf_counter() - started) * 1000.0)
+                self._flush_count += 1
+        # Outside the flush lock: listeners read the updated counters back
+        notify_progress({row[0] for row in logs if row[5] == 'match'})
+        return len(logs)
+
+    def _write(self, deltas: Dict[int, List[Any]], stats: Dict[int, List[int]], logs: List[tuple]) -> set:
+        """Write one batch in one transaction. Returns pending_shipment_ids whose counters were capped."""
+        overcounted = set()
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            if deltas:
+                rows = execute_values(cursor, """
+                    WITH v (pending_item_id, delta, employee_id, verified_at) AS (VALUES %s),
+                    locked AS (
+                        SELECT psi.pending_item_id, COALESCE(psi.quantity_verified, 0) AS verified
+                        FROM pending_shipment_items psi
+                        JOIN v ON v.pending_item_id = psi.pending_item_id
+                        FOR UPDATE OF psi
+                    )
+                    UPDATE pending_shipment_items AS psi
+                    SET quantity_verified = GREATEST(locked.verified,
+                                                     LEAST(COALESCE(psi.quantity_expected, 0), locked.verified + v.delta)),
+                        verified_by = v.employee_id,
+                        verified_at = v.verified_at,
+                        status = CASE
+                            WHEN locked.verified + v.delta >= COALESCE(psi.quantity_expected, 0)
+                            THEN 'verified' ELSE 'pending'
+                        END
+                    FROM v
+                    JOIN locked ON locked.pending_item_id = v.pending_item_id
+                    WHERE psi.pending_item_id = v.pending_item_id
+                    RETURNING psi.pending_shipment_id,
+                              locked.verified + v.delta > COALESCE(psi.quantity_expected, 0) AS capped
+                """, [(item_id, d[0], d[1], d[2]) for item_id, d in deltas.items()],
+                    template="(%s::integer, %s::integer, %s::integer, %s::timestamp)", fetch=True)
+                overcounted = {row[0] for row in rows if row[1]}
+            if stats:
+                execute_values(cursor, """
+                    UPDATE verification_sessions AS vs
+                    SET total_scans = COALESCE(vs.total_scans, 0) + v.scans,
+                        items_verified = COALESCE(vs.items_verified, 0) + v.verified
+                    FROM (VALUES %s) AS v(session_id, scans, verified)
+                    WHERE vs.session_id = v.session_id
+                """, [(sid, s[0], s[1]) for sid, s in stats.items()],
+                    template="(%s::integer, %s::integer, %s::integer)")
+            if logs:
+                execute_values(cursor, """
+                    INSERT INTO shipment_scan_log
+                    (pending_shipment_id, pending_item_id, scanned_barcode,
+                     scanned_by, scanned_at, scan_result, device_id, location)
+                    VALUES %s
+                """, logs)
+            conn.commit()
+            return overcounted
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def _write_separately(self, deltas: Dict[int, List[Any]], stats: Dict[int, List[int]], logs: List[tuple]) -> set:
+        """After a data error: counters and session stats first, then scan log rows one by one."""
+        overcounted = set()
+        try:
+            overcounted = self._write(deltas, stats, [])
+        except _CONNECTION_ERRORS as e:
+            logger.warning("Scan flush failed (%d scans re-queued): %s", len(logs), e)
+            self._requeue(deltas, logs, stats)
+            return overcounted
+        except Exception as e:
+            # In-memory counters are now ahead of the DB; reload the affected sessions from the DB
+            logger.error("Scan counter flush failed (%d scans); reloading affected sessions: %s", len(logs), e)
+            overcounted = {row[0] for row in logs}
+        for i, row in enumerate(logs):
+            try:
+                self._write({}, {}, [row])
+            except _CONNECTION_ERRORS:
+                self._requeue({}, logs[i:], {})
+                break
+            except Exception as e:
+                logger.error("Dropping scan log row (shipment %s, barcode %s): %s", row[0], row[2], e)
+        return overcounted
+
+    def _requeue(self, deltas: Dict[int, List[Any]], logs: List[tuple], stats: Dict[int, List[int]]):
+        """Put an unwritten batch back in front of what was queued since (newer scans keep their
+        employee / timestamp)."""
+        with self._pending_lock:
+            for item_id, delta in deltas.items():
+                current = self._item_deltas.get(item_id)
+                if current is None:
+                    self._item_deltas[item_id] = list(delta)
+                else:
+                    current[0] += delta[0]
+            for sid, counts in stats.items():
+                current = self._session_stats.setdefault(sid, [0, 0])
+                current[0] += counts[0]
+                current[1] += counts[1]
+            self._scan_log = logs + self._scan_log
+            overflow = len(self._scan_log) - SCAN_MAX_PENDING
+            if overflow > 0:
+                logger.error("Scan log buffer full; dropping %d oldest scan log rows", overflow)
+                del self._scan_log[:overflow]
+
+    def shutdown(self):
+        self._stopped = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._pending_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='scan-session-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = max(SCAN_FLUSH_INTERVAL_MS, 10) / 1000.0
+        while not self._stopped:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Scan flush error: %s", e)
+
+    # ------------------------------------------------------------------ #
+    # Metrics
+    # ------------------------------------------------------------------ #
+
+    def metrics(self) -> Dict[str, Any]:
+        """Scan-to-ack and flush latency percentiles (ms) plus counters."""
+        def summarize(samples):
+            if not samples:
+                return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+            ordered = sorted(samples)
+            pick = lambda pct: round(ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))], 3)
+            return {'count': len(ordered), 'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': round(ordered[-1], 3)}
+
+        with self._metrics_lock:
+            scan = summarize(list(self._scan_latency_ms))
+            flush = summarize(list(self._flush_latency_ms))
+            totals = {'scans': self._scan_count, 'flushes': self._flush_count, 'session_loads': self._session_loads}
+        with self._pending_lock:
+            queued = len(self._scan_log)
+        with self._sessions_lock:
+            active = len(self._sessions)
+        return {'scan_to_ack_ms': scan, 'flush_ms': flush, 'queued_scans': queued,
+                'active_sessions': active, **totals}
+
+
+# Global scan session manager instance
+_scan_sessions = None
+_scan_sessions_lock = threading.Lock()
+
+# Callbacks run with a set of pending_shipment_ids whose verification progress changed
+_progress_listeners: List[Any] = []
+
+
+def get_scan_session_manager() -> ScanSessionManager:
+    """Get or create the scan session manager singleton"""
+    global _scan_sessions
+    if _scan_sessions is None:
+        with _scan_sessions_lock:
+            if _scan_sessions is None:
+                _scan_sessions = ScanSessionManager()
+                atexit.register(_scan_sessions.shutdown)
+    return _scan_sessions
+
+
+def flush_scan_sessions() -> int:
+    """Write pending scans now (before reading verification state from the DB)."""
+    if _scan_sessions is None:
+        return 0
+    return _scan_sessions.flush()
+
+
+def invalidate_scan_sessions(pending_shipment_id: Optional[int] = None, pending_item_id: Optional[int] = None):
+    """Flush and drop cached sessions after items change outside of scanning."""
+    if _scan_sessions is not None:
+        _scan_sessions.invalidate(pending_shipment_id=pending_shipment_id, pending_item_id=pending_item_id)
+
+
+def add_progress_listener(callback):
+    """Register callback(pending_shipment_ids) run after scans are written or items/issues change."""
+    if callback not in _progress_listeners:
+        _progress_listeners.append(callback)
+
+
+def notify_progress(pending_shipment_ids):
+    """Tell listeners (e.g. the Socket.IO progress push) which shipments' counters changed."""
+    ids = {int(i) for i in (pending_shipment_ids or ()) if i is not None}
+    if not ids:
+        return
+    for callback in list(_progress_listeners):
+        try:
+            callback(ids)
+        except Exception as e:
+            logger.warning("Shipment progress listener failed: %s", e)
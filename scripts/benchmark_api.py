@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Benchmark / load-test the Flask API hot paths.
+Seeds the current (first) establishment of a LOCAL PostgreSQL database with a synthetic store
+(products, variants, customers, employees, a vendor shipment, a year of orders and journal
+entries), then drives the POS, inventory, order, customer search, shipment scan and accounting
+report endpoints concurrently through the Flask app in-process. Prints throughput, p50 / p95 /
+p99 latency and DB queries per request for every endpoint and saves the results as JSON.
+Compare two runs with --compare to spot regressions.
+
+Usage (from project root, against a scratch database):
+    python scripts/benchmark_api.py                              # seed if needed, then run
+    python scripts/benchmark_api.py --requests 500 --concurrency 16
+    python scripts/benchmark_api.py --endpoints create_order,orders,customers_search
+    python scripts/benchmark_api.py --compare benchmark_results/api_20260101_120000.json
+    python scripts/benchmark_api.py --base-url http://localhost:5001   # drive a running server
+    python scripts/benchmark_api.py --cleanup                    # remove benchmark data
+
+Seeded rows are tagged (SKU / email / order number prefix BENCH-) so --cleanup can remove them.
+Query counts and DB time come from the X-DB-Queries / X-DB-Time-Ms response headers (see
+database_postgres instrumentation); with --base-url the server must run in debug mode or with
+DB_PERF_HEADERS=1. Statements run by background workers (journal queue, scan flush) are not
+attributed to the request that queued them.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2
+
+# In-process runs read per-request DB stats from response headers
+os.environ.setdefault('DB_PERF_HEADERS', '1')
+
+import database_postgres
+from database_postgres import get_connection
+
+BENCH_PREFIX = 'BENCH'
+BENCH_VENDOR_NAME = 'Benchmark Vendor'
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark_results')
+
+ENDPOINTS = ['create_order', 'pos_bootstrap', 'inventory', 'orders', 'customers_search',
+             'shipment_scan', 'report_profit_loss', 'report_balance_sheet', 'report_trial_balance']
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'William', 'Barbara', 'Carlos', 'Maria', 'Wei', 'Aisha']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Nguyen', 'Kim', 'Patel', 'Ivanova', 'Wilson', 'Moore']
+
+
+# --------------------------------------------------------------------------- #
+# Seeding
+# --------------------------------------------------------------------------- #
+
+def _scalar(cursor, sql, params=None):
+    cursor.execute(sql, params)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row[0] if not isinstance(row, dict) else next(iter(row.values()))
+
+
+def _require_local_db(allow_remote: bool):
+    target = database_postgres._build_connection_string()
+    if allow_remote or 'localhost' in target or '127.0.0.1' in target:
+        return
+    raise SystemExit("Refusing to seed a non-local database. Point DATABASE_URL / DB_HOST at a scratch "
+                     "PostgreSQL instance or pass --allow-remote.")
+
+
+def seed_store(args) -> dict:
+    """Insert the synthetic store (skips parts that are already seeded). Returns ids used by the scenarios."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        establishment_id = _scalar(cursor, "SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
+        if establishment_id is None:
+            establishment_id = _scalar(cursor, """
+                INSERT INTO establishments (establishment_name, establishment_type)
+                VALUES ('Benchmark Store', 'retail') RETURNING establishment_id
+            """)
+        start = time.perf_counter()
+
+        # Employees
+        existing = _scalar(cursor, "SELECT COUNT(*) FROM employees WHERE employee_code LIKE %s", (BENCH_PREFIX + '-%',))
+        if existing < args.employees:
+            cursor.execute("""
+                INSERT INTO employees (establishment_id, employee_code, first_name, last_name, "position",
+                                       date_started, active)
+                SELECT %s, %s || '-EMP-' || g, (%s::text[])[1 + g %% array_length(%s::text[], 1)],
+                       'Bench' || g, CASE WHEN g %% 10 = 0 THEN 'manager' ELSE 'cashier' END,
+                       CURRENT_DATE - 400, 1
+                FROM generate_series(%s, %s) AS g
+            """, (establishment_id, BENCH_PREFIX, FIRST_NAMES, FIRST_NAMES, existing + 1, args.employees))
+        cursor.execute("SELECT employee_id FROM employees WHERE employee_code LIKE %s ORDER BY employee_id",
+                       (BENCH_PREFIX + '-%',))
+        employee_ids = [r[0] for r in cursor.fetchall()]
+
+        # Vendor
+        vendor_id = _scalar(cursor, "SELECT vendor_id FROM vendors WHERE vendor_name = %s", (BENCH_VENDOR_NAME,))
+        if vendor_id is None:
+            vendor_id = _scalar(cursor, """
+                INSERT INTO vendors (establishment_id, vendor_name) VALUES (%s, %s) RETURNING vendor_id
+            """, (establishment_id, BENCH_VENDOR_NAME))
+
+        # Products (+ variants for every fifth product)
+        existing = _scalar(cursor, "SELECT COUNT(*) FROM inventory WHERE sku LIKE %s", (BENCH_PREFIX + '-%',))
+        if existing < args.products:
+            cursor.execute("""
+                INSERT INTO inventory (establishment_id, product_name, sku, barcode, product_price, product_cost,
+                                       vendor_id, current_quantity, category)
+                SELECT %s, 'Bench Product ' || g, %s || '-' || lpad(g::text, 7, '0'), '99' || lpad(g::text, 10, '0'),
+                       round((1 + (g %% 97) * 0.37)::numeric, 2), round((0.5 + (g %% 97) * 0.15)::numeric, 2),
+                       %s, 1000000, 'Bench Category ' || (g %% 25)
+                FROM generate_series(%s, %s) AS g
+            """, (establishment_id, BENCH_PREFIX, vendor_id, existing + 1, args.products))
+            try:
+                cursor.execute("SAVEPOINT bench_variants")
+                cursor.execute("""
+                    INSERT INTO product_variants (product_id, variant_name, price, cost, sort_order)
+                    SELECT i.product_id, v.name, i.product_price + v.extra, i.product_cost, v.ord
+                    FROM inventory i
+                    CROSS JOIN (VALUES ('Small', 0.00, 0), ('Large', 1.50, 1)) AS v(name, extra, ord)
+                    WHERE i.sku LIKE %s AND i.product_id %% 5 = 0
+                    ON CONFLICT DO NOTHING
+                """, (BENCH_PREFIX + '-%',))
+                cursor.execute("RELEASE SAVEPOINT bench_variants")
+            except psycopg2.Error as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT bench_variants")
+                print(f"  (skipping variants: {e.pgerror or e})")
+        cursor.execute("SELECT product_id, product_price, barcode FROM inventory WHERE sku LIKE %s ORDER BY product_id",
+                       (BENCH_PREFIX + '-%',))
+        products = [(r[0], float(r[1]), r[2]) for r in cursor.fetchall()]
+
+        # Customers
+        existing = _scalar(cursor, "SELECT COUNT(*) FROM customers WHERE email LIKE %s", ('%@' + BENCH_PREFIX.lower() + '.example.com',))
+        if existing < args.customers:
+            cursor.execute("""
+                INSERT INTO customers (establishment_id, customer_name, email, phone, loyalty_points)
+                SELECT %s,
+                       (%s::text[])[1 + (g %% array_length(%s::text[], 1))] || ' ' ||
+                           (%s::text[])[1 + ((g / 7) %% array_length(%s::text[], 1))] || ' ' || g,
+                       'customer' || g || '@' || lower(%s) || '.example.com',
+                       '(' || (200 + g %% 800) || ') ' || lpad((g %% 1000)::text, 3, '0') || '-' || lpad((g %% 10000)::text, 4, '0'),
+                       g %% 500
+                FROM generate_series(%s, %s) AS g
+            """, (establishment_id, FIRST_NAMES, FIRST_NAMES, LAST_NAMES, LAST_NAMES, BENCH_PREFIX,
+                  existing + 1, args.customers))
+        cursor.execute("SELECT customer_id FROM customers WHERE email LIKE %s ORDER BY customer_id",
+                       ('%@' + BENCH_PREFIX.lower() + '.example.com',))
+        customer_ids = [r[0] for r in cursor.fetchall()]
+        conn.commit()
+
+        # A year of orders (1-4 lines each, two thirds with a customer)
+        existing = _scalar(cursor, "SELECT COUNT(*) FROM orders WHERE order_number LIKE %s", (BENCH_PREFIX + '-%',))
+        target_orders = args.days * args.orders_per_day
+        if existing < target_orders and products and employee_ids:
+            print(f"Seeding {target_orders - existing} orders over {args.days} days...")
+            cursor.execute("""
+                INSERT INTO orders (establishment_id, order_number, order_date, employee_id, customer_id,
+                                    subtotal, tax_rate, tax_amount, total, payment_method, payment_status, order_status)
+                SELECT %s, %s || '-' || lpad(g::text, 9, '0'),
+                       NOW() - ((g %% %s) || ' days')::interval - ((g * 37 %% 86400) || ' seconds')::interval,
+                       (%s::int[])[1 + g %% array_length(%s::int[], 1)],
+                       CASE WHEN g %% 3 = 0 OR %s = 0 THEN NULL
+                            ELSE (%s::int[])[1 + g %% GREATEST(%s, 1)] END,
+                       0, 0.08, 0, 0,
+                       (ARRAY['cash', 'credit_card', 'debit_card', 'mobile_payment'])[1 + g %% 4],
+                       'completed', CASE WHEN g %% 97 = 0 THEN 'voided' ELSE 'completed' END
+                FROM generate_series(%s, %s) AS g
+            """, (establishment_id, BENCH_PREFIX, args.days, employee_ids, employee_ids,
+                  len(customer_ids), customer_ids, len(customer_ids), existing + 1, target_orders))
+            cursor.execute("""
+                INSERT INTO order_items (establishment_id, order_id, product_id, quantity, unit_price, discount,
+                                         subtotal, tax_rate, tax_amount)
+                SELECT o.establishment_id, o.order_id, p.product_id, q.qty, p.product_price, 0,
+                       p.product_price * q.qty, 0.08, round(p.product_price * q.qty * 0.08, 2)
+                FROM orders o
+                CROSS JOIN LATERAL generate_series(1, 1 + o.order_id %% 4) AS line(n)
+                CROSS JOIN LATERAL (SELECT 1 + (o.order_id + line.n) %% 3 AS qty) q
+                JOIN inventory p ON p.product_id = (%s::int[])[1 + (o.order_id * 7 + line.n * 13) %% %s]
+                WHERE o.order_number LIKE %s AND o.subtotal = 0
+                  AND NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.order_id = o.order_id)
+            """, ([p[0] for p in products], len(products), BENCH_PREFIX + '-%'))
+            # Fresh tables have no statistics; without them the planner nests the aggregate per order
+            cursor.execute("ANALYZE orders, order_items")
+            cursor.execute("""
+                UPDATE orders o
+                SET subtotal = s.subtotal, tax_amount = s.tax, total = s.subtotal + s.tax
+                FROM (SELECT order_id, SUM(subtotal) AS subtotal, SUM(tax_amount) AS tax
+                      FROM order_items GROUP BY order_id) s
+                WHERE o.order_id = s.order_id AND o.order_number LIKE %s AND o.subtotal = 0
+            """, (BENCH_PREFIX + '-%',))
+            conn.commit()
+
+        # Journal entries: one balanced sales receipt per bench order (cash / revenue)
+        if args.journal:
+            try:
+                cash_account = _scalar(cursor, """
+                    SELECT id FROM accounting.accounts WHERE account_type = 'Asset' AND is_active
+                    ORDER BY account_number NULLS LAST, id LIMIT 1
+                """)
+                revenue_account = _scalar(cursor, """
+                    SELECT id FROM accounting.accounts WHERE account_type = 'Revenue' AND is_active
+                    ORDER BY account_number NULLS LAST, id LIMIT 1
+                """)
+                if cash_account and revenue_account:
+                    cursor.execute("""
+                        INSERT INTO accounting.transactions (transaction_number, transaction_date, transaction_type,
+                                                             description, source_document_id, source_document_type,
+                                                             is_posted, created_by, updated_by)
+                        SELECT %s || '-JE-' || o.order_id, o.order_date::date, 'sales_receipt',
+                               'Bench sale ' || o.order_number, o.order_id, 'order', false, o.employee_id, o.employee_id
+                        FROM orders o
+                        WHERE o.order_number LIKE %s AND o.total > 0
+                          AND NOT EXISTS (SELECT 1 FROM accounting.transactions t
+                                          WHERE t.transaction_number = %s || '-JE-' || o.order_id)
+                    """, (BENCH_PREFIX, BENCH_PREFIX + '-%', BENCH_PREFIX))
+                    cursor.execute("""
+                        INSERT INTO accounting.transaction_lines (transaction_id, account_id, line_number,
+                                                                  debit_amount, credit_amount, description)
+                        SELECT t.id, l.account_id, l.line_number, l.debit, l.credit, t.description
+                        FROM accounting.transactions t
+                        JOIN orders o ON o.order_id = t.source_document_id AND t.source_document_type = 'order'
+                        CROSS JOIN LATERAL (VALUES (%s, 1, o.total, 0::numeric), (%s, 2, 0::numeric, o.total))
+                            AS l(account_id, line_number, debit, credit)
+                        WHERE t.transaction_number LIKE %s
+                          AND NOT EXISTS (SELECT 1 FROM accounting.transaction_lines x WHERE x.transaction_id = t.id)
+                        ORDER BY t.id, l.line_number
+                    """, (cash_account, revenue_account, BENCH_PREFIX + '-JE-%'))
+                    cursor.execute("UPDATE accounting.transactions SET is_posted = true WHERE transaction_number LIKE %s AND NOT is_posted",
+                                   (BENCH_PREFIX + '-JE-%',))
+                    conn.commit()
+                else:
+                    print("  (skipping journal entries: no Asset / Revenue accounts in accounting.accounts)")
+            except psycopg2.Error as e:
+                conn.rollback()
+                print(f"  (skipping journal entries: {e.pgerror or e})")
+
+        # A shipment to scan against (large expected quantities so scans keep matching)
+        shipment_id = _scalar(cursor, """
+            SELECT pending_shipment_id FROM pending_shipments
+            WHERE vendor_id = %s AND purchase_order_number = %s
+        """, (vendor_id, BENCH_PREFIX + '-PO'))
+        if shipment_id is None and products:
+            shipment_id = _scalar(cursor, """
+                INSERT INTO pending_shipments (establishment_id, vendor_id, purchase_order_number, status, uploaded_by)
+                VALUES (%s, %s, %s, 'in_progress', %s) RETURNING pending_shipment_id
+            """, (establishment_id, vendor_id, BENCH_PREFIX + '-PO', employee_ids[0] if employee_ids else None))
+            cursor.execute("""
+                INSERT INTO pending_shipment_items (establishment_id, pending_shipment_id, product_sku, product_name,
+                                                    quantity_expected, quantity_verified, unit_cost, product_id,
+                                                    barcode, line_number)
+                SELECT i.establishment_id, %s, i.sku, i.product_name, 1000000, 0, i.product_cost, i.product_id,
+                       i.barcode, row_number() OVER (ORDER BY i.product_id)
+                FROM inventory i
+                WHERE i.sku LIKE %s
+                ORDER BY i.product_id
+                LIMIT 200
+            """, (shipment_id, BENCH_PREFIX + '-%'))
+        conn.commit()
+        cursor.execute("ANALYZE")
+        conn.commit()
+        print(f"Seed ready in {time.perf_counter() - start:.1f}s "
+              f"({len(products)} products, {len(employee_ids)} employees, shipment {shipment_id})")
+        return {
+            'establishment_id': establishment_id,
+            'employee_ids': employee_ids,
+            'products': products[:500],
+            'shipment_id': shipment_id,
+            'shipment_barcodes': [p[2] for p in products[:200]],
+        }
+    finally:
+        conn.close()
+
+
+def cleanup():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        like = BENCH_PREFIX + '-%'
+        try:
+            cursor.execute("SAVEPOINT bench_journal")
+            cursor.execute("DELETE FROM accounting.transactions WHERE transaction_number LIKE %s", (BENCH_PREFIX + '-JE-%',))
+            cursor.execute("RELEASE SAVEPOINT bench_journal")
+        except psycopg2.Error:
+            cursor.execute("ROLLBACK TO SAVEPOINT bench_journal")
+        cursor.execute("""
+            DELETE FROM pending_shipments WHERE vendor_id IN (SELECT vendor_id FROM vendors WHERE vendor_name = %s)
+        """, (BENCH_VENDOR_NAME,))
+        cursor.execute("DELETE FROM order_items WHERE order_id IN (SELECT order_id FROM orders WHERE order_number LIKE %s)", (like,))
+        cursor.execute("DELETE FROM orders WHERE order_number LIKE %s", (like,))
+        cursor.execute("DELETE FROM customers WHERE email LIKE %s", ('%@' + BENCH_PREFIX.lower() + '.example.com',))
+        cursor.execute("DELETE FROM inventory WHERE sku LIKE %s", (like,))
+        cursor.execute("DELETE FROM vendors WHERE vendor_name = %s", (BENCH_VENDOR_NAME,))
+        cursor.execute("DELETE FROM employees WHERE employee_code LIKE %s", (like,))
+        conn.commit()
+        print("Removed benchmark data.")
+    finally:
+        conn.close()
+
+
+# --------------------------------------------------------------------------- #
+# Scenarios
+# --------------------------------------------------------------------------- #
+
+def build_request(name: str, seed: dict, rng: random.Random):
+    """(method, path, json_body) for one request of the named endpoint."""
+    today = date.today()
+    if name == 'create_order':
+        items = []
+        for product_id, price, _ in rng.sample(seed['products'], min(len(seed['products']), rng.randint(1, 4))):
+            items.append({'product_id': product_id, 'quantity': rng.randint(1, 3), 'unit_price': price})
+        return 'POST', '/api/create_order', {
+            'items': items, 'payment_method': rng.choice(['cash', 'credit_card']),
+            'employee_id': rng.choice(seed['employee_ids']), 'tax_rate': 0.08,
+        }
+    if name == 'pos_bootstrap':
+        return 'GET', '/api/pos-bootstrap', None
+    if name == 'inventory':
+        return 'GET', '/api/inventory', None
+    if name == 'orders':
+        return 'GET', f"/api/orders?limit=50&offset={rng.choice([0, 0, 0, 50, 500])}", None
+    if name == 'customers_search':
+        kind = rng.randrange(3)
+        if kind == 0:
+            q = rng.choice(FIRST_NAMES)[:rng.randint(2, 5)]
+        elif kind == 1:
+            q = f"customer{rng.randint(1, 9999)}"
+        else:
+            q = str(rng.randint(200, 999))
+        return 'GET', f"/api/customers/search?q={q}", None
+    if name == 'shipment_scan':
+        return 'POST', f"/api/shipments/{seed['shipment_id']}/scan", {
+            'barcode': rng.choice(seed['shipment_barcodes']), 'employee_id': rng.choice(seed['employee_ids']),
+            'device_id': 'benchmark',
+        }
+    if name == 'report_profit_loss':
+        return 'GET', f"/api/v1/reports/profit-loss?start_date={today.replace(month=1, day=1)}&end_date={today}", None
+    if name == 'report_balance_sheet':
+        return 'GET', f"/api/v1/reports/balance-sheet?as_of_date={today}", None
+    if name == 'report_trial_balance':
+        return 'GET', f"/api/accounting/trial-balance?as_of_date={today}", None
+    raise ValueError(f"Unknown endpoint {name}")
+
+
+class InProcessClient:
+    """One Flask test client per worker thread."""
+
+    def __init__(self):
+        from web_viewer import app
+        app.config['TESTING'] = True
+        self._app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        return (response.status_code,) + _db_headers(response.headers)
+
+
+def _db_headers(headers):
+    """(queries, db_ms) from the instrumentation headers, None when the server doesn't send them."""
+    queries = headers.get('X-DB-Queries')
+    db_ms = headers.get('X-DB-Time-Ms')
+    return (int(queries) if queries is not None else None,
+            float(db_ms) if db_ms is not None else None)
+
+
+class HttpClient:
+    """Drive an already running server (query counts need debug mode or DB_PERF_HEADERS=1 there)."""
+
+    def __init__(self, base_url):
+        self._base = base_url.rstrip('/')
+
+    def request(self, method, path, body):
+        import urllib.request
+        import urllib.error
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self._base + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'} if data else {})
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                resp.read()
+                return (resp.status,) + _db_headers(resp.headers)
+        except urllib.error.HTTPError as e:
+            return (e.code,) + _db_headers(e.headers)
+
+
+def _percentile(sorted_values, pct: float):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return round(sorted_values[k], 3)
+
+
+def run_load(client, seed: dict, endpoints, requests_per_endpoint: int, concurrency: int, warmup: int):
+    """Run all endpoints interleaved on `concurrency` threads. Returns per-endpoint stats."""
+    rng = random.Random(42)
+    for name in endpoints:
+        for _ in range(warmup):
+            client.request(*build_request(name, seed, rng))
+
+    plan = [name for name in endpoints for _ in range(requests_per_endpoint)]
+    rng.shuffle(plan)
+    samples = {name: [] for name in endpoints}
+    samples_lock = threading.Lock()
+    thread_rngs = threading.local()
+
+    def one(name):
+        r = getattr(thread_rngs, 'rng', None)
+        if r is None:
+            r = thread_rngs.rng = random.Random(threading.get_ident())
+        method, path, body = build_request(name, seed, r)
+        started = time.perf_counter()
+        try:
+            status, queries, db_ms = client.request(method, path, body)
+        except Exception as e:
+            status, queries, db_ms = f"error: {e}", None, None
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with samples_lock:
+            samples[name].append((elapsed_ms, status, queries, db_ms))
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, plan))
+    wall = time.perf_counter() - wall_start
+
+    results = {}
+    for name in endpoints:
+        rows = samples[name]
+        timings = sorted(r[0] for r in rows)
+        errors = sum(1 for r in rows if not (isinstance(r[1], int) and r[1] < 400))
+        queries = [r[2] for r in rows if r[2] is not None]
+        db_times = [r[3] for r in rows if r[3] is not None]
+        results[name] = {
+            'requests': len(rows),
+            'errors': errors,
+            # Endpoints share the run, so throughput is completed requests over the whole wall time
+            'throughput_rps': round(len(rows) / wall, 2) if wall > 0 else None,
+            'p50_ms': _percentile(timings, 50),
+            'p95_ms': _percentile(timings, 95),
+            'p99_ms': _percentile(timings, 99),
+            'max_ms': round(timings[-1], 3) if timings else None,
+            'queries_avg': round(sum(queries) / len(queries), 2) if queries else None,
+            'queries_max': max(queries) if queries else None,
+            'db_time_avg_ms': round(sum(db_times) / len(db_times), 3) if db_times else None,
+        }
+    return results, wall
+
+
+def print_results(results, wall, total_requests):
+    print(f"\n{total_requests} requests in {wall:.1f}s ({total_requests / wall:.1f} req/s overall)\n")
+    print(f"{'endpoint':<22}{'req':>6}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+    for name, r in results.items():
+        fmt = lambda v: f"{v:9.1f}" if v is not None else f"{'-':>9}"
+        print(f"{name:<22}{r['requests']:>6}{r['errors']:>5}{r['throughput_rps'] or 0:>8.1f}"
+              f"{fmt(r['p50_ms'])}{fmt(r['p95_ms'])}{fmt(r['p99_ms'])}{fmt(r['queries_avg'])}")
+
+
+def compare(results, baseline_path: str, threshold_pct: float) -> int:
+    """Print p95 / query-count changes against a saved run. Returns the number of regressions."""
+    with open(baseline_path) as f:
+        baseline = json.load(f).get('endpoints', {})
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (regression threshold {threshold_pct:.0f}% on p95):")
+    for name, r in results.items():
+        base = baseline.get(name)
+        if not base or not base.get('p95_ms') or r.get('p95_ms') is None:
+            print(f"  {name:<22} (no baseline)")
+            continue
+        change = (r['p95_ms'] - base['p95_ms']) * 100.0 / base['p95_ms']
+        flag = ''
+        if change > threshold_pct:
+            flag = '  REGRESSION'
+            regressions += 1
+        queries = ''
+        if base.get('queries_avg') is not None and r.get('queries_avg') is not None:
+            queries = f", queries {base['queries_avg']} -> {r['queries_avg']}"
+        print(f"  {name:<22} p95 {base['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms ({change:+.1f}%){queries}{flag}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).decode().strip()
+    except Exception:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark / load-test the Flask API hot paths')
+    parser.add_argument('--products', type=int, default=2000, help='Synthetic products (default 2000)')
+    parser.add_argument('--customers', type=int, default=50000, help='Synthetic customers (default 50000)')
+    parser.add_argument('--employees', type=int, default=20, help='Synthetic employees (default 20)')
+    parser.add_argument('--days', type=int, default=365, help='Days of order history (default 365)')
+    parser.add_argument('--orders-per-day', type=int, default=200, help='Orders per day of history (default 200)')
+    parser.add_argument('--no-journal', dest='journal', action='store_false', help='Do not seed journal entries')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='Comma-separated endpoints to drive')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint (default 200)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent workers (default 8)')
+    parser.add_argument('--warmup', type=int, default=5, help='Serial warm-up requests per endpoint')
+    parser.add_argument('--base-url', help='Drive a running server instead of the app in-process')
+    parser.add_argument('--output', help='Results JSON path (default benchmark_results/api_<timestamp>.json)')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='p95 regression threshold in percent')
+    parser.add_argument('--seed-only', action='store_true', help='Seed and exit')
+    parser.add_argument('--allow-remote', action='store_true', help='Allow seeding a non-local database')
+    parser.add_argument('--cleanup', action='store_true', help='Delete benchmark data and exit')
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)} (choose from {', '.join(ENDPOINTS)})")
+
+    if args.cleanup:
+        cleanup()
+        sys.exit(0)
+
+    _require_local_db(args.allow_remote)
+    # Seeding is incremental: parts that already exist are left alone
+    seed = seed_store(args)
+    if args.seed_only:
+        sys.exit(0)
+    if not seed['shipment_id'] and 'shipment_scan' in endpoints:
+        endpoints.remove('shipment_scan')
+
+    client = HttpClient(args.base_url) if args.base_url else InProcessClient()
+    results, wall = run_load(client, seed, endpoints, args.requests, args.concurrency, args.warmup)
+    print_results(results, wall, args.requests * len(endpoints))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"api_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'git_commit': _git_commit(),
+                'mode': 'http' if args.base_url else 'in-process',
+                'concurrency': args.concurrency,
+                'requests_per_endpoint': args.requests,
+                'wall_seconds': round(wall, 3),
+                'seed': {'products': args.products, 'customers': args.customers, 'employees': args.employees,
+                         'days': args.days, 'orders_per_day': args.orders_per_day, 'journal': args.journal},
+            },
+            'endpoints': results,
+        }, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        sys.exit(1 if compare(results, args.compare, args.threshold) else 0)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark barcode image rendering and bulk label sheets (barcode_images.py), no database needed.
+Renders a label sheet for N synthetic products three ways and prints the wall time of each:
+- cold, in-process (BARCODE_LABEL_WORKERS=1 equivalent): every PNG rendered serially;
+- cold, process pool: uncached PNGs rendered on BARCODE_LABEL_WORKERS processes;
+- warm: every PNG served from the memory / disk cache (a reprint).
+Uses a temporary cache directory, so the real BARCODE_CACHE_DIR is not touched.
+
+Usage (from project root):
+    python scripts/benchmark_barcode_labels.py
+    python scripts/benchmark_barcode_labels.py --products 500 --copies 2 --output benchmark_results/labels.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import barcode_images
+
+
+def _labels(count: int, copies: int) -> list:
+    labels = []
+    for i in range(count):
+        base = '200' + str(i).zfill(8)
+        labels.append({
+            'barcode_value': base + str(sum(int(d) for d in base) % 10),
+            'product_name': f'Benchmark product {i}',
+            'product_price': 1.99 + i % 50,
+            'copies': copies,
+        })
+    return labels
+
+
+def _reset_cache(cache_dir: str):
+    barcode_images.BARCODE_CACHE_DIR = cache_dir
+    with barcode_images._memory_lock:
+        barcode_images._memory.clear()
+
+
+def _timed(labels: list, layout: str) -> tuple:
+    start = time.perf_counter()
+    pdf = barcode_images.label_sheet_pdf(labels, layout=layout)
+    return (time.perf_counter() - start) * 1000.0, len(pdf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark barcode label sheet generation')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--copies', type=int, default=1)
+    parser.add_argument('--layout', default='avery5160', choices=sorted(barcode_images.LABEL_LAYOUTS))
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    if barcode_images._get_barcode_lib() is None:
+        raise SystemExit("python-barcode[images] is required: pip install python-barcode[images]")
+    labels = _labels(args.products, args.copies)
+    results = {'products': args.products, 'labels': args.products * args.copies, 'layout': args.layout,
+               'pool_workers': barcode_images.BARCODE_LABEL_WORKERS}
+
+    with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as pool_dir:
+        _reset_cache(serial_dir)
+        pool_min, barcode_images.BARCODE_POOL_MIN_BATCH = barcode_images.BARCODE_POOL_MIN_BATCH, 10 ** 9
+        results['cold_serial_ms'], _ = _timed(labels, args.layout)
+        barcode_images.BARCODE_POOL_MIN_BATCH = pool_min
+
+        _reset_cache(pool_dir)
+        barcode_images._get_pool()   # process start-up is a one-time cost per server process
+        results['cold_pool_ms'], _ = _timed(labels, args.layout)
+        results['warm_ms'], results['pdf_bytes'] = _timed(labels, args.layout)
+
+    print(f"{results['labels']} labels ({args.products} products, layout {args.layout}):")
+    print(f"  cold, in-process:            {results['cold_serial_ms']:>9.1f} ms")
+    print(f"  cold, {results['pool_workers']} process pool:       {results['cold_pool_ms']:>9.1f} ms")
+    print(f"  warm (cached images):        {results['warm_ms']:>9.1f} ms")
+    print(f"  PDF size: {results['pdf_bytes'] / 1024:.0f} KiB")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark POS customer lookup (database.search_customers).
+Seeds a dedicated "Benchmark Store" establishment with synthetic customers (default 500k),
+replays type-ahead style queries (name/email prefixes, phone fragments, substrings, typos)
+and prints p50 / p95 / p99 latency.
+
+Usage (from project root):
+    python scripts/benchmark_customer_search.py                # seed if needed, then run
+    python scripts/benchmark_customer_search.py --rows 500000 --queries 2000
+    python scripts/benchmark_customer_search.py --cleanup      # remove benchmark data
+
+Run once before and once after migrations/add_customers_search_index.sql to compare.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection, search_customers
+
+BENCH_ESTABLISHMENT_NAME = 'Benchmark Store'
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica',
+               'Thomas', 'Sarah', 'Carlos', 'Maria', 'Wei', 'Aisha', 'Olga', 'Kenji']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+              'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Nguyen', 'Kim', 'Patel', 'Ivanova']
+
+
+def _get_bench_establishment(cursor) -> int:
+    cursor.execute("SELECT establishment_id FROM establishments WHERE establishment_name = %s", (BENCH_ESTABLISHMENT_NAME,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute("""
+        INSERT INTO establishments (establishment_name, establishment_type)
+        VALUES (%s, 'retail') RETURNING establishment_id
+    """, (BENCH_ESTABLISHMENT_NAME,))
+    return cursor.fetchone()[0]
+
+
+def seed_customers(rows: int) -> int:
+    """Insert synthetic customers (in SQL, so 500k rows takes seconds). Returns establishment_id."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        establishment_id = _get_bench_establishment(cursor)
+        cursor.execute("SELECT COUNT(*) FROM customers WHERE establishment_id = %s", (establishment_id,))
+        existing = cursor.fetchone()[0] or 0
+        if existing >= rows:
+            print(f"Benchmark store already has {existing} customers")
+            conn.commit()
+            return establishment_id
+        print(f"Seeding {rows - existing} customers into establishment {establishment_id}...")
+        start = time.perf_counter()
+        cursor.execute("""
+            INSERT INTO customers (establishment_id, customer_name, email, phone, loyalty_points)
+            SELECT
+                %s,
+                (%s::text[])[1 + (g %% array_length(%s::text[], 1))] || ' ' ||
+                    (%s::text[])[1 + ((g / 7) %% array_length(%s::text[], 1))] || ' ' || g,
+                'customer' || g || '@example.com',
+                '(' || (200 + g %% 800) || ') ' || lpad((g %% 1000)::text, 3, '0') || '-' || lpad((g %% 10000)::text, 4, '0'),
+                g %% 500
+            FROM generate_series(%s, %s) AS g
+        """, (establishment_id, FIRST_NAMES, FIRST_NAMES, LAST_NAMES, LAST_NAMES, existing + 1, rows))
+        conn.commit()
+        cursor.execute("ANALYZE customers")
+        conn.commit()
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+        return establishment_id
+    finally:
+        conn.close()
+
+
+def cleanup():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT establishment_id FROM establishments WHERE establishment_name = %s", (BENCH_ESTABLISHMENT_NAME,))
+        row = cursor.fetchone()
+        if not row:
+            print("No benchmark data found.")
+            return
+        cursor.execute("DELETE FROM customers WHERE establishment_id = %s", (row[0],))
+        deleted = cursor.rowcount
+        cursor.execute("DELETE FROM establishments WHERE establishment_id = %s", (row[0],))
+        conn.commit()
+        print(f"Removed {deleted} benchmark customers.")
+    finally:
+        conn.close()
+
+
+def _sample_queries(n: int):
+    rng = random.Random(42)
+    queries = []
+    for _ in range(n):
+        kind = rng.randrange(5)
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        if kind == 0:
+            queries.append(first[:rng.randint(1, len(first))])          # typing a first name
+        elif kind == 1:
+            queries.append(f"customer{rng.randint(1, 99999)}")          # email prefix
+        elif kind == 2:
+            queries.append(str(rng.randint(200, 999)) + str(rng.randint(0, 999)).zfill(3))  # phone digits
+        elif kind == 3:
+            queries.append(last[1:])                                    # substring of a last name
+        else:
+            i = rng.randrange(1, len(last))
+            queries.append(last[:i] + last[i + 1:])                     # typo (dropped letter)
+    return queries
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def run_benchmark(establishment_id: int, queries: int, limit: int):
+    samples = _sample_queries(queries)
+    # Warm-up (connection pool, plan cache, schema probes)
+    for q in samples[:20]:
+        search_customers(establishment_id, q, limit=limit)
+    timings = []
+    empty = 0
+    for q in samples:
+        start = time.perf_counter()
+        rows = search_customers(establishment_id, q, limit=limit)
+        timings.append((time.perf_counter() - start) * 1000.0)
+        if not rows:
+            empty += 1
+    timings.sort()
+    print(f"\nsearch_customers: {len(timings)} queries, limit={limit}, {empty} with no results")
+    print(f"  p50: {_percentile(timings, 50):8.2f} ms")
+    print(f"  p95: {_percentile(timings, 95):8.2f} ms")
+    print(f"  p99: {_percentile(timings, 99):8.2f} ms")
+    print(f"  max: {timings[-1]:8.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark POS customer search latency')
+    parser.add_argument('--rows', type=int, default=500000, help='Number of synthetic customers (default 500000)')
+    parser.add_argument('--queries', type=int, default=1000, help='Number of search queries to time')
+    parser.add_argument('--limit', type=int, default=20, help='Result limit per search (POS uses 20)')
+    parser.add_argument('--cleanup', action='store_true', help='Delete benchmark customers and exit')
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        est_id = seed_customers(args.rows)
+        run_benchmark(est_id, args.queries, args.limit)
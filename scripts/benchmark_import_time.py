@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark how long `import web_viewer` takes (worker start-up / reload cost).
+Runs `python -X importtime -c "import web_viewer"` in a fresh interpreter several times, reports the
+median total, the slowest modules by cumulative time, and fails when a module that should load on
+first use (accounting controllers, ReportLab, python-barcode, torch, scikit-learn, spaCy, OpenCV)
+was imported at start-up or the total is over budget.
+
+Usage (from project root):
+    python scripts/benchmark_import_time.py
+    python scripts/benchmark_import_time.py --runs 5 --top 25
+    python scripts/benchmark_import_time.py --budget-ms 1500 --output benchmark_results/import_time.json
+
+Exit status 1 on a budget or lazy-import violation, so it can gate CI next to the test suite.
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages / modules that must not be imported by `import web_viewer`
+LAZY_MODULES = (
+    'backend.controllers',
+    'backend.services',
+    'reportlab',
+    'qrcode',
+    'barcode',
+    'torch',
+    'torchvision',
+    'sklearn',
+    'spacy',
+    'ollama',
+    'cv2',
+    'pyzbar',
+    'product_image_matcher',
+    'barcode_scanner',
+    'metadata_extraction',
+    'receipt_generator',
+)
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$')
+
+
+def measure(module: str) -> dict:
+    """One cold import in a subprocess. Returns {'total_us', 'modules': {name: (self_us, cumulative_us)}}."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+        tail = '\n'.join(errors[-15:])
+        raise SystemExit(f"import {module} failed:\n{tail}")
+    modules = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        modules[name] = (self_us, cumulative_us)
+        if len(indent) <= 1:
+            total_us += cumulative_us
+    return {'total_us': total_us, 'modules': modules}
+
+
+def lazy_violations(modules) -> list:
+    return sorted(name for name in modules
+                  if any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY_MODULES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark web_viewer import time')
+    parser.add_argument('--module', default='web_viewer', help='Module to import (default web_viewer)')
+    parser.add_argument('--runs', type=int, default=3, help='Cold imports to run; the median is reported')
+    parser.add_argument('--top', type=int, default=15, help='Slowest modules to list')
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_TIME_BUDGET_MS', '0')),
+                        help='Fail when the median import is slower (0 = no budget)')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(max(1, args.runs))]
+    totals_ms = [r['total_us'] / 1000.0 for r in runs]
+    median_ms = statistics.median(totals_ms)
+    last = runs[-1]['modules']
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {len(runs)} runs "
+          f"({', '.join(f'{t:.0f}' for t in totals_ms)} ms), {len(last)} modules")
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module")
+    slowest = sorted(last.items(), key=lambda kv: kv[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{cumulative_us / 1000.0:>14.1f}{self_us / 1000.0:>10.1f}  {name}")
+
+    violations = lazy_violations(last)
+    failed = False
+    if violations:
+        failed = True
+        print(f"\nFAIL: imported at start-up but should load on first use: {', '.join(violations)}")
+    if args.budget_ms and median_ms > args.budget_ms:
+        failed = True
+        print(f"\nFAIL: median {median_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump({
+                'module': args.module,
+                'median_ms': median_ms,
+                'runs_ms': totals_ms,
+                'module_count': len(last),
+                'slowest': [{'module': n, 'cumulative_ms': c / 1000.0, 'self_ms': s / 1000.0}
+                            for n, (s, c) in slowest],
+                'lazy_violations': violations,
+            }, f, indent=2)
+        print(f"\nWrote {args.output}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark order number lookup (database.find_orders_by_number, /api/orders/search).
+Uses the synthetic orders of scripts/benchmark_orders_list.py (seeded if needed, default 1M) and
+replays counter-style lookups built from real order numbers: exact, scanner-mangled punctuation,
+truncated scans, a dropped digit, and order ids. Prints p50 / p95 / p99 latency per kind.
+
+Usage (from project root):
+    python scripts/benchmark_order_search.py                 # seed if needed, then run
+    python scripts/benchmark_order_search.py --rows 1000000 --queries 500
+    python scripts/benchmark_orders_list.py --cleanup        # remove benchmark data
+
+Run once before and once after migrations/add_orders_number_lookup_index.sql to compare.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection, find_orders_by_number
+from benchmark_orders_list import seed_orders
+
+
+def _sample_orders(establishment_id: int, n: int):
+    """(order_id, order_number) of n random benchmark orders."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT order_id, order_number FROM orders TABLESAMPLE SYSTEM (1)
+            WHERE establishment_id = %s AND order_number IS NOT NULL
+            LIMIT %s
+        """, (establishment_id, n))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def _queries(orders, rng):
+    """(kind, term) lookups as they arrive from the counter."""
+    queries = []
+    for order_id, number in orders:
+        digits = ''.join(ch for ch in number if ch.isdigit())
+        kind = rng.randrange(5)
+        if kind == 0:
+            queries.append(('exact', number))
+        elif kind == 1:
+            queries.append(('mangled', number.replace('-', rng.choice(['#', ',', ':', '']), 1).replace('-', ',')))
+        elif kind == 2:
+            queries.append(('truncated', number[:-rng.randint(1, 3)]))
+        elif kind == 3:
+            i = rng.randrange(len(digits))
+            queries.append(('dropped digit', digits[:i] + digits[i + 1:]))
+        else:
+            queries.append(('order id', f"ORD#,{order_id}:"))
+    return queries
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def run_benchmark(establishment_id: int, queries: int):
+    rng = random.Random(42)
+    samples = _queries(_sample_orders(establishment_id, queries), rng)
+    # Warm-up (connection pool, plan cache, schema probes)
+    for _, term in samples[:20]:
+        find_orders_by_number(term)
+    by_kind = {}
+    misses = {}
+    for kind, term in samples:
+        start = time.perf_counter()
+        rows = find_orders_by_number(term)
+        by_kind.setdefault(kind, []).append((time.perf_counter() - start) * 1000.0)
+        if not rows:
+            misses[kind] = misses.get(kind, 0) + 1
+    print(f"\nfind_orders_by_number: {len(samples)} lookups")
+    for kind, timings in sorted(by_kind.items()):
+        timings.sort()
+        print(f"  {kind:<14} n={len(timings):<5} p50 {_percentile(timings, 50):8.2f} ms"
+              f"   p95 {_percentile(timings, 95):8.2f} ms   p99 {_percentile(timings, 99):8.2f} ms"
+              f"   no match: {misses.get(kind, 0)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark order number lookup latency')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of synthetic orders (default 1000000)')
+    parser.add_argument('--queries', type=int, default=500, help='Number of lookups to time')
+    args = parser.parse_args()
+
+    est_id = seed_orders(args.rows)
+    run_benchmark(est_id, args.queries)
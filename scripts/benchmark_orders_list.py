@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Benchmark the recent orders list (database.list_orders / count_orders).
+Seeds a dedicated "Benchmark Store" establishment with synthetic orders (default 1M, one payment
+transaction each), then times newest-first pages of 50:
+- first page, lean projection vs o.*;
+- deep pages by OFFSET vs by keyset cursor (the same rows);
+- a filtered page (returns / voids);
+- pagination totals: exact COUNT(*) vs the cached / estimated count_orders.
+Prints p50 / p95 per case.
+
+Usage (from project root):
+    python scripts/benchmark_orders_list.py                 # seed if needed, then run
+    python scripts/benchmark_orders_list.py --rows 1000000 --repeat 50
+    python scripts/benchmark_orders_list.py --cleanup       # remove benchmark data
+
+Run once before and once after migrations/add_orders_list_indexes.sql to compare.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection, list_orders, count_orders, order_list_cursor
+
+BENCH_ESTABLISHMENT_NAME = 'Benchmark Store'
+PAGE_SIZE = 50
+
+
+def _get_bench_establishment(cursor) -> int:
+    cursor.execute("SELECT establishment_id FROM establishments WHERE establishment_name = %s", (BENCH_ESTABLISHMENT_NAME,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute("""
+        INSERT INTO establishments (establishment_name, establishment_type)
+        VALUES (%s, 'retail') RETURNING establishment_id
+    """, (BENCH_ESTABLISHMENT_NAME,))
+    return cursor.fetchone()[0]
+
+
+def _get_bench_employee(cursor, establishment_id: int) -> int:
+    cursor.execute("SELECT employee_id FROM employees WHERE establishment_id = %s AND employee_code = 'BENCH'",
+                   (establishment_id,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute("""
+        INSERT INTO employees (establishment_id, employee_code, first_name, last_name, position, date_started)
+        VALUES (%s, 'BENCH', 'Benchmark', 'Cashier', 'cashier', CURRENT_DATE) RETURNING employee_id
+    """, (establishment_id,))
+    return cursor.fetchone()[0]
+
+
+def seed_orders(rows: int) -> int:
+    """Insert synthetic orders over the last two years plus one payment each (in SQL). Returns establishment_id."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        establishment_id = _get_bench_establishment(cursor)
+        employee_id = _get_bench_employee(cursor, establishment_id)
+        cursor.execute("SELECT COUNT(*) FROM orders WHERE establishment_id = %s", (establishment_id,))
+        existing = cursor.fetchone()[0] or 0
+        if existing >= rows:
+            print(f"Benchmark store already has {existing} orders")
+            conn.commit()
+            return establishment_id
+        print(f"Seeding {rows - existing} orders into establishment {establishment_id}...")
+        start = time.perf_counter()
+        cursor.execute("""
+            WITH new_orders AS (
+                INSERT INTO orders (establishment_id, order_number, order_date, employee_id, subtotal,
+                                    tax_amount, total, payment_method, order_status, order_type)
+                SELECT
+                    %s,
+                    'ORD-' || to_char(NOW() - ((%s - g) * INTERVAL '63 seconds'), 'YYYYMMDD') || '-' || lpad(g::text, 7, '0'),
+                    NOW() - ((%s - g) * INTERVAL '63 seconds'),
+                    %s,
+                    (g %% 9000) / 100.0,
+                    (g %% 9000) / 1250.0,
+                    (g %% 9000) / 100.0 + (g %% 9000) / 1250.0,
+                    (ARRAY['cash', 'credit_card', 'debit_card'])[1 + g %% 3],
+                    CASE WHEN g %% 97 = 0 THEN 'returned' WHEN g %% 89 = 0 THEN 'voided' ELSE 'completed' END,
+                    CASE g %% 5 WHEN 0 THEN 'pickup' WHEN 1 THEN 'delivery' ELSE NULL END
+                FROM generate_series(%s, %s) AS g
+                RETURNING order_id, establishment_id, payment_method, total
+            )
+            INSERT INTO payment_transactions (establishment_id, order_id, payment_method, amount, net_amount)
+            SELECT establishment_id, order_id, payment_method, total, total FROM new_orders
+        """, (establishment_id, rows, rows, employee_id, existing + 1, rows))
+        conn.commit()
+        cursor.execute("ANALYZE orders")
+        cursor.execute("ANALYZE payment_transactions")
+        conn.commit()
+        print(f"Seeded in {time.perf_counter() - start:.1f}s")
+        return establishment_id
+    finally:
+        conn.close()
+
+
+def cleanup():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT establishment_id FROM establishments WHERE establishment_name = %s", (BENCH_ESTABLISHMENT_NAME,))
+        row = cursor.fetchone()
+        if not row:
+            print("No benchmark data found.")
+            return
+        cursor.execute("DELETE FROM payment_transactions WHERE establishment_id = %s", (row[0],))
+        cursor.execute("DELETE FROM orders WHERE establishment_id = %s", (row[0],))
+        deleted = cursor.rowcount
+        cursor.execute("DELETE FROM employees WHERE establishment_id = %s AND employee_code = 'BENCH'", (row[0],))
+        cursor.execute("DELETE FROM establishments WHERE establishment_id = %s", (row[0],))
+        conn.commit()
+        print(f"Removed {deleted} benchmark orders.")
+    finally:
+        conn.close()
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def _time(label: str, func, repeat: int):
+    func()  # warm-up (pool, plan cache, schema probes)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    print(f"  {label:<42} p50 {_percentile(timings, 50):8.2f} ms   p95 {_percentile(timings, 95):8.2f} ms")
+
+
+def _cursor_at(depth: int) -> str:
+    """Cursor whose next page starts at row `depth` (newest first)."""
+    last = list_orders(limit=1, offset=depth - 1, lean=True)
+    return order_list_cursor(last[0]) if last else None
+
+
+def run_benchmark(repeat: int, depths):
+    print(f"\nlist_orders, pages of {PAGE_SIZE}, {repeat} runs each:")
+    _time("first page (lean)", lambda: list_orders(limit=PAGE_SIZE, lean=True), repeat)
+    _time("first page (o.*)", lambda: list_orders(limit=PAGE_SIZE), repeat)
+    for depth in depths:
+        cursor_token = _cursor_at(depth)
+        if not cursor_token:
+            continue
+        _time(f"page at row {depth:,} by OFFSET",
+              lambda d=depth: list_orders(limit=PAGE_SIZE, offset=d, lean=True), repeat)
+        _time(f"page at row {depth:,} by cursor",
+              lambda c=cursor_token: list_orders(limit=PAGE_SIZE, after=c, lean=True), repeat)
+    _time("returns / voids, first page",
+          lambda: list_orders(limit=PAGE_SIZE, order_status_in=['returned', 'voided'], lean=True), repeat)
+
+    print("\ncount_orders (pagination total):")
+    _time("unfiltered, exact COUNT(*)", lambda: count_orders(exact=True), max(3, repeat // 10))
+    _time("unfiltered, cached / estimated", lambda: count_orders(), repeat)
+    _time("returns / voids, exact", lambda: count_orders(order_status_in=['returned', 'voided'], exact=True),
+          max(3, repeat // 10))
+    _time("returns / voids, cached", lambda: count_orders(order_status_in=['returned', 'voided']), repeat)
+    print(f"  totals: exact {count_orders(exact=True):,}, reported {count_orders():,}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark recent orders list latency')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of synthetic orders (default 1000000)')
+    parser.add_argument('--repeat', type=int, default=30, help='Timed runs per case')
+    parser.add_argument('--depths', default='1000,100000,500000', help='Comma-separated page depths (rows)')
+    parser.add_argument('--cleanup', action='store_true', help='Delete benchmark orders and exit')
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        seed_orders(args.rows)
+        run_benchmark(args.repeat, [int(d) for d in args.depths.split(',') if d.strip()])
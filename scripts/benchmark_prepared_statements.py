@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark the prepared-statement registry on the POS hot paths.
+For every registered hot statement (inventory availability check, barcode lookup, session
+verification, scan session load) runs the same parameters as plain parameterized SQL and
+through database_postgres.execute_prepared, and reports per-call latency plus the server's
+planning time (EXPLAIN ANALYZE) for both. Ends with an estimate of the planning time saved
+per checkout (1 session check + N barcode lookups + 1 availability check).
+
+Usage (from project root, against a database with some inventory / sessions, e.g. after
+scripts/benchmark_api.py --seed-only):
+    python scripts/benchmark_prepared_statements.py
+    python scripts/benchmark_prepared_statements.py --iterations 2000 --items-per-checkout 8
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DB_PREPARED_STATEMENTS', '1')
+
+import database  # noqa: F401  (registers the POS statements)
+import scan_sessions  # noqa: F401  (registers the scan session load)
+from database_postgres import get_connection, execute_prepared, get_prepared_statement_sql, PREPARED_STATEMENTS
+
+
+def _sample_params(cursor) -> dict:
+    """Parameter sets per statement, taken from existing rows (statements with no data are skipped)."""
+    samples = {}
+    cursor.execute("SELECT barcode FROM inventory WHERE barcode IS NOT NULL AND barcode <> '' LIMIT 200")
+    barcodes = [r[0] for r in cursor.fetchall()]
+    if barcodes:
+        samples['pos_product_by_barcode'] = [(b,) for b in barcodes]
+    cursor.execute("""
+        SELECT establishment_id, (array_agg(product_id ORDER BY random()))[1:5]
+        FROM inventory GROUP BY establishment_id ORDER BY COUNT(*) DESC LIMIT 1
+    """)
+    row = cursor.fetchone()
+    if row:
+        ids = list(row[1])
+        samples['pos_inventory_availability'] = [
+            (row[0], random.Random(i).sample(ids, min(len(ids), 1 + i % len(ids)))) for i in range(50)
+        ]
+    cursor.execute("SELECT session_token FROM employee_sessions WHERE is_active = 1 LIMIT 50")
+    tokens = [r[0] for r in cursor.fetchall()] or [f"bench-missing-{i}" for i in range(10)]
+    samples['pos_verify_session'] = [(t,) for t in tokens]
+    cursor.execute("SELECT pending_shipment_id FROM pending_shipments ORDER BY pending_shipment_id DESC LIMIT 10")
+    shipments = [r[0] for r in cursor.fetchall()]
+    if shipments:
+        samples['scan_session_items'] = [(s,) for s in shipments]
+    return samples
+
+
+def _planning_ms(cursor, sql: str, params) -> float:
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return float(plan[0].get('Planning Time', 0.0))
+
+
+def bench_statement(conn, name: str, param_sets, iterations: int) -> dict:
+    sql = get_prepared_statement_sql(name)
+    cursor = conn.cursor()
+    # Warm both paths (prepares the statement; after 5 EXECUTEs Postgres may switch to a generic plan)
+    for params in param_sets[:10]:
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        execute_prepared(cursor, name, params)
+        cursor.fetchall()
+    conn.rollback()
+
+    timings = {}
+    for mode in ('plain', 'prepared'):
+        start = time.perf_counter()
+        for i in range(iterations):
+            params = param_sets[i % len(param_sets)]
+            if mode == 'plain':
+                cursor.execute(sql, params)
+            else:
+                execute_prepared(cursor, name, params)
+            cursor.fetchall()
+        timings[mode] = (time.perf_counter() - start) * 1000.0 / iterations
+        conn.rollback()
+
+    params = param_sets[0]
+    plain_plan = _planning_ms(cursor, sql, params)
+    execute_prepared(cursor, name, params)
+    cursor.fetchall()
+    prepared_plan = _planning_ms(cursor, f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    conn.rollback()
+    cursor.close()
+    return {
+        'plain_ms': timings['plain'],
+        'prepared_ms': timings['prepared'],
+        'saved_ms': timings['plain'] - timings['prepared'],
+        'plain_planning_ms': plain_plan,
+        'prepared_planning_ms': prepared_plan,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=1000, help='Calls per statement and mode')
+    parser.add_argument('--items-per-checkout', type=int, default=5, help='Barcode lookups per checkout')
+    args = parser.parse_args()
+
+    if not PREPARED_STATEMENTS:
+        print("DB_PREPARED_STATEMENTS is disabled; prepared runs would be plain SQL. Unset it to benchmark.")
+        sys.exit(1)
+
+    conn = get_connection()
+    try:
+        samples = _sample_params(conn.cursor())
+        conn.rollback()
+        results = {}
+        for name, param_sets in samples.items():
+            results[name] = bench_statement(conn, name, param_sets, args.iterations)
+    finally:
+        conn.close()
+
+    print(f"\n{'statement':<28}{'plain ms':>10}{'prep ms':>10}{'saved':>9}{'plan ms':>10}{'prep plan':>11}")
+    for name, r in results.items():
+        print(f"{name:<28}{r['plain_ms']:>10.3f}{r['prepared_ms']:>10.3f}{r['saved_ms']:>9.3f}"
+              f"{r['plain_planning_ms']:>10.3f}{r['prepared_planning_ms']:>11.3f}")
+
+    per_checkout = {'pos_verify_session': 1, 'pos_product_by_barcode': args.items_per_checkout,
+                    'pos_inventory_availability': 1}
+    saved = sum(results[n]['saved_ms'] * k for n, k in per_checkout.items() if n in results)
+    planning = sum((results[n]['plain_planning_ms'] - results[n]['prepared_planning_ms']) * k
+                   for n, k in per_checkout.items() if n in results)
+    print(f"\nPer checkout (1 session check, {args.items_per_checkout} barcode lookups, 1 availability check):")
+    print(f"  planning time saved  {planning:.3f} ms")
+    print(f"  wall time saved      {saved:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,14 +5,12 @@ Creates scannable barcode images that can be used for testing
 """
 
 import os
+import importlib.util
 from database import get_connection, list_products
+from barcode_images import barcode_png
 
-try:
-    import barcode
-    from barcode.writer import ImageWriter
-    BARCODE_AVAILABLE = True
-except ImportError:
-    BARCODE_AVAILABLE = False
+BARCODE_AVAILABLE = importlib.util.find_spec('barcode') is not None
+if not BARCODE_AVAILABLE:
     print("Warning: python-barcode not installed. Install with: pip install python-barcode[images]")
 
 def generate_barcode_image(barcode_value: str, product_name: str, output_dir: str = "barcode_images"):
@@ -39,13 +37,10 @@ def generate_barcode_image(barcode_value: str, product_name: str, output_dir: st
         # For numeric-only, we could use EAN13 or Code39
         if barcode_value.isdigit() and len(barcode_value) == 12:
             # Use EAN13 format for 12-digit codes (add leading 0 to make 13 digits)
-            code = barcode.get('ean13', '0' + barcode_value, writer=ImageWriter())
-        elif barcode_value.isdigit():
-            # Use Code128 for other numeric codes
-            code = barcode.get('code128', barcode_value, writer=ImageWriter())
+            symbology, value = 'ean13', '0' + barcode_value
         else:
-            # Use Code128 for alphanumeric
-            code = barcode.get('code128', barcode_value, writer=ImageWriter())
+            # Use Code128 for other numeric codes and alphanumeric
+            symbology, value = 'code128', barcode_value
         
         # Configure writer options
         options = {
@@ -60,10 +55,12 @@ def generate_barcode_image(barcode_value: str, product_name: str, output_dir: st
             'text': barcode_value
         }
         
-        # Generate and save barcode
+        # Render (or reuse from the barcode image cache on re-runs) and save
+        png_bytes, _ = barcode_png(symbology, value, options)
         filename = f"{safe_name}_{barcode_value}"
         filepath = os.path.join(output_dir, filename)
-        code.save(filepath, options=options)
+        with open(filepath + '.png', 'wb') as f:
+            f.write(png_bytes)
         
         return filepath + '.png'
     except Exception as e:
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the POS web server (web_viewer.py is the development server:
+Werkzeug, debugger on, threading Socket.IO).
+
+    python serve.py                               # one async worker on 0.0.0.0:5001, background jobs in-process
+    python serve.py --port 8000 --host 127.0.0.1
+    python serve.py --workers 4 --port 5101       # workers on :5101-:5104 + one coordinator process
+    python serve.py --async-mode threading        # no gevent/eventlet available
+
+Async mode (--async-mode / SOCKETIO_ASYNC_MODE, default auto): gevent, then eventlet. Both need
+psycogreen so psycopg2 waits on the database yield to other requests instead of blocking the
+worker; auto falls back to threading (thread per request) when neither combination is installed.
+
+Several workers (--workers N > 1):
+- Socket.IO clients use long-polling, so a sticky proxy (e.g. nginx ip_hash) must route each client
+  to one worker; see docs/PRODUCTION_SERVER.md.
+- SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) is required so emits reach rooms joined
+  on other workers.
+- Late clock-in alerts, scheduled orders and the journal drain run once, in the coordinator
+  (background_workers.py), not in every worker; job_scheduler.py's leader lease keeps periodic
+  jobs single-run even if several coordinators are started.
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+
+ASYNC_MODES = ('auto', 'gevent', 'eventlet', 'threading')
+
+
+def _detect_async_mode(requested: str) -> str:
+    """First usable mode: the requested one, else gevent / eventlet with psycogreen, else threading."""
+    candidates = ['gevent', 'eventlet'] if requested == 'auto' else [requested]
+    for mode in candidates:
+        if mode == 'threading':
+            return mode
+        try:
+            __import__(mode)
+            __import__(f'psycogreen.{mode}')
+            return mode
+        except ImportError as e:
+            if requested != 'auto':
+                raise SystemExit(f"--async-mode {mode} needs {mode} and psycogreen installed ({e})")
+    print("Warning: gevent/eventlet + psycogreen not installed; serving with threads "
+          "(pip install eventlet psycogreen for the async server)")
+    return 'threading'
+
+
+def _patch(mode: str):
+    """Monkey-patch the stdlib and psycopg2 for cooperative I/O (before anything else is imported)."""
+    if mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+    elif mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+        from psycogreen.eventlet import patch_psycopg
+        patch_psycopg()
+
+
+def run_worker(host: str, port: int, mode: str, background: bool):
+    """Serve web_viewer's app in this process."""
+    os.environ['SOCKETIO_ASYNC_MODE'] = mode
+    _patch(mode)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
+
+    from web_viewer import app, socketio, check_database_connection
+
+    # Fail fast when the database is unreachable; leaves a pooled connection for the first request
+    check_database_connection()
+    from background_workers import ensure_rollup_tables
+    ensure_rollup_tables()
+    if background:
+        from background_workers import start_background_workers
+        start_background_workers()
+
+    print(f"[worker {os.getpid()}] serving on http://{host}:{port} (async_mode={mode})", flush=True)
+    if socketio is None:
+        raise SystemExit("flask-socketio is required: pip install flask-socketio")
+    kwargs = {'allow_unsafe_werkzeug': True} if mode == 'threading' else {}
+    socketio.run(app, host=host, port=port, debug=False, use_reloader=False, log_output=False, **kwargs)
+
+
+def supervise(args, mode: str):
+    """Run N single-process workers plus the coordinator; restart any that exit."""
+    if not os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+        raise SystemExit("--workers > 1 needs SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/0) "
+                         "so Socket.IO rooms work across workers")
+    script = os.path.abspath(__file__)
+    commands = {
+        f'worker:{args.port + i}': [sys.executable, script, '--worker', '--host', args.host,
+                                    '--port', str(args.port + i), '--async-mode', mode]
+        for i in range(args.workers)
+    }
+    commands['coordinator'] = [sys.executable, script, '--coordinator']
+    procs = {name: subprocess.Popen(cmd) for name, cmd in commands.items()}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    print(f"Supervising {args.workers} workers on ports {args.port}-{args.port + args.workers - 1} "
+          f"and the background coordinator", flush=True)
+    try:
+        while not stopping:
+            time.sleep(1)
+            for name, proc in list(procs.items()):
+                if proc.poll() is not None and not stopping:
+                    print(f"{name} exited with {proc.returncode}; restarting", flush=True)
+                    procs[name] = subprocess.Popen(commands[name])
+    finally:
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in procs.values():
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', '5001')),
+                        help='Port (first port with --workers)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', '1')))
+    parser.add_argument('--async-mode', choices=ASYNC_MODES,
+                        default=os.environ.get('SOCKETIO_ASYNC_MODE', 'auto'))
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--coordinator', action='store_true', help='Only run the background jobs')
+    args = parser.parse_args()
+
+    if args.coordinator:
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        from background_workers import run_coordinator
+        run_coordinator()
+        return
+    mode = _detect_async_mode(args.async_mode)
+    if args.worker:
+        run_worker(args.host, args.port, mode, background=False)
+    elif args.workers > 1:
+        supervise(args, mode)
+    else:
+        run_worker(args.host, args.port, mode, background=True)
+
+
+if __name__ == '__main__':
+    main()
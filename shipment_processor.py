@@ -3,19 +3,105 @@ Main orchestrator for the AI-powered shipment document processor.
 Processes any document type and returns products for UI review/confirmation.
 """
 
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 from config import EXTRACTION_CONFIG
 from document_processor import ShipmentDocumentProcessor
 
 
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Content hash of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Successful extraction results keyed by file content hash.
+    Small in-memory LRU in front of JSON files in EXTRACTION_CONFIG["cache_dir"],
+    so previews, re-uploads and other worker processes reuse the same result.
+    """
+
+    def __init__(self, cache_dir=None, ttl_hours=None, memory_entries=None):
+        self.cache_dir = cache_dir or EXTRACTION_CONFIG.get("cache_dir", "uploads/shipments/.extraction_cache")
+        self.ttl_seconds = float(ttl_hours if ttl_hours is not None else EXTRACTION_CONFIG.get("cache_ttl_hours", 72)) * 3600
+        self.memory_entries = memory_entries or EXTRACTION_CONFIG.get("cache_memory_entries", 64)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                return entry[1]
+        try:
+            path = self._path(key)
+            if now - os.path.getmtime(path) >= self.ttl_seconds:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._remember(key, result)
+        return result
+
+    def set(self, key, result):
+        self._remember(key, result)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = self._path(key) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(result, f, default=str)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            pass
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._memory[key] = (time.time(), result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+
+_extraction_cache = ExtractionCache()
+
+
 class ShipmentProcessor:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.doc_processor = ShipmentDocumentProcessor()
+        self.cache = cache if cache is not None else _extraction_cache
 
-    def process_shipment(self, file_path):
+    def process_shipment(self, file_path, progress_callback=None, use_cache=True):
         """
         Main function: processes any document and returns products for review.
+        Results are cached by file content hash, so a document that was already
+        previewed (or uploaded before) is returned without re-extraction.
+        progress_callback(stage, percent) receives progress updates.
         Returns: dict with products, confidence, and metadata.
         """
+        def report(stage, pct):
+            if progress_callback:
+                try:
+                    progress_callback(stage, pct)
+                except Exception:
+                    pass
+
         try:
             if not self.doc_processor.get_file_type(file_path):
                 return {
@@ -23,17 +109,36 @@ class ShipmentProcessor:
                     "error": f"Unsupported file type. Supported: {sorted(self.doc_processor.supported)}",
                     "products": [],
                 }
-            text, quality = self.doc_processor.extract_text_fast(file_path)
+            cache_key = None
+            if use_cache:
+                report("hashing", 2)
+                cache_key = file_sha256(file_path)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    report("done", 100)
+                    return dict(cached, cached=True)
+
+            report("extracting_text", 5)
+            text, quality = self.doc_processor.extract_text_fast(
+                file_path,
+                progress_callback=lambda done, total: report("extracting_text", 5 + int(45 * done / max(total, 1))),
+            )
+            report("ai_extraction", 55)
             result = self.doc_processor.route_to_ai(file_path, text, quality)
+            report("validating", 90)
             validated = self.validate_results(result)
 
-            return {
+            out = {
                 "success": True,
                 "products": validated["products"],
                 "confidence": validated["avg_confidence"],
                 "extraction_method": result.get("extraction_method"),
                 "needs_review": validated["avg_confidence"] < EXTRACTION_CONFIG.get("confidence_threshold", 0.8),
             }
+            if cache_key:
+                self.cache.set(cache_key, out)
+            report("done", 100)
+            return out
         except Exception as e:
             return {
                 "success": False,
@@ -91,3 +196,104 @@ def ai_products_to_shipment_items(products):
             "barcode": p.get("barcode") or "",
         })
     return items
+
+
+def extract_shipment_items(file_path, progress_callback=None):
+    """
+    Run AI extraction on a document and convert to shipment items.
+    Returns {'success', 'items'} or {'success': False, 'message'}.
+    """
+    result = ShipmentProcessor().process_shipment(file_path, progress_callback=progress_callback)
+    if not result.get("success"):
+        return {"success": False, "message": result.get("error", "Processing failed")}
+    items = ai_products_to_shipment_items(result.get("products") or [])
+    if not items:
+        return {"success": False, "message": "No items found in document"}
+    return {"success": True, "items": items, "cached": bool(result.get("cached"))}
+
+
+# ---------------------------------------------------------------------------
+# Background shipment jobs (async preview / upload with progress)
+# ---------------------------------------------------------------------------
+
+# Per process: status / events requests must reach the worker that started the job (docs/PRODUCTION_SERVER.md)
+_jobs = {}
+_jobs_lock = threading.Lock()
+_job_executor = None
+
+
+def _get_job_executor():
+    global _job_executor
+    with _jobs_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(
+                max_workers=EXTRACTION_CONFIG.get("job_workers", 2),
+                thread_name_prefix="shipment-job",
+            )
+        return _job_executor
+
+
+def _prune_jobs():
+    cutoff = time.time() - EXTRACTION_CONFIG.get("job_ttl_minutes", 60) * 60
+    with _jobs_lock:
+        for job_id in [j for j, job in _jobs.items() if job["status"] in ("done", "failed") and job["updated_at"] < cutoff]:
+            del _jobs[job_id]
+
+
+def start_shipment_job(func, *args, **kwargs):
+    """
+    Run func(*args, progress_callback=..., **kwargs) in the background.
+    func should return a dict with 'success'. Returns the job id.
+    """
+    _prune_jobs()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    job = {
+        "job_id": job_id,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    with _jobs_lock:
+        _jobs[job_id] = job
+
+    def progress(stage, pct):
+        with _jobs_lock:
+            job["stage"] = stage
+            job["progress"] = max(job["progress"], int(pct))
+            job["updated_at"] = time.time()
+
+    def run():
+        with _jobs_lock:
+            job["status"] = "running"
+            job["updated_at"] = time.time()
+        try:
+            result = func(*args, progress_callback=progress, **kwargs)
+            with _jobs_lock:
+                job["result"] = result
+                if result and result.get("success"):
+                    job["status"], job["stage"], job["progress"] = "done", "done", 100
+                else:
+                    job["status"] = "failed"
+                    job["error"] = (result or {}).get("message") or (result or {}).get("error") or "Processing failed"
+        except Exception as e:
+            with _jobs_lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+        finally:
+            with _jobs_lock:
+                job["updated_at"] = time.time()
+
+    _get_job_executor().submit(run)
+    return job_id
+
+
+def get_shipment_job(job_id):
+    """Snapshot of a job's state, or None if unknown/expired."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
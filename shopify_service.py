@@ -272,8 +272,8 @@ def sync_shopify_orders(establishment_id: int) -> Dict[str, Any]:
             if cr.get("success") and cr.get("order_id"):
                 result["created"] += 1
                 try:
-                    from pos_accounting_bridge import journalize_sale_to_accounting
-                    journalize_sale_to_accounting(cr["order_id"], employee_id)
+                    from journal_queue import enqueue_sale_journalization
+                    enqueue_sale_journalization(cr["order_id"], employee_id)
                 except Exception as je:
                     result["errors"].append(f"Order {cr.get('order_number')} created but accounting failed: {je}")
             else:
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Generic table browsing for the admin Tables UI and the /api/<table_name> endpoints (PostgreSQL).
+
+Pages are bounded and keyset-paginated by primary key (no OFFSET scans, no full-table dumps):
+
+    GET /api/tables/orders                                  first page, primary key order
+    GET /api/tables/orders?after=<next_cursor>              next page
+    GET /api/tables/orders?columns=order_id,total&sort=-order_date&limit=200
+    GET /api/tables/orders?filter=order_status:eq:completed&filter=total:gte:100
+    GET /api/tables/orders/export?format=csv                streamed through a server-side cursor
+
+Filters are column:op:value with op one of eq, ne, lt, lte, gt, gte, like (case-insensitive
+contains), in (comma separated), null, notnull. The list of tables and their columns / primary keys
+is read from the catalog once and cached for TABLE_METADATA_CACHE_TTL seconds.
+"""
+
+import os
+import io
+import csv
+import json
+import time
+import base64
+import threading
+import itertools
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+
+from database_postgres import get_connection
+
+TABLE_API_DEFAULT_LIMIT = int(os.getenv('TABLE_API_DEFAULT_LIMIT', '500'))
+TABLE_API_MAX_LIMIT = int(os.getenv('TABLE_API_MAX_LIMIT', '5000'))
+TABLE_METADATA_CACHE_TTL = float(os.getenv('TABLE_METADATA_CACHE_TTL', '300'))
+TABLE_EXPORT_BATCH_SIZE = int(os.getenv('TABLE_EXPORT_BATCH_SIZE', '2000'))
+
+FILTER_OPERATORS = ('eq', 'ne', 'lt', 'lte', 'gt', 'gte', 'like', 'in', 'null', 'notnull')
+_COMPARISONS = {'eq': '=', 'ne': '<>', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>='}
+
+_metadata_lock = threading.Lock()
+_table_metadata: Optional[Dict[str, Dict[str, list]]] = None  # table -> {'columns': [...], 'primary_key': [...]}
+_metadata_loaded_at = 0.0
+_export_ids = itertools.count(1)
+
+
+class TableQueryError(ValueError):
+    """Invalid column, filter, sort or cursor in a table request (answer 400)."""
+
+
+# ---------------------------------------------------------------------------
+# Cached catalog metadata
+# ---------------------------------------------------------------------------
+
+def _load_table_metadata() -> Dict[str, Dict[str, list]]:
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT c.relname, a.attname,
+                   array_position(i.indkey::int2[], a.attnum) AS pk_position
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = 'public'
+            JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+            LEFT JOIN pg_index i ON i.indrelid = c.oid AND i.indisprimary
+            WHERE c.relkind IN ('r', 'p') AND c.relname NOT LIKE 'pg\\_%%'
+            ORDER BY c.relname, a.attnum
+        """)
+        tables: Dict[str, Dict[str, list]] = {}
+        pk_positions: Dict[str, List[Tuple[int, str]]] = {}
+        for table_name, column_name, pk_position in cursor.fetchall():
+            info = tables.setdefault(table_name, {'columns': [], 'primary_key': []})
+            info['columns'].append(column_name)
+            if pk_position is not None:
+                pk_positions.setdefault(table_name, []).append((pk_position, column_name))
+        for table_name, positions in pk_positions.items():
+            tables[table_name]['primary_key'] = [c for _, c in sorted(positions)]
+        conn.rollback()
+        return tables
+    finally:
+        conn.close()
+
+
+def table_metadata() -> Dict[str, Dict[str, list]]:
+    """{table: {'columns': [...], 'primary_key': [...]}} for public tables, cached."""
+    global _table_metadata, _metadata_loaded_at
+    with _metadata_lock:
+        if _table_metadata is not None and time.monotonic() - _metadata_loaded_at < TABLE_METADATA_CACHE_TTL:
+            return _table_metadata
+    tables = _load_table_metadata()
+    with _metadata_lock:
+        _table_metadata = tables
+        _metadata_loaded_at = time.monotonic()
+    return tables
+
+
+def invalidate_table_metadata():
+    """Forget the cached table list / columns / primary keys (call after DDL)."""
+    global _table_metadata
+    with _metadata_lock:
+        _table_metadata = None
+
+
+def allowed_tables() -> List[str]:
+    """Public table names (cached)."""
+    return list(table_metadata().keys())
+
+
+def table_primary_key(table_name: str) -> List[str]:
+    """Primary key column names in key order (cached); [] when the table has none."""
+    info = table_metadata().get(table_name)
+    return list(info['primary_key']) if info else []
+
+
+# ---------------------------------------------------------------------------
+# Keyset cursors
+# ---------------------------------------------------------------------------
+
+def _json_default(value):
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+
+def encode_cursor(values) -> str:
+    """Opaque page cursor for the last row's sort key values (or {'o': offset})."""
+    raw = json.dumps(values, default=_json_default, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise TableQueryError('Invalid cursor')
+
+
+def decode_int_cursor(token: str, size: int) -> list:
+    """decode_cursor() for endpoints whose sort key is `size` integer columns."""
+    values = decode_cursor(token)
+    if not (isinstance(values, list) and len(values) == size
+            and all(isinstance(v, int) and not isinstance(v, bool) for v in values)):
+        raise TableQueryError('Invalid cursor')
+    return values
+
+
+def keyset_condition(keys: List[Tuple[sql.Composable, bool]], values: list) -> Tuple[sql.Composable, list]:
+    """
+    WHERE clause selecting rows after `values` in ORDER BY `keys` ([(expression, descending)]).
+    Uses one row comparison when all keys sort the same way (index-friendly), else the expanded
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) ... form. Key values must not be NULL.
+    """
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise TableQueryError('Invalid cursor')
+    if len({desc for _, desc in keys}) == 1:
+        op = sql.SQL('<' if keys[0][1] else '>')
+        lhs = sql.SQL(', ').join(expr for expr, _ in keys)
+        rhs = sql.SQL(', ').join(sql.Placeholder() * len(keys))
+        return sql.SQL('({}) {} ({})').format(lhs, op, rhs), list(values)
+    clauses, params = [], []
+    for i, (expr, desc) in enumerate(keys):
+        parts = [sql.SQL('{} = %s').format(k) for k, _ in keys[:i]]
+        parts.append(sql.SQL('{} {} %s').format(expr, sql.SQL('<' if desc else '>')))
+        clauses.append(sql.SQL('({})').format(sql.SQL(' AND ').join(parts)))
+        params.extend(values[:i])
+        params.append(values[i])
+    return sql.SQL('({})').format(sql.SQL(' OR ').join(clauses)), params
+
+
+def page_limit(args, default: int = None) -> int:
+    """`limit` query parameter, clamped to 1..TABLE_API_MAX_LIMIT."""
+    raw = args.get('limit')
+    try:
+        limit = int(raw) if raw not in (None, '') else (default or TABLE_API_DEFAULT_LIMIT)
+    except (TypeError, ValueError):
+        raise TableQueryError('limit must be an integer')
+    return max(1, min(limit, TABLE_API_MAX_LIMIT))
+
+
+# ---------------------------------------------------------------------------
+# Query building
+# ---------------------------------------------------------------------------
+
+def _parse_query(table_name: str, args) -> Dict[str, Any]:
+    info = table_metadata().get(table_name)
+    if info is None:
+        raise TableQueryError('Table not found')
+    all_columns = info['columns']
+    pk = info['primary_key']
+
+    def check(col):
+        if col not in all_columns:
+            raise TableQueryError(f'Unknown column: {col}')
+        return col
+
+    sort_param = (args.get('sort') or '').strip()
+    descending = sort_param.startswith('-')
+    sort_col = check(sort_param.lstrip('-')) if sort_param else None
+    if sort_col and sort_col in pk:
+        order_keys = [sort_col] + [c for c in pk if c != sort_col]
+        nullable_sort = None
+    elif sort_col:
+        order_keys = [sort_col] + pk
+        nullable_sort = sort_col
+    else:
+        order_keys = list(pk)
+        nullable_sort = None
+
+    requested = [c.strip() for c in (args.get('columns') or '').split(',') if c.strip()]
+    columns = [check(c) for c in requested] if requested else list(all_columns)
+    for col in order_keys:
+        if col not in columns:
+            columns.append(col)
+
+    where, params = [], []
+    for spec in args.getlist('filter') if hasattr(args, 'getlist') else args.get('filter') or []:
+        col, _, rest = spec.partition(':')
+        op, _, value = rest.partition(':')
+        ident = sql.Identifier(check(col.strip()))
+        op = op.strip().lower() or 'eq'
+        if op in _COMPARISONS:
+            where.append(sql.SQL('{} {} %s').format(ident, sql.SQL(_COMPARISONS[op])))
+            params.append(value)
+        elif op == 'like':
+            where.append(sql.SQL("{}::text ILIKE %s").format(ident))
+            params.append('%' + value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        elif op == 'in':
+            items = [v for v in value.split(',') if v != '']
+            if not items:
+                raise TableQueryError(f'Empty "in" filter for {col}')
+            where.append(sql.SQL('{} IN ({})').format(ident, sql.SQL(', ').join(sql.Placeholder() * len(items))))
+            params.extend(items)
+        elif op == 'null':
+            where.append(sql.SQL('{} IS NULL').format(ident))
+        elif op == 'notnull':
+            where.append(sql.SQL('{} IS NOT NULL').format(ident))
+        else:
+            raise TableQueryError(f'Unknown filter operator: {op} (use one of {", ".join(FILTER_OPERATORS)})')
+
+    return {
+        'table': table_name,
+        'primary_key': pk,
+        'columns': columns,
+        'order_keys': order_keys,
+        'descending': descending,
+        'nullable_sort': nullable_sort,
+        'where': where,
+        'params': params,
+    }
+
+
+def _order_by(q) -> sql.Composable:
+    direction = sql.SQL(' DESC' if q['descending'] else '')
+    parts = []
+    for col in q['order_keys']:
+        nulls = sql.SQL(' NULLS LAST') if col == q['nullable_sort'] else sql.SQL('')
+        parts.append(sql.SQL('{}{}{}').format(sql.Identifier(col), direction, nulls))
+    return sql.SQL(' ORDER BY {}').format(sql.SQL(', ').join(parts)) if parts else sql.SQL('')
+
+
+def _after_condition(q, values) -> Tuple[sql.Composable, list]:
+    """Rows after the cursor row; the non-key sort column may be NULL (NULLS LAST)."""
+    keys = [(sql.Identifier(c), q['descending']) for c in q['order_keys']]
+    nullable = q['nullable_sort']
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise TableQueryError('Invalid cursor')
+    if not nullable:
+        return keyset_condition(keys, values)
+    sort_ident = sql.Identifier(nullable)
+    if values[0] is None:
+        cond, params = keyset_condition(keys[1:], values[1:])
+        return sql.SQL('({} IS NULL AND {})').format(sort_ident, cond), params
+    cond, params = keyset_condition(keys, values)
+    return sql.SQL('({} OR {} IS NULL)').format(cond, sort_ident), params
+
+
+def _select(q, where: List[sql.Composable]) -> sql.Composable:
+    query = sql.SQL('SELECT {} FROM {}').format(
+        sql.SQL(', ').join(sql.Identifier(c) for c in q['columns']), sql.Identifier(q['table']))
+    if where:
+        query += sql.SQL(' WHERE ') + sql.SQL(' AND ').join(where)
+    return query + _order_by(q)
+
+
+# ---------------------------------------------------------------------------
+# Pages and exports
+# ---------------------------------------------------------------------------
+
+def fetch_table_page(table_name: str, args) -> Dict[str, Any]:
+    """
+    One page of `table_name` for request args (columns, filter, sort, limit, after).
+    Returns the Tables UI shape {'columns', 'data', 'primary_key', 'rowid_column'} plus
+    'limit', 'has_more' and 'next_cursor' (pass back as ?after=). Tables without a primary key
+    page by offset inside the same opaque cursor.
+    """
+    q = _parse_query(table_name, args)
+    limit = page_limit(args)
+    where, params = list(q['where']), list(q['params'])
+    offset = 0
+    after = args.get('after')
+    if after:
+        position = decode_cursor(after)
+        if isinstance(position, dict):
+            try:
+                offset = int(position.get('o') or 0)
+            except (TypeError, ValueError):
+                raise TableQueryError('Invalid cursor')
+            if offset < 0:
+                raise TableQueryError('Invalid cursor')
+        elif q['order_keys']:
+            cond, cond_params = _after_condition(q, position)
+            where.append(cond)
+            params.extend(cond_params)
+        else:
+            raise TableQueryError('Invalid cursor')
+
+    query = _select(q, where) + sql.SQL(' LIMIT %s')
+    params.append(limit + 1)
+    if offset:
+        query += sql.SQL(' OFFSET %s')
+        params.append(offset)
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute(query, params)
+        rows = [dict(r) for r in cursor.fetchall()]
+        conn.rollback()
+    finally:
+        conn.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        if q['order_keys']:
+            next_cursor = encode_cursor([rows[-1][c] for c in q['order_keys']])
+        else:
+            next_cursor = encode_cursor({'o': offset + limit})
+    return {
+        'columns': q['columns'],
+        'data': rows,
+        'primary_key': q['primary_key'],
+        'rowid_column': None,
+        'limit': limit,
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+    }
+
+
+def iter_table_export(table_name: str, args, fmt: str = 'ndjson') -> Iterator[str]:
+    """
+    Stream every row matching the request's columns / filter / sort as NDJSON lines or CSV
+    (header first), fetched TABLE_EXPORT_BATCH_SIZE rows at a time through a server-side cursor.
+    Arguments are validated before the first chunk is produced.
+    """
+    if fmt not in ('ndjson', 'csv'):
+        raise TableQueryError('format must be ndjson or csv')
+    q = _parse_query(table_name, args)
+    query = _select(q, q['where'])
+    params = q['params']
+
+    def generate():
+        conn = get_connection()
+        try:
+            cursor = conn.cursor(name=f'table_export_{next(_export_ids)}', cursor_factory=RealDictCursor)
+            cursor.itersize = TABLE_EXPORT_BATCH_SIZE
+            cursor.execute(query, params)
+            buf = io.StringIO()
+            writer = csv.writer(buf) if fmt == 'csv' else None
+            if writer:
+                writer.writerow(q['columns'])
+            while True:
+                rows = cursor.fetchmany(TABLE_EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    if writer:
+                        writer.writerow([_csv_value(row[c]) for c in q['columns']])
+                    else:
+                        buf.write(json.dumps(row, default=_json_default))
+                        buf.write('\n')
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            if buf.tell():
+                yield buf.getvalue()
+            cursor.close()
+        finally:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            conn.close()
+
+    return generate()
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    return value
@@ -49,3 +49,111 @@ def mock_account_data():
         'created_by': 1,
         'updated_by': 1
     }
+
+
+class FakeCursor:
+    """Cursor of FakeConnection: rows come from the connection's respond callback."""
+
+    def __init__(self, conn):
+        self.connection = conn
+        self.description = None
+        self.closed = False
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        self._rows = list(self.connection.run(sql, params) or [])
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """
+    Stand-in for a psycopg2 connection: records every statement, counts commits / rollbacks and
+    tracks transaction status the way the server reports it. respond(sql, params) returns the
+    statement's rows or raises (the transaction is then aborted until rollback).
+    """
+
+    def __init__(self, respond=None):
+        import psycopg2.extensions
+        self._ext = psycopg2.extensions
+        self.respond = respond
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.closed = False
+        self.info = type('ConnectionInfo', (), {})()
+        self.info.transaction_status = self._ext.TRANSACTION_STATUS_IDLE
+
+    def run(self, sql, params=None):
+        if (self.info.transaction_status == self._ext.TRANSACTION_STATUS_INERROR
+                and not sql.lstrip().upper().startswith('ROLLBACK TO')):
+            import psycopg2
+            raise psycopg2.errors.InFailedSqlTransaction('current transaction is aborted')
+        self.statements.append(' '.join(sql.split()))
+        self.info.transaction_status = self._ext.TRANSACTION_STATUS_INTRANS
+        try:
+            return self.respond(sql, params) if self.respond else None
+        except Exception:
+            self.info.transaction_status = self._ext.TRANSACTION_STATUS_INERROR
+            raise
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.info.transaction_status = self._ext.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = self._ext.TRANSACTION_STATUS_IDLE
+
+    def set_session(self, **kwargs):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    """Pool handing out FakeConnections (one per getconn) and recording returns."""
+
+    def __init__(self, respond=None):
+        self.respond = respond
+        self.handed_out = []
+        self.returned = []
+
+    def getconn(self):
+        conn = FakeConnection(self.respond)
+        self.handed_out.append(conn)
+        return conn
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+
+def fake_execute_values(cur, sql, argslist, template=None, page_size=100, fetch=False):
+    """psycopg2.extras.execute_values without mogrify: one statement, argslist passed as params."""
+    cur.execute(sql, list(argslist))
+    return cur.fetchall() if fetch else None
+
+
+@pytest.fixture
+def fake_db():
+    """FakeConnection / FakePool / execute_values replacements for unit tests of the DB helpers."""
+    return type('FakeDB', (), {
+        'Connection': FakeConnection,
+        'Pool': FakePool,
+        'execute_values': staticmethod(fake_execute_values),
+    })
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Unit tests for audit_buffer.AuditLogBuffer flush / re-queue (database mocked)
+"""
+
+import psycopg2
+import pytest
+
+import audit_buffer
+from audit_buffer import AuditLogBuffer
+
+COLUMNS = ('table_name', 'record_id', 'action_type', 'employee_id', 'action_timestamp')
+
+
+def _entry(record_id, action_type='UPDATE'):
+    return {'table_name': 'orders', 'record_id': record_id, 'action_type': action_type, 'employee_id': 1}
+
+
+@pytest.fixture
+def db(monkeypatch, fake_db):
+    """Every get_connection() of audit_buffer gets a fresh FakeConnection driven by db.respond."""
+    state = type('State', (), {'respond': None, 'connections': []})()
+
+    def connect():
+        conn = fake_db.Connection(lambda sql, params: state.respond(sql, params) if state.respond else None)
+        state.connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(audit_buffer, 'get_connection', connect)
+    monkeypatch.setattr(audit_buffer, 'execute_values', fake_db.execute_values)
+    return state
+
+
+@pytest.fixture
+def buffer():
+    buf = AuditLogBuffer(flush_interval_ms=60000, max_entries=100, max_pending=5)
+    buf._columns = COLUMNS  # skip the information_schema probe
+    yield buf
+    buf._stopped = True
+
+
+class TestAuditFlush:
+    """Batched flush of queued entries"""
+
+    def test_flush_writes_batch_in_one_insert(self, db, buffer):
+        inserts = []
+        db.respond = lambda sql, params: inserts.append(params)
+        buffer._pending = [_entry(1), _entry(2), _entry(3)]
+
+        assert buffer.flush() == 3
+        assert len(inserts) == 1
+        assert [row[1] for row in inserts[0]] == [1, 2, 3]
+        assert buffer.pending_count() == 0
+        assert db.connections[0].commits == 1
+
+    def test_flush_empty_buffer_does_not_connect(self, db, buffer):
+        assert buffer.flush() == 0
+        assert db.connections == []
+
+
+class TestAuditRequeue:
+    """Entries survive an unreachable database"""
+
+    def test_operational_error_requeues_batch_ahead_of_newer_entries(self, db, buffer):
+        def respond(sql, params):
+            # A new entry arrives while the failing flush is in flight
+            buffer._pending.append(_entry(99))
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        db.respond = respond
+        buffer._pending = [_entry(1), _entry(2)]
+
+        assert buffer.flush() == 0
+        assert [e['record_id'] for e in buffer._pending] == [1, 2, 99]
+        assert db.connections[0].rollbacks >= 1
+
+    def test_requeue_drops_oldest_beyond_max_pending(self, db, buffer):
+        def respond(sql, params):
+            raise psycopg2.InterfaceError('connection already closed')
+        db.respond = respond
+        buffer._pending = [_entry(i) for i in range(7)]
+
+        assert buffer.flush() == 0
+        assert [e['record_id'] for e in buffer._pending] == [2, 3, 4, 5, 6]
+
+    def test_requeued_entries_are_written_by_next_flush(self, db, buffer):
+        calls = []
+
+        def respond(sql, params):
+            calls.append(params)
+            if len(calls) == 1:
+                raise psycopg2.OperationalError('could not connect to server')
+        db.respond = respond
+        buffer._pending = [_entry(1), _entry(2)]
+
+        assert buffer.flush() == 0
+        assert buffer.flush() == 2
+        assert [row[1] for row in calls[-1]] == [1, 2]
+        assert buffer.pending_count() == 0
+
+    def test_bad_row_is_dropped_and_others_written_individually(self, db, buffer):
+        written = []
+
+        def respond(sql, params):
+            if any(row[2] == 'BOGUS' for row in params):
+                raise psycopg2.errors.CheckViolation('audit_log_action_type_check')
+            written.extend(row[1] for row in params)
+        db.respond = respond
+        buffer._pending = [_entry(1), _entry(2, 'BOGUS'), _entry(3)]
+
+        assert buffer.flush() == 2
+        assert written == [1, 3]
+        assert buffer.pending_count() == 0
+
+    def test_connection_lost_during_row_by_row_requeues_the_rest(self, db, buffer):
+        statements = []
+
+        def respond(sql, params):
+            statements.append(params)
+            if len(statements) == 1:
+                raise psycopg2.errors.CheckViolation('audit_log_action_type_check')
+            if len(statements) == 3:
+                raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        db.respond = respond
+        buffer._pending = [_entry(1), _entry(2), _entry(3)]
+
+        assert buffer.flush() == 1
+        assert [e['record_id'] for e in buffer._pending] == [2, 3]
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Unit tests for database_postgres request-scoped connections (nested SAVEPOINT handles) and
+prepared statement re-preparation (pool mocked)
+"""
+
+import psycopg2
+import pytest
+
+import database_postgres
+from database_postgres import (
+    begin_request_scope,
+    end_request_scope,
+    get_connection,
+    get_independent_connection,
+    register_prepared_statement,
+    execute_prepared,
+)
+
+
+@pytest.fixture
+def pool(monkeypatch, fake_db):
+    """Request scopes enabled, no replica, every checkout from a FakePool."""
+    fake_pool = fake_db.Pool()
+    monkeypatch.setattr(database_postgres, 'REQUEST_SCOPED_CONNECTIONS', True)
+    monkeypatch.setattr(database_postgres, '_get_pool', lambda: fake_pool)
+    monkeypatch.setattr(database_postgres, '_get_replica_connection', lambda: None)
+    return fake_pool
+
+
+@pytest.fixture
+def scope(pool):
+    begin_request_scope()
+    yield pool
+    end_request_scope()
+
+
+def _work(handle, sql='UPDATE t SET x = 1'):
+    handle.cursor().execute(sql)
+
+
+class TestRequestScope:
+    """Handles on one request thread share one pooled connection"""
+
+    def test_handles_share_one_connection_returned_once(self, scope):
+        outer = get_connection()
+        inner = get_connection()
+        _work(outer)
+        _work(inner)
+        inner.close()
+        assert scope.returned == []
+        outer.close()
+        assert len(scope.handed_out) == 1
+        assert scope.returned == scope.handed_out
+
+    def test_first_handle_commits_for_real(self, scope):
+        conn = get_connection()
+        _work(conn)
+        conn.commit()
+        raw = scope.handed_out[0]
+        assert raw.commits == 1
+        assert not any(s.startswith('SAVEPOINT') for s in raw.statements)
+        conn.close()
+
+    def test_dropped_connection_outside_scope_is_returned(self, pool):
+        def leaky_read():
+            conn = get_connection()
+            conn.cursor().execute('SELECT 1')
+            # returns without conn.close() (background thread, no request scope)
+
+        leaky_read()
+        assert pool.returned == pool.handed_out
+        assert pool.handed_out[0].rollbacks == 1
+
+    def test_end_request_scope_returns_unclosed_connection(self, pool):
+        begin_request_scope()
+        _work(get_connection())
+        end_request_scope()
+        assert pool.returned == pool.handed_out
+        assert pool.handed_out[0].rollbacks >= 1
+
+
+class TestNestedSavepoints:
+    """A handle that starts inside another handle's transaction runs in a SAVEPOINT"""
+
+    def test_nested_commit_only_releases_savepoint(self, scope):
+        outer = get_connection()
+        _work(outer, 'INSERT INTO orders DEFAULT VALUES')
+        inner = get_connection()
+        _work(inner, 'INSERT INTO audit_log DEFAULT VALUES')
+        inner.commit()
+        inner.close()
+        raw = scope.handed_out[0]
+        assert raw.statements == [
+            'INSERT INTO orders DEFAULT VALUES',
+            'SAVEPOINT scoped_1',
+            'INSERT INTO audit_log DEFAULT VALUES',
+            'RELEASE SAVEPOINT scoped_1',
+        ]
+        # Nothing is durable until the outer handle commits
+        assert raw.commits == 0
+        outer.commit()
+        assert raw.commits == 1
+        outer.close()
+
+    def test_dropped_read_handle_does_not_swallow_later_commit(self, scope):
+        def leaky_read():
+            conn = get_connection()
+            conn.cursor().execute('SELECT 1')
+            # returns without conn.close()
+
+        leaky_read()
+        writer = get_connection()
+        _work(writer, "UPDATE pending_shipments SET status = 'in_progress'")
+        writer.commit()
+        raw = scope.handed_out[0]
+        assert not any(s.startswith(('SAVEPOINT', 'RELEASE')) for s in raw.statements)
+        assert raw.commits == 1
+        writer.close()
+        assert scope.returned == scope.handed_out
+
+    def test_pending_shipment_readers_close_their_handles(self, scope):
+        import database
+        database.get_pending_shipment(1)
+        database.get_pending_shipment_items(1)
+        assert scope.returned == scope.handed_out
+        writer = get_connection()
+        _work(writer)
+        writer.commit()
+        assert scope.handed_out[-1].commits == 1
+        writer.close()
+
+    def test_nested_rollback_keeps_outer_work(self, scope):
+        outer = get_connection()
+        _work(outer)
+        inner = get_connection()
+        _work(inner)
+        inner.rollback()
+        raw = scope.handed_out[0]
+        assert raw.statements[-1] == 'ROLLBACK TO SAVEPOINT scoped_1'
+        assert raw.rollbacks == 0
+        assert raw.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        inner.close()
+        outer.close()
+
+    def test_nested_close_without_commit_undoes_only_its_work(self, scope):
+        outer = get_connection()
+        _work(outer)
+        inner = get_connection()
+        _work(inner)
+        inner.close()
+        raw = scope.handed_out[0]
+        assert raw.statements[-1] == 'ROLLBACK TO SAVEPOINT scoped_1; RELEASE SAVEPOINT scoped_1'
+        assert raw.rollbacks == 0
+        outer.commit()
+        assert raw.commits == 1
+        outer.close()
+
+    def test_nested_error_recovers_to_savepoint(self, scope, pool):
+        def respond(sql, params):
+            if 'bad' in sql:
+                raise psycopg2.errors.UniqueViolation('duplicate key')
+        pool.respond = respond
+        outer = get_connection()
+        _work(outer)
+        inner = get_connection()
+        with pytest.raises(psycopg2.errors.UniqueViolation):
+            _work(inner, 'INSERT bad')
+        inner.rollback()
+        inner.close()
+        # The outer transaction is usable again
+        _work(outer, 'UPDATE t SET y = 2')
+        outer.commit()
+        assert scope.handed_out[0].commits == 1
+        outer.close()
+
+    def test_savepoints_get_distinct_names(self, scope):
+        outer = get_connection()
+        _work(outer)
+        first = get_connection()
+        _work(first)
+        second = get_connection()
+        _work(second)
+        raw = scope.handed_out[0]
+        assert 'SAVEPOINT scoped_1' in raw.statements
+        assert 'SAVEPOINT scoped_2' in raw.statements
+        for handle in (second, first, outer):
+            handle.close()
+
+    def test_stale_nested_commit_after_outer_commit(self, scope):
+        outer = get_connection()
+        _work(outer)
+        inner = get_connection()
+        _work(inner)
+        outer.commit()
+        raw = scope.handed_out[0]
+        # The savepoint went away with the outer commit: no RELEASE, no second commit
+        inner.commit()
+        assert raw.commits == 1
+        assert not any(s.startswith('RELEASE') for s in raw.statements)
+        inner.close()
+        outer.close()
+
+    def test_independent_connection_commits_on_its_own(self, scope):
+        outer = get_connection()
+        _work(outer)
+        own = get_independent_connection()
+        _work(own, 'CREATE TABLE IF NOT EXISTS q (id int)')
+        own.commit()
+        own.close()
+        shared, independent = scope.handed_out
+        assert independent.commits == 1
+        assert shared.commits == 0
+        assert not any(s.startswith('SAVEPOINT') for s in shared.statements)
+        assert independent in scope.returned
+        outer.close()
+
+
+class TestPreparedStatements:
+    """PREPARE once per connection; re-prepare only the statement that failed"""
+
+    @pytest.fixture(autouse=True)
+    def prepared(self, monkeypatch):
+        monkeypatch.setattr(database_postgres, 'PREPARED_STATEMENTS', True)
+        register_prepared_statement('test_stmt_a', 'SELECT 1 WHERE %s', ('integer',))
+        register_prepared_statement('test_stmt_b', 'SELECT 2 WHERE %s', ('integer',))
+
+    def test_prepares_once_per_connection(self, fake_db):
+        conn = fake_db.Connection()
+        execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        execute_prepared(conn.cursor(), 'test_stmt_a', (2,))
+        assert conn.statements == [
+            'PREPARE test_stmt_a (integer) AS SELECT 1 WHERE $1',
+            'EXECUTE test_stmt_a (%s)',
+            'EXECUTE test_stmt_a (%s)',
+        ]
+
+    def test_lost_statement_is_reprepared_alone(self, fake_db):
+        lost = set()
+
+        def respond(sql, params):
+            name = sql.split()[1]
+            if sql.startswith('EXECUTE') and name in lost:
+                lost.discard(name)
+                raise psycopg2.errors.InvalidSqlStatementName(f'prepared statement "{name}" does not exist')
+        conn = fake_db.Connection(respond)
+        execute_prepared(conn.cursor(), 'test_stmt_b', (1,))
+        execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        conn.commit()
+        conn.statements.clear()
+        lost.add('test_stmt_a')
+
+        execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        execute_prepared(conn.cursor(), 'test_stmt_b', (1,))
+        assert conn.statements == [
+            'EXECUTE test_stmt_a (%s)',
+            'PREPARE test_stmt_a (integer) AS SELECT 1 WHERE $1',
+            'EXECUTE test_stmt_a (%s)',
+            # test_stmt_b is still tracked: not re-prepared
+            'EXECUTE test_stmt_b (%s)',
+        ]
+
+    def test_changed_result_type_deallocates_before_prepare(self, fake_db):
+        stale = {'test_stmt_a'}
+
+        def respond(sql, params):
+            if sql.startswith('EXECUTE test_stmt_a') and stale:
+                stale.clear()
+                raise psycopg2.errors.FeatureNotSupported('cached plan must not change result type')
+        conn = fake_db.Connection(respond)
+        execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        assert conn.statements == [
+            'PREPARE test_stmt_a (integer) AS SELECT 1 WHERE $1',
+            'EXECUTE test_stmt_a (%s)',
+            'DEALLOCATE test_stmt_a',
+            'PREPARE test_stmt_a (integer) AS SELECT 1 WHERE $1',
+            'EXECUTE test_stmt_a (%s)',
+        ]
+
+    def test_failure_inside_transaction_propagates_then_recovers(self, fake_db):
+        stale = set()
+
+        def respond(sql, params):
+            if sql.startswith('EXECUTE test_stmt_a') and stale:
+                stale.clear()
+                raise psycopg2.errors.FeatureNotSupported('cached plan must not change result type')
+        conn = fake_db.Connection(respond)
+        execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        conn.commit()
+        stale.add('test_stmt_a')
+        conn.cursor().execute('UPDATE t SET x = 1')  # caller's transaction is open
+        with pytest.raises(psycopg2.errors.FeatureNotSupported):
+            execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        conn.rollback()
+        conn.statements.clear()
+
+        execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        assert conn.statements[:2] == ['DEALLOCATE test_stmt_a',
+                                       'PREPARE test_stmt_a (integer) AS SELECT 1 WHERE $1']
+
+    def test_untracked_server_statement_is_adopted(self, fake_db):
+        def respond(sql, params):
+            if sql.startswith('PREPARE'):
+                raise psycopg2.errors.DuplicatePreparedStatement('prepared statement "test_stmt_a" already exists')
+        conn = fake_db.Connection(respond)
+        execute_prepared(conn.cursor(), 'test_stmt_a', (1,))
+        execute_prepared(conn.cursor(), 'test_stmt_a', (2,))
+        assert conn.statements == [
+            'PREPARE test_stmt_a (integer) AS SELECT 1 WHERE $1',
+            'EXECUTE test_stmt_a (%s)',
+            'EXECUTE test_stmt_a (%s)',
+        ]
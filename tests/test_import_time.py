@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Start-up import check for web_viewer (scripts/benchmark_import_time.py): modules meant to load on
+first use must not be imported by `import web_viewer`
+"""
+
+import os
+import importlib.util
+
+import pytest
+
+_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'scripts', 'benchmark_import_time.py')
+
+
+@pytest.fixture(scope='module')
+def import_time():
+    spec = importlib.util.spec_from_file_location('benchmark_import_time', _SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestLazyModules:
+    """Heavy optional libraries and the accounting controllers stay out of start-up"""
+
+    def test_lazy_violations_match_packages_and_submodules(self, import_time):
+        modules = {'reportlab': (1, 1), 'reportlab.pdfgen': (1, 1), 'backend.controllers.report_controller': (1, 1),
+                   'barcode_images': (1, 1), 'json': (1, 1)}
+        assert import_time.lazy_violations(modules) == [
+            'backend.controllers.report_controller', 'reportlab', 'reportlab.pdfgen']
+
+    @pytest.mark.slow
+    def test_web_viewer_import_defers_lazy_modules(self, import_time):
+        result = import_time.measure('web_viewer')
+        assert import_time.lazy_violations(result['modules']) == []
+        budget_ms = float(os.environ.get('IMPORT_TIME_BUDGET_MS', '0'))
+        if budget_ms:
+            assert result['total_us'] / 1000.0 <= budget_ms
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Unit tests for job_scheduler.JobScheduler leader lease and per-run claiming (database mocked by an
+in-memory model of scheduler_leader / scheduler_jobs)
+"""
+
+import pytest
+
+import job_scheduler
+from job_scheduler import JobScheduler
+
+
+class FakeSchedulerTables:
+    """scheduler_leader / scheduler_jobs rows plus a clock, answering the scheduler's statements."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.leader = None          # (holder, lease_until)
+        self.jobs = {}              # job_name -> [interval_seconds, next_run_at]
+
+    def respond(self, sql, params):
+        sql = ' '.join(sql.split())
+        if sql.startswith('INSERT INTO scheduler_leader'):
+            holder, lease_seconds = params
+            if self.leader is None or self.leader[0] == holder or self.leader[1] < self.now:
+                self.leader = (holder, self.now + lease_seconds)
+                return [(holder,)]
+            return []
+        if sql.startswith('DELETE FROM scheduler_leader'):
+            if self.leader and self.leader[0] == params[0]:
+                self.leader = None
+            return []
+        if sql.startswith('INSERT INTO scheduler_jobs'):
+            name, interval, initial_delay = params
+            if name in self.jobs:
+                self.jobs[name][0] = interval
+                self.jobs[name][1] = min(self.jobs[name][1], self.now + interval)
+            else:
+                self.jobs[name] = [interval, self.now + initial_delay]
+            return []
+        if sql.startswith('SELECT job_name, EXTRACT'):
+            names = params[0]
+            rows = sorted((job[1], name) for name, job in self.jobs.items() if name in names)
+            return [(name, next_run - self.now) for next_run, name in rows]
+        if sql.startswith('UPDATE scheduler_jobs SET next_run_at = CURRENT_TIMESTAMP + interval_seconds'):
+            job = self.jobs.get(params[0])
+            if job is not None and job[1] <= self.now:
+                job[1] = self.now + job[0]
+                return [(1,)]
+            return []
+        return []
+
+
+class RecordingExecutor:
+    """Collects submitted runs instead of starting threads."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, func, *args, **kwargs):
+        self.submitted.append(args)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+@pytest.fixture
+def tables(monkeypatch, fake_db):
+    state = FakeSchedulerTables()
+    monkeypatch.setattr(job_scheduler, 'get_connection', lambda: fake_db.Connection(state.respond))
+    return state
+
+
+def _scheduler(lease_seconds=30):
+    scheduler = JobScheduler(lease_seconds=lease_seconds, workers=1)
+    scheduler._executor.shutdown(wait=False)
+    scheduler._executor = RecordingExecutor()
+    scheduler._tables_ready = True
+    return scheduler
+
+
+class TestLeaderLease:
+    """Only one process holds the scheduler_leader lease at a time"""
+
+    def test_first_process_becomes_leader(self, tables):
+        first = _scheduler()
+        first._renew_lease()
+        assert first._is_leader
+        assert tables.leader[0] == first.instance_id
+
+    def test_second_process_waits_while_lease_is_valid(self, tables):
+        first, second = _scheduler(), _scheduler()
+        first._renew_lease()
+        second._renew_lease()
+        assert first._is_leader
+        assert not second._is_leader
+
+    def test_leader_renews_its_own_lease(self, tables):
+        first, second = _scheduler(), _scheduler()
+        first._renew_lease()
+        tables.now += 20
+        first._renew_lease()
+        tables.now += 20  # past the first lease, within the renewed one
+        second._renew_lease()
+        assert first._is_leader
+        assert not second._is_leader
+
+    def test_expired_lease_is_taken_over(self, tables):
+        first, second = _scheduler(), _scheduler()
+        first._renew_lease()
+        tables.now += 31
+        second._renew_lease()
+        assert second._is_leader
+        assert tables.leader[0] == second.instance_id
+        # The old leader notices on its next renewal
+        first._renew_lease()
+        assert not first._is_leader
+
+    def test_shutdown_releases_lease(self, tables):
+        first, second = _scheduler(), _scheduler()
+        first._renew_lease()
+        first.shutdown()
+        assert tables.leader is None
+        second._renew_lease()
+        assert second._is_leader
+
+
+class TestRunClaims:
+    """Each fire time is claimed by exactly one process"""
+
+    def test_due_job_runs_once_even_with_two_leaders(self, tables):
+        first, second = _scheduler(), _scheduler()
+        for scheduler in (first, second):
+            scheduler.register('late_alerts', lambda: None, interval_seconds=60)
+        first._run_due_jobs()
+        second._run_due_jobs()
+        assert len(first._executor.submitted) == 1
+        assert second._executor.submitted == []
+        assert tables.jobs['late_alerts'][1] == tables.now + 60
+
+    def test_job_not_due_is_not_started(self, tables):
+        scheduler = _scheduler()
+        scheduler.register('cleanup', lambda: None, interval_seconds=60, initial_delay=10)
+        next_due = scheduler._run_due_jobs()
+        assert scheduler._executor.submitted == []
+        assert next_due == pytest.approx(10)
+
+    def test_next_fire_time_is_claimable_again(self, tables):
+        scheduler = _scheduler()
+        scheduler.register('late_alerts', lambda: None, interval_seconds=60)
+        scheduler._run_due_jobs()
+        job = scheduler._jobs['late_alerts']
+        job.running = False
+        tables.now += 60
+        scheduler._run_due_jobs()
+        assert len(scheduler._executor.submitted) == 2
+
+    def test_running_job_is_not_started_twice(self, tables):
+        scheduler = _scheduler()
+        scheduler.register('slow', lambda: None, interval_seconds=1)
+        scheduler._run_due_jobs()
+        assert scheduler._jobs['slow'].running
+        tables.now += 5
+        scheduler._run_due_jobs()
+        assert len(scheduler._executor.submitted) == 1
+        # Its fire time was not consumed while it was still running
+        assert tables.jobs['slow'][1] <= tables.now
+
+    def test_persisted_next_run_survives_restart(self, tables):
+        before = _scheduler()
+        before.register('late_alerts', lambda: None, interval_seconds=60)
+        before._run_due_jobs()
+        after = _scheduler()
+        after.register('late_alerts', lambda: None, interval_seconds=60)
+        after._run_due_jobs()
+        assert after._executor.submitted == []
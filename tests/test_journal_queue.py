@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Unit tests for journal_queue.JournalQueue draining, retry backoff and the bounded pre-report flush
+(database mocked by an in-memory accounting_journal_queue)
+"""
+
+import pytest
+
+import journal_queue
+import pos_accounting_bridge
+from journal_queue import JournalQueue
+
+
+class FakeJournalTable:
+    """accounting_journal_queue rows plus a clock, answering the queue's statements."""
+
+    def __init__(self, order_ids=()):
+        self.now = 0.0
+        self.down = False
+        self.rows = {oid: {'attempts': 0, 'next_attempt_at': 0.0, 'last_error': None} for oid in order_ids}
+
+    def respond(self, sql, params):
+        if self.down:
+            raise ConnectionError('server closed the connection')
+        sql = ' '.join(sql.split())
+        if sql.startswith('SELECT order_id, employee_id'):
+            max_attempts, limit = params
+            due = [oid for oid, row in sorted(self.rows.items())
+                   if row['attempts'] < max_attempts and row['next_attempt_at'] <= self.now]
+            return [{'order_id': oid, 'employee_id': 7, 'transaction_date': None, 'age_seconds': 1.0}
+                    for oid in due[:limit]]
+        if sql.startswith('DELETE FROM accounting_journal_queue'):
+            for oid in params[0]:
+                self.rows.pop(oid, None)
+            return []
+        if sql.startswith('UPDATE accounting_journal_queue q'):
+            for oid, message in params:
+                row = self.rows[oid]
+                row['attempts'] += 1
+                row['last_error'] = message
+                row['next_attempt_at'] = self.now + min(2 ** row['attempts'], 3600)
+            return []
+        return []
+
+
+@pytest.fixture
+def table(monkeypatch, fake_db):
+    state = FakeJournalTable()
+    state.connections = []
+
+    def connect():
+        conn = fake_db.Connection(state.respond)
+        state.connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(journal_queue, 'get_independent_connection', connect)
+    monkeypatch.setattr(journal_queue, 'execute_values', fake_db.execute_values)
+    return state
+
+
+@pytest.fixture
+def journalize(monkeypatch):
+    """Replace the ledger write; orders in .bad fail, .calls records each batch."""
+    class Journalize:
+        def __init__(self):
+            self.bad = set()
+            self.calls = []
+
+        def __call__(self, entries, conn=None):
+            ids = [int(e['order_id']) for e in entries]
+            self.calls.append(ids)
+            if self.bad.intersection(ids):
+                raise ValueError('no inventory account')
+            return {oid: {'success': True} for oid in ids}
+
+    fake = Journalize()
+    monkeypatch.setattr(pos_accounting_bridge, 'journalize_sales_batch_to_accounting', fake)
+    return fake
+
+
+def _queue(**kwargs):
+    queue = JournalQueue(**kwargs)
+    queue._table_ready = True
+    return queue
+
+
+class TestDrain:
+    """Due orders are journalized in one batch and removed from the queue"""
+
+    def test_batch_is_journalized_and_removed(self, table, journalize):
+        table.rows.update(FakeJournalTable([1, 2, 3]).rows)
+        assert _queue().drain() == 3
+        assert journalize.calls == [[1, 2, 3]]
+        assert table.rows == {}
+        assert table.connections[-1].commits == 1
+        assert table.connections[-1].closed
+
+    def test_empty_queue_commits_and_returns_zero(self, table, journalize):
+        assert _queue().drain() == 0
+        assert journalize.calls == []
+        assert table.connections[-1].commits == 1
+
+    def test_bad_order_is_retried_alone_with_backoff(self, table, journalize):
+        table.rows.update(FakeJournalTable([1, 2, 3]).rows)
+        journalize.bad = {2}
+        assert _queue().drain() == 2
+        assert journalize.calls == [[1, 2, 3], [1], [2], [3]]
+        assert list(table.rows) == [2]
+        assert table.rows[2]['attempts'] == 1
+        assert table.rows[2]['next_attempt_at'] == 2
+        assert 'no inventory account' in table.rows[2]['last_error']
+        statements = table.connections[-1].statements
+        assert 'ROLLBACK TO SAVEPOINT journal_batch' in statements
+        assert statements.count('ROLLBACK TO SAVEPOINT journal_order') == 1
+        assert statements.count('RELEASE SAVEPOINT journal_order') == 2
+
+    def test_failed_order_waits_for_backoff(self, table, journalize):
+        table.rows.update(FakeJournalTable([5]).rows)
+        journalize.bad = {5}
+        queue = _queue()
+        queue.drain()
+        table.now += 1
+        assert queue.drain() == 0
+        assert journalize.calls == [[5]]
+        table.now += 1
+        queue.drain()
+        assert table.rows[5]['attempts'] == 2
+        assert table.rows[5]['next_attempt_at'] == table.now + 4
+
+    def test_order_stops_after_max_attempts(self, table, journalize):
+        table.rows.update(FakeJournalTable([5]).rows)
+        journalize.bad = {5}
+        queue = _queue(max_attempts=2)
+        for _ in range(4):
+            queue.drain()
+            table.now += 3600
+        assert table.rows[5]['attempts'] == 2
+        assert len(journalize.calls) == 2
+
+    def test_connection_error_rolls_back_and_raises(self, table, journalize, monkeypatch):
+        table.rows.update(FakeJournalTable([1]).rows)
+
+        def lost(*args, **kwargs):
+            table.down = True
+            raise ConnectionError('server closed the connection')
+
+        monkeypatch.setattr(pos_accounting_bridge, 'journalize_sales_batch_to_accounting', lost)
+        with pytest.raises(ConnectionError):
+            _queue().drain()
+        assert table.connections[-1].rollbacks == 1
+        assert table.connections[-1].closed
+        assert list(table.rows) == [1]
+
+
+class TestDrainAll:
+    """drain_all() keeps going while batches come back full, within its time budget"""
+
+    def test_drains_backlog_in_batches(self, table, journalize):
+        table.rows.update(FakeJournalTable(range(1, 6)).rows)
+        assert _queue(batch_size=2).drain_all() == 5
+        assert journalize.calls == [[1, 2], [3, 4], [5]]
+
+    def test_stops_at_deadline(self, table, journalize):
+        table.rows.update(FakeJournalTable(range(1, 6)).rows)
+        assert _queue(batch_size=2).drain_all(max_seconds=0) == 2
+        assert len(table.rows) == 3
+
+    def test_flush_pending_sales_never_raises(self, monkeypatch):
+        def unavailable():
+            raise ConnectionError('could not connect')
+
+        monkeypatch.setattr(journal_queue, 'JOURNAL_QUEUE_ENABLED', True)
+        monkeypatch.setattr(journal_queue, '_journal_queue', _queue())
+        monkeypatch.setattr(journal_queue, 'get_independent_connection', unavailable)
+        assert journal_queue.flush_pending_sales() == 0
+
+    def test_journalized_reads_flushes_before_report(self, monkeypatch):
+        order = []
+        monkeypatch.setattr(journal_queue, 'flush_pending_sales', lambda: order.append('flush'))
+
+        @journal_queue.journalized_reads
+        def report():
+            order.append('report')
+            return 'ok'
+
+        assert report() == 'ok'
+        assert order == ['flush', 'report']
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Unit tests for late_arrivals.LateArrivalRoster due-shift tracking (database mocked)
+"""
+
+import time
+from datetime import datetime
+
+import psycopg2
+import pytest
+
+import late_arrivals
+from late_arrivals import LateArrivalRoster, _StoreRoster
+
+TODAY = datetime(2026, 3, 2)
+
+
+def _roster(*starts):
+    """A loaded roster for store 1 (25 minutes grace) with one shift per start hour."""
+    roster = LateArrivalRoster()
+    shifts = [{'store_id': 1, 'employee_id': 100 + i, 'employee_name': f'Emp {i}', 'email': '',
+               'start': TODAY.replace(hour=hour)} for i, hour in enumerate(starts)]
+    roster._stores = {1: _StoreRoster(1, 25, shifts)}
+    roster._day = TODAY.date()
+    roster._loaded_at = time.monotonic()
+    roster._stale = False
+    return roster
+
+
+@pytest.fixture
+def time_clock(monkeypatch, fake_db):
+    """Clock-in lookups answered from `clocked`; set `down` to make the lookup fail."""
+    state = type('TimeClock', (), {'clocked': [], 'down': False})
+
+    def respond(sql, params):
+        if state.down:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        return [(employee_id,) for employee_id in state.clocked]
+    monkeypatch.setattr(late_arrivals, 'get_connection', lambda: fake_db.Connection(respond))
+    return state
+
+
+class TestDueShifts:
+    """Each late shift is returned once, after its clock-in check"""
+
+    def test_due_shift_returned_once(self, time_clock):
+        roster = _roster(8, 12)
+        assert [s['employee_id'] for s in roster.due_shifts(TODAY.replace(hour=9))] == [100]
+        assert roster.due_shifts(TODAY.replace(hour=9, minute=5)) == []
+
+    def test_clocked_in_elsewhere_is_dropped(self, time_clock):
+        roster = _roster(8)
+        time_clock.clocked = [100]
+        assert roster.due_shifts(TODAY.replace(hour=9)) == []
+
+    def test_failed_clock_in_check_retries_next_tick(self, time_clock):
+        roster = _roster(8, 8)
+        time_clock.down = True
+        with pytest.raises(psycopg2.OperationalError):
+            roster.due_shifts(TODAY.replace(hour=9))
+        assert roster.metrics()['pending'] == 2
+        time_clock.down = False
+        due = roster.due_shifts(TODAY.replace(hour=9, minute=1))
+        assert sorted(s['employee_id'] for s in due) == [100, 101]
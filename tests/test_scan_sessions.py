@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Unit tests for scan_sessions.ScanSessionManager.flush: batching, re-queue on connection loss,
+capped counters (database mocked)
+"""
+
+from datetime import datetime
+
+import psycopg2
+import pytest
+
+import scan_sessions
+from scan_sessions import ScanSessionManager, ShipmentScanSession
+
+AT = datetime(2026, 1, 5, 9, 30)
+
+
+def _log(shipment_id, item_id, result='match'):
+    return (shipment_id, item_id, f'CODE{item_id}', 7, AT, result, 'handheld-1', None)
+
+
+@pytest.fixture
+def db(monkeypatch, fake_db):
+    """get_connection() of scan_sessions returns FakeConnections driven by db.respond."""
+    state = type('State', (), {'respond': None, 'connections': []})()
+
+    def connect():
+        conn = fake_db.Connection(lambda sql, params: state.respond(sql, params) if state.respond else None)
+        state.connections.append(conn)
+        return conn
+
+    monkeypatch.setattr(scan_sessions, 'get_connection', connect)
+    monkeypatch.setattr(scan_sessions, 'execute_values', fake_db.execute_values)
+    return state
+
+
+@pytest.fixture
+def manager():
+    m = ScanSessionManager()
+    m._stopped = True
+    return m
+
+
+def _queue(manager, deltas, logs, stats):
+    manager._item_deltas = {k: list(v) for k, v in deltas.items()}
+    manager._scan_log = list(logs)
+    manager._session_stats = {k: list(v) for k, v in stats.items()}
+
+
+class TestScanFlush:
+    """One transaction per flush: counters, session stats, scan log"""
+
+    def test_flush_writes_counters_stats_and_log(self, db, manager):
+        seen = []
+
+        def respond(sql, params):
+            seen.append((' '.join(sql.split()), params))
+            return []
+        db.respond = respond
+        _queue(manager, {10: [2, 7, AT]}, [_log(5, 10), _log(5, 10)], {3: [2, 1]})
+
+        assert manager.flush() == 2
+        counters_sql, counters_params = seen[0]
+        assert counters_sql.startswith('WITH v (pending_item_id, delta, employee_id, verified_at)')
+        assert 'LEAST(COALESCE(psi.quantity_expected, 0), locked.verified + v.delta)' in counters_sql
+        assert counters_params == [(10, 2, 7, AT)]
+        assert 'UPDATE verification_sessions' in seen[1][0]
+        assert 'INSERT INTO shipment_scan_log' in seen[2][0]
+        assert db.connections[0].commits == 1
+        assert manager._item_deltas == {} and manager._scan_log == [] and manager._session_stats == {}
+
+    def test_capped_counters_reload_session(self, db, manager):
+        def respond(sql, params):
+            if 'UPDATE pending_shipment_items' in sql:
+                return [(5, True), (6, False)]
+            return []
+        db.respond = respond
+        manager._sessions = {5: ShipmentScanSession(5, {}), 6: ShipmentScanSession(6, {})}
+        _queue(manager, {10: [1, 7, AT], 20: [1, 7, AT]}, [_log(5, 10), _log(6, 20)], {})
+
+        manager.flush()
+        assert 5 not in manager._sessions
+        assert 6 in manager._sessions
+
+
+class TestScanRequeue:
+    """Accepted scans are kept when the database is unreachable"""
+
+    @pytest.mark.parametrize('error', [
+        psycopg2.OperationalError('server closed the connection unexpectedly'),
+        psycopg2.InterfaceError('connection already closed'),
+    ])
+    def test_connection_error_requeues_everything(self, db, manager, error):
+        def respond(sql, params):
+            raise error
+        db.respond = respond
+        manager._sessions = {5: ShipmentScanSession(5, {})}
+        _queue(manager, {10: [2, 7, AT]}, [_log(5, 10), _log(5, 10)], {3: [2, 1]})
+
+        assert manager.flush() == 0
+        assert manager._item_deltas == {10: [2, 7, AT]}
+        assert manager._scan_log == [_log(5, 10), _log(5, 10)]
+        assert manager._session_stats == {3: [2, 1]}
+        # The in-memory session still matches what the scanners were told
+        assert 5 in manager._sessions
+
+    def test_requeue_merges_with_scans_queued_meanwhile(self, manager):
+        later = datetime(2026, 1, 5, 9, 31)
+        _queue(manager, {10: [1, 8, later], 11: [1, 8, later]}, [_log(5, 11)], {3: [1, 1]})
+
+        manager._requeue({10: [2, 7, AT]}, [_log(5, 10), _log(5, 10)], {3: [2, 0]})
+
+        # Counts add up; the newer scan keeps its employee / timestamp
+        assert manager._item_deltas == {10: [3, 8, later], 11: [1, 8, later]}
+        assert manager._scan_log == [_log(5, 10), _log(5, 10), _log(5, 11)]
+        assert manager._session_stats == {3: [3, 1]}
+
+    def test_requeue_bounds_scan_log_but_keeps_counters(self, monkeypatch, manager):
+        monkeypatch.setattr(scan_sessions, 'SCAN_MAX_PENDING', 3)
+        manager._requeue({10: [5, 7, AT]}, [_log(5, 10) for _ in range(5)], {})
+
+        assert len(manager._scan_log) == 3
+        assert manager._item_deltas == {10: [5, 7, AT]}
+
+    def test_requeued_batch_is_written_by_next_flush(self, db, manager):
+        attempts = []
+
+        def respond(sql, params):
+            attempts.append(sql)
+            if len(attempts) == 1:
+                raise psycopg2.OperationalError('could not connect to server')
+            return []
+        db.respond = respond
+        _queue(manager, {10: [2, 7, AT]}, [_log(5, 10), _log(5, 10)], {})
+
+        assert manager.flush() == 0
+        assert manager.flush() == 2
+        assert manager._item_deltas == {} and manager._scan_log == []
+
+    def test_bad_log_row_does_not_cost_counters(self, db, manager):
+        written = {'counters': 0, 'logs': []}
+
+        def respond(sql, params):
+            if 'UPDATE pending_shipment_items' in sql:
+                written['counters'] += 1
+                return []
+            if 'INSERT INTO shipment_scan_log' in sql:
+                if any(row[2] == 'CODE99' for row in params):
+                    raise psycopg2.errors.ForeignKeyViolation('shipment_scan_log_pending_item_id_fkey')
+                written['logs'].extend(params)
+            return []
+        db.respond = respond
+        _queue(manager, {10: [2, 7, AT]}, [_log(5, 10), _log(5, 99)], {})
+
+        assert manager.flush() == 2
+        # First attempt rolled back, counters written again on their own, then the good log row
+        assert written['counters'] == 2
+        assert written['logs'] == [_log(5, 10)]
+        assert manager._item_deltas == {} and manager._scan_log == []
@@ -26,7 +26,7 @@ from database import (
     list_products, list_vendors, list_categories, list_shipments, get_sales,
     get_shipment_items, get_shipment_details, get_product,
     employee_login, verify_session, employee_logout,
-    list_employees, get_employee, add_employee, update_employee, delete_employee, reactivate_employee, permanently_delete_employee, list_orders, count_orders,
+    list_employees, get_employee, add_employee, update_employee, delete_employee, reactivate_employee, permanently_delete_employee, list_orders, count_orders, order_list_cursor, find_orders_by_number,
     get_employee_by_clerk_user_id, link_clerk_user_to_employee, verify_pin_login, generate_pin,
     get_connection,
     get_discrepancies, get_audit_trail,
@@ -55,41 +55,28 @@ from database import (
 )
 from permission_manager import get_permission_manager
 import os
-# QuickBooks-style accounting backend (accounting schema)
-try:
-    from backend.controllers.account_controller import account_controller
-    from backend.controllers.transaction_controller import transaction_controller
-    from backend.controllers.report_controller import report_controller
-    from backend.controllers.bill_controller import bill_controller
-    from backend.controllers.bill_payment_controller import bill_payment_controller
-    from backend.controllers.invoice_controller import invoice_controller
-    from backend.controllers.payment_controller import payment_controller
-    from backend.controllers.vendor_controller import vendor_controller
-    from backend.controllers.customer_controller import customer_controller
-    from backend.middleware.error_handler import AppError, handle_error as handle_app_error
-    _ACCOUNTING_BACKEND_AVAILABLE = True
-except Exception as e:
-    _ACCOUNTING_BACKEND_AVAILABLE = False
-    print(f"Note: Accounting backend not loaded: {e}")
+# QuickBooks-style accounting API; the controllers load on first use (accounting_routes.py)
+from accounting_routes import accounting_bp
+from job_scheduler import run_in_background
+from barcode_images import product_barcode_png, product_symbology, label_sheet_pdf, LABEL_LAYOUTS
+from table_browser import (
+    allowed_tables, table_primary_key, fetch_table_page, iter_table_export, page_limit,
+    encode_cursor, decode_cursor, decode_int_cursor, keyset_condition, TableQueryError,
+)
+from backend.middleware.error_handler import AppError, handle_error as handle_app_error
 import sys
 import json
-import threading
+import importlib.util
 import time
 from datetime import datetime, time, date
 from decimal import Decimal
 import tempfile
 import traceback
-import io
-import shutil
 from psycopg2 import sql
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
-try:
-    import barcode
-    from barcode.writer import ImageWriter
-    _BARCODE_GEN_AVAILABLE = True
-except ImportError:
-    _BARCODE_GEN_AVAILABLE = False
+# python-barcode (+ Pillow) is imported on the first uncached barcode image, not at startup
+_BARCODE_GEN_AVAILABLE = importlib.util.find_spec('barcode') is not None
 
 # Initialize image matcher and barcode scanner (lazy loading)
 _image_matcher = None
@@ -136,23 +123,25 @@ app = Flask(__name__)
 # DATABASE CONNECTION - Initialize after database import
 # ============================================================================
 
-# Initialize establishment context functions (no-ops for local PostgreSQL)
-set_current_establishment = None
-get_current_establishment = None
-
 # PostgreSQL connection (local or Supabase via DATABASE_URL)
 try:
     from database_postgres import (
         get_connection as get_postgres_connection,
-        set_current_establishment as _set_establishment,
-        get_current_establishment as _get_establishment
+        set_current_establishment,
+        get_current_establishment,
     )
-    # Test connection on startup
+except ImportError as e:
+    print(f"❌ ERROR: PostgreSQL module not found: {e}")
+    print("❌ Install required packages: pip3 install psycopg2-binary python-dotenv")
+    raise SystemExit("Cannot start without PostgreSQL dependencies")
+
+
+def check_database_connection():
+    """Open (and pool) one connection before serving; exits when the database is unreachable.
+    Called by the server entry points (__main__ here, serve.py), not at import."""
     try:
         test_conn = get_postgres_connection()
         test_conn.close()
-        set_current_establishment = _set_establishment
-        get_current_establishment = _get_establishment
         db_url = os.environ.get('DATABASE_URL') or os.environ.get('POSTGRES_URL') or ''
         if 'supabase' in db_url.lower():
             print("✓ Connected to Supabase (PostgreSQL)")
@@ -162,13 +151,6 @@ try:
         print(f"❌ ERROR: PostgreSQL connection failed: {conn_err}")
         print("❌ Set DATABASE_URL (Supabase URI) or DB_HOST, DB_USER, DB_PASSWORD (and DB_NAME) in .env")
         raise SystemExit("Cannot start without PostgreSQL connection")
-except ImportError as e:
-    print(f"❌ ERROR: PostgreSQL module not found: {e}")
-    print("❌ Install required packages: pip3 install psycopg2-binary python-dotenv")
-    raise SystemExit("Cannot start without PostgreSQL dependencies")
-except Exception as e:
-    print(f"❌ ERROR: Could not initialize PostgreSQL: {e}")
-    raise SystemExit("Cannot start without PostgreSQL")
 
 # ============================================================================
 # ESTABLISHMENT CONTEXT HANDLING (no-op for local PostgreSQL)
@@ -176,14 +158,25 @@ except Exception as e:
 
 def get_establishment_from_request():
     """
-    No-op for local PostgreSQL (no multi-tenant establishment context needed)
+    Establishment of the signed-in employee (Authorization / X-Session-Token), only looked up
+    when the database holds several establishments; None means "use the cached default".
     """
-    return None
+    from database_postgres import has_multiple_establishments, establishment_for_session
+    if not has_multiple_establishments():
+        return None
+    token = (request.headers.get('Authorization', '').replace('Bearer ', '').strip()
+             or request.headers.get('X-Session-Token'))
+    return establishment_for_session(token) if token else None
 
 @app.before_request
 def set_establishment_context():
-    """No-op for local PostgreSQL (no multi-tenant establishment context needed)"""
-    pass
+    """Per-request establishment context (worker threads are reused, so always reset it)."""
+    if set_current_establishment is None:
+        return
+    try:
+        set_current_establishment(get_establishment_from_request())
+    except Exception:
+        set_current_establishment(None)
 
 
 def _table_has_archived_column(table_name):
@@ -204,8 +197,14 @@ def _table_has_archived_column(table_name):
 
 # Initialize Socket.IO
 if SOCKETIO_AVAILABLE:
-    # Use threading mode instead of eventlet to avoid blocking issues
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+    # Threading mode for the development server; serve.py selects eventlet/gevent and, with several
+    # worker processes, a message queue (e.g. redis://) so emits reach rooms joined on other workers
+    socketio = SocketIO(
+        app,
+        cors_allowed_origins="*",
+        async_mode=os.environ.get('SOCKETIO_ASYNC_MODE', 'threading'),
+        message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None,
+    )
 else:
     socketio = None
 
@@ -247,10 +246,9 @@ def handle_500_error(e):
         return Response(f'{{"success": false, "error": "{error_msg}", "message": "Internal server error"}}', 
                        mimetype='application/json', status=500)
 
-if _ACCOUNTING_BACKEND_AVAILABLE:
-    @app.errorhandler(AppError)
-    def handle_app_error_exc(e):
-        return handle_app_error(e)
+@app.errorhandler(AppError)
+def handle_app_error_exc(e):
+    return handle_app_error(e)
 
 # After request hook to ensure all error responses are JSON
 @app.after_request
@@ -280,6 +278,45 @@ def after_request(response):
                            mimetype='application/json', status=response.status_code)
     return response
 
+
+# Per-request DB instrumentation (statement count, DB time, pool wait; see database_postgres)
+# and request-scoped connection sharing (nested get_connection() calls reuse the request's connection)
+_DB_PERF_HEADERS = os.environ.get('DB_PERF_HEADERS', '').strip().lower() in ('1', 'true', 'yes')
+
+
+@app.before_request
+def _begin_db_stats():
+    from database_postgres import begin_request_stats, begin_request_scope
+    begin_request_stats()
+    begin_request_scope()
+
+
+@app.after_request
+def _db_stats_headers(response):
+    """Expose this request's DB stats as headers in debug mode (or with DB_PERF_HEADERS=1)."""
+    if not (app.debug or _DB_PERF_HEADERS):
+        return response
+    from database_postgres import current_request_stats
+    stats = current_request_stats()
+    if stats is not None:
+        response.headers['X-DB-Queries'] = str(stats.statements)
+        response.headers['X-DB-Time-Ms'] = f'{stats.db_time_ms:.2f}'
+        response.headers['X-DB-Pool-Wait-Ms'] = f'{stats.pool_wait_ms:.2f}'
+        response.headers['X-DB-Slow-Queries'] = str(len(stats.slow))
+        response.headers['Server-Timing'] = (
+            f'db;dur={stats.db_time_ms:.2f};desc="{stats.statements} queries", '
+            f'pool;dur={stats.pool_wait_ms:.2f}'
+        )
+    return response
+
+
+@app.teardown_request
+def _end_db_stats(exc=None):
+    from database_postgres import end_request_stats, end_request_scope
+    end_request_scope()
+    rule = request.url_rule.rule if request.url_rule is not None else '(unmatched)'
+    end_request_stats(f'{request.method} {rule}')
+
 # Check if React build exists
 BUILD_DIR = 'frontend/dist'
 HAS_BUILD = os.path.exists(BUILD_DIR) and os.path.exists(os.path.join(BUILD_DIR, 'index.html'))
@@ -646,7 +683,7 @@ def _send_order_notification_async(order_info):
             import traceback
             print(f"[notification] order notify error: {e}", flush=True)
             traceback.print_exc()
-    threading.Thread(target=_do, daemon=True).start()
+    run_in_background(_do)
 
 
 
@@ -680,57 +717,12 @@ def _sanitize_for_json(obj):
     return obj
 
 def _pg_allowed_tables():
-    """List public table names (PostgreSQL)."""
-    conn, cursor = _pg_conn()
-    try:
-        cursor.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename NOT LIKE 'pg_%%'")
-        return [r['tablename'] for r in cursor.fetchall()]
-    finally:
-        conn.close()
-
-def get_table_data(table_name):
-    """Get all data from a table (PostgreSQL)."""
-    conn, cursor = _pg_conn()
-    try:
-        cursor.execute(sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name)))
-        rows = cursor.fetchall()
-        columns = list(rows[0].keys()) if rows else []
-        return columns, [dict(r) for r in rows]
-    finally:
-        conn.close()
+    """List public table names (PostgreSQL; cached catalog metadata, see table_browser)."""
+    return allowed_tables()
 
 def get_table_primary_key_columns(table_name):
-    """Return primary key column names for a table (PostgreSQL)."""
-    conn, cursor = _pg_conn()
-    try:
-        cursor.execute("""
-            SELECT a.attname
-            FROM pg_index i
-            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey) AND NOT a.attisdropped
-            WHERE i.indrelid = %s::regclass AND i.indisprimary
-            ORDER BY array_position(i.indkey, a.attnum)
-        """, (table_name,))
-        return [r['attname'] for r in cursor.fetchall()]
-    finally:
-        conn.close()
-
-def get_table_data_for_admin(table_name):
-    """Get table data plus PK metadata (PostgreSQL). No rowid fallback."""
-    pk_cols = get_table_primary_key_columns(table_name)
-    conn, cursor = _pg_conn()
-    try:
-        cursor.execute(sql.SQL("SELECT * FROM {}").format(sql.Identifier(table_name)))
-        rows = cursor.fetchall()
-        columns = list(rows[0].keys()) if rows else []
-        data = [dict(r) for r in rows]
-        return {
-            'columns': columns,
-            'data': data,
-            'primary_key': pk_cols,
-            'rowid_column': None
-        }
-    finally:
-        conn.close()
+    """Return primary key column names for a table (PostgreSQL; cached)."""
+    return table_primary_key(table_name)
 
 @app.route('/')
 def index():
@@ -908,6 +900,16 @@ def api_inventory():
                 has_sell_at_pos = cursor.fetchone() is not None
                 if has_sell_at_pos and sell_at_pos_only:
                     sql += " AND (i.sell_at_pos IS TRUE)"
+                # Optional master category filter (category_id or category path) including all subcategories
+                category_filter_ids = None
+                category_id_arg = request.args.get('category_id')
+                category_path_arg = request.args.get('category')
+                if (category_id_arg and category_id_arg.isdigit()) or category_path_arg:
+                    from database import get_category_by_path, get_category_subtree_ids
+                    root_id = int(category_id_arg) if category_id_arg and category_id_arg.isdigit() else get_category_by_path(category_path_arg)
+                    category_filter_ids = get_category_subtree_ids(root_id) if root_id else []
+                    sql += " AND pm.category_id = ANY(%s)"
+                    params.append(category_filter_ids)
                 if has_item_type:
                     sql += " ORDER BY i.item_type NULLS LAST, i.product_name"
                 else:
@@ -929,7 +931,7 @@ def api_inventory():
                 total = None
                 if limit_val is not None:
                     try:
-                        count_sql = "SELECT COUNT(*) AS c FROM inventory i WHERE 1=1"
+                        count_sql = "SELECT COUNT(*) AS c FROM inventory i LEFT JOIN product_metadata pm ON i.product_id = pm.product_id WHERE 1=1"
                         count_params = []
                         cursor.execute("SELECT 1 FROM information_schema.columns WHERE table_schema = 'public' AND table_name = 'inventory' AND column_name = 'archived'")
                         if cursor.fetchone():
@@ -943,6 +945,9 @@ def api_inventory():
                             count_sql += " AND i.item_type = 'ingredient'"
                         if has_sell_at_pos and sell_at_pos_only:
                             count_sql += " AND (i.sell_at_pos IS TRUE)"
+                        if category_filter_ids is not None:
+                            count_sql += " AND pm.category_id = ANY(%s)"
+                            count_params.append(category_filter_ids)
                         cursor.execute(count_sql, count_params)
                         row = cursor.fetchone()
                         total = row['c'] if row else len(data)
@@ -950,8 +955,8 @@ def api_inventory():
                         total = len(data)
                 # Use full category path for each item so master category filter includes subcategories
                 try:
-                    cats = list_categories(include_path=True)
-                    category_id_to_path = {c['category_id']: c.get('category_path') or c.get('category_name') for c in cats if c.get('category_id')}
+                    from database import get_category_paths
+                    category_id_to_path = get_category_paths()
                     for row in data:
                         cid = row.get('metadata_category_id')
                         if cid and cid in category_id_to_path and category_id_to_path[cid]:
@@ -1500,7 +1505,7 @@ def api_category_doordash_bulk(category_id):
 def api_update_category_impl(category_id):
     """Update a category - supports updating the full category path"""
     try:
-        from database import get_connection, create_or_get_category_with_hierarchy
+        from database import get_connection, create_or_get_category_with_hierarchy, invalidate_category_cache
         data = request.json if request.is_json else request.form.to_dict()
         category_path = data.get('category_name') or data.get('category_path')
         
@@ -1544,6 +1549,7 @@ def api_update_category_impl(category_id):
         conn.commit()
         success = cursor.rowcount > 0
         conn.close()
+        invalidate_category_cache()
         
         if success:
             return jsonify({
@@ -1751,10 +1757,48 @@ def api_scan_item(shipment_id):
         traceback.print_exc()
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/api/shipments/scan-metrics', methods=['GET'])
+def api_scan_metrics():
+    """Scan-to-ack and batch flush latency (p50/p95/p99 ms) for shipment verification scans"""
+    try:
+        from scan_sessions import get_scan_session_manager
+        return jsonify({'success': True, 'metrics': get_scan_session_manager().metrics()})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/accounting/journal-queue/metrics', methods=['GET'])
+def api_journal_queue_metrics():
+    """Deferred sale journalization: queue depth, lag and throughput"""
+    try:
+        from journal_queue import get_journal_queue
+        return jsonify({'success': True, 'metrics': get_journal_queue().metrics()})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/admin/scheduler/metrics', methods=['GET'])
+def api_scheduler_metrics():
+    """Background job scheduler: leader lease, per-job next run, runs, failures, duration and lag"""
+    try:
+        from job_scheduler import get_scheduler
+        return jsonify({'success': True, 'metrics': get_scheduler().metrics()})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/shipments/<int:shipment_id>/progress', methods=['GET'])
 def api_get_progress(shipment_id):
-    """Get verification progress"""
-    try:
+    """Get verification progress (?summary=1: counters only, no item list)"""
+    try:
+        if request.args.get('summary') in ('1', 'true'):
+            from scan_sessions import flush_scan_sessions
+            from database import get_shipment_progress_summary
+            flush_scan_sessions()
+            summary = get_shipment_progress_summary(shipment_id)
+            if summary is None:
+                return jsonify({'error': 'Shipment not found'}), 404
+            return jsonify(summary)
         progress = get_verification_progress(shipment_id)
         return jsonify(progress)
     except Exception as e:
@@ -2122,10 +2166,71 @@ def api_preview_shipment_manual():
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
+def _shipment_async_requested():
+    """True if the client asked for background processing (header, form or query ?async=1)."""
+    val = (
+        (request.headers.get('X-Shipment-Async') or '') or
+        (request.form.get('async') or '') or
+        (request.args.get('async') or '')
+    ).strip().lower()
+    return val in ('1', 'true', 'yes')
+
+
+def _cleanup_on_failure(func, file_path):
+    """Wrap a shipment job so the uploaded file is removed when processing fails."""
+    def run(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if not (result or {}).get('success'):
+            try:
+                os.remove(file_path)
+            except Exception:
+                pass
+        return result
+    return run
+
+
+@app.route('/api/shipments/jobs/<job_id>', methods=['GET'])
+def api_shipment_job_status(job_id):
+    """Status of a background shipment preview/upload job: status, stage, progress (0-100), result."""
+    from shipment_processor import get_shipment_job
+    job = get_shipment_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+
+@app.route('/api/shipments/jobs/<job_id>/events', methods=['GET'])
+def api_shipment_job_events(job_id):
+    """Server-Sent Events stream of job progress; ends when the job is done or failed."""
+    from shipment_processor import get_shipment_job
+    if not get_shipment_job(job_id):
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+
+    def generate():
+        import time as _time
+        last = None
+        deadline = _time.monotonic() + 15 * 60
+        while _time.monotonic() < deadline:
+            job = get_shipment_job(job_id)
+            if not job:
+                yield 'event: error\ndata: {"message": "Job expired"}\n\n'
+                return
+            snapshot = (job['status'], job['stage'], job['progress'])
+            if snapshot != last:
+                last = snapshot
+                yield f"data: {json.dumps(job, default=str)}\n\n"
+            if job['status'] in ('done', 'failed'):
+                return
+            _time.sleep(0.5)
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @app.route('/api/shipments/preview', methods=['POST'])
 def api_preview_shipment():
     """Preview scraped data from a vendor shipment document without creating shipment.
-    For manual entry (no scrape), use POST /api/shipments/preview-manual instead."""
+    For manual entry (no scrape), use POST /api/shipments/preview-manual instead.
+    With async=1 returns 202 + job_id immediately; items arrive in the job result."""
     try:
         # Check if file is present
         if 'document' not in request.files:
@@ -2163,6 +2268,17 @@ def api_preview_shipment():
                 'filename': file.filename
             })
         
+        if not use_legacy and _shipment_async_requested():
+            # Background extraction: poll GET /api/shipments/jobs/<job_id> or stream .../events
+            from shipment_processor import start_shipment_job, extract_shipment_items
+            job_id = start_shipment_job(_cleanup_on_failure(extract_shipment_items, file_path), file_path)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'file_path': file_path,
+                'filename': file.filename
+            }), 202
+        
         if use_legacy:
             # Legacy scraper (PDF, Excel, CSV only)
             try:
@@ -2550,6 +2666,19 @@ def api_upload_shipment():
         file_path = os.path.join(upload_dir, filename)
         file.save(file_path)
         
+        if not use_legacy_scraper and _shipment_async_requested():
+            from shipment_processor import start_shipment_job
+            job_id = start_shipment_job(
+                _cleanup_on_failure(create_shipment_from_document, file_path),
+                file_path=file_path,
+                vendor_id=vendor_id,
+                purchase_order_number=purchase_order_number if purchase_order_number else None,
+                expected_delivery_date=expected_delivery_date,
+                uploaded_by=employee_id,
+                verification_mode=verification_mode
+            )
+            return jsonify({'success': True, 'job_id': job_id}), 202
+        
         # Process document and create pending shipment
         result = create_shipment_from_document(
             file_path=file_path,
@@ -2824,12 +2953,12 @@ def api_create_order():
             scheduled_time=data.get('scheduled_time'),
         )
         
-        # Post to accounting only when order was paid (not pay-later)
+        # Post to accounting only when order was paid (not pay-later); queued, posted in the background
         if (result.get('success') and result.get('order_id') and employee_id
                 and pay_status != 'pending'):
                 try:
-                    from pos_accounting_bridge import journalize_sale_to_accounting
-                    jr = journalize_sale_to_accounting(result['order_id'], int(employee_id))
+                    from journal_queue import enqueue_sale_journalization
+                    jr = enqueue_sale_journalization(result['order_id'], int(employee_id))
                     if not jr.get('success'):
                         print(f"Accounting journalize_sale (order {result['order_id']}): {jr.get('message', 'unknown')}")
                 except Exception as je:
@@ -3325,6 +3454,8 @@ def api_update_pos_settings():
                 except Exception:
                     pass
             conn.commit()
+            from customer_display_system import invalidate_display_context
+            invalidate_display_context()
             return jsonify({'success': True, 'message': 'POS settings updated successfully'})
         finally:
             conn.close()
@@ -3418,9 +3549,7 @@ def api_pos_bootstrap():
                 rewards_settings = {'enabled': 0, 'require_email': 0, 'require_phone': 0, 'require_both': 0, 'reward_type': 'points', 'points_per_dollar': 1.0, 'points_redemption_value': 0.01, 'percentage_discount': 0.0, 'fixed_discount': 0.0, 'minimum_spend': 0.0}
 
             # 3) POS search filters (from establishment settings)
-            cursor.execute("SELECT establishment_id FROM establishments ORDER BY establishment_id LIMIT 1")
-            est_row = cursor.fetchone()
-            establishment_id = est_row.get('establishment_id') if est_row and isinstance(est_row, dict) else (est_row[0] if est_row else None)
+            establishment_id = get_current_establishment() if get_current_establishment else None
             pos_search_filters = None
             if establishment_id:
                 cursor.execute("SELECT settings FROM establishments WHERE establishment_id = %s", (establishment_id,))
@@ -3433,7 +3562,7 @@ def api_pos_bootstrap():
                 pos_search_filters = _default_pos_search_filters()
 
             # 4) Inventory (products + variants) – same shape as GET /api/inventory?item_type=product&include_variants=1
-            from database import ensure_metadata_tables, list_categories
+            from database import ensure_metadata_tables
             ensure_metadata_tables()
             sql = """
                 SELECT i.*, v.vendor_name, pm.keywords, pm.tags, pm.attributes, pm.brand, pm.color, pm.size,
@@ -3458,8 +3587,8 @@ def api_pos_bootstrap():
             columns = list(rows[0].keys()) if rows else []
             data = [dict(r) for r in rows]
             try:
-                cats = list_categories(include_path=True)
-                category_id_to_path = {c['category_id']: c.get('category_path') or c.get('category_name') for c in (cats or []) if c.get('category_id')}
+                from database import get_category_paths
+                category_id_to_path = get_category_paths()
                 for row in data:
                     cid = row.get('metadata_category_id')
                     if cid and cid in category_id_to_path and category_id_to_path[cid]:
@@ -3588,42 +3717,50 @@ def api_list_tables():
         return jsonify({'tables': [], 'error': str(e)}), 500
 
 # Raw table endpoints for admin table viewer (always direct table access + metadata)
-@app.route('/api/tables/<table_name>', methods=['GET'])
-def api_tables_table(table_name):
-    """Raw table access for the Tables UI (includes PK metadata)."""
+def _table_page_response(table_name):
+    """Bounded, keyset-paginated page of a table (see table_browser for the query parameters)."""
     try:
-        allowed_tables = _pg_allowed_tables()
+        allowed = _pg_allowed_tables()
     except Exception as e:
         print(f"Error getting table list: {e}")
         return jsonify({'columns': [], 'data': [], 'error': 'Database error'}), 500
-    if table_name not in allowed_tables:
+    if table_name not in allowed:
         return jsonify({'columns': [], 'data': [], 'error': 'Table not found'}), 404
     try:
-        result = get_table_data_for_admin(table_name)
-        return jsonify(result)
+        return jsonify(fetch_table_page(table_name, request.args))
+    except TableQueryError as e:
+        return jsonify({'columns': [], 'data': [], 'error': str(e)}), 400
     except Exception as e:
         print(f"Error loading table {table_name}: {e}")
         traceback.print_exc()
         return jsonify({'columns': [], 'data': [], 'error': str(e)}), 500
 
+@app.route('/api/tables/<table_name>', methods=['GET'])
+def api_tables_table(table_name):
+    """Raw table access for the Tables UI (includes PK metadata). Paginated: follow next_cursor via ?after=."""
+    return _table_page_response(table_name)
+
+@app.route('/api/tables/<table_name>/export', methods=['GET'])
+def api_tables_export(table_name):
+    """Stream a whole table (same columns / filter / sort parameters) as NDJSON or CSV (?format=csv)."""
+    if table_name not in _pg_allowed_tables():
+        return jsonify({'success': False, 'error': 'Table not found'}), 404
+    fmt = (request.args.get('format') or 'ndjson').lower()
+    try:
+        chunks = iter_table_export(table_name, request.args, fmt)
+    except TableQueryError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(chunks, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{table_name}.{fmt}"',
+        'Cache-Control': 'no-store',
+    })
+
 # Generic table endpoints
 @app.route('/api/<table_name>', methods=['GET'])
 def api_table(table_name):
-    """Generic endpoint for any table (read-only)"""
-    try:
-        allowed_tables = _pg_allowed_tables()
-    except Exception as e:
-        print(f"Error getting table list: {e}")
-        return jsonify({'columns': [], 'data': [], 'error': 'Database error'}), 500
-    if table_name not in allowed_tables:
-        return jsonify({'columns': [], 'data': [], 'error': 'Table not found'}), 404
-    try:
-        result = get_table_data_for_admin(table_name)
-        return jsonify(result)
-    except Exception as e:
-        print(f"Error loading table {table_name}: {e}")
-        traceback.print_exc()
-        return jsonify({'columns': [], 'data': [], 'error': str(e)}), 500
+    """Generic endpoint for any table (read-only, paginated like /api/tables/<table_name>)"""
+    return _table_page_response(table_name)
 
 @app.route('/api/tables/<table_name>/rows', methods=['DELETE'])
 @app.route('/api/<table_name>/rows', methods=['DELETE'])
@@ -3738,29 +3875,37 @@ def api_update_table_row(table_name):
 # Specialized endpoints with joins
 @app.route('/api/orders')
 def api_orders():
-    """Get orders with employee and customer names. Query params: order_status, order_status_in (comma), order_type_in (comma), limit, offset."""
+    """Get orders with employee and customer names. Query params: order_status, order_status_in (comma), order_type_in (comma), limit, offset,
+    cursor (next_cursor of the previous page; keyset paging, preferred over offset)."""
     try:
         order_status = request.args.get('order_status')
         order_status_in_str = request.args.get('order_status_in')
         order_type_in_str = request.args.get('order_type_in')
         limit_str = request.args.get('limit')
         offset_str = request.args.get('offset')
+        after = request.args.get('cursor') or None
         order_status_in = [s.strip() for s in order_status_in_str.split(',') if s.strip()] if order_status_in_str else None
         order_type_in = [t.strip() for t in order_type_in_str.split(',') if t.strip()] if order_type_in_str else None
         limit = int(limit_str) if limit_str and str(limit_str).isdigit() else None
         offset = int(offset_str) if offset_str and str(offset_str).isdigit() else None
-        orders = list_orders(
-            order_status=order_status or None,
-            order_status_in=order_status_in,
-            order_type_in=order_type_in,
-            limit=limit,
-            offset=offset
-        )
+        try:
+            orders = list_orders(
+                order_status=order_status or None,
+                order_status_in=order_status_in,
+                order_type_in=order_type_in,
+                limit=limit,
+                offset=offset,
+                after=after,
+                lean=True
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e), 'columns': [], 'data': []}), 400
         if not orders:
             out = {'columns': [], 'data': []}
             if limit is not None:
                 total = count_orders(order_status=order_status or None, order_status_in=order_status_in, order_type_in=order_type_in)
                 out['total'] = total
+                out['next_cursor'] = None
             return jsonify(out)
         # Ensure every order has order_source, prepare_by, dasher fields (for logos and Dasher status in table/cards)
         for o in orders:
@@ -3785,6 +3930,7 @@ def api_orders():
         if limit is not None:
             total = count_orders(order_status=order_status or None, order_status_in=order_status_in, order_type_in=order_type_in)
             out['total'] = total
+            out['next_cursor'] = order_list_cursor(orders[-1]) if len(orders) == limit else None
         return jsonify(out)
     except Exception as e:
         print(f"Error in api_orders: {e}")
@@ -3802,69 +3948,24 @@ def api_search_orders():
         if not order_number and not order_id:
             return jsonify({'error': 'order_number or order_id required', 'data': []}), 400
         
+        if not order_id:
+            # Search by order_number: exact -> prefix -> fuzzy (barcode scanners may send ORD# or wrong chars)
+            return jsonify({'data': find_orders_by_number(order_number, limit=10)})
+        
         conn, cursor = _pg_conn()
         try:
-            if order_id:
-                # Search by order_id
-                cursor.execute("""
-                    SELECT 
-                        o.*,
-                        e.first_name || ' ' || e.last_name as employee_name,
-                        c.customer_name
-                    FROM orders o
-                    LEFT JOIN employees e ON o.employee_id = e.employee_id
-                    LEFT JOIN customers c ON o.customer_id = c.customer_id
-                    WHERE o.order_id = %s
-                """, (int(order_id),))
-                rows = cursor.fetchall()
-                data = [dict(r) for r in rows]
-            else:
-                # Search by order_number: exact, partial, or fuzzy (barcode scanners may send ORD# or wrong chars)
-                import re
-                cleaned = re.sub(r'[^A-Za-z0-9-]', '', (order_number or ''))
-                digits_only = re.sub(r'[^0-9]', '', (order_number or ''))
-                pattern = f'%{order_number}%'
-                params = [pattern, order_number]
-                fuzzy_pattern = None
-                if cleaned.upper().startswith('ORD'):
-                    digits = re.sub(r'[^0-9]', '', cleaned)
-                    if len(digits) >= 9:
-                        date_part = digits[:8]
-                        seq_part = digits[8:]
-                        fuzzy_pattern = f'%ORD%{date_part}%{seq_part}%'
-                        params.append(fuzzy_pattern)
-                sql = """
-                    SELECT 
-                        o.*,
-                        e.first_name || ' ' || e.last_name as employee_name,
-                        c.customer_name
-                    FROM orders o
-                    LEFT JOIN employees e ON o.employee_id = e.employee_id
-                    LEFT JOIN customers c ON o.customer_id = c.customer_id
-                    WHERE o.order_number::text ILIKE %s
-                       OR o.order_number::text = %s
-                """
-                if fuzzy_pattern:
-                    sql += " OR o.order_number::text ILIKE %s"
-                sql += " ORDER BY o.order_date DESC LIMIT 10"
-                cursor.execute(sql, params)
-                rows = cursor.fetchall()
-                data = [dict(r) for r in rows]
-                # If no match and barcode looked like order (e.g. "ORD#,4:" -> digits 4), try order_id
-                if not data and digits_only and digits_only.isdigit():
-                    cursor.execute("""
-                        SELECT 
-                            o.*,
-                            e.first_name || ' ' || e.last_name as employee_name,
-                            c.customer_name
-                        FROM orders o
-                        LEFT JOIN employees e ON o.employee_id = e.employee_id
-                        LEFT JOIN customers c ON o.customer_id = c.customer_id
-                        WHERE o.order_id = %s
-                    """, (int(digits_only),))
-                    rows = cursor.fetchall()
-                    data = [dict(r) for r in rows]
-
+            cursor.execute("""
+                SELECT 
+                    o.*,
+                    e.first_name || ' ' || e.last_name as employee_name,
+                    c.customer_name
+                FROM orders o
+                LEFT JOIN employees e ON o.employee_id = e.employee_id
+                LEFT JOIN customers c ON o.customer_id = c.customer_id
+                WHERE o.order_id = %s
+            """, (int(order_id),))
+            rows = cursor.fetchall()
+            data = [dict(r) for r in rows]
             return jsonify({'data': data})
         finally:
             conn.close()
@@ -3925,8 +4026,8 @@ def api_update_order_status(order_id):
         )
         if result.get('success') and data.get('payment_status') == 'completed' and employee_id:
             try:
-                from pos_accounting_bridge import journalize_sale_to_accounting
-                journalize_sale_to_accounting(order_id, int(employee_id))
+                from journal_queue import enqueue_sale_journalization
+                enqueue_sale_journalization(order_id, int(employee_id))
             except Exception as je:
                 print(f"Accounting journalize_sale (order {order_id}) after mark-paid: {je}")
         if result.get('success'):
@@ -4675,8 +4776,8 @@ def api_orders_from_integration():
         if result.get('success') and result.get('order_id'):
             order_id = result['order_id']
             try:
-                from pos_accounting_bridge import journalize_sale_to_accounting
-                journalize_sale_to_accounting(order_id, int(employee_id))
+                from journal_queue import enqueue_sale_journalization
+                enqueue_sale_journalization(order_id, int(employee_id))
             except Exception as je:
                 print(f"Accounting journalize_sale (order {order_id}) from integration: {je}")
             oi = {'order_number': result.get('order_number', ''), 'total': result.get('total', 0), 'order_source': order_source}
@@ -4848,8 +4949,8 @@ def api_webhooks_shopify_orders():
         )
         if result.get('success') and result.get('order_id'):
             try:
-                from pos_accounting_bridge import journalize_sale_to_accounting
-                journalize_sale_to_accounting(result['order_id'], employee_id)
+                from journal_queue import enqueue_sale_journalization
+                enqueue_sale_journalization(result['order_id'], employee_id)
             except Exception:
                 pass
         return jsonify({'ok': True}), 200
@@ -4946,8 +5047,8 @@ def api_webhooks_doordash_orders():
             except Exception:
                 pass
             try:
-                from pos_accounting_bridge import journalize_sale_to_accounting
-                journalize_sale_to_accounting(result['order_id'], employee_id)
+                from journal_queue import enqueue_sale_journalization
+                enqueue_sale_journalization(result['order_id'], employee_id)
             except Exception:
                 pass
             merchant_id = str(result.get('order_id') or result.get('order_number') or '')
@@ -5820,7 +5921,7 @@ def api_orders_latest():
     """Return the most recent order id (for new-order polling / toast)."""
     try:
         from database import list_orders
-        orders = list_orders(limit=1, offset=0)
+        orders = list_orders(limit=1, lean=True)
         if not orders:
             return jsonify({'order_id': None, 'order_number': None})
         o = orders[0]
@@ -5836,9 +5937,16 @@ def api_orders_latest():
 
 @app.route('/api/order_items')
 def api_order_items():
-    """Get order items with product details"""
+    """Get order items with product details. ?order_id= for one order; otherwise newest orders first,
+    filtered by ?product_id= (comma separated) and paginated (limit, after=next_cursor)."""
     try:
         order_id = request.args.get('order_id')
+        if order_id:
+            try:
+                order_id = int(order_id)
+            except ValueError:
+                raise TableQueryError('order_id must be an integer')
+        after = decode_int_cursor(request.args['after'], 2) if request.args.get('after') else None
         conn, cursor = _pg_conn()
         try:
             if order_id:
@@ -5854,26 +5962,45 @@ def api_order_items():
                     LEFT JOIN orders o ON oi.order_id = o.order_id
                     WHERE oi.order_id = %s
                     ORDER BY oi.order_item_id
-                """, (int(order_id),))
-            else:
-                # Fetch all order items
-                cursor.execute("""
-                    SELECT 
-                        oi.*,
-                        i.product_name,
-                        i.sku,
-                        o.order_number
-                    FROM order_items oi
-                    LEFT JOIN inventory i ON oi.product_id = i.product_id
-                    LEFT JOIN orders o ON oi.order_id = o.order_id
-                    ORDER BY oi.order_id DESC, oi.order_item_id
-                """)
-            rows = cursor.fetchall()
+                """, (order_id,))
+                rows = cursor.fetchall()
+                columns = list(rows[0].keys()) if rows else []
+                return jsonify({'columns': columns, 'data': [dict(r) for r in rows]})
+
+            limit = page_limit(request.args)
+            where, params = [sql.SQL('TRUE')], []
+            product_ids = [int(p) for p in (request.args.get('product_id') or '').split(',') if p.strip().isdigit()]
+            if product_ids:
+                where.append(sql.SQL('oi.product_id = ANY(%s)'))
+                params.append(product_ids)
+            if after is not None:
+                cond, cond_params = keyset_condition(
+                    [(sql.SQL('oi.order_id'), True), (sql.SQL('oi.order_item_id'), False)], after)
+                where.append(cond)
+                params.extend(cond_params)
+            cursor.execute(sql.SQL("""
+                SELECT 
+                    oi.*,
+                    i.product_name,
+                    i.sku,
+                    o.order_number
+                FROM order_items oi
+                LEFT JOIN inventory i ON oi.product_id = i.product_id
+                LEFT JOIN orders o ON oi.order_id = o.order_id
+                WHERE {}
+                ORDER BY oi.order_id DESC, oi.order_item_id
+                LIMIT %s
+            """).format(sql.SQL(' AND ').join(where)), params + [limit + 1])
+            rows = [dict(r) for r in cursor.fetchall()]
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             columns = list(rows[0].keys()) if rows else []
-            data = [dict(r) for r in rows]
-            return jsonify({'columns': columns, 'data': data})
+            next_cursor = encode_cursor([rows[-1]['order_id'], rows[-1]['order_item_id']]) if has_more else None
+            return jsonify({'columns': columns, 'data': rows, 'has_more': has_more, 'next_cursor': next_cursor})
         finally:
             conn.close()
+    except TableQueryError as e:
+        return jsonify({'error': str(e), 'columns': [], 'data': []}), 400
     except Exception as e:
         print(f"Error in api_order_items: {e}")
         traceback.print_exc()
@@ -5881,25 +6008,46 @@ def api_order_items():
 
 @app.route('/api/payment_transactions')
 def api_payment_transactions():
-    """Get payment transactions with order details"""
-    try:
+    """Get payment transactions with order details, newest first. Filters: ?transaction_id=, ?order_id=;
+    paginated (limit, after=next_cursor)."""
+    try:
+        limit = page_limit(request.args)
+        where, params = [sql.SQL('TRUE')], []
+        for arg, column in (('transaction_id', 'pt.transaction_id'), ('order_id', 'pt.order_id')):
+            value = request.args.get(arg)
+            if value:
+                if not value.isdigit():
+                    return jsonify({'error': f'{arg} must be an integer', 'columns': [], 'data': []}), 400
+                where.append(sql.SQL(column + ' = %s'))
+                params.append(int(value))
+        if request.args.get('after'):
+            cond, cond_params = keyset_condition([(sql.SQL('pt.transaction_id'), True)],
+                                                 decode_int_cursor(request.args['after'], 1))
+            where.append(cond)
+            params.extend(cond_params)
         conn, cursor = _pg_conn()
         try:
-            cursor.execute("""
+            cursor.execute(sql.SQL("""
                 SELECT 
                     pt.*,
                     o.order_number,
                     o.total as order_total
                 FROM payment_transactions pt
                 JOIN orders o ON pt.order_id = o.order_id
-                ORDER BY pt.transaction_date DESC
-            """)
-            rows = cursor.fetchall()
+                WHERE {}
+                ORDER BY pt.transaction_id DESC
+                LIMIT %s
+            """).format(sql.SQL(' AND ').join(where)), params + [limit + 1])
+            rows = [dict(r) for r in cursor.fetchall()]
+            has_more = len(rows) > limit
+            rows = rows[:limit]
             columns = list(rows[0].keys()) if rows else []
-            data = [dict(r) for r in rows]
-            return jsonify({'columns': columns, 'data': data})
+            next_cursor = encode_cursor([rows[-1]['transaction_id']]) if has_more else None
+            return jsonify({'columns': columns, 'data': rows, 'has_more': has_more, 'next_cursor': next_cursor})
         finally:
             conn.close()
+    except TableQueryError as e:
+        return jsonify({'error': str(e), 'columns': [], 'data': []}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({'error': str(e), 'columns': [], 'data': []}), 500
@@ -5975,8 +6123,10 @@ def api_customers():
             return jsonify(out)
         finally:
             conn.close()
-    columns, data = get_table_data('customers')
-    return jsonify({'columns': columns, 'data': data})
+    try:
+        return jsonify(fetch_table_page('customers', request.args))
+    except TableQueryError as e:
+        return jsonify({'columns': [], 'data': [], 'error': str(e)}), 400
 
 
 @app.route('/api/customers/<int:customer_id>', methods=['GET', 'PUT', 'DELETE'])
@@ -6463,26 +6613,22 @@ def api_clock_in():
             # ── Fire clock-in notification (non-blocking) ──────────────────
             try:
                 from notification_service import send_clockin_notification
-                import threading
                 emp_email = employee.get('email', '') or ''
                 sched_start = comparison_result.get('scheduled_start_time')
-                threading.Thread(
-                    target=send_clockin_notification,
-                    kwargs=dict(
-                        store_id=1,
-                        employee_id=employee_id,
-                        employee_name=employee_name,
-                        employee_email=emp_email,
-                        event_type='clock_in',
-                        event_time=clock_in_time,
-                        scheduled_start=sched_start,
-                        minutes_late=comparison_result.get('minutes_late', 0),
-                        is_late=(comparison_result.get('status') == 'late'),
-                        is_early=(comparison_result.get('status') == 'early'),
-                        is_unscheduled=(not bool(schedule_id)),
-                    ),
-                    daemon=True
-                ).start()
+                run_in_background(
+                    send_clockin_notification,
+                    store_id=1,
+                    employee_id=employee_id,
+                    employee_name=employee_name,
+                    employee_email=emp_email,
+                    event_type='clock_in',
+                    event_time=clock_in_time,
+                    scheduled_start=sched_start,
+                    minutes_late=comparison_result.get('minutes_late', 0),
+                    is_late=(comparison_result.get('status') == 'late'),
+                    is_early=(comparison_result.get('status') == 'early'),
+                    is_unscheduled=(not bool(schedule_id)),
+                )
             except Exception as _ne:
                 print(f'[clockin notif] error: {_ne}', flush=True)
             # ──────────────────────────────────────────────────────────────
@@ -6546,22 +6692,18 @@ def api_clock_out():
             # ── Fire clock-out notification (non-blocking) ─────────────────
             try:
                 from notification_service import send_clockin_notification
-                import threading
                 emp_email = (employee or {}).get('email', '') or ''
-                threading.Thread(
-                    target=send_clockin_notification,
-                    kwargs=dict(
-                        store_id=1,
-                        employee_id=employee_id,
-                        employee_name=employee_name,
-                        employee_email=emp_email,
-                        event_type='clock_out',
-                        event_time=clock_out_time,
-                        hours_worked=clock_result.get('hours_worked'),
-                        overtime_hours=clock_result.get('overtime_hours'),
-                    ),
-                    daemon=True
-                ).start()
+                run_in_background(
+                    send_clockin_notification,
+                    store_id=1,
+                    employee_id=employee_id,
+                    employee_name=employee_name,
+                    employee_email=emp_email,
+                    event_type='clock_out',
+                    event_time=clock_out_time,
+                    hours_worked=clock_result.get('hours_worked'),
+                    overtime_hours=clock_result.get('overtime_hours'),
+                )
             except Exception as _ne:
                 print(f'[clockout notif] error: {_ne}', flush=True)
             # ──────────────────────────────────────────────────────────────
@@ -6612,6 +6754,9 @@ def api_save_clockin_notification_settings():
             ids = []
         data['admin_email_ids'] = ids
         ok = save_clockin_notification_settings(store_id, data)
+        if ok:
+            from late_arrivals import roster_changed
+            roster_changed()
         return jsonify({'success': ok, 'message': 'Settings saved' if ok else 'Failed to save'})
     except Exception as e:
         traceback.print_exc()
@@ -6691,91 +6836,6 @@ def api_save_register_notification_settings():
         traceback.print_exc()
         return jsonify({'success': False, 'message': str(e)}), 500
 
-# ── Late-alert background scheduler ──────────────────────────────────────────
-def _run_late_alert_scheduler():
-    """Background thread: every 60s check for employees who should have clocked in but haven't."""
-    import time as _time
-    _STORE_ID = 1
-    _sent_alerts: set = set()   # avoid duplicate alerts per shift per day
-
-    while True:
-        _time.sleep(60)
-        try:
-            from notification_service import (get_clockin_notification_settings,
-                                              send_late_alert_notification)
-            settings = get_clockin_notification_settings(_STORE_ID)
-            if not settings.get('late_alert_enabled', False):
-                continue
-
-            delay_min = int(settings.get('late_alert_delay_min', 15))
-            threshold_min = int(settings.get('late_alert_threshold_min', 10))
-            now = datetime.now()
-            today = now.date().isoformat()
-
-            conn2, cur2 = _pg_conn()
-            # Find scheduled shifts starting today where employee has NOT clocked in
-            cur2.execute("""
-                SELECT
-                    ss.employee_id,
-                    ss.start_time,
-                    e.first_name || ' ' || e.last_name AS employee_name,
-                    e.email
-                FROM employee_schedule ss
-                JOIN employees e ON e.employee_id = ss.employee_id
-                WHERE ss.schedule_date = %s
-                  AND NOT EXISTS (
-                    SELECT 1 FROM time_clock tc
-                    WHERE tc.employee_id = ss.employee_id
-                      AND tc.clock_in::date = %s
-                  )
-            """, (today, today))
-            rows = cur2.fetchall()
-            for row in rows:
-                d = dict(row) if hasattr(row, 'keys') else dict(zip(
-                    ['employee_id','start_time','employee_name','email'], row))
-                emp_id   = d['employee_id']
-                start_t  = d['start_time']  # e.g. '09:00' or timedelta
-                emp_name = d['employee_name']
-                emp_email = d.get('email', '') or ''
-
-                # Parse shift start time
-                try:
-                    if hasattr(start_t, 'seconds'):
-                        total_s = int(start_t.total_seconds())
-                        sched_h, sched_m = divmod(total_s // 60, 60)
-                    else:
-                        parts = str(start_t).split(':')
-                        sched_h, sched_m = int(parts[0]), int(parts[1])
-
-                    from datetime import time as _time_cls
-                    from datetime import datetime as _dt
-                    sched_dt = _dt.combine(now.date(), _time_cls(sched_h, sched_m))
-                    minutes_past = (now - sched_dt).total_seconds() / 60
-
-                    if minutes_past >= (delay_min + threshold_min):
-                        alert_key = f"{today}:{emp_id}"
-                        if alert_key not in _sent_alerts:
-                            sched_str = sched_dt.strftime('%I:%M %p').lstrip('0')
-                            now_str   = now.strftime('%I:%M %p').lstrip('0')
-                            send_late_alert_notification(
-                                store_id=_STORE_ID,
-                                employee_id=emp_id,
-                                employee_name=emp_name,
-                                employee_email=emp_email,
-                                scheduled_start_str=sched_str,
-                                now_str=now_str,
-                                minutes_late=int(minutes_past),
-                            )
-                            _sent_alerts.add(alert_key)
-                except Exception as _pe:
-                    print(f'[late-alert] parse error for emp {emp_id}: {_pe}', flush=True)
-        except Exception as _e:
-            print(f'[late-alert scheduler] error: {_e}', flush=True)
-
-# Start late-alert scheduler at import time (daemon thread, won't block shutdown)
-import threading as _threading_late
-_late_alert_thread = _threading_late.Thread(target=_run_late_alert_scheduler, daemon=True)
-_late_alert_thread.start()
 
 
 @app.route('/api/face/register', methods=['POST'])
@@ -7276,12 +7336,33 @@ def api_face_clock():
         traceback.print_exc()
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def _ledger_page(query, keys, key_columns, base_where):
+    """Run a ledger listing (query has {where} and ends in ORDER BY matching `keys`) one page at a time."""
+    limit = page_limit(request.args)
+    where, params = [sql.SQL(base_where)], []
+    if request.args.get('after'):
+        cond, cond_params = keyset_condition(keys, decode_cursor(request.args['after']))
+        where.append(cond)
+        params.extend(cond_params)
+    conn, cursor = _pg_conn()
+    try:
+        cursor.execute(sql.SQL(query).format(where=sql.SQL(' AND ').join(where)), params + [limit + 1])
+        columns = [d[0] for d in cursor.description] if cursor.description else []
+        rows = [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor([rows[-1][c] for c in key_columns]) if has_more else None
+    return jsonify({'columns': columns, 'data': rows, 'has_more': has_more, 'next_cursor': next_cursor})
+
+
 @app.route('/api/journal_entries')
 def api_journal_entries():
-    """Get journal entries from accounting schema (single ledger). Aliased for backward compatibility."""
-    conn, cursor = _pg_conn()
+    """Get journal entries from accounting schema (single ledger). Aliased for backward compatibility.
+    Paginated (limit, after=next_cursor)."""
     try:
-        cursor.execute("""
+        return _ledger_page("""
             SELECT 
                 t.id AS journal_entry_id,
                 t.transaction_number AS entry_number,
@@ -7298,28 +7379,23 @@ def api_journal_entries():
                 e.first_name || ' ' || e.last_name AS employee_name
             FROM accounting.transactions t
             LEFT JOIN public.employees e ON e.employee_id = t.created_by
-            WHERE t.is_void = FALSE
+            WHERE {where}
             ORDER BY t.transaction_date DESC, t.id DESC
-        """)
-        rows = cursor.fetchall()
-        columns = [d[0] for d in cursor.description] if cursor.description else []
-        data = [dict(row) for row in rows]
-        return jsonify({'columns': columns, 'data': data})
+            LIMIT %s
+        """, [(sql.SQL('t.transaction_date'), True), (sql.SQL('t.id'), True)],
+            ['entry_date', 'journal_entry_id'], 't.is_void = FALSE')
+    except TableQueryError as e:
+        return jsonify({'columns': [], 'data': [], 'error': str(e)}), 400
     except Exception as e:
-        if conn and not conn.closed:
-            conn.close()
         return jsonify({'columns': [], 'data': [], 'error': str(e)}), 500
-    finally:
-        if conn and not conn.closed:
-            conn.close()
 
 
 @app.route('/api/journal_entry_lines')
 def api_journal_entry_lines():
-    """Get journal entry lines from accounting schema (single ledger). Aliased for backward compatibility."""
-    conn, cursor = _pg_conn()
+    """Get journal entry lines from accounting schema (single ledger). Aliased for backward compatibility.
+    Paginated (limit, after=next_cursor)."""
     try:
-        cursor.execute("""
+        return _ledger_page("""
             SELECT 
                 tl.id AS line_id,
                 tl.transaction_id AS journal_entry_id,
@@ -7336,20 +7412,16 @@ def api_journal_entry_lines():
             FROM accounting.transaction_lines tl
             JOIN accounting.accounts a ON a.id = tl.account_id
             JOIN accounting.transactions t ON t.id = tl.transaction_id
-            WHERE t.is_void = FALSE
-            ORDER BY t.transaction_date DESC, tl.transaction_id, tl.line_number
-        """)
-        rows = cursor.fetchall()
-        columns = [d[0] for d in cursor.description] if cursor.description else []
-        data = [dict(row) for row in rows]
-        return jsonify({'columns': columns, 'data': data})
+            WHERE {where}
+            ORDER BY t.transaction_date DESC, tl.transaction_id, tl.line_number, tl.id
+            LIMIT %s
+        """, [(sql.SQL('t.transaction_date'), True), (sql.SQL('tl.transaction_id'), False),
+              (sql.SQL('tl.line_number'), False), (sql.SQL('tl.id'), False)],
+            ['entry_date', 'journal_entry_id', 'line_number', 'line_id'], 't.is_void = FALSE')
+    except TableQueryError as e:
+        return jsonify({'columns': [], 'data': [], 'error': str(e)}), 400
     except Exception as e:
-        if conn and not conn.closed:
-            conn.close()
         return jsonify({'columns': [], 'data': [], 'error': str(e)}), 500
-    finally:
-        if conn and not conn.closed:
-            conn.close()
 
 @app.route('/api/shipment_discrepancies')
 def api_shipment_discrepancies():
@@ -7363,13 +7435,18 @@ def api_shipment_discrepancies():
 
 @app.route('/api/audit_log')
 def api_audit_log():
-    """Get audit log with employee names"""
-    audit_trail = get_audit_trail(limit=1000)
-    if not audit_trail:
-        return jsonify({'columns': [], 'data': []})
-    
-    columns = list(audit_trail[0].keys())
-    return jsonify({'columns': columns, 'data': audit_trail})
+    """Get audit log with employee names, newest first. Paginated (limit, default 1000; after=next_cursor)."""
+    try:
+        limit = page_limit(request.args, default=1000)
+        before_id = decode_int_cursor(request.args['after'], 1)[0] if request.args.get('after') else None
+    except TableQueryError:
+        return jsonify({'columns': [], 'data': [], 'error': 'Invalid cursor'}), 400
+    audit_trail = get_audit_trail(limit=limit + 1, before_id=before_id)
+    has_more = len(audit_trail) > limit
+    audit_trail = audit_trail[:limit]
+    next_cursor = encode_cursor([audit_trail[-1]['audit_id']]) if has_more else None
+    columns = list(audit_trail[0].keys()) if audit_trail else []
+    return jsonify({'columns': columns, 'data': audit_trail, 'has_more': has_more, 'next_cursor': next_cursor})
 
 @app.route('/api/dashboard/statistics', methods=['GET'])
 def api_dashboard_statistics():
@@ -8425,38 +8502,24 @@ def _product_barcode_value(product):
     return base + str(checksum)
 
 def _generate_product_barcode_png(barcode_value):
-    """Generate barcode PNG bytes. Returns (png_bytes, encoded_value) so we can store the exact value that was encoded.
-    For EAN13 the library recalculates the 13th digit, so encoded_value may differ from '0'+barcode_value."""
-    if not _BARCODE_GEN_AVAILABLE:
-        return None, None
-    try:
-        encoded_value = barcode_value
-        if barcode_value.isdigit() and len(barcode_value) == 12:
-            # EAN13 expects 12 digits and adds the 13th (checksum). Pass 12 digits as-is so existing barcodes are not changed.
-            code = barcode.get('ean13', barcode_value, writer=ImageWriter())
-            encoded_value = str(code)
-        elif barcode_value.isdigit():
-            code = barcode.get('code128', barcode_value, writer=ImageWriter())
-        else:
-            code = barcode.get('code128', barcode_value, writer=ImageWriter())
-        options = {
-            'module_width': 0.5,
-            'module_height': 15.0,
-            'quiet_zone': 6.5,
-            'font_size': 10,
-            'text_distance': 5.0,
-            'background': 'white',
-            'foreground': 'black',
-            'write_text': True,
-            'text': encoded_value,
-        }
-        img = code.render(options)
-        buf = io.BytesIO()
-        img.save(buf, format='PNG')
-        return buf.getvalue(), encoded_value
+    """Barcode PNG bytes from the barcode image cache (barcode_images.py). Returns (png_bytes, encoded_value, cache_key)
+    so we can store the exact value that was encoded: for EAN13 the 13th digit is the computed checksum."""
+    try:
+        return product_barcode_png(barcode_value)
     except Exception as e:
         traceback.print_exc()
-        return None, None
+        return None, None, None
+
+def _barcode_value_to_save(existing, encoded_value):
+    """Encoded value to store on the product so table and image stay in sync, or None.
+    Saved when: (1) product had no/short barcode, or (2) image is 13 digits but DB has 12 (EAN-13 case)."""
+    existing = (existing or '').strip()
+    if encoded_value and (
+        not existing or (existing.isdigit() and len(existing) < 8) or
+        (existing.isdigit() and len(existing) == 12 and len(encoded_value) == 13)
+    ):
+        return encoded_value
+    return None
 
 @app.route('/api/product_barcode_image')
 def api_product_barcode_image():
@@ -8470,32 +8533,114 @@ def api_product_barcode_image():
     if not _BARCODE_GEN_AVAILABLE:
         return jsonify({'success': False, 'error': 'Barcode generation not available. Install python-barcode[images].'}), 503
     barcode_value = _product_barcode_value(product)
-    png_bytes, encoded_value = _generate_product_barcode_png(barcode_value)
+    png_bytes, encoded_value, cache_key = _generate_product_barcode_png(barcode_value)
     if not png_bytes:
         return jsonify({'success': False, 'error': 'Failed to generate barcode image'}), 500
-    # Save the exact value shown on the barcode image (encoded_value) so table and image stay in sync.
-    # Do this when: (1) product had no/short barcode, or (2) image is 13 digits but DB has 12 (EAN-13 case).
-    existing = (product.get('barcode') or '').strip()
-    value_to_save = None
-    should_save = encoded_value and (
-        not existing or (existing.isdigit() and len(existing) < 8) or
-        (existing.isdigit() and len(existing) == 12 and len(encoded_value) == 13)
-    )
-    if should_save:
-        value_to_save = encoded_value
+    value_to_save = _barcode_value_to_save(product.get('barcode'), encoded_value)
+    if value_to_save:
         try:
             from database import update_product
             update_product(product_id, barcode=value_to_save)
         except Exception as e:
             traceback.print_exc()
     headers = {
-        'Cache-Control': 'no-store',
+        # Content-addressed: revalidate with If-None-Match instead of downloading the PNG again
+        'Cache-Control': 'no-cache',
         'Content-Disposition': f'inline; filename="barcode_{product_id}.png"',
     }
     # Always send the value shown on the image so the UI (preview/table) can display it
     if encoded_value:
         headers['X-Barcode-Value'] = value_to_save if value_to_save is not None else encoded_value
-    return Response(png_bytes, mimetype='image/png', headers=headers)
+    response = Response(png_bytes, mimetype='image/png', headers=headers)
+    response.set_etag(cache_key)
+    return response.make_conditional(request)
+
+@app.route('/api/product_barcode_labels', methods=['POST'])
+def api_product_barcode_labels():
+    """Printable PDF of product barcode labels (Avery 5160 sheets by default).
+    JSON body, one of: items=[{product_id, copies}], product_ids=[...], shipment_id (copies = quantity received),
+    pending_shipment_id (copies = quantity expected). Options: layout (avery5160 | avery5167), copies (default per
+    product), show_name, show_price. Products without a barcode get one assigned, as in /api/product_barcode_image."""
+    data = request.get_json(silent=True) or {}
+    layout = data.get('layout') or 'avery5160'
+    if layout not in LABEL_LAYOUTS:
+        return jsonify({'success': False, 'error': f"layout must be one of: {', '.join(LABEL_LAYOUTS)}"}), 400
+    if not _BARCODE_GEN_AVAILABLE:
+        return jsonify({'success': False, 'error': 'Barcode generation not available. Install python-barcode[images].'}), 503
+    default_copies = max(int(data.get('copies') or 1), 1)
+    conn, cursor = _pg_conn()
+    try:
+        if data.get('shipment_id'):
+            cursor.execute("""
+                SELECT product_id, SUM(quantity_received)::int AS copies
+                FROM shipment_items WHERE shipment_id = %s
+                GROUP BY product_id ORDER BY MIN(shipment_item_id)
+            """, (int(data['shipment_id']),))
+            wanted = [(r['product_id'], r['copies']) for r in cursor.fetchall()]
+        elif data.get('pending_shipment_id'):
+            cursor.execute("""
+                SELECT product_id, SUM(quantity_expected)::int AS copies
+                FROM pending_shipment_items
+                WHERE pending_shipment_id = %s AND product_id IS NOT NULL
+                GROUP BY product_id ORDER BY MIN(pending_item_id)
+            """, (int(data['pending_shipment_id']),))
+            wanted = [(r['product_id'], r['copies']) for r in cursor.fetchall()]
+        elif data.get('items'):
+            wanted = [(int(i['product_id']), max(int(i.get('copies') or default_copies), 0)) for i in data['items']]
+        else:
+            wanted = [(int(pid), default_copies) for pid in (data.get('product_ids') or [])]
+        if not wanted:
+            return jsonify({'success': False, 'error': 'No products to label'}), 400
+
+        cursor.execute("""
+            SELECT product_id, product_name, barcode, product_price
+            FROM inventory WHERE product_id = ANY(%s)
+        """, ([pid for pid, _ in wanted],))
+        products = {r['product_id']: r for r in cursor.fetchall()}
+        missing = [pid for pid, _ in wanted if pid not in products]
+        if missing:
+            return jsonify({'success': False, 'error': f'Products not found: {missing[:20]}'}), 404
+
+        labels, to_save = [], []
+        for pid, copies in wanted:
+            product = products[pid]
+            barcode_value = _product_barcode_value(product)
+            _, encoded_value = product_symbology(barcode_value)
+            value_to_save = _barcode_value_to_save(product.get('barcode'), encoded_value)
+            if value_to_save:
+                to_save.append((pid, value_to_save))
+            labels.append({
+                'barcode_value': barcode_value,
+                'product_name': product.get('product_name'),
+                'product_price': product.get('product_price'),
+                'copies': copies,
+            })
+        if to_save:
+            execute_values(cursor, """
+                UPDATE inventory AS i SET barcode = v.barcode, updated_at = NOW()
+                FROM (VALUES %s) AS v (product_id, barcode)
+                WHERE i.product_id = v.product_id
+            """, to_save)
+            conn.commit()
+    except (TypeError, ValueError, KeyError) as e:
+        conn.rollback()
+        return jsonify({'success': False, 'error': f'Invalid label request: {e}'}), 400
+    finally:
+        conn.close()
+
+    try:
+        pdf_bytes = label_sheet_pdf(labels, layout=layout,
+                                    show_name=data.get('show_name', True) is not False,
+                                    show_price=data.get('show_price', True) is not False)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': f'Failed to generate labels: {e}'}), 500
+    return Response(pdf_bytes, mimetype='application/pdf', headers={
+        'Cache-Control': 'no-store',
+        'Content-Disposition': 'inline; filename="barcode_labels.pdf"',
+    })
 
 # ============================================================================
 # BARCODE SCANNING API ENDPOINTS
@@ -9444,6 +9589,19 @@ def api_activity_log():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/admin/perf', methods=['GET'])
+def api_admin_perf():
+    """Aggregated per-endpoint DB stats: statements/request, DB time, pool wait, likely N+1s, slow statements.
+    ?reset=1 clears the aggregates after reading; ?limit=N caps each list (default 25)."""
+    try:
+        from database_postgres import get_perf_summary
+        reset = request.args.get('reset', '').lower() in ('1', 'true', 'yes')
+        limit = request.args.get('limit', 25, type=int)
+        return jsonify({'success': True, 'perf': get_perf_summary(reset=reset, limit=limit)})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/admin/employee_activity', methods=['GET'])
 def api_employee_activity():
     """Get aggregated employee activity for monitoring (orders, cash, time clock, shipments, customers, schedule)."""
@@ -9679,6 +9837,9 @@ def api_delete_schedule(schedule_id):
         
         conn.commit()
         conn.close()
+        if str(schedule['schedule_date'])[:10] == datetime.now().date().isoformat():
+            from late_arrivals import roster_changed
+            roster_changed()
         
         return jsonify({
             'success': True,
@@ -10004,7 +10165,6 @@ def _trigger_schedule_update_email(period_id: int, changed_emp_ids: list = None)
     """Fire a background thread to gather shifts and send advanced notifications."""
     try:
         from notification_service import send_schedule_notification_advanced, send_schedule_notification
-        import threading
         from datetime import datetime, timedelta
         
         def run_it():
@@ -10086,7 +10246,7 @@ def _trigger_schedule_update_email(period_id: int, changed_emp_ids: list = None)
                 if conn:
                     conn.close()
                 
-        threading.Thread(target=run_it, daemon=True).start()
+        run_in_background(run_it)
     except Exception as ne:
         print(f"[notification launch err] {ne}", flush=True)
 
@@ -11083,8 +11243,28 @@ if SOCKETIO_AVAILABLE and socketio:
         print('Client connected to Socket.IO')
         emit('connected', {'status': 'ok'})
     
+    # Socket.IO sid -> (establishment_id, register_id) of the cart a customer display mirrors
+    _display_registers = {}
+
+    def _display_register(data):
+        """Establishment (from the display's session token) and register a customer display belongs to."""
+        from database_postgres import has_multiple_establishments, establishment_for_session
+        establishment_id = None
+        token = (data.get('session_token') or '').strip()
+        if token and has_multiple_establishments():
+            establishment_id = establishment_for_session(token)
+        if establishment_id is None:
+            establishment_id = get_current_establishment()
+        register_id = data.get('register_id')
+        try:
+            register_id = int(register_id) if register_id not in (None, '') else None
+        except (TypeError, ValueError):
+            register_id = None
+        return establishment_id, register_id
+
     @socketio.on('disconnect')
     def handle_disconnect():
+        _display_registers.pop(request.sid, None)
         print('Client disconnected from Socket.IO')
     
     @socketio.on('join')
@@ -11093,11 +11273,91 @@ if SOCKETIO_AVAILABLE and socketio:
         join_room(room)
         print(f'Client joined room: {room}')
         emit('joined', {'room': room})
+        if room == 'customer_display':
+            from customer_display_system import get_cart_display_feed, cart_display_room
+            register = _display_register(data)
+            _display_registers[request.sid] = register
+            # Cart diffs go only to the displays of the register that sent the cart
+            join_room(cart_display_room(*register))
+            emit('cart_snapshot', get_cart_display_feed(*register).snapshot())
+
+    def _push_shipment_progress(pending_shipment_ids):
+        """Emit fresh verification counters to receivers watching these shipments (and the list page)."""
+        from database import get_shipment_progress_summary
+        for pending_shipment_id in pending_shipment_ids:
+            summary = get_shipment_progress_summary(pending_shipment_id)
+            if summary:
+                socketio.emit('shipment_progress', summary, room=f'shipment_{pending_shipment_id}')
+                socketio.emit('shipment_progress', summary, room='shipments')
+
+    from scan_sessions import add_progress_listener
+    add_progress_listener(_push_shipment_progress)
+
+    @socketio.on('cart_resync')
+    def handle_cart_resync(data=None):
+        """Display detected a gap in cart_diff sequence numbers; send it the full cart."""
+        from customer_display_system import get_cart_display_feed
+        register = _display_registers.get(request.sid) or _display_register(data or {})
+        emit('cart_snapshot', get_cart_display_feed(*register).snapshot())
+
+    @socketio.on('cart_diff_ack')
+    def handle_cart_diff_ack(data):
+        """Display rendered a cart diff (records scan-to-display latency)."""
+        try:
+            from customer_display_system import get_cart_display_feed
+            register = _display_registers.get(request.sid) or _display_register(data)
+            get_cart_display_feed(*register).ack(int(data.get('seq')), data.get('displayed_at'))
+        except (TypeError, ValueError, AttributeError):
+            pass
 
 # ============================================================================
 # CUSTOMER DISPLAY SYSTEM API ENDPOINTS
 # ============================================================================
 
+@app.route('/api/customer-display/cart', methods=['POST'])
+def customer_display_cart():
+    """POS cart changed: emit only the changed lines to the customer display."""
+    try:
+        session_token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        data = request.get_json(silent=True) or {}
+        if not session_token:
+            session_token = data.get('session_token')
+        if not session_token:
+            return jsonify({'success': False, 'message': 'Authentication required'}), 401
+        session_data = verify_session(session_token)
+        if not session_data.get('valid'):
+            return jsonify({'success': False, 'message': 'Invalid session'}), 401
+        items = data.get('items')
+        if not isinstance(items, list):
+            return jsonify({'success': False, 'message': 'items must be a list'}), 400
+        try:
+            register_id = int(data['register_id']) if data.get('register_id') not in (None, '') else None
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': 'register_id must be an integer'}), 400
+        from customer_display_system import get_cart_display_feed, cart_display_room
+        establishment_id = get_current_establishment()
+        feed = get_cart_display_feed(establishment_id, register_id)
+        diff = feed.update(items, discount=data.get('discount') or 0, scanned_at=data.get('scanned_at'))
+        if diff and SOCKETIO_AVAILABLE and socketio:
+            socketio.emit('cart_diff', diff, room=cart_display_room(establishment_id, register_id))
+        return jsonify({'success': True, 'seq': diff['seq'] if diff else None})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/customer-display/metrics', methods=['GET'])
+def customer_display_metrics():
+    """Scan-to-display latency percentiles and cart diff counters."""
+    try:
+        from customer_display_system import all_cart_display_feeds
+        feeds = all_cart_display_feeds()
+        metrics = [dict(feed.metrics(), establishment_id=establishment_id, register_id=register_id)
+                   for (establishment_id, register_id), feed in feeds.items()]
+        return jsonify({'success': True, 'metrics': metrics})
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @app.route('/api/transaction/start', methods=['POST'])
 def start_transaction():
     """Start new transaction. Returns a single Response (no tuple) to avoid CORS/Flask issues."""
@@ -11195,10 +11455,10 @@ def process_payment():
         # When payment completes for an order, ensure sale is journalized to accounting (idempotent)
         if result.get('success') and result.get('order_id'):
             try:
-                from pos_accounting_bridge import journalize_sale_to_accounting
+                from journal_queue import enqueue_sale_journalization
                 employee_id = session_data.get('employee_id') or session_data.get('user_id')
                 if employee_id:
-                    jr = journalize_sale_to_accounting(int(result['order_id']), int(employee_id))
+                    jr = enqueue_sale_journalization(int(result['order_id']), int(employee_id))
                     if not jr.get('success') and jr.get('message'):
                         print(f"Accounting journalize_sale error (process_payment order {result['order_id']}): {jr.get('message')}")
             except Exception as je:
@@ -13521,12 +13781,18 @@ def api_get_register_events():
         register_id = request.args.get('register_id')
         limit = request.args.get('limit', 100)
         
-        result = get_register_events(
-            register_id=int(register_id) if register_id else None,
-            limit=int(limit) if limit else 100
-        )
+        try:
+            limit = int(limit) if limit else 100
+            result = get_register_events(
+                register_id=int(register_id) if register_id else None,
+                limit=limit,
+                before=request.args.get('before') or None
+            )
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        next_cursor = result[-1].get('cursor') if result and len(result) == limit else None
         
-        return jsonify({'success': True, 'data': result}), 200
+        return jsonify({'success': True, 'data': result, 'next_cursor': next_cursor}), 200
             
     except Exception as e:
         print(f"Error getting register events: {e}")
@@ -13708,712 +13974,8 @@ def api_daily_cash_count():
 # QUICKBOOKS-STYLE ACCOUNTING API (/api/v1/* and /api/accounting/*)
 # ============================================================================
 
-if _ACCOUNTING_BACKEND_AVAILABLE:
-    # One-time ensure accounting schema and accounting.accounts exist (e.g. in Supabase)
-    _accounting_schema_ensured = False
+app.register_blueprint(accounting_bp)
 
-    def _ensure_accounting_schema_once():
-        global _accounting_schema_ensured
-        if _accounting_schema_ensured:
-            return
-        try:
-            from accounting_bootstrap import ensure_accounting_schema
-            ensure_accounting_schema()
-            _accounting_schema_ensured = True
-        except Exception as e:
-            print(f"Accounting schema bootstrap (ensure_accounting_schema): {e}")
-            traceback.print_exc()
-
-    # ---------- /api/v1/accounts ----------
-    @app.route('/api/v1/accounts', methods=['GET'])
-    def api_v1_accounts_list():
-        _ensure_accounting_schema_once()
-        return account_controller.get_all_accounts()
-
-    @app.route('/api/v1/accounts', methods=['POST'])
-    def api_v1_accounts_create():
-        _ensure_accounting_schema_once()
-        return account_controller.create_account()
-
-    @app.route('/api/v1/accounts/tree', methods=['GET'])
-    def api_v1_accounts_tree():
-        return account_controller.get_account_tree()
-
-    @app.route('/api/v1/accounts/<int:account_id>', methods=['GET'])
-    def api_v1_accounts_get(account_id):
-        return account_controller.get_account_by_id(account_id)
-
-    @app.route('/api/v1/accounts/<int:account_id>', methods=['PUT'])
-    def api_v1_accounts_update(account_id):
-        return account_controller.update_account(account_id)
-
-    @app.route('/api/v1/accounts/<int:account_id>', methods=['DELETE'])
-    def api_v1_accounts_delete(account_id):
-        return account_controller.delete_account(account_id)
-
-    @app.route('/api/v1/accounts/<int:account_id>/children', methods=['GET'])
-    def api_v1_accounts_children(account_id):
-        return account_controller.get_account_children(account_id)
-
-    @app.route('/api/v1/accounts/<int:account_id>/balance', methods=['GET'])
-    def api_v1_accounts_balance(account_id):
-        return account_controller.get_account_balance(account_id)
-
-    @app.route('/api/v1/accounts/<int:account_id>/toggle-status', methods=['PATCH'])
-    def api_v1_accounts_toggle(account_id):
-        return account_controller.toggle_account_status(account_id)
-
-    # ---------- /api/v1/transactions ----------
-    @app.route('/api/v1/transactions', methods=['GET'])
-    def api_v1_transactions_list():
-        return transaction_controller.get_all_transactions()
-
-    @app.route('/api/v1/transactions', methods=['POST'])
-    def api_v1_transactions_create():
-        return transaction_controller.create_transaction()
-
-    @app.route('/api/v1/transactions/general-ledger', methods=['GET'])
-    def api_v1_transactions_gl():
-        return transaction_controller.get_general_ledger()
-
-    @app.route('/api/v1/transactions/account-ledger/<int:account_id>', methods=['GET'])
-    def api_v1_transactions_account_ledger(account_id):
-        return transaction_controller.get_account_ledger(account_id)
-
-    @app.route('/api/v1/transactions/<int:transaction_id>', methods=['GET'])
-    def api_v1_transactions_get(transaction_id):
-        return transaction_controller.get_transaction_by_id(transaction_id)
-
-    @app.route('/api/v1/transactions/<int:transaction_id>', methods=['PUT'])
-    def api_v1_transactions_update(transaction_id):
-        return transaction_controller.update_transaction(transaction_id)
-
-    @app.route('/api/v1/transactions/<int:transaction_id>', methods=['DELETE'])
-    def api_v1_transactions_delete(transaction_id):
-        return transaction_controller.delete_transaction(transaction_id)
-
-    @app.route('/api/v1/transactions/<int:transaction_id>/post', methods=['POST'])
-    def api_v1_transactions_post(transaction_id):
-        return transaction_controller.post_transaction(transaction_id)
-
-    @app.route('/api/v1/transactions/<int:transaction_id>/unpost', methods=['POST'])
-    def api_v1_transactions_unpost(transaction_id):
-        return transaction_controller.unpost_transaction(transaction_id)
-
-    @app.route('/api/v1/transactions/<int:transaction_id>/void', methods=['POST'])
-    def api_v1_transactions_void(transaction_id):
-        return transaction_controller.void_transaction(transaction_id)
-
-    # ---------- /api/v1/customers (accounting customers for invoices/payments) ----------
-    @app.route('/api/v1/customers', methods=['GET'])
-    def api_v1_customers_list():
-        return customer_controller.get_all()
-
-    @app.route('/api/v1/customers', methods=['POST'])
-    def api_v1_customers_create():
-        return customer_controller.create()
-
-    @app.route('/api/v1/customers/<int:customer_id>', methods=['GET'])
-    def api_v1_customers_get(customer_id):
-        return customer_controller.get_by_id(customer_id)
-
-    @app.route('/api/v1/customers/<int:customer_id>', methods=['PUT'])
-    def api_v1_customers_update(customer_id):
-        return customer_controller.update(customer_id)
-
-    @app.route('/api/v1/customers/<int:customer_id>', methods=['DELETE'])
-    def api_v1_customers_delete(customer_id):
-        return customer_controller.delete(customer_id)
-
-    # ---------- /api/v1/vendors ----------
-    @app.route('/api/v1/vendors', methods=['GET'])
-    def api_v1_vendors_list():
-        return vendor_controller.get_all()
-
-    @app.route('/api/v1/vendors', methods=['POST'])
-    def api_v1_vendors_create():
-        return vendor_controller.create()
-
-    @app.route('/api/v1/vendors/search', methods=['GET'])
-    def api_v1_vendors_search():
-        return vendor_controller.search()
-
-    @app.route('/api/v1/vendors/<int:vendor_id>', methods=['GET'])
-    def api_v1_vendors_get(vendor_id):
-        return vendor_controller.get_by_id(vendor_id)
-
-    @app.route('/api/v1/vendors/<int:vendor_id>', methods=['PUT'])
-    def api_v1_vendors_update(vendor_id):
-        return vendor_controller.update(vendor_id)
-
-    @app.route('/api/v1/vendors/<int:vendor_id>', methods=['DELETE'])
-    def api_v1_vendors_delete(vendor_id):
-        return vendor_controller.delete(vendor_id)
-
-    @app.route('/api/v1/vendors/<int:vendor_id>/toggle-status', methods=['PATCH'])
-    def api_v1_vendors_toggle(vendor_id):
-        return vendor_controller.toggle_status(vendor_id)
-
-    @app.route('/api/v1/vendors/<int:vendor_id>/balance', methods=['GET'])
-    def api_v1_vendors_balance(vendor_id):
-        return vendor_controller.get_balance(vendor_id)
-
-    @app.route('/api/v1/vendors/<int:vendor_id>/bills', methods=['GET'])
-    def api_v1_vendors_bills(vendor_id):
-        return vendor_controller.get_bills(vendor_id)
-
-    @app.route('/api/v1/vendors/<int:vendor_id>/statement', methods=['GET'])
-    def api_v1_vendors_statement(vendor_id):
-        return vendor_controller.get_statement(vendor_id)
-
-    @app.route('/api/v1/vendors/1099', methods=['GET'])
-    def api_v1_vendors_1099():
-        return vendor_controller.get_1099_vendors()
-
-    # ---------- /api/v1/bills ----------
-    @app.route('/api/v1/bills', methods=['GET'])
-    def api_v1_bills_list():
-        return bill_controller.get_all()
-
-    @app.route('/api/v1/bills', methods=['POST'])
-    def api_v1_bills_create():
-        return bill_controller.create()
-
-    @app.route('/api/v1/bills/overdue', methods=['GET'])
-    def api_v1_bills_overdue():
-        return bill_controller.get_overdue()
-
-    @app.route('/api/v1/bills/<int:bill_id>', methods=['GET'])
-    def api_v1_bills_get(bill_id):
-        return bill_controller.get_by_id(bill_id)
-
-    @app.route('/api/v1/bills/<int:bill_id>', methods=['PUT'])
-    def api_v1_bills_update(bill_id):
-        return bill_controller.update(bill_id)
-
-    @app.route('/api/v1/bills/<int:bill_id>', methods=['DELETE'])
-    def api_v1_bills_delete(bill_id):
-        return bill_controller.delete(bill_id)
-
-    @app.route('/api/v1/bills/<int:bill_id>/void', methods=['POST'])
-    def api_v1_bills_void(bill_id):
-        return bill_controller.void_bill(bill_id)
-
-    # ---------- /api/v1/invoices ----------
-    @app.route('/api/v1/invoices', methods=['GET'])
-    def api_v1_invoices_list():
-        return invoice_controller.get_all()
-
-    @app.route('/api/v1/invoices', methods=['POST'])
-    def api_v1_invoices_create():
-        return invoice_controller.create()
-
-    @app.route('/api/v1/invoices/overdue', methods=['GET'])
-    def api_v1_invoices_overdue():
-        return invoice_controller.get_overdue()
-
-    @app.route('/api/v1/invoices/<int:invoice_id>', methods=['GET'])
-    def api_v1_invoices_get(invoice_id):
-        return invoice_controller.get_by_id(invoice_id)
-
-    @app.route('/api/v1/invoices/<int:invoice_id>', methods=['PUT'])
-    def api_v1_invoices_update(invoice_id):
-        return invoice_controller.update(invoice_id)
-
-    @app.route('/api/v1/invoices/<int:invoice_id>', methods=['DELETE'])
-    def api_v1_invoices_delete(invoice_id):
-        return invoice_controller.delete(invoice_id)
-
-    @app.route('/api/v1/invoices/<int:invoice_id>/mark-sent', methods=['POST'])
-    def api_v1_invoices_mark_sent(invoice_id):
-        return invoice_controller.mark_as_sent(invoice_id)
-
-    @app.route('/api/v1/invoices/<int:invoice_id>/void', methods=['POST'])
-    def api_v1_invoices_void(invoice_id):
-        return invoice_controller.void_invoice(invoice_id)
-
-    # ---------- /api/v1/payments (customer payments / receive payment) ----------
-    @app.route('/api/v1/payments', methods=['GET'])
-    def api_v1_payments_list():
-        return payment_controller.get_all()
-
-    @app.route('/api/v1/payments', methods=['POST'])
-    def api_v1_payments_create():
-        return payment_controller.create()
-
-    @app.route('/api/v1/payments/<int:payment_id>', methods=['GET'])
-    def api_v1_payments_get(payment_id):
-        return payment_controller.get_by_id(payment_id)
-
-    @app.route('/api/v1/payments/<int:payment_id>', methods=['PUT'])
-    def api_v1_payments_update(payment_id):
-        return payment_controller.update(payment_id)
-
-    @app.route('/api/v1/payments/<int:payment_id>', methods=['DELETE'])
-    def api_v1_payments_delete(payment_id):
-        return payment_controller.delete(payment_id)
-
-    @app.route('/api/v1/payments/<int:payment_id>/void', methods=['POST'])
-    def api_v1_payments_void(payment_id):
-        return payment_controller.void_payment(payment_id)
-
-    @app.route('/api/v1/customers/<int:customer_id>/outstanding-invoices', methods=['GET'])
-    def api_v1_customers_outstanding_invoices(customer_id):
-        return payment_controller.get_customer_outstanding_invoices(customer_id)
-
-    @app.route('/api/v1/payments/<int:payment_id>/receipt', methods=['GET'])
-    def api_v1_payments_receipt(payment_id):
-        return payment_controller.get_payment_receipt(payment_id)
-
-    # ---------- /api/v1/bill-payments ----------
-    @app.route('/api/v1/bill-payments', methods=['GET'])
-    def api_v1_bill_payments_list():
-        return bill_payment_controller.get_all()
-
-    @app.route('/api/v1/bill-payments', methods=['POST'])
-    def api_v1_bill_payments_create():
-        return bill_payment_controller.create()
-
-    @app.route('/api/v1/bill-payments/<int:payment_id>', methods=['GET'])
-    def api_v1_bill_payments_get(payment_id):
-        return bill_payment_controller.get_by_id(payment_id)
-
-    @app.route('/api/v1/bill-payments/<int:payment_id>', methods=['PUT'])
-    def api_v1_bill_payments_update(payment_id):
-        return bill_payment_controller.update(payment_id)
-
-    @app.route('/api/v1/bill-payments/<int:payment_id>', methods=['DELETE'])
-    def api_v1_bill_payments_delete(payment_id):
-        return bill_payment_controller.delete(payment_id)
-
-    @app.route('/api/v1/bill-payments/<int:payment_id>/void', methods=['POST'])
-    def api_v1_bill_payments_void(payment_id):
-        return bill_payment_controller.void_payment(payment_id)
-
-    @app.route('/api/v1/vendors/<int:vendor_id>/outstanding-bills', methods=['GET'])
-    def api_v1_vendors_outstanding_bills(vendor_id):
-        return bill_payment_controller.get_vendor_outstanding_bills(vendor_id)
-
-    @app.route('/api/v1/bill-payments/<int:payment_id>/check-data', methods=['GET'])
-    def api_v1_bill_payments_check_data(payment_id):
-        return bill_payment_controller.get_payment_check_data(payment_id)
-
-    # ---------- /api/v1/reports (P&L, Balance Sheet, Cash Flow - same data as /api/accounting, used by reportService) ----------
-    @app.route('/api/v1/reports/profit-loss', methods=['GET'])
-    def api_v1_reports_profit_loss():
-        return report_controller.get_profit_loss()
-
-    @app.route('/api/v1/reports/profit-loss/comparative', methods=['GET'])
-    def api_v1_reports_profit_loss_comparative():
-        return report_controller.get_comparative_profit_loss()
-
-    @app.route('/api/v1/reports/balance-sheet', methods=['GET'])
-    def api_v1_reports_balance_sheet():
-        return report_controller.get_balance_sheet()
-
-    @app.route('/api/v1/reports/balance-sheet/comparative', methods=['GET'])
-    def api_v1_reports_balance_sheet_comparative():
-        return report_controller.get_comparative_balance_sheet()
-
-    @app.route('/api/v1/reports/cash-flow', methods=['GET'])
-    def api_v1_reports_cash_flow():
-        return report_controller.get_cash_flow()
-
-    @app.route('/api/v1/reports/cash-flow/comparative', methods=['GET'])
-    def api_v1_reports_cash_flow_comparative():
-        return report_controller.get_comparative_cash_flow()
-
-    # ---------- /api/accounting reports (trial-balance, P&L, balance-sheet) ----------
-    @app.route('/api/accounting/trial-balance', methods=['GET'])
-    def api_accounting_trial_balance():
-        as_of = request.args.get('as_of_date')
-        if not as_of:
-            as_of = date.today().isoformat()
-        try:
-            d = datetime.fromisoformat(as_of.split('T')[0]).date()
-        except Exception:
-            return jsonify({'success': False, 'message': 'Invalid as_of_date. Use YYYY-MM-DD'}), 400
-        conn, cur = _pg_conn()
-        cur.execute("SELECT * FROM accounting.get_trial_balance(%s)", (d,))
-        rows = cur.fetchall()
-        data = [dict(row) for row in rows]
-        conn.close()
-        total_d = sum(float(row.get('total_debits') or 0) for row in data)
-        total_c = sum(float(row.get('total_credits') or 0) for row in data)
-        return jsonify({'success': True, 'data': {'accounts': data, 'total_debits': total_d, 'total_credits': total_c, 'date': as_of}}), 200
-
-    @app.route('/api/accounting/profit-loss', methods=['GET'])
-    def api_accounting_profit_loss():
-        return report_controller.get_profit_loss()
-
-    @app.route('/api/accounting/profit-loss/comparative', methods=['GET'])
-    def api_accounting_profit_loss_comparative():
-        return report_controller.get_comparative_profit_loss()
-
-    @app.route('/api/accounting/balance-sheet', methods=['GET'])
-    def api_accounting_balance_sheet():
-        return report_controller.get_balance_sheet()
-
-    @app.route('/api/accounting/balance-sheet/comparative', methods=['GET'])
-    def api_accounting_balance_sheet_comparative():
-        return report_controller.get_comparative_balance_sheet()
-
-    ACCOUNTING_REPORTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads', 'accounting_reports')
-
-    @app.route('/api/accounting/directory', methods=['GET'])
-    def api_accounting_directory():
-        """List saved reports and shipment documents for the accounting directory view."""
-        try:
-            saved_reports = []
-            if os.path.isdir(ACCOUNTING_REPORTS_DIR):
-                for fn in sorted(os.listdir(ACCOUNTING_REPORTS_DIR), reverse=True)[:500]:
-                    fp = os.path.join(ACCOUNTING_REPORTS_DIR, fn)
-                    if os.path.isfile(fp):
-                        try:
-                            mtime = os.path.getmtime(fp)
-                            saved_reports.append({
-                                'name': fn,
-                                'saved_at': datetime.fromtimestamp(mtime).isoformat(),
-                                'type': 'report'
-                            })
-                        except OSError:
-                            pass
-            shipment_documents = []
-            conn, cur = _pg_conn()
-            try:
-                cur.execute("""
-                    SELECT pending_shipment_id, file_path, upload_timestamp
-                    FROM pending_shipments
-                    WHERE file_path IS NOT NULL AND file_path != ''
-                    ORDER BY upload_timestamp DESC NULLS LAST
-                    LIMIT 500
-                """)
-                rows = cur.fetchall()
-                for r in rows:
-                    row = dict(r)
-                    fp = row.get('file_path') or ''
-                    name = os.path.basename(fp) if fp else "Shipment #%s" % row.get('pending_shipment_id')
-                    ts = row.get('upload_timestamp')
-                    shipment_documents.append({
-                        'id': row.get('pending_shipment_id'),
-                        'name': name,
-                        'saved_at': ts.isoformat() if hasattr(ts, 'isoformat') else str(ts) if ts else None,
-                        'type': 'shipment',
-                        'file_path': fp
-                    })
-            except Exception:
-                pass
-            finally:
-                conn.close()
-            return jsonify({
-                'success': True,
-                'data': {
-                    'saved_reports': saved_reports,
-                    'shipment_documents': shipment_documents
-                }
-            })
-        except Exception as e:
-            return make_response(jsonify({'success': False, 'message': str(e)}), 500)
-
-    @app.route('/api/accounting/reports/save', methods=['POST'])
-    def api_accounting_reports_save():
-        """Save a report file to the accounting directory. Format 'pdf' generates a PDF from CSV content."""
-        try:
-            data = request.get_json() or {}
-            name = (data.get('name') or data.get('filename') or 'report').strip()
-            content = data.get('content') or ''
-            report_type = (data.get('report_type') or 'report').replace('/', '-').replace('\\', '')
-            fmt = (data.get('format') or 'csv').lower()
-            save_as_pdf = (fmt == 'pdf')
-
-            if save_as_pdf:
-                try:
-                    from report_pdf_generator import generate_report_pdf
-                    pdf_bytes = generate_report_pdf(content, report_type)
-                    if not pdf_bytes:
-                        return make_response(jsonify({'success': False, 'message': 'PDF generation failed. Install reportlab: pip install reportlab'}), 500)
-                except Exception as pdf_err:
-                    return make_response(jsonify({'success': False, 'message': str(pdf_err)}), 500)
-                base = name.replace('.csv', '').replace('.xlsx', '').strip()
-                name = secure_filename(base) + '.pdf'
-                if not name or name == '.pdf':
-                    name = secure_filename(report_type) + '-' + datetime.now().strftime('%Y-%m-%d-%H%M') + '.pdf'
-                os.makedirs(ACCOUNTING_REPORTS_DIR, exist_ok=True)
-                file_path = os.path.join(ACCOUNTING_REPORTS_DIR, name)
-                with open(file_path, 'wb') as f:
-                    f.write(pdf_bytes)
-            else:
-                if not name.endswith('.csv'):
-                    name = name + '.csv' if fmt == 'csv' else name + '.xlsx'
-                name = secure_filename(name)
-                if not name:
-                    name = secure_filename(report_type) + '-' + datetime.now().strftime('%Y-%m-%d-%H%M') + '.csv'
-                else:
-                    base, ext = os.path.splitext(name)
-                    if not ext:
-                        name = base + '.csv'
-                os.makedirs(ACCOUNTING_REPORTS_DIR, exist_ok=True)
-                file_path = os.path.join(ACCOUNTING_REPORTS_DIR, name)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-            resp = make_response(jsonify({'success': True, 'data': {'name': name, 'path': file_path}}), 200)
-            return resp
-        except Exception as e:
-            return make_response(jsonify({'success': False, 'message': str(e)}), 500)
-
-    @app.route('/api/accounting/directory/report/<path:filename>', methods=['GET', 'DELETE', 'PATCH'])
-    def api_accounting_directory_report(filename):
-        """Serve (GET), delete (DELETE), or rename (PATCH) a saved report file from the accounting directory."""
-        try:
-            filename = secure_filename(os.path.basename(filename))
-            if not filename or filename.startswith('.'):
-                if request.method in ('DELETE', 'PATCH'):
-                    return make_response(jsonify({'success': False, 'message': 'Invalid filename'}), 400)
-                return make_response(jsonify({'error': 'Invalid filename'}), 400)
-            file_path = os.path.join(ACCOUNTING_REPORTS_DIR, filename)
-            if request.method == 'PATCH':
-                data = request.get_json(silent=True) or {}
-                new_name = (data.get('new_name') or data.get('name') or '').strip()
-                if not new_name:
-                    return make_response(jsonify({'success': False, 'message': 'New filename is required'}), 400)
-                new_name = secure_filename(os.path.basename(new_name))
-                if not new_name or new_name.startswith('.'):
-                    return make_response(jsonify({'success': False, 'message': 'Invalid new filename (use only letters, numbers, hyphens, underscores, and one extension)'}), 400)
-                if new_name == filename:
-                    return make_response(jsonify({'success': True, 'data': {'name': filename}}), 200)
-                new_path = os.path.join(ACCOUNTING_REPORTS_DIR, new_name)
-                if not os.path.isfile(file_path):
-                    return make_response(jsonify({'success': False, 'message': 'File not found'}), 404)
-                if os.path.exists(new_path) and os.path.abspath(new_path) != os.path.abspath(file_path):
-                    return make_response(jsonify({'success': False, 'message': 'A file with that name already exists'}), 409)
-                try:
-                    shutil.move(file_path, new_path)
-                except OSError as e:
-                    return make_response(jsonify({'success': False, 'message': 'Could not rename file: ' + str(e)}), 500)
-                return make_response(jsonify({'success': True, 'data': {'name': new_name}}), 200)
-            if request.method == 'DELETE':
-                if not os.path.isfile(file_path):
-                    return make_response(jsonify({'success': False, 'message': 'File not found'}), 404)
-                os.remove(file_path)
-                return make_response(jsonify({'success': True, 'message': 'Report deleted'}), 200)
-            return send_from_directory(ACCOUNTING_REPORTS_DIR, filename, as_attachment=False)
-        except Exception as e:
-            if request.method in ('DELETE', 'PATCH'):
-                return make_response(jsonify({'success': False, 'message': str(e)}), 500)
-            return make_response(jsonify({'error': str(e)}), 404)
-
-    @app.route('/api/accounting/directory/shipment/<int:shipment_id>', methods=['GET', 'DELETE'])
-    def api_accounting_directory_shipment(shipment_id):
-        """Serve (GET) or remove (DELETE) a shipment document from the directory."""
-        try:
-            conn, cur = _pg_conn()
-            cur.execute(
-                "SELECT file_path FROM pending_shipments WHERE pending_shipment_id = %s AND file_path IS NOT NULL",
-                (shipment_id,)
-            )
-            row = cur.fetchone()
-            if not row:
-                conn.close()
-                if request.method == 'DELETE':
-                    return make_response(jsonify({'success': False, 'message': 'Shipment or document not found'}), 404)
-                return make_response(jsonify({'error': 'Shipment or document not found'}), 404)
-            fp = row.get('file_path')
-            if request.method == 'DELETE':
-                cur.execute(
-                    "UPDATE pending_shipments SET file_path = NULL WHERE pending_shipment_id = %s",
-                    (shipment_id,)
-                )
-                conn.commit()
-                if fp and os.path.isfile(fp):
-                    try:
-                        os.remove(fp)
-                    except OSError:
-                        pass
-                conn.close()
-                return make_response(jsonify({'success': True, 'message': 'Document removed'}), 200)
-            conn.close()
-            if not fp or not os.path.isfile(fp):
-                return make_response(jsonify({'error': 'File not found'}), 404)
-            directory = os.path.dirname(fp)
-            filename = os.path.basename(fp)
-            return send_from_directory(directory, filename, as_attachment=False)
-        except Exception as e:
-            if request.method == 'DELETE':
-                return make_response(jsonify({'success': False, 'message': str(e)}), 500)
-            return make_response(jsonify({'error': str(e)}), 404)
-
-    @app.route('/api/accounting/cash-flow', methods=['GET'])
-    def api_accounting_cash_flow():
-        return report_controller.get_cash_flow()
-
-    @app.route('/api/accounting/cash-flow/comparative', methods=['GET'])
-    def api_accounting_cash_flow_comparative():
-        return report_controller.get_comparative_cash_flow()
-
-    @app.route('/api/accounting/aging', methods=['GET'])
-    def api_accounting_aging():
-        as_of = request.args.get('as_of_date')
-        if not as_of:
-            as_of = date.today().isoformat()
-        try:
-            d = datetime.fromisoformat(as_of.split('T')[0]).date()
-        except Exception:
-            return jsonify({'success': False, 'message': 'Invalid as_of_date. Use YYYY-MM-DD'}), 400
-        conn, cur = _pg_conn()
-        try:
-            cur.execute("SELECT * FROM accounting.get_aging_report(%s)", (d,))
-            rows = cur.fetchall()
-            data = [dict(row) for row in rows]
-        except Exception:
-            data = []
-        finally:
-            conn.close()
-        return jsonify({'success': True, 'data': data}), 200
-
-    @app.route('/api/accounting/invoices', methods=['GET'])
-    def api_accounting_invoices():
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        conn, cur = _pg_conn()
-        try:
-            cur.execute("""
-                SELECT column_name FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = 'orders'
-            """)
-            cols = [r[0] for r in cur.fetchall()]
-            has_customer = 'customer_id' in cols
-            q = """
-                SELECT o.order_id AS id, o.order_number AS invoice_number,
-                       o.order_date::text AS invoice_date, o.total AS total_amount,
-                       o.total AS balance_due, o.order_status AS status
-            """
-            if has_customer:
-                q = """
-                SELECT o.order_id AS id, o.order_number AS invoice_number,
-                       o.order_date::text AS invoice_date, o.total AS total_amount,
-                       o.total AS balance_due, o.order_status AS status,
-                       c.customer_name AS customer_name
-                FROM orders o
-                LEFT JOIN customers c ON o.customer_id = c.customer_id
-                WHERE 1=1
-                """
-            else:
-                q = """
-                SELECT o.order_id AS id, o.order_number AS invoice_number,
-                       o.order_date::text AS invoice_date, o.total AS total_amount,
-                       o.total AS balance_due, o.order_status AS status,
-                       NULL AS customer_name
-                FROM orders o
-                WHERE 1=1
-                """
-            params = []
-            if start_date:
-                q += " AND o.order_date::date >= %s"
-                params.append(start_date)
-            if end_date:
-                q += " AND o.order_date::date <= %s"
-                params.append(end_date)
-            q += " ORDER BY o.order_date DESC LIMIT 500"
-            cur.execute(q, params)
-            rows = cur.fetchall()
-            data = [dict(zip([c[0] for c in cur.description], r)) for r in rows] if cur.description else []
-        except Exception as e:
-            data = []
-            print(f"Accounting invoices error: {e}")
-        finally:
-            conn.close()
-        return jsonify({'success': True, 'data': data}), 200
-
-    @app.route('/api/accounting/bills', methods=['GET'])
-    def api_accounting_bills():
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        conn, cur = _pg_conn()
-        try:
-            cur.execute("SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'approved_shipments'")
-            if cur.fetchone():
-                q = """
-                    SELECT a.shipment_id AS id, ('BILL-' || a.shipment_id) AS bill_number,
-                           a.received_date::text AS bill_date, a.total_cost AS total_amount,
-                           a.total_cost AS balance_due, 'open' AS status,
-                           v.vendor_name
-                    FROM approved_shipments a
-                    LEFT JOIN vendors v ON a.vendor_id = v.vendor_id
-                    WHERE a.total_cost IS NOT NULL AND a.total_cost > 0
-                """
-                params = []
-                if start_date:
-                    q += " AND a.received_date::date >= %s"
-                    params.append(start_date)
-                if end_date:
-                    q += " AND a.received_date::date <= %s"
-                    params.append(end_date)
-                q += " ORDER BY a.received_date DESC LIMIT 500"
-                cur.execute(q, params)
-            else:
-                q2 = """
-                    SELECT s.shipment_id AS id, ('BILL-' || s.shipment_id) AS bill_number,
-                           s.shipment_date::text AS bill_date,
-                           COALESCE(SUM(si.quantity_received * si.unit_cost), 0) AS total_amount,
-                           COALESCE(SUM(si.quantity_received * si.unit_cost), 0) AS balance_due,
-                           'open' AS status, v.vendor_name
-                    FROM shipments s
-                    LEFT JOIN shipment_items si ON s.shipment_id = si.shipment_id
-                    LEFT JOIN vendors v ON s.vendor_id = v.vendor_id
-                    WHERE 1=1
-                """
-                params2 = []
-                if start_date:
-                    q2 += " AND s.shipment_date::date >= %s"
-                    params2.append(start_date)
-                if end_date:
-                    q2 += " AND s.shipment_date::date <= %s"
-                    params2.append(end_date)
-                q2 += " GROUP BY s.shipment_id, s.shipment_date, v.vendor_name ORDER BY s.shipment_date DESC LIMIT 500"
-                cur.execute(q2, params2)
-            rows = cur.fetchall()
-            data = [dict(zip([c[0] for c in cur.description], r)) for r in rows] if cur.description else []
-        except Exception as e:
-            data = []
-            print(f"Accounting bills error: {e}")
-        finally:
-            conn.close()
-        return jsonify({'success': True, 'data': data}), 200
-
-    @app.route('/api/accounting/customers', methods=['GET'])
-    def api_accounting_customers():
-        conn, cur = _pg_conn()
-        try:
-            cur.execute("SELECT 1 FROM information_schema.tables WHERE table_schema = 'public' AND table_name = 'customers'")
-            if cur.fetchone():
-                cur.execute("""
-                    SELECT customer_id AS id, customer_id AS customer_number, customer_name AS name,
-                           customer_name AS display_name, email, phone, COALESCE(address, '') AS address,
-                           0 AS account_balance
-                    FROM customers ORDER BY customer_name LIMIT 1000
-                """)
-                rows = cur.fetchall()
-                data = [dict(zip([c[0] for c in cur.description], r)) for r in rows] if cur.description else []
-            else:
-                data = []
-        except Exception as e:
-            data = []
-            print(f"Accounting customers error: {e}")
-        finally:
-            conn.close()
-        return jsonify({'success': True, 'data': data}), 200
-
-    @app.route('/api/accounting/vendors', methods=['GET'])
-    def api_accounting_vendors():
-        try:
-            vendors = list_vendors()
-            data = [{'id': v.get('vendor_id'), 'vendor_number': v.get('vendor_id'), 'vendor_name': v.get('vendor_name'),
-                     'contact_person': v.get('contact_person'), 'email': v.get('email'), 'phone': v.get('phone'),
-                     'address': v.get('address') or '', 'account_balance': 0} for v in (vendors or [])]
-        except Exception as e:
-            data = []
-            print(f"Accounting vendors error: {e}")
-        return jsonify({'success': True, 'data': data}), 200
 
 @app.route('/api/order-delivery-settings', methods=['GET'])
 def api_order_delivery_settings():
@@ -14488,6 +14050,8 @@ def api_accounting_settings():
         ok = update_establishment_settings(None, updates)
         if not ok:
             return jsonify({'success': False, 'message': 'Failed to update settings'}), 500
+        from customer_display_system import invalidate_display_context
+        invalidate_display_context(get_current_establishment())
         settings = get_establishment_settings(None)
         return jsonify({'success': True, 'data': settings}), 200
     except Exception as e:
@@ -14744,6 +14308,7 @@ if __name__ == '__main__':
     except Exception as e:
         # Silently fail - don't block startup if sync fails
         pass
+    check_database_connection()
     # Warm connection pool so first request doesn't wait for DB connections (helps remote/Supabase)
     try:
         for _ in range(2):
@@ -14752,34 +14317,13 @@ if __name__ == '__main__':
     except Exception:
         pass
 
-    # Keep-alive for free-tier DBs (e.g. Supabase) that pause after inactivity – prevents 10–30s cold starts
-    def _db_keepalive():
-        import time as _time  # use stdlib time (module); top-level 'time' is datetime.time)
-        interval = 4 * 60  # 4 minutes
-        while True:
-            _time.sleep(interval)
-            try:
-                conn = get_connection()
-                try:
-                    cur = conn.cursor()
-                    cur.execute("SELECT 1")
-                    cur.close()
-                finally:
-                    conn.close()
-            except Exception:
-                pass
+    # No keep-alive thread: the pool validates connections lazily on checkout (database_postgres
+    # DB_POOL_VALIDATE_AFTER) and replaces stale ones, instead of pinging every 4 minutes.
 
-    _keepalive_thread = threading.Thread(target=_db_keepalive, daemon=True)
-    _keepalive_thread.start()
-
-    # Start the scheduled orders background worker
-    try:
-        from notification_service import scheduled_orders_worker
-        _scheduling_thread = threading.Thread(target=scheduled_orders_worker, daemon=True)
-        _scheduling_thread.start()
-        print("Scheduled orders worker started")
-    except ImportError:
-        print("Warning: could not start scheduled orders worker (notification_service not found)")
+    # Late clock-in alerts, scheduled orders, accounting journal drain (serve.py runs these in a
+    # coordinator process when there are several web workers)
+    from background_workers import start_background_workers
+    start_background_workers()
 
     print("Starting web viewer...")
     print("Open your browser to: http://localhost:5001")